@@ -4,6 +4,8 @@ from .media_routes import media_bp
 from .image_routes import image_bp
 from .system_routes import system_bp
 from .ffmpeg_routes import ffmpeg_bp
+from .thumb_routes import thumb_bp
+from .asset_routes import asset_bp
 
 def register_routes(app):
     app.register_blueprint(video_bp)
@@ -11,3 +13,5 @@ def register_routes(app):
     app.register_blueprint(image_bp)
     app.register_blueprint(system_bp)
     app.register_blueprint(ffmpeg_bp)
+    app.register_blueprint(thumb_bp)
+    app.register_blueprint(asset_bp)
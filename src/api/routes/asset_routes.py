@@ -0,0 +1,120 @@
+from flask import Blueprint, request, jsonify
+from werkzeug.utils import secure_filename
+from ...services.asset_service import register_asset, get_asset, list_assets, delete_asset, ASSET_KINDS
+from ...utils.file_utils import generate_temp_filename
+from ..middlewares.authentication import require_api_key
+from ..middlewares.request_validator import validate_json
+from ..middlewares.error_handler import APIError, ValidationError
+import logging
+
+logger = logging.getLogger(__name__)
+
+asset_bp = Blueprint('asset', __name__, url_prefix='/api/v1/assets')
+
+asset_schema = {
+    "type": "object",
+    "properties": {
+        "url": {"type": "string", "format": "uri"},
+        "kind": {"type": "string", "enum": list(ASSET_KINDS)},
+        "name": {"type": "string", "maxLength": 200}
+    },
+    "required": ["url", "kind"],
+    "additionalProperties": False
+}
+
+@asset_bp.route('', methods=['POST'])
+@require_api_key
+@validate_json(asset_schema)
+def register():
+    data = request.get_json()
+
+    try:
+        asset = register_asset(
+            kind=data['kind'],
+            url=data['url'],
+            name=data.get('name')
+        )
+
+        return jsonify({
+            "status": "success",
+            "asset": asset
+        }), 201
+
+    except APIError:
+        raise
+    except Exception as e:
+        logger.exception(f"Error registering asset: {str(e)}")
+        return jsonify({
+            "status": "error",
+            "error": "processing_error",
+            "message": str(e)
+        }), 500
+
+@asset_bp.route('/upload', methods=['POST'])
+@require_api_key
+def upload():
+    uploaded = request.files.get('file')
+    kind = request.form.get('kind')
+
+    if not uploaded or not uploaded.filename:
+        raise ValidationError("A 'file' field is required")
+
+    if kind not in ASSET_KINDS:
+        raise ValidationError(f"'kind' must be one of: {', '.join(ASSET_KINDS)}")
+
+    filename = secure_filename(uploaded.filename)
+    file_path = generate_temp_filename(prefix="asset_upload_", suffix=f"_{filename}")
+
+    try:
+        uploaded.save(file_path)
+
+        asset = register_asset(
+            kind=kind,
+            file_path=file_path,
+            name=request.form.get('name'),
+            filename=filename
+        )
+
+        return jsonify({
+            "status": "success",
+            "asset": asset
+        }), 201
+
+    except APIError:
+        raise
+    except Exception as e:
+        logger.exception(f"Error uploading asset: {str(e)}")
+        return jsonify({
+            "status": "error",
+            "error": "processing_error",
+            "message": str(e)
+        }), 500
+
+@asset_bp.route('', methods=['GET'])
+@require_api_key
+def index():
+    kind = request.args.get('kind')
+
+    if kind and kind not in ASSET_KINDS:
+        raise ValidationError(f"'kind' must be one of: {', '.join(ASSET_KINDS)}")
+
+    return jsonify({
+        "status": "success",
+        "assets": list_assets(kind)
+    })
+
+@asset_bp.route('/<asset_id>', methods=['GET'])
+@require_api_key
+def detail(asset_id):
+    return jsonify({
+        "status": "success",
+        "asset": get_asset(asset_id)
+    })
+
+@asset_bp.route('/<asset_id>', methods=['DELETE'])
+@require_api_key
+def remove(asset_id):
+    return jsonify({
+        "status": "success",
+        "asset": delete_asset(asset_id)
+    })
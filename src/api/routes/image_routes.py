@@ -1,7 +1,10 @@
-from flask import Blueprint, request, jsonify
-from ...services.image_service import overlay_image_on_video, generate_thumbnail
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+from ...services.image_service import overlay_image_on_video, generate_thumbnail, generate_thumbnails, generate_storyboard
+from ...services.image_service import generate_thumbnail_derivatives
+from ...services.frame_export_service import export_frames, stream_frame_export, ARCHIVE_MIME_TYPES
 from ..middlewares.authentication import require_api_key
 from ..middlewares.request_validator import validate_json
+from ...config import settings
 import logging
 
 logger = logging.getLogger(__name__)
@@ -19,6 +22,8 @@ overlay_schema = {
         },
         "scale": {"type": "number", "minimum": 0.1, "maximum": 1.0},
         "opacity": {"type": "number", "minimum": 0.0, "maximum": 1.0},
+        "encoding_profile": {"type": "string", "enum": list(settings.ENCODING_PROFILES)},
+        "no_cache": {"type": "boolean"},
         "webhook_url": {"type": "string", "format": "uri"},
         "id": {"type": "string"}
     },
@@ -30,10 +35,74 @@ thumbnail_schema = {
     "type": "object",
     "properties": {
         "video_url": {"type": "string", "format": "uri"},
-        "time": {"type": "number", "minimum": 0},
+        "time": {
+            "oneOf": [
+                {"type": "number", "minimum": 0},
+                {"type": "string", "enum": ["auto"]}
+            ]
+        },
         "width": {"type": "integer", "minimum": 32, "maximum": 3840},
         "height": {"type": "integer", "minimum": 32, "maximum": 2160},
         "quality": {"type": "integer", "minimum": 1, "maximum": 100},
+        "times": {
+            "type": "array",
+            "items": {"type": "number", "minimum": 0},
+            "minItems": 1,
+            "maxItems": settings.THUMBNAIL_MAX_FRAMES
+        },
+        "interval": {"type": "number", "minimum": 0.04},
+        "keyframes_only": {"type": "boolean"},
+        "sizes": {
+            "type": "array",
+            "items": {"type": "integer", "minimum": 16, "maximum": 3840},
+            "minItems": 1,
+            "maxItems": 10
+        },
+        "formats": {
+            "type": "array",
+            "items": {"type": "string", "enum": ["jpg", "webp"]},
+            "minItems": 1,
+            "uniqueItems": True
+        },
+        "no_cache": {"type": "boolean"},
+        "webhook_url": {"type": "string", "format": "uri"},
+        "id": {"type": "string"}
+    },
+    "required": ["video_url"],
+    "additionalProperties": False
+}
+
+storyboard_schema = {
+    "type": "object",
+    "properties": {
+        "video_url": {"type": "string", "format": "uri"},
+        "interval": {"type": "number", "minimum": 0.1},
+        "tile_width": {"type": "integer", "minimum": 32, "maximum": 640},
+        "columns": {"type": "integer", "minimum": 1, "maximum": 20},
+        "rows": {"type": "integer", "minimum": 1, "maximum": 20},
+        "format": {"type": "string", "enum": ["jpg", "webp"]},
+        "quality": {"type": "integer", "minimum": 1, "maximum": 100},
+        "keyframes_only": {"type": "boolean"},
+        "no_cache": {"type": "boolean"},
+        "webhook_url": {"type": "string", "format": "uri"},
+        "id": {"type": "string"}
+    },
+    "required": ["video_url"],
+    "additionalProperties": False
+}
+
+frames_schema = {
+    "type": "object",
+    "properties": {
+        "video_url": {"type": "string", "format": "uri"},
+        "fps": {"type": "number", "exclusiveMinimum": 0, "maximum": 60},
+        "width": {"type": "integer", "minimum": 16, "maximum": 3840},
+        "format": {"type": "string", "enum": ["jpg", "png"]},
+        "archive": {"type": "string", "enum": list(ARCHIVE_MIME_TYPES)},
+        "quality": {"type": "integer", "minimum": 1, "maximum": 100},
+        "max_frames": {"type": "integer", "minimum": 1, "maximum": settings.FRAME_EXPORT_MAX_FRAMES},
+        "stream": {"type": "boolean"},
+        "no_cache": {"type": "boolean"},
         "webhook_url": {"type": "string", "format": "uri"},
         "id": {"type": "string"}
     },
@@ -57,7 +126,9 @@ def overlay():
             scale=data.get('scale', 0.3),
             opacity=data.get('opacity', 1.0),
             job_id=job_id,
-            webhook_url=data.get('webhook_url')
+            webhook_url=data.get('webhook_url'),
+            no_cache=data.get('no_cache', False),
+            encoding_profile=data.get('encoding_profile')
         )
         
         return jsonify({
@@ -83,14 +154,77 @@ def thumbnail():
     try:
         job_id = data.get('id')
         
-        result = generate_thumbnail(
+        if data.get('times') or data.get('interval'):
+            result = generate_thumbnails(
+                video_url=data['video_url'],
+                times=data.get('times'),
+                interval=data.get('interval'),
+                width=data.get('width', 640),
+                height=data.get('height', 360),
+                quality=data.get('quality', 90),
+                keyframes_only=data.get('keyframes_only', False),
+                job_id=job_id,
+                webhook_url=data.get('webhook_url'),
+                no_cache=data.get('no_cache', False)
+            )
+        elif data.get('sizes'):
+            result = generate_thumbnail_derivatives(
+                video_url=data['video_url'],
+                time=data.get('time', 0),
+                sizes=data['sizes'],
+                formats=data.get('formats'),
+                quality=data.get('quality', 90),
+                job_id=job_id,
+                webhook_url=data.get('webhook_url'),
+                no_cache=data.get('no_cache', False)
+            )
+        else:
+            result = generate_thumbnail(
+                video_url=data['video_url'],
+                time=data.get('time', 0),
+                width=data.get('width', 640),
+                height=data.get('height', 360),
+                quality=data.get('quality', 90),
+                job_id=job_id,
+                webhook_url=data.get('webhook_url'),
+                no_cache=data.get('no_cache', False)
+            )
+        
+        return jsonify({
+            "status": "success",
+            "result": result,
+            "job_id": job_id
+        })
+        
+    except Exception as e:
+        logger.exception(f"Error generating thumbnail: {str(e)}")
+        return jsonify({
+            "status": "error",
+            "error": "processing_error",
+            "message": str(e)
+        }), 500
+
+@image_bp.route('/storyboard', methods=['POST'])
+@require_api_key
+@validate_json(storyboard_schema)
+def storyboard():
+    data = request.get_json()
+    
+    try:
+        job_id = data.get('id')
+        
+        result = generate_storyboard(
             video_url=data['video_url'],
-            time=data.get('time', 0),
-            width=data.get('width', 640),
-            height=data.get('height', 360),
-            quality=data.get('quality', 90),
+            interval=data.get('interval', 10),
+            tile_width=data.get('tile_width', 160),
+            columns=data.get('columns', 10),
+            rows=data.get('rows', 10),
+            image_format=data.get('format', 'jpg'),
+            quality=data.get('quality', 75),
+            keyframes_only=data.get('keyframes_only', False),
             job_id=job_id,
-            webhook_url=data.get('webhook_url')
+            webhook_url=data.get('webhook_url'),
+            no_cache=data.get('no_cache', False)
         )
         
         return jsonify({
@@ -100,7 +234,55 @@ def thumbnail():
         })
         
     except Exception as e:
-        logger.exception(f"Error generating thumbnail: {str(e)}")
+        logger.exception(f"Error generating storyboard: {str(e)}")
+        return jsonify({
+            "status": "error",
+            "error": "processing_error",
+            "message": str(e)
+        }), 500
+
+@image_bp.route('/frames', methods=['POST'])
+@require_api_key
+@validate_json(frames_schema)
+def frames():
+    data = request.get_json()
+    
+    try:
+        job_id = data.get('id')
+        archive_format = data.get('archive', 'zip')
+        
+        options = {
+            "video_url": data['video_url'],
+            "fps": data.get('fps', 1),
+            "width": data.get('width'),
+            "image_format": data.get('format', 'jpg'),
+            "archive_format": archive_format,
+            "quality": data.get('quality', 90),
+            "max_frames": data.get('max_frames'),
+            "job_id": job_id
+        }
+        
+        if data.get('stream'):
+            return Response(
+                stream_with_context(stream_frame_export(**options)),
+                mimetype=ARCHIVE_MIME_TYPES[archive_format],
+                headers={"Content-Disposition": f"attachment; filename=frames.{archive_format}"}
+            )
+        
+        result = export_frames(
+            **options,
+            webhook_url=data.get('webhook_url'),
+            no_cache=data.get('no_cache', False)
+        )
+        
+        return jsonify({
+            "status": "success",
+            "result": result,
+            "job_id": job_id
+        })
+        
+    except Exception as e:
+        logger.exception(f"Error exporting frames: {str(e)}")
         return jsonify({
             "status": "error",
             "error": "processing_error",
@@ -1,7 +1,11 @@
 from flask import Blueprint, request, jsonify
-from ...services.media_service import extract_audio, transcribe_media
+from ...services.media_service import extract_audio, extract_audio_formats, transcribe_media
+from ...services.analysis_service import analyze_media, ANALYSIS_DETECTORS, DEFAULT_ANALYSIS_PARAMS
+from ...services.waveform_service import generate_waveform
+from ...services.measurement_service import normalize_loudness
 from ..middlewares.authentication import require_api_key
 from ..middlewares.request_validator import validate_json
+from ...config import settings
 import logging
 
 logger = logging.getLogger(__name__)
@@ -14,6 +18,22 @@ media_to_mp3_schema = {
         "media_url": {"type": "string", "format": "uri"},
         "bitrate": {"type": "string", "pattern": "^[0-9]+k$"},
         "format": {"type": "string", "enum": ["mp3", "wav", "aac", "flac"]},
+        "outputs": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "format": {"type": "string", "enum": ["mp3", "wav", "aac", "flac"]},
+                    "bitrate": {"type": "string", "pattern": "^[0-9]+k$"}
+                },
+                "required": ["format"],
+                "additionalProperties": False
+            },
+            "minItems": 1,
+            "maxItems": 8,
+            "uniqueItems": True
+        },
+        "no_cache": {"type": "boolean"},
         "webhook_url": {"type": "string", "format": "uri"},
         "id": {"type": "string"}
     },
@@ -26,7 +46,65 @@ transcribe_schema = {
     "properties": {
         "media_url": {"type": "string", "format": "uri"},
         "language": {"type": "string", "minLength": 2, "maxLength": 5},
-        "output_format": {"type": "string", "enum": ["txt", "srt", "vtt", "json"]},
+        "output_format": {"type": "string", "enum": ["txt", "srt", "vtt", "ass", "json"]},
+        "no_cache": {"type": "boolean"},
+        "webhook_url": {"type": "string", "format": "uri"},
+        "id": {"type": "string"}
+    },
+    "required": ["media_url"],
+    "additionalProperties": False
+}
+
+analyze_schema = {
+    "type": "object",
+    "properties": {
+        "media_url": {"type": "string", "format": "uri"},
+        "detectors": {
+            "type": "array",
+            "items": {"type": "string", "enum": ANALYSIS_DETECTORS},
+            "minItems": 1,
+            "uniqueItems": True
+        },
+        "params": {
+            "type": "object",
+            "properties": {name: {"type": "number"} for name in DEFAULT_ANALYSIS_PARAMS},
+            "additionalProperties": False
+        },
+        "no_cache": {"type": "boolean"},
+        "webhook_url": {"type": "string", "format": "uri"},
+        "id": {"type": "string"}
+    },
+    "required": ["media_url"],
+    "additionalProperties": False
+}
+
+waveform_schema = {
+    "type": "object",
+    "properties": {
+        "media_url": {"type": "string", "format": "uri"},
+        "zoom_levels": {
+            "type": "array",
+            "items": {"type": "integer", "minimum": 16, "maximum": 65536},
+            "minItems": 1,
+            "maxItems": 8
+        },
+        "no_cache": {"type": "boolean"},
+        "webhook_url": {"type": "string", "format": "uri"},
+        "id": {"type": "string"}
+    },
+    "required": ["media_url"],
+    "additionalProperties": False
+}
+
+loudnorm_schema = {
+    "type": "object",
+    "properties": {
+        "media_url": {"type": "string", "format": "uri"},
+        "integrated": {"type": "number", "minimum": -70, "maximum": -5},
+        "true_peak": {"type": "number", "minimum": -9, "maximum": 0},
+        "lra": {"type": "number", "minimum": 1, "maximum": 20},
+        "encoding_profile": {"type": "string", "enum": list(settings.ENCODING_PROFILES)},
+        "no_cache": {"type": "boolean"},
         "webhook_url": {"type": "string", "format": "uri"},
         "id": {"type": "string"}
     },
@@ -43,13 +121,23 @@ def media_to_mp3():
     try:
         job_id = data.get('id')
         
-        result = extract_audio(
-            media_url=data['media_url'],
-            bitrate=data.get('bitrate', '192k'),
-            format=data.get('format', 'mp3'),
-            job_id=job_id,
-            webhook_url=data.get('webhook_url')
-        )
+        if data.get('outputs'):
+            result = extract_audio_formats(
+                media_url=data['media_url'],
+                outputs=data['outputs'],
+                job_id=job_id,
+                webhook_url=data.get('webhook_url'),
+                no_cache=data.get('no_cache', False)
+            )
+        else:
+            result = extract_audio(
+                media_url=data['media_url'],
+                bitrate=data.get('bitrate', '192k'),
+                format=data.get('format', 'mp3'),
+                job_id=job_id,
+                webhook_url=data.get('webhook_url'),
+                no_cache=data.get('no_cache', False)
+            )
         
         return jsonify({
             "status": "success",
@@ -79,7 +167,8 @@ def transcribe():
             language=data.get('language', 'auto'),
             output_format=data.get('output_format', 'txt'),
             job_id=job_id,
-            webhook_url=data.get('webhook_url')
+            webhook_url=data.get('webhook_url'),
+            no_cache=data.get('no_cache', False)
         )
         
         return jsonify({
@@ -95,3 +184,100 @@ def transcribe():
             "error": "processing_error",
             "message": str(e)
         }), 500
+
+@media_bp.route('/analyze', methods=['POST'])
+@require_api_key
+@validate_json(analyze_schema)
+def analyze():
+    data = request.get_json()
+    
+    try:
+        job_id = data.get('id')
+        
+        result = analyze_media(
+            media_url=data['media_url'],
+            detectors=data.get('detectors'),
+            params=data.get('params'),
+            job_id=job_id,
+            webhook_url=data.get('webhook_url'),
+            no_cache=data.get('no_cache', False)
+        )
+        
+        return jsonify({
+            "status": "success",
+            "result": result,
+            "job_id": job_id
+        })
+        
+    except Exception as e:
+        logger.exception(f"Error analyzing media: {str(e)}")
+        return jsonify({
+            "status": "error",
+            "error": "processing_error",
+            "message": str(e)
+        }), 500
+
+@media_bp.route('/waveform', methods=['POST'])
+@require_api_key
+@validate_json(waveform_schema)
+def waveform():
+    data = request.get_json()
+    
+    try:
+        job_id = data.get('id')
+        
+        result = generate_waveform(
+            media_url=data['media_url'],
+            zoom_levels=data.get('zoom_levels'),
+            job_id=job_id,
+            webhook_url=data.get('webhook_url'),
+            no_cache=data.get('no_cache', False)
+        )
+        
+        return jsonify({
+            "status": "success",
+            "result": result,
+            "job_id": job_id
+        })
+        
+    except Exception as e:
+        logger.exception(f"Error generating waveform: {str(e)}")
+        return jsonify({
+            "status": "error",
+            "error": "processing_error",
+            "message": str(e)
+        }), 500
+
+@media_bp.route('/loudnorm', methods=['POST'])
+@require_api_key
+@validate_json(loudnorm_schema)
+def loudnorm():
+    data = request.get_json()
+    
+    try:
+        job_id = data.get('id')
+        
+        result = normalize_loudness(
+            media_url=data['media_url'],
+            integrated=data.get('integrated'),
+            true_peak=data.get('true_peak'),
+            lra=data.get('lra'),
+            job_id=job_id,
+            webhook_url=data.get('webhook_url'),
+            no_cache=data.get('no_cache', False),
+            encoding_profile=data.get('encoding_profile')
+        )
+        
+        return jsonify({
+            "status": "success",
+            "result": result,
+            "job_id": job_id
+        })
+        
+    except Exception as e:
+        logger.exception(f"Error normalizing loudness: {str(e)}")
+        return jsonify({
+            "status": "error",
+            "error": "processing_error",
+            "message": str(e)
+        }), 500
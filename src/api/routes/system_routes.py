@@ -1,6 +1,7 @@
-from flask import Blueprint, jsonify, current_app
+from flask import Blueprint, jsonify, current_app, request
 from ...services.redis_queue_service import get_queue_stats
 from ...services.cleanup_service import cleanup_temp_files
+from ...services.cache_service import invalidate_cached_result, invalidate_cache
 from ..middlewares.authentication import require_api_key
 import logging
 import os
@@ -80,3 +81,25 @@ def cleanup():
             "message": str(e)
         }), 500
 
+@system_bp.route('/cache', methods=['DELETE'])
+@require_api_key
+def clear_cache():
+    data = request.get_json(silent=True) or {}
+    
+    try:
+        if data.get('fingerprint'):
+            deleted = int(invalidate_cached_result(data['fingerprint']))
+        else:
+            deleted = invalidate_cache(operation=data.get('operation'))
+        
+        return jsonify({
+            "status": "success",
+            "result": {"deleted": deleted}
+        })
+    except Exception as e:
+        logger.exception(f"Error invalidating result cache: {str(e)}")
+        return jsonify({
+            "status": "error",
+            "error": "server_error",
+            "message": str(e)
+        }), 500
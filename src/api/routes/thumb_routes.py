@@ -0,0 +1,68 @@
+from flask import Blueprint, request, send_file, jsonify, current_app
+from ...services.image_service import render_cached_thumbnail, verify_thumbnail_signature, THUMBNAIL_MIME_TYPES
+from ..middlewares.error_handler import ValidationError
+import logging
+
+logger = logging.getLogger(__name__)
+
+thumb_bp = Blueprint('thumb', __name__)
+
+# Thumbnails are addressed by content, so clients may cache them forever
+THUMB_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+def _get_number_arg(name, default, cast, minimum, maximum):
+    value = request.args.get(name)
+    
+    if value is None:
+        return default
+    
+    try:
+        value = cast(value)
+    except ValueError:
+        raise ValidationError(f"Invalid value for '{name}': {value}")
+    
+    if not minimum <= value <= maximum:
+        raise ValidationError(f"'{name}' must be between {minimum} and {maximum}")
+    
+    return value
+
+def _is_authorized(filename):
+    """Accept the X-API-Key header or a signed URL (?exp=<unix time>&sig=<hmac>)."""
+    api_key = request.headers.get('X-API-Key')
+    
+    if api_key:
+        return api_key == current_app.config.get('API_KEY')
+    
+    signature = request.args.get('sig')
+    return bool(signature) and verify_thumbnail_signature(filename, request.args.get('exp'), signature)
+
+@thumb_bp.route('/thumb/<path:filename>', methods=['GET'])
+def thumb(filename):
+    if not _is_authorized(filename):
+        logger.warning(f"Unauthorized thumbnail request for {filename}")
+        return jsonify({
+            "status": "error",
+            "error": "authentication_error",
+            "message": "A valid API key or signed URL is required"
+        }), 401
+    
+    time = _get_number_arg('t', 0, float, 0, 86400)
+    width = _get_number_arg('w', 320, int, 16, 1920)
+    height = _get_number_arg('h', None, int, 16, 1080)
+    quality = _get_number_arg('q', 80, int, 1, 100)
+    image_format = request.args.get('fmt', 'jpg')
+    
+    if image_format not in THUMBNAIL_MIME_TYPES:
+        raise ValidationError(f"'fmt' must be one of: {', '.join(THUMBNAIL_MIME_TYPES)}")
+    
+    cache_path, key = render_cached_thumbnail(filename, time, width, height, quality, image_format)
+    
+    response = send_file(
+        cache_path,
+        mimetype=THUMBNAIL_MIME_TYPES[image_format],
+        etag=key,
+        conditional=True
+    )
+    response.headers['Cache-Control'] = THUMB_CACHE_CONTROL
+    
+    return response
@@ -1,8 +1,13 @@
 from flask import Blueprint, request, jsonify
 from ...services.video_service import add_captions_to_video, concatenate_videos_service, process_meme_overlay, add_audio_to_video
 from ...services.animation_service import animated_text_service
+from ...services.frame_processing_service import process_video_frames, FRAME_PROCESSORS
+from ...services.trim_service import trim_video
+from ...services.silence_service import remove_silence
+from ...services.measurement_service import auto_crop_video
 from ..middlewares.authentication import require_api_key
 from ..middlewares.request_validator import validate_json
+from ...config import settings
 import logging
 
 logger = logging.getLogger(__name__)
@@ -19,10 +24,33 @@ caption_video_schema = {
         "font_color": {"type": "string"},
         "background": {"type": "boolean"},
         "position": {"type": "string", "enum": ["bottom", "top", "center"]},
+        "mode": {"type": "string", "enum": ["burn", "mux"]},
+        "container": {"type": "string", "enum": ["mp4", "mkv"]},
+        "tracks": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "url": {"type": "string", "format": "uri"},
+                    "language": {"type": "string"},
+                    "title": {"type": "string"},
+                    "default": {"type": "boolean"}
+                },
+                "required": ["url"],
+                "additionalProperties": False
+            },
+            "minItems": 1
+        },
+        "encoding_profile": {"type": "string", "enum": list(settings.ENCODING_PROFILES)},
+        "no_cache": {"type": "boolean"},
         "webhook_url": {"type": "string", "format": "uri"},
         "id": {"type": "string"}
     },
-    "required": ["video_url", "subtitles_url"],
+    "required": ["video_url"],
+    "anyOf": [
+        {"required": ["subtitles_url"]},
+        {"required": ["tracks", "mode"], "properties": {"mode": {"const": "mux"}}}
+    ],
     "additionalProperties": False
 }
 
@@ -33,6 +61,8 @@ meme_overlay_schema = {
         "meme_url": {"type": "string", "format": "uri"},
         "position": {"type": "string"},
         "scale": {"type": "number", "minimum": 0.1, "maximum": 1.0},
+        "encoding_profile": {"type": "string", "enum": list(settings.ENCODING_PROFILES)},
+        "no_cache": {"type": "boolean"},
         "webhook_url": {"type": "string", "format": "uri"},
         "id": {"type": "string"}
     },
@@ -48,6 +78,7 @@ concatenate_schema = {
             "items": {"type": "string", "format": "uri"},
             "minItems": 2
         },
+        "no_cache": {"type": "boolean"},
         "webhook_url": {"type": "string", "format": "uri"},
         "id": {"type": "string"}
     },
@@ -72,6 +103,8 @@ animated_text_schema = {
         "font_size": {"type": "integer", "minimum": 12, "maximum": 120},
         "color": {"type": "string"},
         "duration": {"type": "number", "minimum": 1, "maximum": 20},
+        "encoding_profile": {"type": "string", "enum": list(settings.ENCODING_PROFILES)},
+        "no_cache": {"type": "boolean"},
         "webhook_url": {"type": "string", "format": "uri"},
         "id": {"type": "string"}
     },
@@ -86,6 +119,8 @@ add_audio_schema = {
         "audio_url": {"type": "string", "format": "uri"},
         "replace_audio": {"type": "boolean"},
         "audio_volume": {"type": "number", "minimum": 0, "maximum": 10.0},
+        "encoding_profile": {"type": "string", "enum": list(settings.ENCODING_PROFILES)},
+        "no_cache": {"type": "boolean"},
         "webhook_url": {"type": "string", "format": "uri"},
         "id": {"type": "string"}
     },
@@ -93,6 +128,79 @@ add_audio_schema = {
     "additionalProperties": False
 }
 
+process_frames_schema = {
+    "type": "object",
+    "properties": {
+        "video_url": {"type": "string", "format": "uri"},
+        "processor": {"type": "string", "enum": list(FRAME_PROCESSORS)},
+        "params": {"type": "object"},
+        "batch_size": {"type": "integer", "minimum": 1, "maximum": 256},
+        "encoding_profile": {"type": "string", "enum": list(settings.ENCODING_PROFILES)},
+        "no_cache": {"type": "boolean"},
+        "webhook_url": {"type": "string", "format": "uri"},
+        "id": {"type": "string"}
+    },
+    "required": ["video_url", "processor"],
+    "additionalProperties": False
+}
+
+trim_schema = {
+    "type": "object",
+    "properties": {
+        "video_url": {"type": "string", "format": "uri"},
+        "ranges": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "start": {"type": "number", "minimum": 0},
+                    "end": {"type": "number", "minimum": 0}
+                },
+                "required": ["start"],
+                "additionalProperties": False
+            },
+            "minItems": 1,
+            "maxItems": 50
+        },
+        "encoding_profile": {"type": "string", "enum": list(settings.ENCODING_PROFILES)},
+        "no_cache": {"type": "boolean"},
+        "webhook_url": {"type": "string", "format": "uri"},
+        "id": {"type": "string"}
+    },
+    "required": ["video_url", "ranges"],
+    "additionalProperties": False
+}
+
+remove_silence_schema = {
+    "type": "object",
+    "properties": {
+        "video_url": {"type": "string", "format": "uri"},
+        "threshold_db": {"type": "number", "minimum": -90, "maximum": 0},
+        "min_silence": {"type": "number", "minimum": 0.05, "maximum": 10},
+        "padding": {"type": "number", "minimum": 0, "maximum": 2},
+        "encoding_profile": {"type": "string", "enum": list(settings.ENCODING_PROFILES)},
+        "no_cache": {"type": "boolean"},
+        "webhook_url": {"type": "string", "format": "uri"},
+        "id": {"type": "string"}
+    },
+    "required": ["video_url"],
+    "additionalProperties": False
+}
+
+auto_crop_schema = {
+    "type": "object",
+    "properties": {
+        "video_url": {"type": "string", "format": "uri"},
+        "limit": {"type": "integer", "minimum": 0, "maximum": 255},
+        "encoding_profile": {"type": "string", "enum": list(settings.ENCODING_PROFILES)},
+        "no_cache": {"type": "boolean"},
+        "webhook_url": {"type": "string", "format": "uri"},
+        "id": {"type": "string"}
+    },
+    "required": ["video_url"],
+    "additionalProperties": False
+}
+
 @video_bp.route('/caption', methods=['POST'])
 @require_api_key
 @validate_json(caption_video_schema)
@@ -104,14 +212,19 @@ def caption_video():
         
         result = add_captions_to_video(
             video_url=data['video_url'],
-            subtitles_url=data['subtitles_url'],
+            subtitles_url=data.get('subtitles_url'),
             font=data.get('font', 'Arial'),
             font_size=data.get('font_size', 24),
             font_color=data.get('font_color', 'white'),
             background=data.get('background', True),
             position=data.get('position', 'bottom'),
             job_id=job_id,
-            webhook_url=data.get('webhook_url')
+            webhook_url=data.get('webhook_url'),
+            no_cache=data.get('no_cache', False),
+            encoding_profile=data.get('encoding_profile'),
+            mode=data.get('mode', 'burn'),
+            tracks=data.get('tracks'),
+            container=data.get('container', 'mp4')
         )
         
         return jsonify({
@@ -143,7 +256,9 @@ def meme_overlay():
             position=data.get('position', 'bottom_right'),
             scale=data.get('scale', 0.3),
             job_id=job_id,
-            webhook_url=data.get('webhook_url')
+            webhook_url=data.get('webhook_url'),
+            no_cache=data.get('no_cache', False),
+            encoding_profile=data.get('encoding_profile')
         )
         
         return jsonify({
@@ -179,7 +294,9 @@ def animated_text():
             color=data.get('color', 'white'),
             duration=data.get('duration', 3.0),
             job_id=job_id,
-            webhook_url=data.get('webhook_url')
+            webhook_url=data.get('webhook_url'),
+            no_cache=data.get('no_cache', False),
+            encoding_profile=data.get('encoding_profile')
         )
         
         return jsonify({
@@ -208,7 +325,8 @@ def concatenate_videos():
         result = concatenate_videos_service(
             video_urls=data['video_urls'],
             job_id=job_id,
-            webhook_url=data.get('webhook_url')
+            webhook_url=data.get('webhook_url'),
+            no_cache=data.get('no_cache', False)
         )
         
         return jsonify({
@@ -240,7 +358,9 @@ def add_audio():
             replace_audio=data.get('replace_audio', True),
             audio_volume=data.get('audio_volume', 1.0),
             job_id=job_id,
-            webhook_url=data.get('webhook_url')
+            webhook_url=data.get('webhook_url'),
+            no_cache=data.get('no_cache', False),
+            encoding_profile=data.get('encoding_profile')
         )
         
         return jsonify({
@@ -256,3 +376,135 @@ def add_audio():
             "error": "processing_error",
             "message": str(e)
         }), 500
+
+@video_bp.route('/process-frames', methods=['POST'])
+@require_api_key
+@validate_json(process_frames_schema)
+def process_frames():
+    data = request.get_json()
+    
+    try:
+        job_id = data.get('id')
+        
+        result = process_video_frames(
+            video_url=data['video_url'],
+            processor=data['processor'],
+            params=data.get('params'),
+            batch_size=data.get('batch_size'),
+            job_id=job_id,
+            webhook_url=data.get('webhook_url'),
+            no_cache=data.get('no_cache', False),
+            encoding_profile=data.get('encoding_profile')
+        )
+        
+        return jsonify({
+            "status": "success",
+            "result": result,
+            "job_id": job_id
+        })
+        
+    except Exception as e:
+        logger.exception(f"Error procesando frames: {str(e)}")
+        return jsonify({
+            "status": "error",
+            "error": "processing_error",
+            "message": str(e)
+        }), 500
+
+@video_bp.route('/trim', methods=['POST'])
+@require_api_key
+@validate_json(trim_schema)
+def trim():
+    data = request.get_json()
+    
+    try:
+        job_id = data.get('id')
+        
+        result = trim_video(
+            video_url=data['video_url'],
+            ranges=data['ranges'],
+            job_id=job_id,
+            webhook_url=data.get('webhook_url'),
+            no_cache=data.get('no_cache', False),
+            encoding_profile=data.get('encoding_profile')
+        )
+        
+        return jsonify({
+            "status": "success",
+            "result": result,
+            "job_id": job_id
+        })
+        
+    except Exception as e:
+        logger.exception(f"Error recortando video: {str(e)}")
+        return jsonify({
+            "status": "error",
+            "error": "processing_error",
+            "message": str(e)
+        }), 500
+
+@video_bp.route('/remove-silence', methods=['POST'])
+@require_api_key
+@validate_json(remove_silence_schema)
+def remove_silence_route():
+    data = request.get_json()
+    
+    try:
+        job_id = data.get('id')
+        
+        result = remove_silence(
+            media_url=data['video_url'],
+            threshold_db=data.get('threshold_db'),
+            min_silence=data.get('min_silence'),
+            padding=data.get('padding'),
+            job_id=job_id,
+            webhook_url=data.get('webhook_url'),
+            no_cache=data.get('no_cache', False),
+            encoding_profile=data.get('encoding_profile')
+        )
+        
+        return jsonify({
+            "status": "success",
+            "result": result,
+            "job_id": job_id
+        })
+        
+    except Exception as e:
+        logger.exception(f"Error eliminando silencios: {str(e)}")
+        return jsonify({
+            "status": "error",
+            "error": "processing_error",
+            "message": str(e)
+        }), 500
+
+@video_bp.route('/auto-crop', methods=['POST'])
+@require_api_key
+@validate_json(auto_crop_schema)
+def auto_crop():
+    data = request.get_json()
+    
+    try:
+        job_id = data.get('id')
+        
+        result = auto_crop_video(
+            video_url=data['video_url'],
+            limit=data.get('limit'),
+            job_id=job_id,
+            webhook_url=data.get('webhook_url'),
+            no_cache=data.get('no_cache', False),
+            encoding_profile=data.get('encoding_profile')
+        )
+        
+        return jsonify({
+            "status": "success",
+            "result": result,
+            "job_id": job_id
+        })
+        
+    except Exception as e:
+        logger.exception(f"Error en el recorte automático: {str(e)}")
+        return jsonify({
+            "status": "error",
+            "error": "processing_error",
+            "message": str(e)
+        }), 500
@@ -5,7 +5,6 @@ import uuid
 import os
 import time
 import logging
-import subprocess
 from src.config.settings import settings
 from src.api.routes import register_routes
 from src.api.docs import register_docs
@@ -13,6 +12,8 @@ from src.api.middlewares.error_handler import register_error_handlers
 from src.services.video_service import add_audio_to_video
 from src.api.middlewares.authentication import require_api_key
 from src.scheduler import init_scheduler
+from src.services.capability_service import init_ffmpeg_capabilities, get_ffmpeg_capabilities
+from src.services.font_service import init_font_registry
 
 logger = logging.getLogger(__name__)
 
@@ -30,8 +31,9 @@ def create_app():
     app.config['MEDIA_URL'] = settings.MEDIA_URL
     app.config['TEMP_DIR'] = settings.TEMP_DIR
     app.config['LOG_DIR'] = settings.LOG_DIR
+    app.config['CACHE_DIR'] = settings.CACHE_DIR
     
-    for directory in [settings.STORAGE_PATH, settings.TEMP_DIR, settings.LOG_DIR]:
+    for directory in [settings.STORAGE_PATH, settings.TEMP_DIR, settings.LOG_DIR, settings.CACHE_DIR]:
         os.makedirs(directory, exist_ok=True)
     
     register_routes(app)
@@ -39,6 +41,8 @@ def create_app():
     register_error_handlers(app)
     
     init_scheduler(app)
+    init_ffmpeg_capabilities()
+    init_font_registry()
 
     @app.before_request
     def before_request():
@@ -82,6 +86,7 @@ def create_app():
             "status": status,
             "storage": "ok" if storage_ok else "error",
             "ffmpeg": "ok" if ffmpeg_ok else "error",
+            "ffmpeg_version": get_ffmpeg_capabilities().get('ffmpeg_version'),
             "timestamp": time.time()
         })
     
@@ -131,14 +136,7 @@ def create_app():
 
 def _check_ffmpeg():
     try:
-        result = subprocess.run(
-            ['ffmpeg', '-version'], 
-            stdout=subprocess.PIPE, 
-            stderr=subprocess.PIPE, 
-            text=True, 
-            check=False
-        )
-        return result.returncode == 0
+        return get_ffmpeg_capabilities().get('available', False)
     except Exception:
         return False
 
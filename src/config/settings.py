@@ -1,4 +1,5 @@
 import os
+import json
 import logging
 from dotenv import load_dotenv
 
@@ -25,6 +26,7 @@ class Settings:
         self.STORAGE_PATH = os.getenv('STORAGE_PATH', './storage')
         self.TEMP_DIR = os.getenv('TEMP_DIR', './temp')
         self.LOG_DIR = os.getenv('LOG_DIR', './logs')
+        self.CACHE_DIR = os.getenv('CACHE_DIR', './cache')
         
         # Configuración de URLs
         self.BASE_URL = os.getenv('BASE_URL', f"http://localhost:{self.PORT}")
@@ -35,6 +37,102 @@ class Settings:
         self.REDIS_RETRY_ATTEMPTS = int(os.getenv("REDIS_RETRY_ATTEMPTS", 5))
         self.REDIS_RETRY_BACKOFF = int(os.getenv("REDIS_RETRY_BACKOFF", 2))
         
+        # Configuración de caché de resultados
+        self.RESULT_CACHE_ENABLED = os.getenv('RESULT_CACHE_ENABLED', 'True').lower() in ('true', '1', 't')
+        self.RESULT_CACHE_TTL = int(os.getenv('RESULT_CACHE_TTL', '604800'))  # 7 días
+        # La caché no reintenta: si Redis no responde se omite durante CACHE_REDIS_RETRY_INTERVAL
+        self.CACHE_REDIS_TIMEOUT = float(os.getenv('CACHE_REDIS_TIMEOUT', '0.5'))
+        self.CACHE_REDIS_RETRY_INTERVAL = int(os.getenv('CACHE_REDIS_RETRY_INTERVAL', '30'))
+        self.PIPELINE_VERSION = os.getenv('PIPELINE_VERSION', '1')
+        
+        # Perfiles de codificación (velocidad/calidad) seleccionables por petición
+        self.ENCODING_PROFILES = {
+            'draft': {
+                'video_codec': 'h264',
+                'preset': 'ultrafast',
+                'crf': 30,
+                'tune': 'fastdecode',
+                'threads': 0,
+                'audio_codec': 'aac',
+                'audio_bitrate': '96k'
+            },
+            'balanced': {
+                'video_codec': 'h264',
+                'preset': 'medium',
+                'crf': 23,
+                'tune': None,
+                'threads': 0,
+                'audio_codec': 'aac',
+                'audio_bitrate': '128k'
+            },
+            'archive': {
+                'video_codec': 'h264',
+                'preset': 'slow',
+                'crf': 18,
+                'tune': None,
+                'threads': 0,
+                'audio_codec': 'aac',
+                'audio_bitrate': '192k'
+            }
+        }
+        # Permite redefinir o añadir perfiles con un JSON en ENCODING_PROFILES
+        self.ENCODING_PROFILES.update(json.loads(os.getenv('ENCODING_PROFILES', '{}')))
+        self.DEFAULT_ENCODING_PROFILE = os.getenv('DEFAULT_ENCODING_PROFILE', 'balanced')
+        
+        # Configuración de miniaturas
+        self.THUMBNAIL_MAX_FRAMES = int(os.getenv('THUMBNAIL_MAX_FRAMES', '200'))
+        self.THUMBNAIL_BATCH_SIZE = int(os.getenv('THUMBNAIL_BATCH_SIZE', '32'))
+        self.THUMBNAIL_AUTO_CANDIDATES = int(os.getenv('THUMBNAIL_AUTO_CANDIDATES', '200'))
+        self.THUMBNAIL_AUTO_SAMPLE_WIDTH = int(os.getenv('THUMBNAIL_AUTO_SAMPLE_WIDTH', '160'))
+        self.THUMB_CACHE_MAX_AGE = int(os.getenv('THUMB_CACHE_MAX_AGE', str(7 * 86400)))  # 7 days
+        self.THUMB_CACHE_MAX_SIZE = int(os.getenv('THUMB_CACHE_MAX_SIZE', str(1024 * 1024 * 1024)))  # 1GB
+        self.OVERLAY_CACHE_MAX_AGE = int(os.getenv('OVERLAY_CACHE_MAX_AGE', str(7 * 86400)))  # 7 days
+        self.OVERLAY_CACHE_MAX_SIZE = int(os.getenv('OVERLAY_CACHE_MAX_SIZE', str(512 * 1024 * 1024)))  # 512MB
+        self.STORYBOARD_MAX_FRAMES = int(os.getenv('STORYBOARD_MAX_FRAMES', '2000'))
+        self.FRAME_EXPORT_MAX_FRAMES = int(os.getenv('FRAME_EXPORT_MAX_FRAMES', '20000'))
+        self.FRAME_PROCESSING_BATCH_SIZE = int(os.getenv('FRAME_PROCESSING_BATCH_SIZE', '8'))
+        self.FRAME_PROCESSING_MAX_BATCH_BYTES = int(os.getenv('FRAME_PROCESSING_MAX_BATCH_BYTES', str(512 * 1024 * 1024)))  # 512MB
+        self.ANALYSIS_WIDTH = int(os.getenv('ANALYSIS_WIDTH', '320'))
+        self.WAVEFORM_ZOOM_LEVELS = [
+            int(level) for level in os.getenv('WAVEFORM_ZOOM_LEVELS', '256,1024,4096').split(',') if level.strip()
+        ]
+        
+        # Transcripción: backend ASR ('whisper' o 'stub'), modelo y paralelismo
+        self.ASR_BACKEND = os.getenv('ASR_BACKEND', 'whisper')
+        self.ASR_MODEL = os.getenv('ASR_MODEL', 'small')
+        self.ASR_COMPUTE_TYPE = os.getenv('ASR_COMPUTE_TYPE', 'int8')
+        self.ASR_WORKERS = int(os.getenv('ASR_WORKERS', '2'))
+        self.ASR_THREADS = int(os.getenv('ASR_THREADS', '2'))
+        self.ASR_CHUNK_SECONDS = float(os.getenv('ASR_CHUNK_SECONDS', '30'))
+        
+        # Índices de keyframes en memoria (también en CACHE_DIR/keyframes)
+        self.KEYFRAME_INDEX_CACHE_SIZE = int(os.getenv('KEYFRAME_INDEX_CACHE_SIZE', '64'))
+        self.KEYFRAME_CACHE_MAX_AGE = int(os.getenv('KEYFRAME_CACHE_MAX_AGE', str(30 * 86400)))  # 30 días
+        self.KEYFRAME_CACHE_MAX_SIZE = int(os.getenv('KEYFRAME_CACHE_MAX_SIZE', str(256 * 1024 * 1024)))  # 256MB
+        
+        # Mediciones de filtros de dos pasadas en disco (CACHE_DIR/measurements)
+        self.MEASUREMENT_CACHE_MAX_AGE = int(os.getenv('MEASUREMENT_CACHE_MAX_AGE', str(30 * 86400)))  # 30 días
+        self.MEASUREMENT_CACHE_MAX_SIZE = int(os.getenv('MEASUREMENT_CACHE_MAX_SIZE', str(64 * 1024 * 1024)))  # 64MB
+        
+        # Configuración de subtítulos
+        self.SUBTITLE_CACHE_SIZE = int(os.getenv('SUBTITLE_CACHE_SIZE', '128'))
+        
+        # Configuración de fuentes
+        self.FONTS_DIR = os.getenv('FONTS_DIR', './fonts')
+        self.FONT_SEARCH_PATHS = [
+            path.strip()
+            for path in os.getenv('FONT_SEARCH_PATHS', '/usr/share/fonts,/usr/local/share/fonts').split(',')
+            if path.strip()
+        ]
+        self.DEFAULT_FONT = os.getenv('DEFAULT_FONT', 'DejaVu Sans')
+        
+        # Configuración de assets reutilizables (caché local fijada por worker)
+        self.ASSET_CACHE_DIR = os.getenv('ASSET_CACHE_DIR', os.path.join(self.CACHE_DIR, 'assets'))
+        self.ASSET_MAX_SIZE = int(os.getenv('ASSET_MAX_SIZE', str(50 * 1024 * 1024)))  # 50MB
+        
+        # Configuración de FFmpeg
+        self.FFMPEG_HW_ENCODERS = os.getenv('FFMPEG_HW_ENCODERS', 'False').lower() in ('true', '1', 't')
+        
         # Configuración de logging
         self.LOGGING_CONFIG = {
             'version': 1,
@@ -73,6 +171,7 @@ class Settings:
         os.makedirs(self.STORAGE_PATH, exist_ok=True)
         os.makedirs(self.TEMP_DIR, exist_ok=True)
         os.makedirs(self.LOG_DIR, exist_ok=True)
+        os.makedirs(self.CACHE_DIR, exist_ok=True)
 
 # Instancia de configuración
 settings = Settings()
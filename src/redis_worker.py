@@ -6,6 +6,9 @@ import signal
 import importlib
 
 from src.config.settings import settings
+# Cargar primero la API: sus rutas importan los servicios en un orden sin ciclos
+# (los servicios importan error_handler, que inicializa el paquete src.api)
+import src.api  # noqa: F401
 from src.services.redis_queue_service import (
     fetch_pending_task, 
     update_task_status, 
@@ -13,6 +16,9 @@ from src.services.redis_queue_service import (
     init_redis_client
 )
 from src.services.cleanup_service import cleanup_service
+from src.services.capability_service import init_ffmpeg_capabilities
+from src.services.font_service import init_font_registry
+from src.services.asset_service import warm_asset_cache
 
 # Configurar logging
 logging.basicConfig(
@@ -65,13 +71,35 @@ def load_task_functions():
                   "concatenate_videos_service", "add_audio_to_video"])
     
     import_and_add("src.services.media_service",
-                 ["extract_audio", "transcribe_media"])
+                 ["extract_audio", "extract_audio_formats", "transcribe_media"])
     
     import_and_add("src.services.animation_service",
                  ["animated_text_service"])
     
     import_and_add("src.services.image_service",
-                 ["overlay_image_on_video", "generate_thumbnail"])
+                 ["overlay_image_on_video", "generate_thumbnail", "generate_thumbnails",
+                  "generate_storyboard", "generate_thumbnail_derivatives"])
+    
+    import_and_add("src.services.frame_export_service",
+                 ["export_frames"])
+    
+    import_and_add("src.services.frame_processing_service",
+                 ["process_video_frames"])
+    
+    import_and_add("src.services.trim_service",
+                 ["trim_video"])
+    
+    import_and_add("src.services.analysis_service",
+                 ["analyze_media"])
+    
+    import_and_add("src.services.silence_service",
+                 ["remove_silence"])
+    
+    import_and_add("src.services.waveform_service",
+                 ["generate_waveform"])
+    
+    import_and_add("src.services.measurement_service",
+                 ["normalize_loudness", "auto_crop_video"])
     
     logger.info(f"Cargadas {len(task_functions)} funciones de tarea")
 
@@ -116,6 +144,15 @@ def main():
     # Cargar funciones de tarea
     load_task_functions()
     
+    # Detectar capacidades de FFmpeg una sola vez por proceso
+    init_ffmpeg_capabilities()
+    
+    # Assets registrados en la caché local (incluye las fuentes, antes del registro de fuentes)
+    warm_asset_cache()
+    
+    # Registro de fuentes y caché de fontconfig, antes del primer trabajo con texto
+    init_font_registry()
+    
     # Iniciar servicio de limpieza
     cleanup_service.start()
     logger.info("Servicio de limpieza iniciado")
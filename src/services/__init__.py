@@ -10,6 +10,18 @@ __all__ = [
     'concatenate_videos_service',
     'overlay_image_on_video',
     'generate_thumbnail',
+    'generate_thumbnails',
+    'generate_storyboard',
+    'generate_thumbnail_derivatives',
+    'export_frames',
+    'stream_frame_export',
+    'process_video_frames',
+    'trim_video',
+    'analyze_media',
+    'remove_silence',
+    'generate_waveform',
+    'normalize_loudness',
+    'auto_crop_video',
     'store_file',
     'get_file_url',
     'delete_file',
@@ -26,6 +38,7 @@ __all__ = [
     'update_task_status',
     'TaskStatus',
     'extract_audio',
+    'extract_audio_formats',
     'transcribe_media',
     'animated_text_service'
 ]
@@ -40,8 +53,31 @@ def __getattr__(name):
         if name in ['add_captions_to_video', 'process_meme_overlay', 'concatenate_videos_service']:
             from .video_service import add_captions_to_video, process_meme_overlay, concatenate_videos_service
             return locals()[name]
-        elif name in ['overlay_image_on_video', 'generate_thumbnail']:
-            from .image_service import overlay_image_on_video, generate_thumbnail
+        elif name in ['overlay_image_on_video', 'generate_thumbnail', 'generate_thumbnails', 'generate_storyboard',
+                      'generate_thumbnail_derivatives']:
+            from .image_service import (overlay_image_on_video, generate_thumbnail, generate_thumbnails,
+                                        generate_storyboard, generate_thumbnail_derivatives)
+            return locals()[name]
+        elif name in ['export_frames', 'stream_frame_export']:
+            from .frame_export_service import export_frames, stream_frame_export
+            return locals()[name]
+        elif name == 'process_video_frames':
+            from .frame_processing_service import process_video_frames
+            return process_video_frames
+        elif name == 'trim_video':
+            from .trim_service import trim_video
+            return trim_video
+        elif name == 'analyze_media':
+            from .analysis_service import analyze_media
+            return analyze_media
+        elif name == 'remove_silence':
+            from .silence_service import remove_silence
+            return remove_silence
+        elif name == 'generate_waveform':
+            from .waveform_service import generate_waveform
+            return generate_waveform
+        elif name in ['normalize_loudness', 'auto_crop_video']:
+            from .measurement_service import normalize_loudness, auto_crop_video
             return locals()[name]
         elif name in ['store_file', 'get_file_url', 'delete_file']:
             from .storage_service import store_file, get_file_url, delete_file
@@ -63,8 +99,8 @@ def __getattr__(name):
             if name == 'TaskStatus':
                 return TaskStatus
             return locals()[name]
-        elif name in ['extract_audio', 'transcribe_media']:
-            from .media_service import extract_audio, transcribe_media
+        elif name in ['extract_audio', 'extract_audio_formats', 'transcribe_media']:
+            from .media_service import extract_audio, extract_audio_formats, transcribe_media
             return locals()[name]
         elif name == 'animated_text_service':
             from .animation_service import animated_text_service
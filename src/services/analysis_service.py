@@ -0,0 +1,272 @@
+import re
+import os
+import logging
+import uuid
+import subprocess
+from collections import deque
+from ..utils.file_utils import download_file
+from .ffmpeg_service import get_media_info
+from .webhook_service import notify_job_completed, notify_job_failed
+from .cache_service import lookup_cached_result, save_cached_result
+from ..config import settings
+from ..api.middlewares.error_handler import ProcessingError, ValidationError
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_DETECTORS = ['scene', 'black', 'freeze', 'silence']
+
+# Detectores que necesitan la pista de video o la de audio
+VIDEO_DETECTORS = {'scene', 'black', 'freeze'}
+AUDIO_DETECTORS = {'silence'}
+
+DEFAULT_ANALYSIS_PARAMS = {
+    'scene_threshold': 10.0,
+    'black_min_duration': 0.5,
+    'black_pixel_threshold': 0.10,
+    'freeze_noise': 0.001,
+    'freeze_min_duration': 2.0,
+    'silence_noise': -50,
+    'silence_min_duration': 0.5
+}
+
+SCENE_PATTERN = re.compile(r'lavfi\.scd\.score:\s*([\d.]+),\s*lavfi\.scd\.time:\s*([\d.]+)')
+BLACK_PATTERN = re.compile(r'black_start:\s*([\d.]+)\s+black_end:\s*([\d.]+)')
+FREEZE_START_PATTERN = re.compile(r'lavfi\.freezedetect\.freeze_start:\s*([\d.]+)')
+FREEZE_END_PATTERN = re.compile(r'lavfi\.freezedetect\.freeze_end:\s*([\d.]+)')
+SILENCE_START_PATTERN = re.compile(r'silence_start:\s*(-?[\d.]+)')
+SILENCE_END_PATTERN = re.compile(r'silence_end:\s*([\d.]+)')
+
+class AnalysisParser:
+    """
+    Acumula los eventos que los filtros de detección escriben en el log de
+    FFmpeg, línea a línea mientras se decodifica.
+    """
+    def __init__(self):
+        self.events = []
+        self._open = {}
+    
+    def _add_interval(self, kind, start, end):
+        self.events.append({
+            'type': kind,
+            'start': round(start, 3),
+            'end': round(end, 3),
+            'duration': round(end - start, 3)
+        })
+    
+    def feed(self, line):
+        match = SCENE_PATTERN.search(line)
+        if match:
+            time = float(match.group(2))
+            self.events.append({
+                'type': 'scene',
+                'start': round(time, 3),
+                'end': round(time, 3),
+                'score': round(float(match.group(1)), 3)
+            })
+            return
+        
+        match = BLACK_PATTERN.search(line)
+        if match:
+            self._add_interval('black', float(match.group(1)), float(match.group(2)))
+            return
+        
+        for kind, start_pattern, end_pattern in (
+            ('freeze', FREEZE_START_PATTERN, FREEZE_END_PATTERN),
+            ('silence', SILENCE_START_PATTERN, SILENCE_END_PATTERN)
+        ):
+            match = start_pattern.search(line)
+            if match:
+                self._open[kind] = max(float(match.group(1)), 0.0)
+                return
+            
+            match = end_pattern.search(line)
+            if match and kind in self._open:
+                self._add_interval(kind, self._open.pop(kind), float(match.group(1)))
+                return
+    
+    def result(self, duration):
+        """
+        Devuelve la línea de tiempo ordenada. Los intervalos que siguen
+        abiertos al final del archivo se cierran en `duration`.
+        """
+        for kind, start in list(self._open.items()):
+            self._add_interval(kind, start, max(duration, start))
+        self._open = {}
+        
+        events = sorted(self.events, key=lambda event: (event['start'], event['type']))
+        summary = {kind: 0 for kind in ANALYSIS_DETECTORS}
+        for event in events:
+            summary[event['type']] += 1
+        
+        return {
+            'duration': round(duration, 3),
+            'events': events,
+            'summary': summary
+        }
+
+def build_analysis_command(media_path, detectors, params, has_video=True, has_audio=True):
+    """
+    Construye un único comando FFmpeg con todos los detectores.
+    
+    Los detectores de video se encadenan sobre una copia reducida a
+    ANALYSIS_WIDTH píxeles de ancho, de modo que el archivo se decodifica una
+    sola vez. La salida se descarta (muxer null): solo interesa el log.
+    """
+    video_filters = [f"scale={settings.ANALYSIS_WIDTH}:-2"]
+    
+    if 'scene' in detectors:
+        video_filters.append(f"scdet=threshold={params['scene_threshold']}")
+    if 'black' in detectors:
+        video_filters.append(f"blackdetect=d={params['black_min_duration']}:pix_th={params['black_pixel_threshold']}")
+    if 'freeze' in detectors:
+        video_filters.append(f"freezedetect=n={params['freeze_noise']}:d={params['freeze_min_duration']}")
+    
+    graphs = []
+    maps = []
+    
+    if has_video and VIDEO_DETECTORS & set(detectors):
+        graphs.append(f"[0:v:0]{','.join(video_filters)}[v]")
+        maps.extend(['-map', '[v]'])
+    
+    if has_audio and AUDIO_DETECTORS & set(detectors):
+        graphs.append(f"[0:a:0]silencedetect=noise={params['silence_noise']}dB:d={params['silence_min_duration']}[a]")
+        maps.extend(['-map', '[a]'])
+    
+    if not graphs:
+        raise ValidationError("El archivo no tiene pistas para los detectores solicitados")
+    
+    return [
+        'ffmpeg',
+        '-hide_banner',
+        '-nostats',
+        '-v', 'info',
+        '-i', media_path,
+        '-filter_complex', ';'.join(graphs),
+        *maps,
+        '-f', 'null',
+        '-'
+    ]
+
+def run_analysis_command(command, parser):
+    """
+    Ejecuta el comando de análisis y pasa cada línea del log al parser según
+    se produce, sin acumular la salida completa en memoria.
+    
+    Raises:
+        ProcessingError: Si FFmpeg falla
+    """
+    logger.debug(f"Ejecutando comando FFmpeg: {' '.join(command)}")
+    tail = deque(maxlen=20)
+    
+    try:
+        process = subprocess.Popen(
+            command,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+            errors='replace'
+        )
+    except OSError as e:
+        raise ProcessingError(f"Error ejecutando FFmpeg: {str(e)}")
+    
+    with process.stderr:
+        for line in process.stderr:
+            parser.feed(line)
+            tail.append(line)
+    
+    returncode = process.wait()
+    
+    if returncode != 0:
+        logger.error(f"Error FFmpeg (código {returncode}): {''.join(tail)}")
+        raise ProcessingError(f"Error FFmpeg: {tail[-1].strip() if tail else 'Desconocido'}")
+    
+    return parser
+
+def analyze_media(media_url, detectors=None, params=None, job_id=None, webhook_url=None, no_cache=False):
+    """
+    Detecta cambios de escena, frames negros, video congelado y silencios en
+    una sola pasada de decodificación.
+    
+    Args:
+        media_url: URL del archivo multimedia
+        detectors: Lista de detectores (por defecto todos los de ANALYSIS_DETECTORS)
+        params: Umbrales que reemplazan a DEFAULT_ANALYSIS_PARAMS
+        job_id: ID del trabajo (opcional)
+        webhook_url: URL para notificar cuando se complete (opcional)
+        no_cache: Omitir la consulta a la caché de resultados
+    
+    Returns:
+        Dict con la duración, la línea de tiempo de eventos ordenada y el
+        número de eventos de cada tipo
+    """
+    if not job_id:
+        job_id = str(uuid.uuid4())
+    
+    detectors = list(detectors or ANALYSIS_DETECTORS)
+    unknown = [name for name in detectors if name not in ANALYSIS_DETECTORS]
+    if unknown:
+        raise ValidationError(f"Detectores desconocidos: {', '.join(unknown)}")
+    
+    unknown = [name for name in (params or {}) if name not in DEFAULT_ANALYSIS_PARAMS]
+    if unknown:
+        raise ValidationError(f"Parámetros de análisis desconocidos: {', '.join(unknown)}")
+    
+    # Los umbrales van dentro del grafo de filtros: solo se aceptan números
+    try:
+        analysis_params = {name: float(value) for name, value in {**DEFAULT_ANALYSIS_PARAMS, **(params or {})}.items()}
+    except (TypeError, ValueError):
+        raise ValidationError("Los parámetros de análisis deben ser numéricos")
+    
+    logger.info(f"Job {job_id}: Iniciando análisis ({', '.join(detectors)}) de {media_url}")
+    
+    media_path = None
+    
+    try:
+        media_path = download_file(media_url, settings.TEMP_DIR)
+        logger.info(f"Job {job_id}: Archivo descargado: {media_path}")
+        
+        fingerprint, cached_result = lookup_cached_result('analyze_media', {
+            'detectors': sorted(detectors),
+            'params': analysis_params,
+            'width': settings.ANALYSIS_WIDTH
+        }, [media_path], no_cache)
+        
+        if cached_result:
+            logger.info(f"Job {job_id}: Resultado servido desde caché")
+            if webhook_url:
+                notify_job_completed(job_id, webhook_url, cached_result)
+            return cached_result
+        
+        media_info = get_media_info(media_path)
+        command = build_analysis_command(
+            media_path, detectors, analysis_params,
+            has_video='video_codec' in media_info,
+            has_audio='audio_codec' in media_info
+        )
+        
+        parser = run_analysis_command(command, AnalysisParser())
+        result = parser.result(media_info.get('duration', 0))
+        
+        save_cached_result(fingerprint, 'analyze_media', result)
+        logger.info(f"Job {job_id}: Análisis completado: {result['summary']}")
+        
+        if webhook_url:
+            notify_job_completed(job_id, webhook_url, result)
+        
+        return result
+    
+    except Exception as e:
+        logger.exception(f"Job {job_id}: Error analizando archivo: {str(e)}")
+        
+        if webhook_url:
+            notify_job_failed(job_id, webhook_url, str(e))
+        
+        raise
+    
+    finally:
+        if media_path and os.path.exists(media_path):
+            try:
+                os.remove(media_path)
+                logger.debug(f"Job {job_id}: Archivo temporal eliminado: {media_path}")
+            except Exception as e:
+                logger.warning(f"Error eliminando archivo temporal {media_path}: {str(e)}")
@@ -1,10 +1,14 @@
 import os
+import math
 import logging
 import uuid
 from ..utils.file_utils import download_file, generate_temp_filename, verify_file_integrity
-from ..services.ffmpeg_service import run_ffmpeg_command, get_media_info
+from ..services.ffmpeg_service import run_ffmpeg_command, get_media_info, get_encoding_profile, build_video_encoding_args
 from ..services.storage_service import store_file
 from ..services.webhook_service import notify_job_completed, notify_job_failed
+from ..services.cache_service import lookup_cached_result, save_cached_result
+from ..services.subtitle_service import new_document, save_subtitles, apply_style, to_ass_color, ASS_ALIGNMENTS
+from ..services.font_service import resolve_font
 from ..config import settings
 from ..api.middlewares.error_handler import ProcessingError
 
@@ -12,19 +16,38 @@ logger = logging.getLogger(__name__)
 
 def animated_text_service(video_url, text, animation="fade", position="bottom", 
                      font="Arial", font_size=36, color="white", duration=3.0,
-                     job_id=None, webhook_url=None):
+                     job_id=None, webhook_url=None, no_cache=False, encoding_profile=None):
     if not job_id:
         job_id = str(uuid.uuid4())
     
-    logger.info(f"Job {job_id}: Iniciando procesamiento de texto animado en video {video_url}")
+    profile = get_encoding_profile(encoding_profile)
+    logger.info(f"Job {job_id}: Iniciando procesamiento de texto animado en video {video_url} (perfil {profile['name']})")
     
     video_path = None
+    ass_path = None
     output_path = None
     
     try:
         video_path = download_file(video_url, settings.TEMP_DIR)
         logger.info(f"Job {job_id}: Video descargado: {video_path}")
         
+        fingerprint, cached_url = lookup_cached_result('animated_text_service', {
+            'text': text,
+            'animation': animation,
+            'position': position,
+            'font': font,
+            'font_size': font_size,
+            'color': color,
+            'duration': duration,
+            'encoding_profile': profile
+        }, [video_path], no_cache)
+        
+        if cached_url:
+            logger.info(f"Job {job_id}: Resultado obtenido de caché: {cached_url}")
+            if webhook_url:
+                notify_job_completed(job_id, webhook_url, cached_url)
+            return cached_url
+        
         video_info = get_media_info(video_path)
         video_duration = float(video_info.get('duration', 0))
         video_width = int(video_info.get('width', 0))
@@ -39,15 +62,22 @@ def animated_text_service(video_url, text, animation="fade", position="bottom",
         
         output_path = generate_temp_filename(prefix=f"{job_id}_animated_", suffix=".mp4")
         
-        filter_complex = build_animation_filter(
-            text, animation, position, font, font_size, color, 
+        # libass recibe una familia instalada; fontconfig usa la caché ya construida
+        animation_subtitles = build_animation_subtitles(
+            text, animation, position, resolve_font(font)['family'], font_size, color, 
             duration, video_width, video_height
         )
         
+        ass_path = save_subtitles(
+            animation_subtitles,
+            generate_temp_filename(prefix=f"{job_id}_animation_", suffix=".ass")
+        )
+        
         command = [
             'ffmpeg',
             '-i', video_path,
-            '-vf', filter_complex,
+            '-vf', f"ass={ass_path}",
+            *build_video_encoding_args(profile['name']),
             '-c:a', 'copy',
             output_path
         ]
@@ -58,6 +88,7 @@ def animated_text_service(video_url, text, animation="fade", position="bottom",
             raise ProcessingError("El archivo de video con texto animado no es válido")
         
         result_url = store_file(output_path)
+        save_cached_result(fingerprint, 'animated_text_service', result_url)
         logger.info(f"Job {job_id}: Video con texto animado procesado y almacenado: {result_url}")
         
         if webhook_url:
@@ -74,58 +105,129 @@ def animated_text_service(video_url, text, animation="fade", position="bottom",
         raise
         
     finally:
-        if video_path and os.path.exists(video_path):
-            try:
-                os.remove(video_path)
-            except Exception as e:
-                logger.warning(f"Error eliminando archivo temporal {video_path}: {str(e)}")
-        
-        if output_path and os.path.exists(output_path):
-            try:
-                os.remove(output_path)
-            except Exception as e:
-                logger.warning(f"Error eliminando archivo temporal {output_path}: {str(e)}")
+        for file_path in [video_path, ass_path, output_path]:
+            if file_path and os.path.exists(file_path):
+                try:
+                    os.remove(file_path)
+                except Exception as e:
+                    logger.warning(f"Error eliminando archivo temporal {file_path}: {str(e)}")
+
+def escape_ass_text(text):
+    """
+    Escapa texto de usuario para un evento ASS: las llaves abrirían bloques
+    de override y la barra invertida secuencias como \\N.
+    """
+    return (
+        text.replace('\\', '\\\u200b')
+            .replace('{', '(')
+            .replace('}', ')')
+            .replace('\n', '\\N')
+    )
 
-def build_animation_filter(text, animation, position, font, font_size, color, 
-                          duration, video_width, video_height):
-    text_escaped = text.replace("'", "\\'").replace(":", "\\:").replace(",", "\\,")
+def build_animation_subtitles(text, animation, position, font, font_size, color,
+                              duration, video_width, video_height):
+    """
+    Compila una animación de texto en eventos ASS.
     
+    libass solo renderiza los eventos mientras están activos, en lugar de
+    evaluar expresiones drawtext en cada frame de todo el video.
+    
+    Args:
+        text: Texto a animar
+        animation: 'fade', 'slide', 'zoom', 'typewriter' o 'bounce'
+        position: 'top', 'bottom' o 'center'
+        font: Nombre de la fuente
+        font_size: Tamaño en píxeles del video
+        color: Color del texto
+        duration: Duración de la animación en segundos
+        video_width: Ancho del video
+        video_height: Alto del video
+        
+    Returns:
+        Documento de subtítulos listo para escribir como ASS
+    """
+    alignment = ASS_ALIGNMENTS.get(position, ASS_ALIGNMENTS['center'])
+    
+    # Posición de anclaje equivalente a la del filtro drawtext anterior
+    x_pos = video_width / 2
     if position == "top":
-        y_pos = f"h*0.1"
+        y_pos = video_height * 0.1
     elif position == "bottom":
-        y_pos = f"h*0.9"
+        y_pos = video_height * 0.9
     else:
-        y_pos = f"(h-text_h)/2"
+        y_pos = video_height / 2
     
-    x_pos = f"(w-text_w)/2"
+    style = {
+        'Fontname': font,
+        'Fontsize': str(font_size),
+        'PrimaryColour': to_ass_color(color),
+        'Alignment': str(alignment),
+        'MarginL': '0',
+        'MarginR': '0',
+        'MarginV': '0'
+    }
     
-    base_filter = f"drawtext=text='{text_escaped}':fontfile={font}:fontsize={font_size}:fontcolor={color}:x={x_pos}:y={y_pos}"
+    text_escaped = escape_ass_text(text)
+    pos_tag = f"\\pos({x_pos:.0f},{y_pos:.0f})"
+    cues = []
     
     if animation == "fade":
-        fade_time = min(1.0, duration / 3)
-        alpha_expr = f"if(lt(t,{fade_time}),t/{fade_time},if(lt(t,{duration-fade_time}),1,({duration}-t)/{fade_time}))"
-        return f"{base_filter}:alpha={alpha_expr}"
+        fade_ms = int(min(1.0, duration / 3) * 1000)
+        cues.append((0, duration, f"{{{pos_tag}\\fad({fade_ms},{fade_ms})}}{text_escaped}"))
         
     elif animation == "slide":
-        slide_time = min(1.5, duration / 2)
-        x_expr = f"if(lt(t,{slide_time}),w*1.5-((w*1.5-{x_pos})*t/{slide_time}),{x_pos})"
-        return f"{base_filter}:x={x_expr}"
+        slide_ms = int(min(1.5, duration / 2) * 1000)
+        move_tag = f"\\move({video_width * 1.5:.0f},{y_pos:.0f},{x_pos:.0f},{y_pos:.0f},0,{slide_ms})"
+        cues.append((0, duration, f"{{{move_tag}}}{text_escaped}"))
         
     elif animation == "zoom":
-        zoom_time = min(1.0, duration / 2)
-        size_expr = f"if(lt(t,{zoom_time}),{font_size}*t/{zoom_time},{font_size})"
-        return f"drawtext=text='{text_escaped}':fontfile={font}:fontsize={size_expr}:fontcolor={color}:x={x_pos}:y={y_pos}"
+        zoom_ms = int(min(1.0, duration / 2) * 1000)
+        cues.append((0, duration, f"{{{pos_tag}\\fscx0\\fscy0\\t(0,{zoom_ms},\\fscx100\\fscy100)}}{text_escaped}"))
         
     elif animation == "typewriter":
-        chars_per_sec = len(text) / duration
-        return f"{base_filter}:enable='gte(t,0)'"
+        # Karaoke: cada carácter aparece al llegar su turno; hasta entonces se
+        # dibuja con SecondaryColour, que es totalmente transparente
+        style.update({'SecondaryColour': '&HFF000000', 'Outline': '0', 'Shadow': '0'})
+        characters = list(text)
+        typing_cs = max(1, int(duration * 0.8 * 100 / max(1, len(characters))))
+        karaoke = ''.join(f"{{\\k{typing_cs}}}{escape_ass_text(char)}" for char in characters)
+        cues.append((0, duration, f"{{{pos_tag}}}{karaoke}"))
         
     elif animation == "bounce":
+        # Oscilación amortiguada: cada medio periodo sube al pico con \\move y
+        # vuelve a la posición base; cuando la amplitud es despreciable el
+        # texto queda fijo
         bounce_freq = 2.0
         bounce_amp = font_size * 0.2
         decay = 2.0 / duration
-        y_expr = f"{y_pos}+{bounce_amp}*exp(-{decay}*t)*sin(2*PI*{bounce_freq}*t)"
-        return f"{base_filter}:y={y_expr}"
+        half_period = 1 / (2 * bounce_freq)
+        
+        start = 0.0
+        direction = 1
+        while start < duration:
+            end = min(duration, start + half_period)
+            peak_time = (start + end) / 2
+            amplitude = bounce_amp * math.exp(-decay * peak_time)
+            
+            if amplitude < 0.5:
+                cues.append((start, duration, f"{{{pos_tag}}}{text_escaped}"))
+                break
+            
+            peak_y = y_pos + direction * amplitude
+            rise_ms = int((peak_time - start) * 1000)
+            fall_ms = int((end - peak_time) * 1000)
+            cues.append((start, peak_time, f"{{\\move({x_pos:.0f},{y_pos:.0f},{x_pos:.0f},{peak_y:.0f},0,{rise_ms})}}{text_escaped}"))
+            cues.append((peak_time, end, f"{{\\move({x_pos:.0f},{peak_y:.0f},{x_pos:.0f},{y_pos:.0f},0,{fall_ms})}}{text_escaped}"))
+            
+            direction = -direction
+            start = end
         
     else:
-        return base_filter
+        cues.append((0, duration, f"{{{pos_tag}}}{text_escaped}"))
+    
+    document = new_document(
+        [{'start': start, 'end': end, 'text': text} for start, end, text in cues],
+        script_info={'PlayResX': str(video_width), 'PlayResY': str(video_height)}
+    )
+    
+    return apply_style(document, style)
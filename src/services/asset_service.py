@@ -0,0 +1,310 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import logging
+import threading
+from typing import Dict, Any, List, Optional
+from urllib.parse import unquote
+from ..utils.file_utils import download_file, get_file_extension, compute_file_hash
+from .storage_service import store_file, delete_file
+from ..config import settings
+from ..api.middlewares.error_handler import ProcessingError, ValidationError, NotFoundError
+
+logger = logging.getLogger(__name__)
+
+# Constantes
+ASSET_PREFIX = "video_api:asset:"
+ASSET_SCHEME = "asset://"
+
+# Tipos de asset y extensiones admitidas
+ASSET_KINDS = {
+    'image': {'.png', '.jpg', '.jpeg', '.webp', '.gif', '.bmp'},
+    'font': {'.ttf', '.otf', '.ttc', '.otc'},
+    'subtitle': {'.srt', '.vtt', '.ass', '.ssa'}
+}
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+def _get_redis_client():
+    # Importar aquí para evitar referencias circulares
+    from .redis_queue_service import _ensure_redis_connection
+    return _ensure_redis_connection()
+
+def _get_lock(asset_id: str) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(asset_id, threading.Lock())
+
+def is_asset_ref(url) -> bool:
+    return isinstance(url, str) and url.startswith(ASSET_SCHEME)
+
+def parse_asset_ref(ref: str) -> str:
+    """Extrae el ID de una referencia asset://<id>."""
+    asset_id = ref[len(ASSET_SCHEME):].strip('/')
+    if not asset_id:
+        raise ValidationError(f"Referencia de asset inválida: {ref}")
+    return asset_id
+
+def get_asset_dir(kind: str) -> str:
+    """Directorio local fijado (sin expiración) de un tipo de asset."""
+    directory = os.path.join(settings.ASSET_CACHE_DIR, kind)
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+def get_pinned_path(asset: Dict[str, Any]) -> str:
+    """Ruta del asset en la caché local, direccionada por contenido."""
+    return os.path.join(get_asset_dir(asset['kind']), f"{asset['sha256']}{asset['extension']}")
+
+def _save_asset(asset: Dict[str, Any]):
+    client = _get_redis_client()
+    client.set(f"{ASSET_PREFIX}{asset['id']}", json.dumps(asset))
+
+def get_asset(asset_id: str) -> Dict[str, Any]:
+    """
+    Obtiene los metadatos de un asset.
+
+    Raises:
+        NotFoundError: Si el asset no existe
+    """
+    client = _get_redis_client()
+    entry = client.get(f"{ASSET_PREFIX}{asset_id}")
+
+    if not entry:
+        raise NotFoundError(f"Asset no encontrado: {asset_id}")
+
+    return json.loads(entry)
+
+def list_assets(kind: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Lista los assets registrados, opcionalmente filtrados por tipo."""
+    client = _get_redis_client()
+    assets = []
+
+    for key in client.scan_iter(match=f"{ASSET_PREFIX}*"):
+        entry = client.get(key)
+        if not entry:
+            continue
+        asset = json.loads(entry)
+        if kind and asset.get('kind') != kind:
+            continue
+        assets.append(asset)
+
+    return sorted(assets, key=lambda asset: asset.get('created_at', 0))
+
+def _pin_file(source_path: str, pinned_path: str, sha256: str):
+    """Copia un archivo a la caché fijada de forma atómica, verificando su contenido."""
+    if compute_file_hash(source_path) != sha256:
+        raise ProcessingError(f"El contenido del asset no coincide con su huella: {source_path}")
+
+    tmp_path = f"{pinned_path}.{uuid.uuid4().hex}.tmp"
+    try:
+        shutil.copyfile(source_path, tmp_path)
+        os.replace(tmp_path, pinned_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def register_asset(kind: str, file_path: Optional[str] = None, url: Optional[str] = None,
+                   name: Optional[str] = None, filename: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Registra un asset a partir de un archivo subido o de una URL.
+
+    El archivo se descarga una sola vez, se guarda en el almacenamiento
+    como copia de referencia y se fija en la caché local.
+
+    Args:
+        kind: 'image', 'font' o 'subtitle'
+        file_path: Archivo local ya subido (se elimina al terminar)
+        url: URL desde la que descargar el asset
+        name: Nombre descriptivo
+        filename: Nombre original del archivo (para la extensión)
+
+    Returns:
+        Metadatos del asset, incluida su referencia asset://<id>
+    """
+    if kind not in ASSET_KINDS:
+        raise ValidationError(f"Tipo de asset no soportado: {kind}")
+
+    if not file_path and not url:
+        raise ValidationError("Se requiere un archivo o una URL")
+
+    source_path = file_path
+
+    try:
+        if not source_path:
+            source_path = download_file(url, settings.TEMP_DIR)
+
+        filename = os.path.basename(filename or (unquote(url.split('?')[0]) if url else source_path))
+        extension = get_file_extension(filename) or get_file_extension(source_path)
+
+        if extension not in ASSET_KINDS[kind]:
+            raise ValidationError(
+                f"Extensión {extension or '(ninguna)'} no válida para assets de tipo {kind}: "
+                f"{', '.join(sorted(ASSET_KINDS[kind]))}"
+            )
+
+        size = os.path.getsize(source_path)
+        if size == 0:
+            raise ValidationError("El asset está vacío")
+        if size > settings.ASSET_MAX_SIZE:
+            raise ValidationError(f"El asset es demasiado grande: {size} bytes")
+
+        asset_id = uuid.uuid4().hex
+        asset = {
+            'id': asset_id,
+            'ref': f"{ASSET_SCHEME}{asset_id}",
+            'kind': kind,
+            'name': name or filename,
+            'filename': filename,
+            'extension': extension,
+            'sha256': compute_file_hash(source_path),
+            'size': size,
+            'source_url': url,
+            'created_at': time.time()
+        }
+
+        asset['url'] = store_file(
+            source_path,
+            target_dir=os.path.join(settings.STORAGE_PATH, 'assets'),
+            custom_filename=f"{asset_id}{extension}"
+        )
+
+        _pin_file(source_path, get_pinned_path(asset), asset['sha256'])
+        _save_asset(asset)
+
+        logger.info(f"Asset {asset_id} registrado ({kind}, {size} bytes): {asset['name']}")
+        return asset
+
+    finally:
+        if source_path and os.path.exists(source_path):
+            try:
+                os.remove(source_path)
+            except Exception as e:
+                logger.warning(f"Error eliminando archivo temporal {source_path}: {str(e)}")
+
+def ensure_asset_cached(asset: Dict[str, Any]) -> str:
+    """
+    Garantiza que el asset está en la caché local y devuelve su ruta.
+
+    Se copia del almacenamiento compartido si está disponible en este
+    equipo; si no, se descarga una vez desde su URL.
+    """
+    pinned_path = get_pinned_path(asset)
+
+    if os.path.exists(pinned_path):
+        return pinned_path
+
+    with _get_lock(asset['id']):
+        if os.path.exists(pinned_path):
+            return pinned_path
+
+        stored_url = asset['url']
+        if stored_url.startswith(settings.MEDIA_URL):
+            relative_path = unquote(stored_url[len(settings.MEDIA_URL):].lstrip('/'))
+            stored_path = os.path.join(settings.STORAGE_PATH, relative_path)
+            if os.path.exists(stored_path):
+                _pin_file(stored_path, pinned_path, asset['sha256'])
+                return pinned_path
+
+        temp_path = download_file(stored_url, settings.TEMP_DIR, prefix=f"asset_{asset['id']}_")
+        try:
+            _pin_file(temp_path, pinned_path, asset['sha256'])
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        logger.info(f"Asset {asset['id']} descargado a la caché local")
+        return pinned_path
+
+def get_asset_path(ref: str) -> str:
+    """Ruta local (fijada) de una referencia asset://<id>. No debe modificarse."""
+    return ensure_asset_cached(get_asset(parse_asset_ref(ref)))
+
+def materialize_asset(ref: str, target_dir: Optional[str] = None, prefix: Optional[str] = None) -> str:
+    """
+    Sustituye a la descarga de un archivo cuando la URL es asset://<id>:
+    devuelve una copia desechable del asset fijado, sin acceso a la red.
+
+    Se usa un enlace duro cuando es posible, de modo que la copia no cuesta
+    E/S y el trabajo puede borrarla como cualquier temporal.
+    """
+    asset = get_asset(parse_asset_ref(ref))
+    pinned_path = ensure_asset_cached(asset)
+
+    target_dir = target_dir or settings.TEMP_DIR
+    os.makedirs(target_dir, exist_ok=True)
+    target_path = os.path.join(target_dir, f"{prefix or ''}{uuid.uuid4().hex}_{asset['filename']}")
+
+    try:
+        os.link(pinned_path, target_path)
+    except OSError:
+        shutil.copyfile(pinned_path, target_path)
+
+    logger.debug(f"Asset {asset['id']} servido desde la caché local: {target_path}")
+    return target_path
+
+def delete_asset(asset_id: str) -> Dict[str, Any]:
+    """
+    Elimina un asset del registro, del almacenamiento y de la caché local.
+
+    Las cachés de otros workers se limpian en su siguiente arranque.
+    """
+    asset = get_asset(asset_id)
+    client = _get_redis_client()
+    client.delete(f"{ASSET_PREFIX}{asset_id}")
+
+    try:
+        delete_file(asset['url'])
+    except NotFoundError:
+        pass
+
+    pinned_path = get_pinned_path(asset)
+    # La caché es por contenido: otro asset puede compartir el mismo archivo
+    if os.path.exists(pinned_path) and not any(
+        other['sha256'] == asset['sha256'] and other['kind'] == asset['kind'] for other in list_assets()
+    ):
+        os.remove(pinned_path)
+
+    logger.info(f"Asset {asset_id} eliminado")
+    return asset
+
+def warm_asset_cache() -> Dict[str, int]:
+    """
+    Descarga a la caché local todos los assets registrados y elimina los
+    archivos de assets que ya no existen. Se ejecuta al arrancar el worker.
+
+    Returns:
+        Dict con el número de assets cargados, fallidos y eliminados
+    """
+    stats = {'cached': 0, 'failed': 0, 'removed': 0}
+
+    try:
+        assets = list_assets()
+    except Exception as e:
+        logger.warning(f"No se pudo leer el registro de assets: {str(e)}")
+        return stats
+
+    start_time = time.time()
+    expected = set()
+
+    for asset in assets:
+        try:
+            expected.add(ensure_asset_cached(asset))
+            stats['cached'] += 1
+        except Exception as e:
+            logger.warning(f"No se pudo cargar el asset {asset.get('id')}: {str(e)}")
+            stats['failed'] += 1
+
+    for kind in ASSET_KINDS:
+        directory = get_asset_dir(kind)
+        for filename in os.listdir(directory):
+            path = os.path.join(directory, filename)
+            if path not in expected and os.path.isfile(path):
+                os.remove(path)
+                stats['removed'] += 1
+
+    logger.info(f"Caché de assets preparada en {time.time() - start_time:.2f}s: {stats['cached']} assets, "
+                f"{stats['failed']} fallidos, {stats['removed']} eliminados")
+
+    return stats
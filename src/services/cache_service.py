@@ -0,0 +1,258 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import redis
+from redis.exceptions import RedisError
+from typing import Dict, Any, List, Optional, Tuple
+from urllib.parse import unquote
+from ..utils.file_utils import compute_file_hash
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+# Constantes
+CACHE_PREFIX = "video_api:cache:"
+
+# Parámetros que no afectan al resultado de un trabajo
+IGNORED_PARAMS = {'job_id', 'webhook_url', 'no_cache', 'id'}
+
+# Cliente propio de la caché y momento hasta el que Redis se da por caído
+_cache_client = None
+_cache_unavailable_until = 0.0
+
+def _get_redis_client():
+    # Importar aquí para evitar referencias circulares
+    from .redis_queue_service import _ensure_redis_connection
+    return _ensure_redis_connection()
+
+def _get_cache_client():
+    """
+    Cliente Redis para consultar y guardar resultados en caché.
+
+    La caché es opcional: a diferencia de la cola, se conecta con un timeout
+    corto y sin reintentos, y si Redis no responde se omite durante
+    CACHE_REDIS_RETRY_INTERVAL segundos en lugar de bloquear cada trabajo.
+
+    Returns:
+        Cliente Redis o None si Redis no está disponible
+    """
+    global _cache_client, _cache_unavailable_until
+
+    if _cache_client is not None:
+        return _cache_client
+
+    if time.time() < _cache_unavailable_until:
+        return None
+
+    try:
+        client = redis.from_url(
+            settings.REDIS_URL,
+            socket_connect_timeout=settings.CACHE_REDIS_TIMEOUT,
+            socket_timeout=settings.CACHE_REDIS_TIMEOUT,
+            decode_responses=True
+        )
+        client.ping()
+    except RedisError as e:
+        _mark_cache_unavailable(e)
+        return None
+
+    _cache_client = client
+    return client
+
+def _mark_cache_unavailable(error):
+    global _cache_client, _cache_unavailable_until
+
+    _cache_client = None
+    _cache_unavailable_until = time.time() + settings.CACHE_REDIS_RETRY_INTERVAL
+    logger.warning(f"Redis no disponible para la caché de resultados, se omite durante "
+                   f"{settings.CACHE_REDIS_RETRY_INTERVAL}s: {str(error)}")
+
+def _normalize_value(value):
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, dict):
+        return {str(k): _normalize_value(v) for k, v in sorted(value.items()) if v is not None}
+    if isinstance(value, (list, tuple)):
+        return [_normalize_value(v) for v in value]
+    return value
+
+def normalize_params(params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Normaliza los parámetros de un trabajo para que peticiones equivalentes
+    produzcan la misma huella (ignora valores nulos e identificadores).
+    """
+    return {
+        key: _normalize_value(value)
+        for key, value in sorted((params or {}).items())
+        if key not in IGNORED_PARAMS and value is not None
+    }
+
+def build_job_fingerprint(operation: str, params: Dict[str, Any], input_paths: List[str],
+                          input_hashes: Optional[List[str]] = None) -> str:
+    """
+    Genera la huella determinista de un trabajo.
+
+    Args:
+        operation: Nombre de la operación
+        params: Parámetros de la operación
+        input_paths: Rutas de los archivos de entrada descargados
+        input_hashes: Hashes ya calculados de las entradas (evita volver a leerlas)
+
+    Returns:
+        String hexadecimal con la huella del trabajo
+    """
+    payload = {
+        "operation": operation,
+        "params": normalize_params(params),
+        "inputs": input_hashes or [compute_file_hash(path) for path in input_paths],
+        "pipeline_version": settings.PIPELINE_VERSION
+    }
+
+    serialized = json.dumps(payload, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(serialized.encode('utf-8')).hexdigest()
+
+def _result_exists(result_url) -> bool:
+    """Comprueba que un resultado almacenado localmente sigue existiendo."""
+    if isinstance(result_url, dict):
+        return all(_result_exists(value) for value in result_url.values())
+    if isinstance(result_url, list):
+        return all(_result_exists(value) for value in result_url)
+    if not isinstance(result_url, str) or not result_url.startswith(settings.MEDIA_URL):
+        return True
+
+    relative_path = unquote(result_url[len(settings.MEDIA_URL):].lstrip('/'))
+    return os.path.exists(os.path.join(settings.STORAGE_PATH, relative_path))
+
+def get_cached_result(fingerprint: str):
+    """
+    Obtiene el resultado almacenado para una huella.
+
+    Args:
+        fingerprint: Huella del trabajo
+
+    Returns:
+        Resultado almacenado (URL o estructura de URLs) o None si no hay
+        entrada válida
+    """
+    client = _get_cache_client()
+    if client is None:
+        return None
+
+    try:
+        entry = client.get(f"{CACHE_PREFIX}{fingerprint}")
+
+        if not entry:
+            return None
+
+        result = json.loads(entry).get("result")
+
+        if not _result_exists(result):
+            logger.info(f"Entrada de caché {fingerprint} apunta a un archivo inexistente, invalidando")
+            client.delete(f"{CACHE_PREFIX}{fingerprint}")
+            return None
+
+        return result
+    except RedisError as e:
+        _mark_cache_unavailable(e)
+        return None
+    except Exception as e:
+        logger.warning(f"Error consultando caché de resultados: {str(e)}")
+        return None
+
+def store_cached_result(fingerprint: str, operation: str, result, ttl: Optional[int] = None) -> bool:
+    """
+    Guarda el resultado de un trabajo asociado a su huella.
+
+    Args:
+        fingerprint: Huella del trabajo
+        operation: Nombre de la operación
+        result: URL del resultado (o estructura JSON de URLs)
+        ttl: Tiempo de vida en segundos (por defecto RESULT_CACHE_TTL)
+
+    Returns:
+        Bool indicando si se guardó la entrada
+    """
+    client = _get_cache_client()
+    if client is None:
+        return False
+
+    try:
+        entry = {
+            "operation": operation,
+            "result": result,
+            "created_at": time.time()
+        }
+        client.set(f"{CACHE_PREFIX}{fingerprint}", json.dumps(entry), ex=ttl or settings.RESULT_CACHE_TTL)
+        logger.debug(f"Resultado almacenado en caché: {fingerprint}")
+        return True
+    except RedisError as e:
+        _mark_cache_unavailable(e)
+        return False
+    except Exception as e:
+        logger.warning(f"Error guardando resultado en caché: {str(e)}")
+        return False
+
+def invalidate_cached_result(fingerprint: str) -> bool:
+    """
+    Elimina la entrada de caché de una huella.
+
+    Returns:
+        Bool indicando si existía la entrada
+    """
+    client = _get_redis_client()
+    return bool(client.delete(f"{CACHE_PREFIX}{fingerprint}"))
+
+def invalidate_cache(operation: Optional[str] = None) -> int:
+    """
+    Elimina todas las entradas de caché, o solo las de una operación.
+
+    Returns:
+        Número de entradas eliminadas
+    """
+    client = _get_redis_client()
+    deleted = 0
+
+    for key in client.scan_iter(match=f"{CACHE_PREFIX}*"):
+        if operation:
+            entry = client.get(key)
+            if not entry or json.loads(entry).get("operation") != operation:
+                continue
+        deleted += client.delete(key)
+
+    logger.info(f"Caché de resultados invalidada: {deleted} entradas eliminadas")
+    return deleted
+
+def lookup_cached_result(operation: str, params: Dict[str, Any], input_paths: List[str],
+                         no_cache: bool = False, input_hashes: Optional[List[str]] = None) -> Tuple[Optional[str], Any]:
+    """
+    Calcula la huella de un trabajo y busca un resultado previo.
+
+    Con no_cache se omite la consulta, pero se devuelve la huella para que el
+    nuevo resultado reemplace la entrada existente. Si el llamador ya calculó
+    el hash de las entradas lo pasa en input_hashes. Si Redis no está
+    disponible no se calcula la huella y el trabajo se procesa sin caché.
+
+    Returns:
+        Tupla (huella, resultado en caché o None)
+    """
+    if not settings.RESULT_CACHE_ENABLED or _get_cache_client() is None:
+        return None, None
+
+    try:
+        fingerprint = build_job_fingerprint(operation, params, input_paths, input_hashes)
+    except Exception as e:
+        logger.warning(f"Error calculando huella de trabajo: {str(e)}")
+        return None, None
+
+    if no_cache:
+        return fingerprint, None
+
+    return fingerprint, get_cached_result(fingerprint)
+
+def save_cached_result(fingerprint: Optional[str], operation: str, result) -> bool:
+    """Guarda un resultado si la huella está disponible."""
+    if not fingerprint:
+        return False
+    return store_cached_result(fingerprint, operation, result)
@@ -0,0 +1,249 @@
+import re
+import time
+import hashlib
+import logging
+import subprocess
+import threading
+from typing import Dict, Any, List, Optional
+from ..utils.cache_utils import read_json_cache, write_json_cache
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+# Versión del formato del registro en disco
+REGISTRY_FORMAT_VERSION = 1
+
+# Encoders por codec, ordenados del más rápido al más lento
+ENCODER_PREFERENCES = {
+    'h264': ['h264_nvenc', 'h264_qsv', 'libx264', 'libopenh264'],
+    'hevc': ['hevc_nvenc', 'hevc_qsv', 'libx265'],
+    'mp3': ['libmp3lame', 'libshine'],
+    'aac': ['libfdk_aac', 'aac'],
+    'opus': ['libopus', 'opus'],
+    'flac': ['flac'],
+    'pcm_s16le': ['pcm_s16le'],
+    'mjpeg': ['mjpeg'],
+    'webp': ['libwebp'],
+    'png': ['png']
+}
+
+# Segundos antes de reintentar la detección si FFmpeg no estaba disponible
+UNAVAILABLE_RETRY_INTERVAL = 60
+
+# Encoders que requieren hardware y se validan con una codificación de prueba
+HARDWARE_ENCODERS = {'h264_nvenc', 'h264_qsv', 'hevc_nvenc', 'hevc_qsv'}
+
+_capabilities = None
+_lock = threading.Lock()
+
+def _run(command: List[str], timeout: int = 30) -> Optional[str]:
+    try:
+        process = subprocess.run(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            check=False,
+            timeout=timeout
+        )
+    except (OSError, subprocess.TimeoutExpired) as e:
+        logger.warning(f"No se pudo ejecutar {' '.join(command)}: {str(e)}")
+        return None
+
+    if process.returncode != 0:
+        return None
+
+    return process.stdout
+
+def _parse_version(output: Optional[str]) -> Optional[str]:
+    if not output:
+        return None
+    match = re.search(r'version\s+(\S+)', output)
+    return match.group(1) if match else output.splitlines()[0]
+
+def _parse_codec_list(output: Optional[str]) -> List[str]:
+    """Extrae los nombres de la salida de `ffmpeg -encoders` / `-decoders`."""
+    names = []
+    in_list = False
+
+    for line in (output or '').splitlines():
+        if line.strip().startswith('------'):
+            in_list = True
+            continue
+        parts = line.split()
+        if in_list and len(parts) >= 2:
+            names.append(parts[1])
+
+    return sorted(names)
+
+def _parse_filter_list(output: Optional[str]) -> List[str]:
+    """Extrae los nombres de la salida de `ffmpeg -filters`."""
+    names = []
+
+    for line in (output or '').splitlines():
+        parts = line.split()
+        if len(parts) >= 3 and '->' in parts[2]:
+            names.append(parts[1])
+
+    return sorted(names)
+
+def _parse_protocols(output: Optional[str]) -> Dict[str, List[str]]:
+    protocols = {'input': [], 'output': []}
+    section = None
+
+    for line in (output or '').splitlines():
+        stripped = line.strip()
+        if stripped == 'Input:':
+            section = 'input'
+        elif stripped == 'Output:':
+            section = 'output'
+        elif section and stripped:
+            protocols[section].append(stripped)
+
+    return protocols
+
+def _encoder_works(encoder: str) -> bool:
+    """Comprueba un encoder de hardware con una codificación mínima."""
+    output = _run([
+        'ffmpeg', '-hide_banner', '-loglevel', 'error',
+        '-f', 'lavfi', '-i', 'color=c=black:s=256x256:d=0.1',
+        '-frames:v', '1',
+        '-c:v', encoder,
+        '-f', 'null', '-'
+    ])
+    return output is not None
+
+def _select_preferred_encoders(encoders: List[str]) -> Dict[str, str]:
+    available = set(encoders)
+    preferred = {}
+
+    for codec, candidates in ENCODER_PREFERENCES.items():
+        for encoder in candidates:
+            if encoder not in available:
+                continue
+            if encoder in HARDWARE_ENCODERS:
+                if not settings.FFMPEG_HW_ENCODERS or not _encoder_works(encoder):
+                    continue
+            preferred[codec] = encoder
+            break
+
+    return preferred
+
+def detect_ffmpeg_capabilities() -> Dict[str, Any]:
+    """
+    Detecta las capacidades de FFmpeg instalado.
+
+    Los resultados se guardan en disco indexados por las versiones de
+    ffmpeg/ffprobe, de modo que solo se analizan una vez por binario.
+
+    Returns:
+        Dict con versiones, encoders, decoders, filtros, protocolos y el
+        encoder preferido por codec
+    """
+    ffmpeg_output = _run(['ffmpeg', '-hide_banner', '-version'])
+    ffprobe_output = _run(['ffprobe', '-hide_banner', '-version'])
+
+    if ffmpeg_output is None:
+        logger.error("FFmpeg no está disponible")
+        return {
+            'available': False,
+            'ffprobe_available': ffprobe_output is not None,
+            'detected_at': time.time()
+        }
+
+    cache_key = hashlib.sha256(
+        f"{REGISTRY_FORMAT_VERSION}|{ffmpeg_output}|{ffprobe_output}|{settings.FFMPEG_HW_ENCODERS}".encode('utf-8')
+    ).hexdigest()[:16]
+
+    cached = read_json_cache('capabilities', cache_key)
+    if cached:
+        logger.info(f"Capacidades de FFmpeg cargadas de caché ({cached.get('ffmpeg_version')})")
+        return cached
+
+    start_time = time.time()
+
+    encoders = _parse_codec_list(_run(['ffmpeg', '-hide_banner', '-encoders']))
+    decoders = _parse_codec_list(_run(['ffmpeg', '-hide_banner', '-decoders']))
+
+    capabilities = {
+        'available': True,
+        'ffprobe_available': ffprobe_output is not None,
+        'ffmpeg_version': _parse_version(ffmpeg_output),
+        'ffprobe_version': _parse_version(ffprobe_output),
+        'encoders': encoders,
+        'decoders': decoders,
+        'filters': _parse_filter_list(_run(['ffmpeg', '-hide_banner', '-filters'])),
+        'protocols': _parse_protocols(_run(['ffmpeg', '-hide_banner', '-protocols'])),
+        'preferred_encoders': _select_preferred_encoders(encoders),
+        'detected_at': time.time()
+    }
+
+    try:
+        write_json_cache('capabilities', cache_key, capabilities)
+    except OSError as e:
+        logger.warning(f"No se pudo guardar el registro de capacidades: {str(e)}")
+
+    logger.info(f"Capacidades de FFmpeg detectadas en {time.time() - start_time:.2f}s: "
+                f"{len(encoders)} encoders, {len(capabilities['filters'])} filtros")
+
+    return capabilities
+
+def _should_retry(capabilities: Dict[str, Any]) -> bool:
+    return (not capabilities.get('available')
+            and time.time() - capabilities.get('detected_at', 0) > UNAVAILABLE_RETRY_INTERVAL)
+
+def get_ffmpeg_capabilities(refresh: bool = False) -> Dict[str, Any]:
+    """
+    Devuelve el registro de capacidades del proceso, detectándolo la
+    primera vez que se solicita.
+    """
+    global _capabilities
+
+    if _capabilities is not None and not refresh and not _should_retry(_capabilities):
+        return _capabilities
+
+    with _lock:
+        if _capabilities is None or refresh or _should_retry(_capabilities):
+            _capabilities = detect_ffmpeg_capabilities()
+
+    return _capabilities
+
+def init_ffmpeg_capabilities() -> Dict[str, Any]:
+    """
+    Construye el registro de capacidades al arrancar el proceso.
+    """
+    return get_ffmpeg_capabilities()
+
+def is_ffmpeg_available() -> bool:
+    return get_ffmpeg_capabilities().get('available', False)
+
+def has_encoder(name: str) -> bool:
+    return name in get_ffmpeg_capabilities().get('encoders', [])
+
+def has_decoder(name: str) -> bool:
+    return name in get_ffmpeg_capabilities().get('decoders', [])
+
+def has_filter(name: str) -> bool:
+    return name in get_ffmpeg_capabilities().get('filters', [])
+
+def select_encoder(codec: str, default: Optional[str] = None) -> str:
+    """
+    Devuelve el encoder más rápido disponible para un codec.
+
+    Args:
+        codec: Nombre del codec (h264, aac, mp3...) o de un encoder concreto
+        default: Encoder a usar si no se encuentra ninguno disponible
+
+    Returns:
+        Nombre del encoder
+    """
+    preferred = get_ffmpeg_capabilities().get('preferred_encoders', {})
+
+    if codec in preferred:
+        return preferred[codec]
+
+    if default:
+        return default
+
+    candidates = [e for e in ENCODER_PREFERENCES.get(codec, []) if e not in HARDWARE_ENCODERS]
+    return candidates[0] if candidates else codec
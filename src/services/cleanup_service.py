@@ -8,6 +8,15 @@ from ..config import settings
 
 logger = logging.getLogger(__name__)
 
+# CACHE_DIR namespaces evicted by the cleanup service, with the names of
+# their max-age and max-size settings
+EVICTED_CACHES = {
+    'thumbs': ('THUMB_CACHE_MAX_AGE', 'THUMB_CACHE_MAX_SIZE'),
+    'overlays': ('OVERLAY_CACHE_MAX_AGE', 'OVERLAY_CACHE_MAX_SIZE'),
+    'keyframes': ('KEYFRAME_CACHE_MAX_AGE', 'KEYFRAME_CACHE_MAX_SIZE'),
+    'measurements': ('MEASUREMENT_CACHE_MAX_AGE', 'MEASUREMENT_CACHE_MAX_SIZE')
+}
+
 class CleanupService:
     def __init__(self):
         self.running = False
@@ -30,6 +39,15 @@ class CleanupService:
             replace_existing=True
         )
         
+        # Evict the on-disk caches (CACHE_DIR/thumbs, keyframes...) every hour
+        self.scheduler.add_job(
+            self._cleanup_disk_caches,
+            'interval',
+            hours=1,
+            id='cleanup_disk_caches',
+            replace_existing=True
+        )
+        
         # Start the scheduler
         self.scheduler.start()
         
@@ -90,6 +108,78 @@ class CleanupService:
             "cutoff_datetime": cutoff_datetime.isoformat()
         }
 
+    def _cleanup_cache(self, namespace, max_age, max_size):
+        """
+        Evict a CACHE_DIR namespace: entries not used for `max_age` seconds,
+        then the least recently used ones until it fits in `max_size` bytes.
+        
+        Cache hits refresh the entry's modification time, so mtime order is
+        LRU order.
+        """
+        start_time = time.time()
+        cache_dir = os.path.join(settings.CACHE_DIR, namespace)
+        cutoff_time = start_time - max_age
+        
+        entries = []
+        deleted_count = 0
+        total_size = 0
+        
+        if os.path.isdir(cache_dir):
+            for filename in os.listdir(cache_dir):
+                file_path = os.path.join(cache_dir, filename)
+                
+                try:
+                    stat = os.stat(file_path)
+                except OSError:
+                    continue
+                
+                entries.append((stat.st_mtime, stat.st_size, file_path))
+        
+        # Oldest first
+        entries.sort()
+        cache_size = sum(size for _, size, _ in entries)
+        
+        for mtime, size, file_path in entries:
+            if mtime >= cutoff_time and cache_size <= max_size:
+                break
+            
+            try:
+                os.remove(file_path)
+                deleted_count += 1
+                total_size += size
+                cache_size -= size
+                logger.debug(f"Cache entry deleted: {file_path}")
+            except Exception as e:
+                logger.warning(f"Error deleting cache entry {file_path}: {str(e)}")
+        
+        duration = time.time() - start_time
+        logger.info(f"Cache '{namespace}' cleanup completed in {duration:.2f}s: {deleted_count} files deleted, "
+                   f"{total_size / (1024*1024):.2f} MB freed")
+        
+        return {
+            "deleted_count": deleted_count,
+            "total_size_bytes": total_size,
+            "cache_size_bytes": cache_size,
+            "duration_seconds": duration
+        }
+
+    def _cleanup_disk_caches(self):
+        """Evict every namespace in EVICTED_CACHES with its own limits."""
+        results = {}
+        
+        for namespace, (max_age_setting, max_size_setting) in EVICTED_CACHES.items():
+            results[namespace] = self._cleanup_cache(
+                namespace,
+                getattr(settings, max_age_setting),
+                getattr(settings, max_size_setting)
+            )
+        
+        return results
+
+    def _cleanup_thumbnail_cache(self):
+        """Evict on-demand thumbnails (THUMB_CACHE_MAX_AGE / THUMB_CACHE_MAX_SIZE)."""
+        return self._cleanup_cache('thumbs', settings.THUMB_CACHE_MAX_AGE, settings.THUMB_CACHE_MAX_SIZE)
+
 # Singleton instance of the cleanup service
 cleanup_service = CleanupService()
 
@@ -99,6 +189,18 @@ def cleanup_temp_files():
     """
     return cleanup_service._cleanup_temp_files()
 
+def cleanup_thumbnail_cache():
+    """
+    Utility function to run the on-demand thumbnail cache eviction.
+    """
+    return cleanup_service._cleanup_thumbnail_cache()
+
+def cleanup_disk_caches():
+    """
+    Utility function to run the eviction of every on-disk cache.
+    """
+    return cleanup_service._cleanup_disk_caches()
+
 def init_cleanup_service():
     """
     Initialize and start the cleanup service.
@@ -2,7 +2,8 @@ import os
 import json
 import subprocess
 import logging
-from ..api.middlewares.error_handler import ProcessingError
+from ..config import settings
+from ..api.middlewares.error_handler import ProcessingError, ValidationError
 
 logger = logging.getLogger(__name__)
 
@@ -48,6 +49,62 @@ def run_ffmpeg_command(command):
         logger.exception(f"Error ejecutando comando FFmpeg: {str(e)}")
         raise ProcessingError(f"Error ejecutando FFmpeg: {str(e)}")
 
+def run_ffmpeg_pipe(command):
+    """
+    Ejecuta un comando FFmpeg que escribe datos binarios en stdout
+    (por ejemplo, frames rawvideo con `pipe:1`).
+    
+    Args:
+        command: Lista de strings que representan el comando a ejecutar
+        
+    Returns:
+        Bytes escritos por FFmpeg en stdout
+        
+    Raises:
+        ProcessingError: Si hay un error ejecutando el comando
+    """
+    try:
+        logger.debug(f"Ejecutando comando FFmpeg (pipe): {' '.join(command)}")
+        
+        process = subprocess.run(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            check=False
+        )
+        
+        if process.returncode != 0:
+            stderr = process.stderr.decode('utf-8', errors='replace')
+            logger.error(f"Error FFmpeg (código {process.returncode}): {stderr}")
+            raise ProcessingError(f"Error FFmpeg: {stderr.splitlines()[-1] if stderr else 'Desconocido'}")
+        
+        return process.stdout
+        
+    except Exception as e:
+        if isinstance(e, ProcessingError):
+            raise
+        
+        logger.exception(f"Error ejecutando comando FFmpeg: {str(e)}")
+        raise ProcessingError(f"Error ejecutando FFmpeg: {str(e)}")
+
+def get_stream_rotation(stream):
+    """
+    Rotación de visualización de un stream de video en grados (0, 90, 180 o 270).
+    
+    FFprobe 5+ la informa en side_data_list (Display Matrix) y las versiones
+    anteriores en la etiqueta rotate.
+    """
+    rotation = stream.get('tags', {}).get('rotate', 0)
+    
+    for side_data in stream.get('side_data_list', []):
+        if 'rotation' in side_data:
+            rotation = side_data['rotation']
+    
+    try:
+        return int(round(float(rotation))) % 360
+    except (TypeError, ValueError):
+        return 0
+
 def get_media_info(file_path):
     """
     Obtiene información sobre un archivo multimedia usando FFprobe.
@@ -103,11 +160,15 @@ def get_media_info(file_path):
                 result['height'] = stream.get('height', 0)
                 result['video_codec'] = stream.get('codec_name', 'unknown')
                 result['frame_rate'] = stream.get('r_frame_rate', 'unknown')
+                result['pix_fmt'] = stream.get('pix_fmt', 'unknown')
+                result['rotation'] = get_stream_rotation(stream)
                 
-            elif stream.get('codec_type') == 'audio':
+            elif stream.get('codec_type') == 'audio' and 'audio_codec' not in result:
+                # Solo la primera pista de audio (la que se usa con -map 0:a:0)
                 result['audio_codec'] = stream.get('codec_name', 'unknown')
                 result['sample_rate'] = stream.get('sample_rate', 'unknown')
                 result['channels'] = stream.get('channels', 0)
+                result['audio_bit_rate'] = int(stream.get('bit_rate', 0) or 0)
         
         return result
         
@@ -117,3 +178,93 @@ def get_media_info(file_path):
         
         logger.exception(f"Error obteniendo información del archivo {file_path}: {str(e)}")
         raise ProcessingError(f"Error obteniendo información del archivo: {str(e)}")
+
+def get_encoding_profile(profile_name=None):
+    """
+    Obtiene la configuración de un perfil de codificación.
+    
+    Args:
+        profile_name: Nombre del perfil (None para el perfil por defecto)
+        
+    Returns:
+        Dict con la configuración del perfil, incluyendo su nombre
+        
+    Raises:
+        ValidationError: Si el perfil no existe
+    """
+    name = profile_name or settings.DEFAULT_ENCODING_PROFILE
+    
+    if name not in settings.ENCODING_PROFILES:
+        raise ValidationError(f"Perfil de codificación desconocido: {name}")
+    
+    return dict(settings.ENCODING_PROFILES[name], name=name)
+
+# Equivalencia de presets x264 con los presets p1-p7 de NVENC
+NVENC_PRESETS = {
+    'ultrafast': 'p1', 'superfast': 'p1', 'veryfast': 'p2', 'faster': 'p3',
+    'fast': 'p4', 'medium': 'p5', 'slow': 'p6', 'slower': 'p7', 'veryslow': 'p7'
+}
+
+def build_video_encoding_args(profile_name=None):
+    """
+    Construye los argumentos de codificación de video de un perfil.
+    
+    El codec del perfil se resuelve al encoder más rápido disponible según
+    el registro de capacidades de FFmpeg.
+    
+    Args:
+        profile_name: Nombre del perfil (None para el perfil por defecto)
+        
+    Returns:
+        Lista de argumentos FFmpeg
+    """
+    from .capability_service import select_encoder
+    
+    profile = get_encoding_profile(profile_name)
+    encoder = select_encoder(profile.get('video_codec', 'h264'), default=None)
+    
+    args = ['-c:v', encoder]
+    
+    if encoder.endswith('_nvenc'):
+        if profile.get('preset'):
+            args.extend(['-preset', NVENC_PRESETS.get(profile['preset'], 'p4')])
+        if profile.get('crf') is not None:
+            args.extend(['-rc', 'vbr', '-cq', str(profile['crf'])])
+    elif encoder.endswith('_qsv'):
+        if profile.get('preset'):
+            args.extend(['-preset', str(profile['preset'])])
+        if profile.get('crf') is not None:
+            args.extend(['-global_quality', str(profile['crf'])])
+    else:
+        if profile.get('preset'):
+            args.extend(['-preset', str(profile['preset'])])
+        if profile.get('crf') is not None:
+            args.extend(['-crf', str(profile['crf'])])
+        if profile.get('tune'):
+            args.extend(['-tune', str(profile['tune'])])
+    
+    if profile.get('threads') is not None:
+        args.extend(['-threads', str(profile['threads'])])
+    
+    return args
+
+def build_audio_encoding_args(profile_name=None):
+    """
+    Construye los argumentos de codificación de audio de un perfil.
+    
+    Args:
+        profile_name: Nombre del perfil (None para el perfil por defecto)
+        
+    Returns:
+        Lista de argumentos FFmpeg
+    """
+    from .capability_service import select_encoder
+    
+    profile = get_encoding_profile(profile_name)
+    
+    args = ['-c:a', select_encoder(profile.get('audio_codec', 'aac'))]
+    
+    if profile.get('audio_bitrate'):
+        args.extend(['-b:a', str(profile['audio_bitrate'])])
+    
+    return args
@@ -0,0 +1,371 @@
+import os
+import time
+import struct
+import hashlib
+import logging
+import subprocess
+import threading
+from typing import Dict, Any, List, Optional
+from xml.sax.saxutils import escape
+from ..utils.cache_utils import get_cache_path, atomic_write, read_json_cache, write_json_cache
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+# Versión del formato del registro en disco
+REGISTRY_FORMAT_VERSION = 1
+
+FONT_EXTENSIONS = ('.ttf', '.otf', '.ttc', '.otc')
+
+# Familias habituales en las peticiones y sus sustitutos métricamente compatibles
+FONT_ALIASES = {
+    'arial': ['Liberation Sans', 'Arimo', 'DejaVu Sans'],
+    'helvetica': ['Liberation Sans', 'Arimo', 'DejaVu Sans'],
+    'sans': ['DejaVu Sans', 'Liberation Sans'],
+    'sans-serif': ['DejaVu Sans', 'Liberation Sans'],
+    'times new roman': ['Liberation Serif', 'Tinos', 'DejaVu Serif'],
+    'times': ['Liberation Serif', 'Tinos', 'DejaVu Serif'],
+    'serif': ['DejaVu Serif', 'Liberation Serif'],
+    'courier new': ['Liberation Mono', 'Cousine', 'DejaVu Sans Mono'],
+    'courier': ['Liberation Mono', 'Cousine', 'DejaVu Sans Mono'],
+    'monospace': ['DejaVu Sans Mono', 'Liberation Mono']
+}
+
+# Identificadores de la tabla 'name': familia/estilo tipográficos y heredados
+NAME_ID_FAMILY = 1
+NAME_ID_STYLE = 2
+NAME_ID_TYPOGRAPHIC_FAMILY = 16
+NAME_ID_TYPOGRAPHIC_STYLE = 17
+
+_registry = None
+_lock = threading.Lock()
+
+def _decode_name(platform_id: int, data: bytes) -> Optional[str]:
+    try:
+        if platform_id in (0, 3):
+            return data.decode('utf-16-be').strip('\x00').strip()
+        if platform_id == 1:
+            return data.decode('mac_roman').strip('\x00').strip()
+    except UnicodeDecodeError:
+        return None
+    return None
+
+def _read_name_table(data: bytes, font_offset: int) -> Dict[int, str]:
+    """Lee los nombres de una fuente SFNT (TrueType/OpenType) a partir de su offset."""
+    num_tables = struct.unpack_from('>H', data, font_offset + 4)[0]
+    name_offset = None
+
+    for index in range(num_tables):
+        tag, _, offset, _ = struct.unpack_from('>4sIII', data, font_offset + 12 + index * 16)
+        if tag == b'name':
+            name_offset = offset
+            break
+
+    if name_offset is None:
+        return {}
+
+    _, count, string_offset = struct.unpack_from('>HHH', data, name_offset)
+    names = {}
+    ranks = {}
+
+    for index in range(count):
+        platform_id, _, language_id, name_id, length, offset = struct.unpack_from(
+            '>HHHHHH', data, name_offset + 6 + index * 12
+        )
+        if name_id not in (NAME_ID_FAMILY, NAME_ID_STYLE, NAME_ID_TYPOGRAPHIC_FAMILY, NAME_ID_TYPOGRAPHIC_STYLE):
+            continue
+
+        # Preferencia: Windows en inglés, luego cualquier Windows/Unicode, luego Mac
+        if platform_id == 3:
+            rank = 0 if language_id == 0x409 else 1
+        elif platform_id == 0:
+            rank = 2
+        else:
+            rank = 3
+
+        if name_id in ranks and ranks[name_id] <= rank:
+            continue
+
+        start = name_offset + string_offset + offset
+        value = _decode_name(platform_id, data[start:start + length])
+        if value:
+            names[name_id] = value
+            ranks[name_id] = rank
+
+    return names
+
+def read_font_names(path: str) -> List[Dict[str, str]]:
+    """
+    Extrae familia y estilo de un archivo de fuente leyendo su tabla 'name'.
+
+    Args:
+        path: Ruta del archivo .ttf/.otf o colección .ttc/.otc
+
+    Returns:
+        Lista de dicts con 'family' y 'style' (una entrada por fuente de la colección)
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    if data[:4] == b'ttcf':
+        num_fonts = struct.unpack_from('>I', data, 8)[0]
+        offsets = struct.unpack_from(f'>{num_fonts}I', data, 12)
+    else:
+        offsets = (0,)
+
+    fonts = []
+    for offset in offsets:
+        names = _read_name_table(data, offset)
+        family = names.get(NAME_ID_TYPOGRAPHIC_FAMILY) or names.get(NAME_ID_FAMILY)
+        if not family:
+            continue
+        style = names.get(NAME_ID_TYPOGRAPHIC_STYLE) or names.get(NAME_ID_STYLE) or 'Regular'
+        fonts.append({'family': family, 'style': style})
+
+    return fonts
+
+def get_font_dirs() -> List[str]:
+    """
+    Directorios de fuentes: el de la aplicación y los assets de tipo fuente
+    primero, luego los del sistema.
+    """
+    dirs = [settings.FONTS_DIR, os.path.join(settings.ASSET_CACHE_DIR, 'font')] + settings.FONT_SEARCH_PATHS
+    return [os.path.abspath(d) for d in dirs if d and os.path.isdir(d)]
+
+def _find_font_files(dirs: List[str]) -> List[str]:
+    files = []
+
+    # Orden estable dentro de cada directorio, respetando el orden de los directorios
+    for directory in dirs:
+        found = []
+        for root, _, filenames in os.walk(directory):
+            for filename in filenames:
+                if filename.lower().endswith(FONT_EXTENSIONS):
+                    found.append(os.path.join(root, filename))
+        files.extend(sorted(found))
+
+    return files
+
+def _registry_key(dirs: List[str], files: List[str]) -> str:
+    """Huella del conjunto de fuentes: cambia si se añade, borra o modifica alguna."""
+    hasher = hashlib.sha256(f"{REGISTRY_FORMAT_VERSION}|{'|'.join(dirs)}".encode('utf-8'))
+
+    for path in files:
+        stat = os.stat(path)
+        hasher.update(f"|{path}:{stat.st_size}:{int(stat.st_mtime)}".encode('utf-8'))
+
+    return hasher.hexdigest()[:16]
+
+def build_font_registry() -> Dict[str, Any]:
+    """
+    Construye el registro de fuentes disponibles.
+
+    El análisis de los archivos se guarda en disco indexado por la lista de
+    archivos, tamaños y fechas, de modo que solo se repite si cambian.
+
+    Returns:
+        Dict con la huella, los directorios y las familias (clave en minúsculas
+        con el nombre original y la ruta de cada estilo)
+    """
+    dirs = get_font_dirs()
+    files = _find_font_files(dirs)
+    key = _registry_key(dirs, files)
+
+    cached = read_json_cache('fonts', key)
+    if cached:
+        logger.info(f"Registro de fuentes cargado de caché ({len(cached['families'])} familias)")
+        return cached
+
+    start_time = time.time()
+    families = {}
+
+    for path in files:
+        try:
+            fonts = read_font_names(path)
+        except (OSError, struct.error) as e:
+            logger.warning(f"No se pudo leer la fuente {path}: {str(e)}")
+            continue
+
+        for font in fonts:
+            entry = families.setdefault(font['family'].lower(), {'family': font['family'], 'styles': {}})
+            # Los directorios de la aplicación tienen prioridad sobre los del sistema
+            entry['styles'].setdefault(font['style'].lower(), path)
+
+    registry = {
+        'key': key,
+        'dirs': dirs,
+        'families': families
+    }
+
+    try:
+        write_json_cache('fonts', key, registry)
+    except OSError as e:
+        logger.warning(f"No se pudo guardar el registro de fuentes: {str(e)}")
+
+    logger.info(f"Registro de fuentes construido en {time.time() - start_time:.2f}s: "
+                f"{len(families)} familias en {len(files)} archivos")
+
+    return registry
+
+def build_fontconfig_config(dirs: List[str], cache_dir: str) -> str:
+    """
+    Genera un fonts.conf que limita fontconfig a los directorios del registro
+    y usa una caché propia, para que los procesos FFmpeg no tengan que
+    escanear las fuentes al arrancar.
+    """
+    lines = [
+        '<?xml version="1.0"?>',
+        '<!DOCTYPE fontconfig SYSTEM "urn:fontconfig:fonts.dtd">',
+        '<fontconfig>'
+    ]
+    lines.extend(f'  <dir>{escape(directory)}</dir>' for directory in dirs)
+    lines.append(f'  <cachedir>{escape(cache_dir)}</cachedir>')
+    lines.append('</fontconfig>')
+    return '\n'.join(lines) + '\n'
+
+def prepare_fontconfig(registry: Dict[str, Any]) -> Optional[str]:
+    """
+    Escribe la configuración de fontconfig, la exporta a los procesos hijos
+    mediante FONTCONFIG_FILE y construye su caché una vez por conjunto de fuentes.
+
+    Returns:
+        Ruta del fonts.conf generado
+    """
+    cache_dir = os.path.abspath(os.path.join(settings.CACHE_DIR, 'fontconfig'))
+    config_path = get_cache_path('fontconfig', 'fonts', '.conf')
+
+    config = build_fontconfig_config(registry['dirs'], cache_dir).encode('utf-8')
+    current = None
+    if os.path.exists(config_path):
+        with open(config_path, 'rb') as f:
+            current = f.read()
+    if current != config:
+        atomic_write(config_path, config)
+
+    os.environ['FONTCONFIG_FILE'] = os.path.abspath(config_path)
+
+    stamp_key = f"stamp-{registry['key']}"
+    if read_json_cache('fontconfig', stamp_key):
+        return config_path
+
+    start_time = time.time()
+    try:
+        process = subprocess.run(
+            ['fc-cache', '-f'],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            check=False,
+            timeout=300
+        )
+    except (OSError, subprocess.TimeoutExpired) as e:
+        logger.warning(f"No se pudo construir la caché de fontconfig: {str(e)}")
+        return config_path
+
+    if process.returncode != 0:
+        logger.warning(f"fc-cache falló (código {process.returncode}): {process.stderr.strip()}")
+        return config_path
+
+    write_json_cache('fontconfig', stamp_key, {'built_at': time.time()})
+    logger.info(f"Caché de fontconfig construida en {time.time() - start_time:.2f}s")
+
+    return config_path
+
+def validate_font_registry(registry: Dict[str, Any]) -> List[str]:
+    """
+    Comprueba que la fuente por defecto y los alias resuelven a una familia
+    instalada.
+
+    Returns:
+        Lista de nombres sin ninguna familia disponible
+    """
+    families = registry['families']
+    missing = []
+
+    for name in [settings.DEFAULT_FONT] + list(FONT_ALIASES):
+        candidates = [name] + FONT_ALIASES.get(name.lower(), [])
+        if not any(candidate.lower() in families for candidate in candidates):
+            missing.append(name)
+
+    if missing:
+        logger.warning(f"Fuentes sin familia disponible: {', '.join(missing)}")
+
+    return missing
+
+def get_font_registry(refresh: bool = False) -> Dict[str, Any]:
+    """
+    Devuelve el registro de fuentes del proceso, construyéndolo la primera
+    vez que se solicita.
+    """
+    global _registry
+
+    if _registry is not None and not refresh:
+        return _registry
+
+    with _lock:
+        if _registry is None or refresh:
+            _registry = build_font_registry()
+
+    return _registry
+
+def init_font_registry() -> Dict[str, Any]:
+    """
+    Construye el registro de fuentes y la caché de fontconfig al arrancar
+    el proceso.
+    """
+    registry = get_font_registry()
+
+    try:
+        prepare_fontconfig(registry)
+    except OSError as e:
+        logger.warning(f"No se pudo preparar fontconfig: {str(e)}")
+
+    validate_font_registry(registry)
+    return registry
+
+def resolve_font(name: Optional[str], style: str = 'Regular') -> Dict[str, Optional[str]]:
+    """
+    Traduce el nombre de fuente de una petición a una familia instalada.
+
+    Acepta referencias asset://<id> a fuentes registradas. Para los nombres
+    prueba la familia pedida, sus alias y, por último, DEFAULT_FONT. Si no hay
+    ninguna instalada se devuelve el nombre original para que libass aplique
+    su propia sustitución.
+
+    Args:
+        name: Nombre de la familia (ej. "Arial")
+        style: Estilo preferido
+
+    Returns:
+        Dict con 'family' (nombre para ASS/fontconfig) y 'path' (archivo o None)
+    """
+    name = (name or settings.DEFAULT_FONT).strip()
+
+    if name.startswith('asset://'):
+        # Importar aquí para evitar referencias circulares
+        from .asset_service import get_asset_path
+        path = get_asset_path(name)
+        fonts = read_font_names(path)
+        if fonts:
+            return {'family': fonts[0]['family'], 'path': path}
+        logger.warning(f"El asset {name} no contiene una fuente válida")
+        name = settings.DEFAULT_FONT
+
+    families = get_font_registry()['families']
+
+    candidates = [name] + FONT_ALIASES.get(name.lower(), []) + [settings.DEFAULT_FONT]
+
+    for candidate in candidates:
+        entry = families.get(candidate.lower())
+        if not entry:
+            continue
+
+        if candidate.lower() != name.lower():
+            logger.debug(f"Fuente '{name}' sustituida por '{entry['family']}'")
+
+        styles = entry['styles']
+        path = styles.get(style.lower()) or styles.get('regular') or styles[sorted(styles)[0]]
+        return {'family': entry['family'], 'path': path}
+
+    logger.warning(f"Fuente '{name}' no encontrada en el registro")
+    return {'family': name, 'path': None}
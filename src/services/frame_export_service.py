@@ -0,0 +1,305 @@
+import os
+import io
+import time
+import uuid
+import logging
+import tarfile
+import zipfile
+import datetime
+import tempfile
+import subprocess
+from ..utils.file_utils import download_file
+from ..utils.frame_utils import iter_images
+from .ffmpeg_service import get_media_info
+from .image_service import quality_to_qscale
+from .storage_service import get_file_url
+from .webhook_service import notify_job_completed, notify_job_failed
+from .cache_service import lookup_cached_result, save_cached_result
+from ..config import settings
+from ..api.middlewares.error_handler import ProcessingError, ValidationError
+
+logger = logging.getLogger(__name__)
+
+# Tamaño de lectura del pipe de FFmpeg
+PIPE_CHUNK_SIZE = 256 * 1024
+
+ARCHIVE_MIME_TYPES = {
+    'zip': 'application/zip',
+    'tar': 'application/x-tar'
+}
+
+class _ChunkBuffer:
+    """
+    Destino de escritura no posicionable: acumula lo escrito por el archivo
+    hasta que el generador de la respuesta lo vacía.
+    """
+    def __init__(self):
+        self._data = bytearray()
+    
+    def write(self, data):
+        self._data.extend(data)
+        return len(data)
+    
+    def flush(self):
+        pass
+    
+    def drain(self):
+        data = bytes(self._data)
+        self._data.clear()
+        return data
+
+class FrameArchiveWriter:
+    """
+    Escribe frames en un ZIP o TAR de forma incremental sobre cualquier
+    objeto con write(), incluido un destino no posicionable.
+    """
+    def __init__(self, fileobj, archive_format='zip'):
+        if archive_format not in ARCHIVE_MIME_TYPES:
+            raise ValidationError(f"Formato de archivo no soportado: {archive_format}")
+        
+        self.archive_format = archive_format
+        self.count = 0
+        
+        if archive_format == 'zip':
+            # Las imágenes ya están comprimidas: se almacenan sin recomprimir
+            self._archive = zipfile.ZipFile(fileobj, mode='w', compression=zipfile.ZIP_STORED)
+        else:
+            self._archive = tarfile.open(fileobj=fileobj, mode='w|')
+    
+    def add(self, name, data):
+        if self.archive_format == 'zip':
+            info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+            self._archive.writestr(info, data)
+        else:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = time.time()
+            self._archive.addfile(info, io.BytesIO(data))
+        self.count += 1
+    
+    def close(self):
+        self._archive.close()
+
+def build_frame_export_command(video_path, fps=1, width=None, image_format='jpg', quality=90, max_frames=None):
+    """
+    Construye el comando FFmpeg que emite los frames por image2pipe.
+    
+    Args:
+        video_path: Ruta del vídeo
+        fps: Frames por segundo a extraer
+        width: Ancho de los frames (altura proporcional) o None para el original
+        image_format: 'jpg' o 'png'
+        quality: Calidad JPEG (1-100)
+        max_frames: Número máximo de frames
+    
+    Returns:
+        Lista con el comando
+    """
+    video_filter = f"fps={fps}"
+    if width:
+        video_filter += f",scale={width}:-2"
+    
+    command = [
+        'ffmpeg',
+        '-i', video_path,
+        '-an', '-sn',
+        '-vf', video_filter,
+        '-frames:v', str(max_frames or settings.FRAME_EXPORT_MAX_FRAMES),
+        '-f', 'image2pipe'
+    ]
+    
+    if image_format == 'png':
+        command.extend(['-c:v', 'png'])
+    else:
+        command.extend(['-c:v', 'mjpeg', '-q:v', quality_to_qscale(quality)])
+    
+    command.append('pipe:1')
+    return command
+
+def iter_video_frames(video_path, fps=1, width=None, image_format='jpg', quality=90, max_frames=None):
+    """
+    Decodifica el vídeo una sola vez y devuelve los frames a medida que
+    FFmpeg los produce, sin archivos temporales por frame.
+    
+    Yields:
+        Bytes de cada frame codificado
+    
+    Raises:
+        ProcessingError: Si FFmpeg falla o el flujo es inválido
+    """
+    command = build_frame_export_command(video_path, fps, width, image_format, quality, max_frames)
+    logger.debug(f"Ejecutando comando FFmpeg (image2pipe): {' '.join(command)}")
+    
+    # stderr va a un archivo para que el pipe de salida nunca se bloquee
+    with tempfile.TemporaryFile(dir=settings.TEMP_DIR) as stderr_file:
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=stderr_file)
+        
+        try:
+            chunks = iter(lambda: process.stdout.read(PIPE_CHUNK_SIZE), b'')
+            
+            try:
+                yield from iter_images(chunks, image_format)
+            except ValueError as e:
+                raise ProcessingError(f"Error leyendo frames de FFmpeg: {str(e)}")
+            
+            returncode = process.wait()
+            
+            if returncode != 0:
+                stderr_file.seek(0)
+                stderr = stderr_file.read().decode('utf-8', errors='replace')
+                logger.error(f"Error FFmpeg (código {returncode}): {stderr}")
+                raise ProcessingError(f"Error FFmpeg: {stderr.splitlines()[-1] if stderr else 'Desconocido'}")
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            process.stdout.close()
+
+def frame_name(index, image_format):
+    return f"frame_{index:06d}.{image_format}"
+
+def export_frames(video_url, fps=1, width=None, image_format='jpg', archive_format='zip', quality=90,
+                  max_frames=None, job_id=None, webhook_url=None, no_cache=False):
+    """
+    Extrae frames a intervalos regulares y los guarda en un archivo ZIP/TAR
+    escrito de forma incremental en el almacenamiento.
+    
+    Args:
+        video_url: URL del vídeo
+        fps: Frames por segundo a extraer
+        width: Ancho de los frames (None para el original)
+        image_format: 'jpg' o 'png'
+        archive_format: 'zip' o 'tar'
+        quality: Calidad JPEG (1-100)
+        max_frames: Número máximo de frames
+        job_id: ID del trabajo (opcional)
+        webhook_url: URL para notificar cuando se complete (opcional)
+        no_cache: Omitir la consulta a la caché de resultados
+    
+    Returns:
+        Dict con la URL del archivo, número de frames y fps
+    """
+    if not job_id:
+        job_id = str(uuid.uuid4())
+    
+    logger.info(f"Job {job_id}: Iniciando exportación de frames de {video_url} a {fps} fps")
+    
+    video_path = None
+    partial_path = None
+    
+    try:
+        video_path = download_file(video_url, settings.TEMP_DIR)
+        logger.info(f"Job {job_id}: Video descargado: {video_path}")
+        
+        fingerprint, cached_result = lookup_cached_result('export_frames', {
+            'fps': fps,
+            'width': width,
+            'image_format': image_format,
+            'archive_format': archive_format,
+            'quality': quality,
+            'max_frames': max_frames
+        }, [video_path], no_cache)
+        
+        if cached_result:
+            logger.info(f"Job {job_id}: Resultado servido desde caché")
+            if webhook_url:
+                notify_job_completed(job_id, webhook_url, cached_result)
+            return cached_result
+        
+        # El archivo se escribe directamente en el almacenamiento, sin copia final
+        target_dir = os.path.join(settings.STORAGE_PATH, datetime.datetime.now().strftime('%Y/%m/%d'))
+        os.makedirs(target_dir, exist_ok=True)
+        target_path = os.path.join(target_dir, f"{uuid.uuid4()}.{archive_format}")
+        partial_path = f"{target_path}.partial"
+        
+        with open(partial_path, 'wb') as f:
+            writer = FrameArchiveWriter(f, archive_format)
+            for index, data in enumerate(iter_video_frames(video_path, fps, width, image_format, quality, max_frames)):
+                writer.add(frame_name(index, image_format), data)
+            writer.close()
+        
+        if writer.count == 0:
+            raise ProcessingError("No se extrajo ningún frame del video")
+        
+        os.replace(partial_path, target_path)
+        
+        result = {
+            "url": get_file_url(target_path),
+            "frame_count": writer.count,
+            "fps": fps
+        }
+        
+        save_cached_result(fingerprint, 'export_frames', result)
+        logger.info(f"Job {job_id}: {writer.count} frames exportados: {result['url']}")
+        
+        if webhook_url:
+            notify_job_completed(job_id, webhook_url, result)
+        
+        return result
+    
+    except Exception as e:
+        logger.exception(f"Job {job_id}: Error exportando frames: {str(e)}")
+        
+        if webhook_url:
+            notify_job_failed(job_id, webhook_url, str(e))
+        
+        raise
+    
+    finally:
+        for file_path in [video_path, partial_path]:
+            if file_path and os.path.exists(file_path):
+                try:
+                    os.remove(file_path)
+                    logger.debug(f"Job {job_id}: Archivo temporal eliminado: {file_path}")
+                except Exception as e:
+                    logger.warning(f"Error eliminando archivo temporal {file_path}: {str(e)}")
+
+def stream_frame_export(video_url, fps=1, width=None, image_format='jpg', archive_format='zip',
+                        quality=90, max_frames=None, job_id=None):
+    """
+    Descarga el vídeo y devuelve un generador que emite el archivo ZIP/TAR
+    de frames a medida que se produce, para enviarlo en la respuesta HTTP.
+    
+    La descarga y la validación ocurren antes de devolver el generador, de
+    modo que los errores iniciales se notifican como una respuesta normal.
+    
+    Returns:
+        Generador de bloques de bytes del archivo
+    """
+    if not job_id:
+        job_id = str(uuid.uuid4())
+    
+    if archive_format not in ARCHIVE_MIME_TYPES:
+        raise ValidationError(f"Formato de archivo no soportado: {archive_format}")
+    
+    logger.info(f"Job {job_id}: Iniciando exportación de frames en streaming de {video_url} a {fps} fps")
+    
+    video_path = download_file(video_url, settings.TEMP_DIR)
+    
+    try:
+        video_info = get_media_info(video_path)
+        if not video_info.get('width'):
+            raise ProcessingError("El archivo no contiene un stream de video")
+    except Exception:
+        os.remove(video_path)
+        raise
+    
+    def generate():
+        buffer = _ChunkBuffer()
+        try:
+            writer = FrameArchiveWriter(buffer, archive_format)
+            for index, data in enumerate(iter_video_frames(video_path, fps, width, image_format, quality, max_frames)):
+                writer.add(frame_name(index, image_format), data)
+                yield buffer.drain()
+            writer.close()
+            yield buffer.drain()
+            logger.info(f"Job {job_id}: {writer.count} frames enviados en streaming")
+        except Exception as e:
+            # La respuesta ya está en curso: solo se puede registrar y cortar el flujo
+            logger.exception(f"Job {job_id}: Error en exportación de frames en streaming: {str(e)}")
+            raise
+        finally:
+            if os.path.exists(video_path):
+                os.remove(video_path)
+    
+    return generate()
@@ -0,0 +1,536 @@
+import os
+import time
+import uuid
+import logging
+import tempfile
+import subprocess
+import numpy as np
+from PIL import Image
+from ..utils.file_utils import download_file, generate_temp_filename, verify_file_integrity
+from ..utils.frame_utils import LUMA_WEIGHTS
+from .ffmpeg_service import get_media_info, get_encoding_profile, build_video_encoding_args
+from .storage_service import store_file
+from .webhook_service import notify_job_completed, notify_job_failed
+from .cache_service import lookup_cached_result, save_cached_result
+from ..config import settings
+from ..api.middlewares.error_handler import ProcessingError, ValidationError
+
+logger = logging.getLogger(__name__)
+
+# Frame rate usado si FFprobe no informa uno válido
+DEFAULT_FRAME_RATE = '25'
+
+# Procesadores de frames registrados por nombre
+FRAME_PROCESSORS = {}
+
+def register_frame_processor(name):
+    """
+    Registra una clase FrameProcessor con el nombre que se usa en las
+    peticiones.
+    """
+    def decorator(cls):
+        cls.name = name
+        FRAME_PROCESSORS[name] = cls
+        return cls
+    return decorator
+
+class FrameProcessor:
+    """
+    Base de los procesadores de frames.
+    
+    setup() recibe las dimensiones y el tamaño de lote una sola vez para
+    reservar los buffers de trabajo; process() recibe cada lote como un
+    array uint8 (n, alto, ancho, 3) y lo modifica en el sitio.
+    """
+    # Si es False el video no se vuelve a codificar (análisis)
+    modifies_frames = True
+    # Bytes por píxel que reserva setup() por cada frame del lote
+    scratch_bytes_per_pixel = 0
+    
+    def __init__(self, params=None):
+        self.params = params or {}
+    
+    def setup(self, width, height, batch_size):
+        pass
+    
+    def process(self, frames):
+        raise NotImplementedError
+    
+    def result(self):
+        return None
+
+def parse_cube_lut(text):
+    """
+    Lee un LUT en formato .cube (Adobe/Resolve).
+    
+    Args:
+        text: Contenido del archivo
+    
+    Returns:
+        Tupla (tamaño, tabla uint8, es_3d). La tabla tiene forma (3, 256)
+        para LUT 1D y (tamaño³, 3) con R variando más rápido para LUT 3D
+    """
+    size = None
+    is_3d = False
+    rows = []
+    
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        
+        keyword = line.split()[0].upper()
+        if keyword == 'LUT_1D_SIZE':
+            size = int(line.split()[1])
+        elif keyword == 'LUT_3D_SIZE':
+            size = int(line.split()[1])
+            is_3d = True
+        elif keyword in ('TITLE', 'DOMAIN_MIN', 'DOMAIN_MAX', 'LUT_1D_INPUT_RANGE', 'LUT_3D_INPUT_RANGE'):
+            continue
+        else:
+            rows.append([float(value) for value in line.split()[:3]])
+    
+    if not size or size < 2:
+        raise ValidationError("LUT .cube sin LUT_1D_SIZE/LUT_3D_SIZE válido")
+    
+    expected = size ** 3 if is_3d else size
+    if len(rows) != expected:
+        raise ValidationError(f"LUT .cube incompleto: {len(rows)} filas, se esperaban {expected}")
+    
+    values = np.clip(np.rint(np.array(rows, dtype=np.float64) * 255), 0, 255).astype(np.uint8)
+    
+    if is_3d:
+        return size, values, True
+    
+    # Un LUT 1D de cualquier tamaño se remuestrea a 256 entradas por canal
+    positions = np.linspace(0, 255, size)
+    curves = np.stack([
+        np.rint(np.interp(np.arange(256), positions, values[:, channel])).astype(np.uint8)
+        for channel in range(3)
+    ])
+    return size, curves, False
+
+def build_curve_lut(brightness=0, contrast=1.0, gamma=1.0):
+    """
+    Genera curvas de color (3, 256) a partir de brillo, contraste y gamma.
+    """
+    x = np.arange(256, dtype=np.float64) / 255
+    y = np.clip((x - 0.5) * contrast + 0.5 + brightness / 255, 0, 1) ** (1 / gamma)
+    curve = np.rint(y * 255).astype(np.uint8)
+    return np.stack([curve, curve, curve])
+
+@register_frame_processor('lut')
+class LutProcessor(FrameProcessor):
+    """
+    Gradación de color con un LUT .cube 1D/3D (lut_url) o con curvas de
+    brillo, contraste y gamma.
+    """
+    # Índice y buffer auxiliar intp de los LUT 3D
+    scratch_bytes_per_pixel = 2 * np.dtype(np.intp).itemsize
+    
+    def setup(self, width, height, batch_size):
+        if self.params.get('lut_url'):
+            lut_path = download_file(self.params['lut_url'], settings.TEMP_DIR)
+            try:
+                with open(lut_path, 'r', encoding='utf-8', errors='replace') as f:
+                    size, table, self.is_3d = parse_cube_lut(f.read())
+            finally:
+                os.remove(lut_path)
+        else:
+            size = 256
+            self.is_3d = False
+            table = build_curve_lut(
+                self.params.get('brightness', 0),
+                self.params.get('contrast', 1.0),
+                self.params.get('gamma', 1.0)
+            )
+        
+        if self.is_3d:
+            # Vecino más cercano: índice plano r + g*n + b*n² acumulado en un buffer reservado
+            grid = np.rint(np.arange(256) * (size - 1) / 255).astype(np.intp)
+            self.table = table
+            self.offsets = (grid, grid * size, grid * size * size)
+            self.index = np.empty((batch_size, height, width), dtype=np.intp)
+            self.scratch = np.empty_like(self.index)
+        else:
+            self.curves = table
+    
+    def process(self, frames):
+        count = len(frames)
+        
+        if not self.is_3d:
+            for channel in range(3):
+                np.take(self.curves[channel], frames[..., channel], out=frames[..., channel], mode='clip')
+            return
+        
+        index = self.index[:count]
+        scratch = self.scratch[:count]
+        
+        np.take(self.offsets[0], frames[..., 0], out=index, mode='clip')
+        for channel in (1, 2):
+            np.take(self.offsets[channel], frames[..., channel], out=scratch, mode='clip')
+            index += scratch
+        
+        np.take(self.table, index, axis=0, out=frames, mode='clip')
+
+@register_frame_processor('mask')
+class MaskProcessor(FrameProcessor):
+    """
+    Aplica una máscara en escala de grises (mask_url): el blanco conserva el
+    frame y el negro lo sustituye por el color de fondo.
+    """
+    scratch_bytes_per_pixel = 3 * np.dtype(np.uint16).itemsize
+    
+    def setup(self, width, height, batch_size):
+        if not self.params.get('mask_url'):
+            raise ValidationError("El procesador 'mask' requiere mask_url")
+        
+        mask_path = download_file(self.params['mask_url'], settings.TEMP_DIR)
+        try:
+            with Image.open(mask_path) as image:
+                mask = image.convert('L').resize((width, height), Image.Resampling.LANCZOS)
+        finally:
+            os.remove(mask_path)
+        
+        weights = np.asarray(mask, dtype=np.uint16)
+        if self.params.get('invert'):
+            weights = 255 - weights
+        
+        color = np.array(self.params.get('color', [0, 0, 0]), dtype=np.uint16)
+        
+        self.mask = weights[:, :, None]
+        self.background = (255 - self.mask) * color
+        self.scratch = np.empty((batch_size, height, width, 3), dtype=np.uint16)
+    
+    def process(self, frames):
+        scratch = self.scratch[:len(frames)]
+        
+        np.multiply(frames, self.mask, out=scratch)
+        scratch += self.background
+        scratch //= 255
+        np.copyto(frames, scratch, casting='unsafe')
+
+@register_frame_processor('analytics')
+class AnalyticsProcessor(FrameProcessor):
+    """
+    Calcula el color medio y el brillo de cada frame sin volver a codificar.
+    """
+    modifies_frames = False
+    
+    def setup(self, width, height, batch_size):
+        self.pixels = width * height
+        self.brightness = []
+        self.totals = np.zeros(3, dtype=np.float64)
+    
+    def process(self, frames):
+        sums = np.einsum('npc->nc', frames.reshape(len(frames), -1, 3), dtype=np.uint64)
+        means = sums / self.pixels
+        
+        self.totals += means.sum(axis=0)
+        self.brightness.extend(round(float(value), 2) for value in means @ LUMA_WEIGHTS)
+    
+    def result(self):
+        count = len(self.brightness)
+        mean_rgb = self.totals / count if count else self.totals
+        
+        return {
+            'mean_rgb': [round(float(value), 2) for value in mean_rgb],
+            'mean_brightness': round(float(mean_rgb @ LUMA_WEIGHTS), 2),
+            'brightness': self.brightness
+        }
+
+def cap_batch_size(batch_size, width, height, processor):
+    """
+    Limita el lote para que el buffer de frames y los buffers del
+    procesador no superen FRAME_PROCESSING_MAX_BATCH_BYTES.
+    
+    Un lote de 256 frames 4K con un LUT 3D reservaría decenas de GB; el
+    límite se expresa en bytes para que valga para cualquier resolución.
+    """
+    frame_bytes = width * height * (3 + processor.scratch_bytes_per_pixel)
+    limit = max(1, settings.FRAME_PROCESSING_MAX_BATCH_BYTES // frame_bytes)
+    return min(batch_size, limit)
+
+def build_frame_decode_command(video_path):
+    return [
+        'ffmpeg',
+        '-v', 'error',
+        '-i', video_path,
+        '-map', '0:v:0',
+        '-an', '-sn',
+        '-f', 'rawvideo',
+        '-pix_fmt', 'rgb24',
+        'pipe:1'
+    ]
+
+def build_frame_encode_command(video_path, output_path, width, height, frame_rate, encoding_profile=None):
+    """
+    Construye el comando que codifica frames rgb24 desde stdin, copiando el
+    audio del video original.
+    """
+    return [
+        'ffmpeg', '-y',
+        '-v', 'error',
+        '-f', 'rawvideo',
+        '-pix_fmt', 'rgb24',
+        '-s', f"{width}x{height}",
+        '-framerate', str(frame_rate),
+        '-i', 'pipe:0',
+        '-i', video_path,
+        '-map', '0:v',
+        '-map', '1:a?',
+        *build_video_encoding_args(encoding_profile),
+        '-pix_fmt', 'yuv420p',
+        '-c:a', 'copy',
+        '-shortest',
+        output_path
+    ]
+
+def _read_into(stream, view):
+    """Llena el buffer desde el pipe; devuelve los bytes leídos (menos solo al final)."""
+    filled = 0
+    total = len(view)
+    
+    while filled < total:
+        count = stream.readinto(view[filled:])
+        if not count:
+            break
+        filled += count
+    
+    return filled
+
+def _write_all(stream, view):
+    written = 0
+    while written < len(view):
+        written += stream.write(view[written:])
+
+def _pipeline_error(stage, log_file, returncode):
+    log_file.seek(0)
+    stderr = log_file.read().decode('utf-8', errors='replace').strip()
+    logger.error(f"Error FFmpeg en {stage} (código {returncode}): {stderr}")
+    return ProcessingError(f"Error FFmpeg ({stage}): {stderr.splitlines()[-1] if stderr else 'Desconocido'}")
+
+def run_frame_pipeline(video_path, processor, width, height, frame_rate, output_path=None,
+                       encoding_profile=None, batch_size=None):
+    """
+    Decodifica el video a rawvideo, procesa los frames por lotes y, si hay
+    salida, los codifica con un segundo proceso FFmpeg.
+    
+    Los lotes se leen con readinto() sobre un único buffer reservado al
+    inicio y se escriben como memoryview, sin copias por frame.
+    
+    Args:
+        video_path: Ruta del video de entrada
+        processor: Instancia de FrameProcessor
+        width: Ancho del video
+        height: Alto del video
+        frame_rate: Frame rate de salida (ej. '30000/1001')
+        output_path: Ruta del video de salida (None para solo procesar)
+        encoding_profile: Nombre del perfil de codificación
+        batch_size: Frames por lote (se reduce según FRAME_PROCESSING_MAX_BATCH_BYTES)
+    
+    Returns:
+        Dict con frame_count, elapsed y throughput_fps
+    """
+    requested = batch_size or settings.FRAME_PROCESSING_BATCH_SIZE
+    batch_size = cap_batch_size(requested, width, height, processor)
+    if batch_size < requested:
+        logger.info(f"Lote reducido de {requested} a {batch_size} frames por memoria ({width}x{height})")
+    
+    frame_size = width * height * 3
+    
+    buffer = np.empty((batch_size, height, width, 3), dtype=np.uint8)
+    view = memoryview(buffer).cast('B')
+    
+    processor.setup(width, height, batch_size)
+    
+    decode_command = build_frame_decode_command(video_path)
+    logger.debug(f"Ejecutando comando FFmpeg (decodificación): {' '.join(decode_command)}")
+    
+    # stderr va a archivos para que ningún pipe se bloquee
+    with tempfile.TemporaryFile(dir=settings.TEMP_DIR) as decoder_log, \
+         tempfile.TemporaryFile(dir=settings.TEMP_DIR) as encoder_log:
+        decoder = subprocess.Popen(decode_command, stdout=subprocess.PIPE, stderr=decoder_log, bufsize=0)
+        encoder = None
+        
+        try:
+            if output_path:
+                encode_command = build_frame_encode_command(
+                    video_path, output_path, width, height, frame_rate, encoding_profile
+                )
+                logger.debug(f"Ejecutando comando FFmpeg (codificación): {' '.join(encode_command)}")
+                encoder = subprocess.Popen(encode_command, stdin=subprocess.PIPE, stderr=encoder_log, bufsize=0)
+            
+            frame_count = 0
+            start_time = time.time()
+            
+            while True:
+                filled = _read_into(decoder.stdout, view)
+                count = filled // frame_size
+                
+                if count:
+                    frames = buffer[:count]
+                    processed = processor.process(frames)
+                    if processed is not None and processed is not frames:
+                        np.copyto(frames, processed)
+                    
+                    if encoder:
+                        try:
+                            _write_all(encoder.stdin, view[:count * frame_size])
+                        except BrokenPipeError:
+                            raise _pipeline_error('codificación', encoder_log, encoder.wait())
+                    
+                    frame_count += count
+                
+                if filled < len(view):
+                    if filled % frame_size:
+                        logger.warning("Frame incompleto al final del flujo rawvideo, descartado")
+                    break
+            
+            returncode = decoder.wait()
+            if returncode != 0:
+                raise _pipeline_error('decodificación', decoder_log, returncode)
+            
+            if encoder:
+                encoder.stdin.close()
+                returncode = encoder.wait()
+                if returncode != 0:
+                    raise _pipeline_error('codificación', encoder_log, returncode)
+            
+            elapsed = time.time() - start_time
+        
+        finally:
+            for process in [decoder, encoder]:
+                if process and process.poll() is None:
+                    process.kill()
+                    process.wait()
+            decoder.stdout.close()
+            if encoder and not encoder.stdin.closed:
+                try:
+                    encoder.stdin.close()
+                except BrokenPipeError:
+                    pass
+    
+    throughput = frame_count / elapsed if elapsed > 0 else 0.0
+    logger.info(f"Procesador '{processor.name}': {frame_count} frames en {elapsed:.2f}s ({throughput:.1f} fps)")
+    
+    return {
+        'frame_count': frame_count,
+        'elapsed': round(elapsed, 3),
+        'throughput_fps': round(throughput, 2)
+    }
+
+def process_video_frames(video_url, processor, params=None, batch_size=None, job_id=None,
+                         webhook_url=None, no_cache=False, encoding_profile=None):
+    """
+    Aplica un procesador de frames NumPy registrado a un video.
+    
+    Args:
+        video_url: URL del video
+        processor: Nombre del procesador ('lut', 'mask', 'analytics' o uno registrado)
+        params: Parámetros del procesador
+        batch_size: Frames por lote (por defecto FRAME_PROCESSING_BATCH_SIZE)
+        job_id: ID del trabajo (opcional)
+        webhook_url: URL para notificar cuando se complete (opcional)
+        no_cache: Omitir la consulta a la caché de resultados
+        encoding_profile: Nombre del perfil de codificación (por defecto si es None)
+    
+    Returns:
+        Dict con la URL del video procesado (None si el procesador no
+        modifica frames), número de frames, throughput en fps y el
+        resultado del procesador
+    """
+    if not job_id:
+        job_id = str(uuid.uuid4())
+    
+    if processor not in FRAME_PROCESSORS:
+        raise ValidationError(f"Procesador de frames desconocido: {processor}")
+    
+    profile = get_encoding_profile(encoding_profile)
+    logger.info(f"Job {job_id}: Iniciando procesamiento de frames '{processor}' de {video_url}")
+    
+    video_path = None
+    output_path = None
+    
+    try:
+        video_path = download_file(video_url, settings.TEMP_DIR)
+        logger.info(f"Job {job_id}: Video descargado: {video_path}")
+        
+        fingerprint, cached_result = lookup_cached_result('process_video_frames', {
+            'processor': processor,
+            'params': params,
+            'encoding_profile': profile
+        }, [video_path], no_cache)
+        
+        if cached_result:
+            logger.info(f"Job {job_id}: Resultado servido desde caché")
+            if webhook_url:
+                notify_job_completed(job_id, webhook_url, cached_result)
+            return cached_result
+        
+        video_info = get_media_info(video_path)
+        width = int(video_info.get('width', 0))
+        height = int(video_info.get('height', 0))
+        
+        if width <= 0 or height <= 0:
+            raise ProcessingError("No se pudo obtener información del video")
+        
+        # FFmpeg aplica la rotación al decodificar: los frames de un video
+        # vertical de móvil llegan con ancho y alto intercambiados
+        if video_info.get('rotation', 0) % 180 == 90:
+            width, height = height, width
+        
+        frame_rate = video_info.get('frame_rate')
+        if not frame_rate or frame_rate in ('unknown', '0/0'):
+            frame_rate = DEFAULT_FRAME_RATE
+        
+        frame_processor = FRAME_PROCESSORS[processor](params)
+        
+        if frame_processor.modifies_frames:
+            output_path = generate_temp_filename(prefix=f"{job_id}_frames_", suffix=".mp4")
+        
+        stats = run_frame_pipeline(
+            video_path, frame_processor, width, height, frame_rate,
+            output_path=output_path, encoding_profile=profile['name'], batch_size=batch_size
+        )
+        
+        if stats['frame_count'] == 0:
+            raise ProcessingError("No se decodificó ningún frame del video")
+        
+        result_url = None
+        if output_path:
+            if not verify_file_integrity(output_path):
+                raise ProcessingError("El video procesado no es válido")
+            result_url = store_file(output_path)
+        
+        result = {
+            "url": result_url,
+            "frame_count": stats['frame_count'],
+            "throughput_fps": stats['throughput_fps'],
+            "result": frame_processor.result()
+        }
+        
+        save_cached_result(fingerprint, 'process_video_frames', result)
+        logger.info(f"Job {job_id}: Frames procesados a {stats['throughput_fps']} fps")
+        
+        if webhook_url:
+            notify_job_completed(job_id, webhook_url, result)
+        
+        return result
+    
+    except Exception as e:
+        logger.exception(f"Job {job_id}: Error procesando frames: {str(e)}")
+        
+        if webhook_url:
+            notify_job_failed(job_id, webhook_url, str(e))
+        
+        raise
+    
+    finally:
+        for file_path in [video_path, output_path]:
+            if file_path and os.path.exists(file_path):
+                try:
+                    os.remove(file_path)
+                    logger.debug(f"Job {job_id}: Archivo temporal eliminado: {file_path}")
+                except Exception as e:
+                    logger.warning(f"Error eliminando archivo temporal {file_path}: {str(e)}")
@@ -1,22 +1,46 @@
 # src/services/image_service.py
 import os
+import math
+import shutil
 import logging
 import uuid
-from ..utils.file_utils import download_file, generate_temp_filename, verify_file_integrity
-from .ffmpeg_service import run_ffmpeg_command, get_media_info
+import time
+import hmac
+import hashlib
+import threading
+import io
+from PIL import Image
+from ..utils.file_utils import download_file, generate_temp_filename, verify_file_integrity, compute_file_hash
+from ..utils.frame_utils import frames_from_buffer, select_best_frame
+from ..utils.cache_utils import get_cache_path, atomic_write
+from .ffmpeg_service import run_ffmpeg_command, run_ffmpeg_pipe, get_media_info, get_encoding_profile, build_video_encoding_args
 from .storage_service import store_file
 from .webhook_service import notify_job_completed, notify_job_failed
+from .cache_service import lookup_cached_result, save_cached_result
+from .subtitle_service import format_timestamp
+from .keyframe_service import get_keyframe_index
 from ..config import settings
-from ..api.middlewares.error_handler import ProcessingError
+from ..api.middlewares.error_handler import ProcessingError, ValidationError, NotFoundError
 
 logger = logging.getLogger(__name__)
 
+# In-flight on-demand renders, keyed by cache key: [lock, waiters]
+_render_locks = {}
+_render_locks_guard = threading.Lock()
+
+THUMBNAIL_MIME_TYPES = {
+    'jpg': 'image/jpeg',
+    'webp': 'image/webp'
+}
+
 def overlay_image_on_video(video_url, image_url, position='bottom_right', scale=0.3, 
-                          opacity=1.0, job_id=None, webhook_url=None):
+                          opacity=1.0, job_id=None, webhook_url=None, no_cache=False,
+                          encoding_profile=None):
     if not job_id:
         job_id = str(uuid.uuid4())
     
-    logger.info(f"Job {job_id}: Starting image overlay on video {video_url}")
+    profile = get_encoding_profile(encoding_profile)
+    logger.info(f"Job {job_id}: Starting image overlay on video {video_url} (profile {profile['name']})")
     
     video_path = None
     image_path = None
@@ -29,6 +53,19 @@ def overlay_image_on_video(video_url, image_url, position='bottom_right', scale=
         image_path = download_file(image_url, settings.TEMP_DIR)
         logger.info(f"Job {job_id}: Image downloaded: {image_path}")
         
+        fingerprint, cached_url = lookup_cached_result('overlay_image_on_video', {
+            'position': position,
+            'scale': scale,
+            'opacity': opacity,
+            'encoding_profile': profile
+        }, [video_path, image_path], no_cache)
+        
+        if cached_url:
+            logger.info(f"Job {job_id}: Result served from cache: {cached_url}")
+            if webhook_url:
+                notify_job_completed(job_id, webhook_url, cached_url)
+            return cached_url
+        
         video_info = get_media_info(video_path)
         video_width = int(video_info.get('width', 0))
         video_height = int(video_info.get('height', 0))
@@ -41,15 +78,21 @@ def overlay_image_on_video(video_url, image_url, position='bottom_right', scale=
         # Calculate position for the overlay
         overlay_x, overlay_y = calculate_overlay_position(position, scale, video_width, video_height)
         
-        filter_complex = f"[1:v]scale=iw*{scale}:-1,format=rgba,colorchannelmixer=aa={opacity}[overlay];[0:v][overlay]overlay={overlay_x}:{overlay_y}:enable='between(t,0,999999)'[out]"
+        prepared_path = prepare_overlay_image(image_path, scale, opacity)
+        
+        if prepared_path:
+            filter_complex = build_overlay_filter(overlay_x, overlay_y)
+        else:
+            filter_complex = build_overlay_filter(overlay_x, overlay_y, scale, opacity)
         
         command = [
             'ffmpeg',
             '-i', video_path,
-            '-i', image_path,
+            '-i', prepared_path or image_path,
             '-filter_complex', filter_complex,
             '-map', '[out]',
             '-map', '0:a?',
+            *build_video_encoding_args(profile['name']),
             '-c:a', 'copy',
             output_path
         ]
@@ -60,6 +103,7 @@ def overlay_image_on_video(video_url, image_url, position='bottom_right', scale=
             raise ProcessingError("The video with image is not valid")
         
         result_url = store_file(output_path)
+        save_cached_result(fingerprint, 'overlay_image_on_video', result_url)
         logger.info(f"Job {job_id}: Video with image processed and stored: {result_url}")
         
         if webhook_url:
@@ -160,8 +204,97 @@ def calculate_overlay_position(position, scale, video_width, video_height):
     logger.warning(f"Unrecognized position format: {position}, using default (top left)")
     return f"{margin}", f"{margin}"
 
+def build_overlay_cache_key(image_hash, width, height, opacity):
+    """
+    Build the prepared overlay cache key from the image content, target size
+    and opacity.
+    """
+    payload = f"{image_hash}|{width}x{height}|{float(opacity)}|{settings.PIPELINE_VERSION}"
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def prepare_overlay_image(image_path, scale=1.0, opacity=1.0):
+    """
+    Prepare an overlay image once: scaled, with the opacity baked into the
+    alpha channel and stored as RGBA, so FFmpeg only blends a single frame
+    instead of scaling and mixing channels on every frame.
+    
+    Prepared images are cached on disk by (image hash, target size, opacity),
+    so the same logo is processed once for any number of videos.
+    
+    Args:
+        image_path: Path of the overlay image
+        scale: Scale factor relative to the image width
+        opacity: Overlay opacity (0.0 to 1.0)
+        
+    Returns:
+        Path of the prepared PNG, or None for animated or unreadable images
+        (the caller keeps the FFmpeg filter chain for those)
+    """
+    try:
+        with Image.open(image_path) as image:
+            if getattr(image, 'is_animated', False):
+                return None
+            source_width, source_height = image.size
+    except (OSError, Image.DecompressionBombError) as e:
+        logger.warning(f"Overlay image {image_path} cannot be prepared in process: {str(e)}")
+        return None
+    
+    # Same size as scale=iw*{scale}:-1
+    width = max(1, round(source_width * scale))
+    height = max(1, round(source_height * width / source_width))
+    
+    key = build_overlay_cache_key(compute_file_hash(image_path), width, height, opacity)
+    cache_path = get_cache_path('overlays', key, '.png')
+    
+    if os.path.exists(cache_path):
+        logger.debug(f"Prepared overlay served from cache: {cache_path}")
+        # Mark it as recently used for the cache eviction
+        os.utime(cache_path)
+        return cache_path
+    
+    entry = _acquire_render_lock(key)
+    
+    try:
+        # Another job may have prepared it while we waited
+        if os.path.exists(cache_path):
+            return cache_path
+        
+        with Image.open(image_path) as image:
+            overlay = image.convert('RGBA')
+        
+        if overlay.size != (width, height):
+            overlay = overlay.resize((width, height), Image.Resampling.LANCZOS, reducing_gap=2.0)
+        
+        if opacity < 1.0:
+            alpha = overlay.getchannel('A').point(lambda value: round(value * opacity))
+            overlay.putalpha(alpha)
+        
+        buffer = io.BytesIO()
+        overlay.save(buffer, format='PNG', compress_level=1)
+        atomic_write(cache_path, buffer.getvalue())
+        
+        logger.info(f"Overlay prepared at {width}x{height} (opacity {opacity}): {cache_path}")
+        return cache_path
+        
+    finally:
+        _release_render_lock(key, entry)
+
+def build_overlay_filter(overlay_x, overlay_y, scale=None, opacity=None):
+    """
+    Build the overlay filter graph.
+    
+    A prepared overlay is a single frame that the overlay filter repeats
+    (eof_action=repeat), so it is decoded and converted only once. Without a
+    prepared image the scale/alpha chain runs on the raw input.
+    """
+    if scale is None and opacity is None:
+        return f"[0:v][1:v]overlay={overlay_x}:{overlay_y}:eof_action=repeat[out]"
+    
+    return (f"[1:v]scale=iw*{scale}:-1,format=rgba,colorchannelmixer=aa={opacity}[overlay];"
+            f"[0:v][overlay]overlay={overlay_x}:{overlay_y}:enable='between(t,0,999999)'[out]")
+
 def generate_thumbnail(video_url, time=0, width=640, height=360, quality=90,
-                      job_id=None, webhook_url=None):
+                      job_id=None, webhook_url=None, no_cache=False):
     if not job_id:
         job_id = str(uuid.uuid4())
     
@@ -174,13 +307,36 @@ def generate_thumbnail(video_url, time=0, width=640, height=360, quality=90,
         video_path = download_file(video_url, settings.TEMP_DIR)
         logger.info(f"Job {job_id}: Video downloaded: {video_path}")
         
+        fingerprint, cached_url = lookup_cached_result('generate_thumbnail', {
+            'time': time,
+            'width': width,
+            'height': height,
+            'quality': quality
+        }, [video_path], no_cache)
+        
+        if cached_url:
+            logger.info(f"Job {job_id}: Result served from cache: {cached_url}")
+            if webhook_url:
+                notify_job_completed(job_id, webhook_url, cached_url)
+            return cached_url
+        
         video_info = get_media_info(video_path)
         video_duration = float(video_info.get('duration', 0))
         
         if video_duration <= 0:
             raise ProcessingError("Could not get video duration")
         
-        if time > video_duration:
+        seek_args = []
+        
+        if time == 'auto':
+            time = select_auto_thumbnail_time(
+                video_path, video_duration,
+                int(video_info.get('width', 0)), int(video_info.get('height', 0))
+            )
+            # Candidates are keyframes, so seek to the same keyframe for the final render
+            seek_args = ['-noaccurate_seek']
+            logger.info(f"Job {job_id}: Auto-selected thumbnail time {time}s")
+        elif time > video_duration:
             time = video_duration / 2
             logger.warning(f"Job {job_id}: Time adjusted to {time}s (half of video duration)")
         
@@ -188,11 +344,12 @@ def generate_thumbnail(video_url, time=0, width=640, height=360, quality=90,
         
         command = [
             'ffmpeg',
+            *seek_args,
             '-ss', str(time),
             '-i', video_path,
             '-vframes', '1',
             '-vf', f"scale={width}:{height}:force_original_aspect_ratio=decrease",
-            '-q:v', str(min(31, 31 - (quality / 3.45))),  # Convert quality (0-100) to FFmpeg quality factor (2-31)
+            '-q:v', quality_to_qscale(quality),
             output_path
         ]
         
@@ -202,6 +359,7 @@ def generate_thumbnail(video_url, time=0, width=640, height=360, quality=90,
             raise ProcessingError("Could not generate thumbnail")
         
         result_url = store_file(output_path)
+        save_cached_result(fingerprint, 'generate_thumbnail', result_url)
         logger.info(f"Job {job_id}: Thumbnail generated and stored: {result_url}")
         
         if webhook_url:
@@ -226,8 +384,774 @@ def generate_thumbnail(video_url, time=0, width=640, height=360, quality=90,
                 except Exception as e:
                     logger.warning(f"Error removing temporary file {file_path}: {str(e)}")
 
+def build_derivative_sizes(sizes, video_width, video_height):
+    """
+    Compute (width, height) for every requested width, largest first.
+    
+    Widths larger than the source are clamped, so derivatives are never
+    upscaled. Heights keep the video aspect ratio with even values.
+    """
+    dimensions = []
+    
+    for width in sorted(set(sizes), reverse=True):
+        width = min(width, video_width)
+        height = max(2, int(round(width * video_height / video_width / 2)) * 2)
+        if (width, height) not in dimensions:
+            dimensions.append((width, height))
+    
+    return dimensions
+
+def encode_image(image, output_path, image_format, quality):
+    """Encode a PIL image as JPEG or WebP"""
+    if image_format == 'webp':
+        image.save(output_path, 'WEBP', quality=quality, method=4)
+    else:
+        image.save(output_path, 'JPEG', quality=quality)
+    return output_path
+
+def generate_thumbnail_derivatives(video_url, time=0, sizes=None, formats=None, quality=90,
+                                   job_id=None, webhook_url=None, no_cache=False):
+    """
+    Generate the same frame at several sizes and formats.
+    
+    The frame is decoded once at the largest size through a rawvideo pipe;
+    smaller derivatives are resampled in process from that buffer.
+    
+    Args:
+        video_url: URL of the video file
+        time: Timestamp in seconds or 'auto'
+        sizes: List of widths in pixels
+        formats: List of formats ('jpg', 'webp')
+        quality: Image quality (1-100)
+        job_id: Optional job ID
+        webhook_url: Optional webhook URL for notification
+        no_cache: Skip the result cache lookup
+        
+    Returns:
+        Dict with the time and a list of {width, height, format, url}
+    """
+    if not job_id:
+        job_id = str(uuid.uuid4())
+    
+    if not sizes:
+        raise ValidationError("At least one size is required")
+    
+    formats = formats or ['jpg']
+    
+    logger.info(f"Job {job_id}: Generating thumbnail derivatives {sizes} for {video_url}")
+    
+    video_path = None
+    output_paths = []
+    
+    try:
+        video_path = download_file(video_url, settings.TEMP_DIR)
+        logger.info(f"Job {job_id}: Video downloaded: {video_path}")
+        
+        fingerprint, cached_result = lookup_cached_result('generate_thumbnail_derivatives', {
+            'time': time,
+            'sizes': sorted(set(sizes)),
+            'formats': sorted(set(formats)),
+            'quality': quality
+        }, [video_path], no_cache)
+        
+        if cached_result:
+            logger.info(f"Job {job_id}: Result served from cache")
+            if webhook_url:
+                notify_job_completed(job_id, webhook_url, cached_result)
+            return cached_result
+        
+        video_info = get_media_info(video_path)
+        video_duration = float(video_info.get('duration', 0))
+        video_width = int(video_info.get('width', 0))
+        video_height = int(video_info.get('height', 0))
+        
+        if video_duration <= 0 or video_width <= 0 or video_height <= 0:
+            raise ProcessingError("Could not get video information")
+        
+        seek_args = []
+        
+        if time == 'auto':
+            time = select_auto_thumbnail_time(video_path, video_duration, video_width, video_height)
+            seek_args = ['-noaccurate_seek']
+            logger.info(f"Job {job_id}: Auto-selected thumbnail time {time}s")
+        elif time > video_duration:
+            time = video_duration / 2
+            logger.warning(f"Job {job_id}: Time adjusted to {time}s (half of video duration)")
+        
+        dimensions = build_derivative_sizes(sizes, video_width, video_height)
+        largest_width, largest_height = dimensions[0]
+        
+        command = [
+            'ffmpeg',
+            *seek_args,
+            '-ss', str(time),
+            '-i', video_path,
+            '-frames:v', '1',
+            '-vf', f"scale={largest_width}:{largest_height}",
+            '-f', 'rawvideo',
+            '-pix_fmt', 'rgb24',
+            'pipe:1'
+        ]
+        
+        buffer = run_ffmpeg_pipe(command)
+        
+        if len(buffer) < largest_width * largest_height * 3:
+            raise ProcessingError("Could not decode thumbnail frame")
+        
+        frame = Image.frombuffer('RGB', (largest_width, largest_height), buffer, 'raw', 'RGB', 0, 1)
+        
+        thumbnails = []
+        for width, height in dimensions:
+            if (width, height) == frame.size:
+                image = frame
+            else:
+                # reducing_gap downsamples with a cheap box reduce before the final filter
+                image = frame.resize((width, height), Image.Resampling.LANCZOS, reducing_gap=2.0)
+            
+            for image_format in formats:
+                output_path = generate_temp_filename(prefix=f"{job_id}_thumbnail_{width}_", suffix=f".{image_format}")
+                output_paths.append(output_path)
+                encode_image(image, output_path, image_format, quality)
+                
+                thumbnails.append({
+                    "width": width,
+                    "height": height,
+                    "format": image_format,
+                    "url": store_file(output_path)
+                })
+        
+        result = {"time": time, "thumbnails": thumbnails}
+        
+        save_cached_result(fingerprint, 'generate_thumbnail_derivatives', result)
+        logger.info(f"Job {job_id}: {len(thumbnails)} thumbnail derivatives generated and stored")
+        
+        if webhook_url:
+            notify_job_completed(job_id, webhook_url, result)
+        
+        return result
+        
+    except Exception as e:
+        logger.exception(f"Job {job_id}: Error generating thumbnail derivatives: {str(e)}")
+        
+        if webhook_url:
+            notify_job_failed(job_id, webhook_url, str(e))
+        
+        raise
+        
+    finally:
+        for file_path in [video_path] + output_paths:
+            if file_path and os.path.exists(file_path):
+                try:
+                    os.remove(file_path)
+                    logger.debug(f"Job {job_id}: Temporary file removed: {file_path}")
+                except Exception as e:
+                    logger.warning(f"Error removing temporary file {file_path}: {str(e)}")
+
+def quality_to_qscale(quality):
+    """Convert quality (0-100) to FFmpeg quality factor (2-31)"""
+    return str(min(31, 31 - (quality / 3.45)))
+
+def build_auto_thumbnail_sample_command(video_path, step, candidates, sample_width, sample_height):
+    """
+    Build the FFmpeg command that decodes evenly spaced, downscaled
+    candidate frames as raw RGB to stdout.
+    
+    Only keyframes are decoded, so sampling a long video stays fast.
+    """
+    return [
+        'ffmpeg',
+        '-skip_frame', 'nokey',
+        '-i', video_path,
+        '-an', '-sn',
+        '-vf', f"fps=1/{step},scale={sample_width}:{sample_height}",
+        '-frames:v', str(candidates),
+        '-f', 'rawvideo',
+        '-pix_fmt', 'rgb24',
+        'pipe:1'
+    ]
+
+def select_auto_thumbnail_time(video_path, duration, video_width, video_height):
+    """
+    Pick a representative thumbnail time by scoring sampled frames.
+    
+    Candidates are scored in one vectorized batch for brightness, contrast,
+    sharpness and colorfulness, so black frames and fades are skipped.
+    
+    Returns:
+        Time in seconds of the best candidate
+    """
+    candidates = settings.THUMBNAIL_AUTO_CANDIDATES
+    step = duration / candidates
+    
+    sample_width = settings.THUMBNAIL_AUTO_SAMPLE_WIDTH
+    if video_width > 0 and video_height > 0:
+        sample_height = max(2, int(round(sample_width * video_height / video_width / 2)) * 2)
+    else:
+        sample_height = int(sample_width * 9 / 16)
+    
+    command = build_auto_thumbnail_sample_command(video_path, step, candidates, sample_width, sample_height)
+    frames = frames_from_buffer(run_ffmpeg_pipe(command), sample_width, sample_height)
+    
+    best_index = select_best_frame(frames)
+    
+    if best_index is None:
+        logger.warning("No candidate frames decoded, falling back to half of video duration")
+        return round(duration / 2, 3)
+    
+    logger.debug(f"Best thumbnail candidate {best_index} of {len(frames)}")
+    return round(best_index * step, 3)
+
+def build_thumbnail_times(duration, times=None, interval=None):
+    """
+    Build the list of timestamps to extract.
+    
+    Either an explicit list of times or a sampling interval (every N seconds).
+    Timestamps beyond the video duration are dropped.
+    """
+    if interval:
+        # Cap before building the list: a tiny interval must not allocate
+        # one timestamp per step of a long video
+        count = min(int(duration // interval) + 1, settings.THUMBNAIL_MAX_FRAMES)
+        times = [round(i * interval, 3) for i in range(count) if i * interval < duration]
+    
+    valid_times = [t for t in (times or []) if 0 <= t < duration]
+    
+    if len(valid_times) < len(times or []):
+        logger.warning(f"Dropped {len(times) - len(valid_times)} timestamps beyond video duration ({duration}s)")
+    
+    return valid_times[:settings.THUMBNAIL_MAX_FRAMES]
+
+def build_batch_thumbnail_command(video_path, times, output_paths, width, height, quality, keyframes_only=False):
+    """
+    Build a single FFmpeg command extracting one frame per timestamp.
+    
+    Every timestamp is a separate input with fast input seeking, so only the
+    GOP around each timestamp is decoded. In keyframes_only mode non-key
+    frames are skipped and the frame snaps to the keyframe at or before the
+    timestamp.
+    """
+    command = ['ffmpeg', '-y']
+    
+    for time in times:
+        if keyframes_only:
+            command.extend(['-skip_frame', 'nokey', '-noaccurate_seek'])
+        command.extend(['-ss', str(time), '-i', video_path])
+    
+    for index, output_path in enumerate(output_paths):
+        command.extend([
+            '-map', f'{index}:v:0',
+            '-frames:v', '1',
+            '-vf', f"scale={width}:{height}:force_original_aspect_ratio=decrease",
+            '-q:v', quality_to_qscale(quality),
+            output_path
+        ])
+    
+    return command
+
+def generate_thumbnails(video_url, times=None, interval=None, width=640, height=360, quality=90,
+                        keyframes_only=False, job_id=None, webhook_url=None, no_cache=False):
+    """
+    Generate thumbnails at many timestamps from a single download.
+    
+    Args:
+        video_url: URL of the video file
+        times: List of timestamps in seconds
+        interval: Extract a frame every N seconds (alternative to times)
+        width: Maximum thumbnail width
+        height: Maximum thumbnail height
+        quality: JPEG quality (1-100)
+        keyframes_only: Snap each timestamp to the nearest previous keyframe
+        job_id: Optional job ID
+        webhook_url: Optional webhook URL for notification
+        no_cache: Skip the result cache lookup
+        
+    Returns:
+        List of dicts with the time and URL of every thumbnail
+    """
+    if not job_id:
+        job_id = str(uuid.uuid4())
+    
+    if not times and not interval:
+        raise ValidationError("Either times or interval is required")
+    
+    logger.info(f"Job {job_id}: Generating batch thumbnails for {video_url}")
+    
+    video_path = None
+    output_paths = []
+    
+    try:
+        video_path = download_file(video_url, settings.TEMP_DIR)
+        logger.info(f"Job {job_id}: Video downloaded: {video_path}")
+        
+        fingerprint, cached_result = lookup_cached_result('generate_thumbnails', {
+            'times': times,
+            'interval': interval,
+            'width': width,
+            'height': height,
+            'quality': quality,
+            'keyframes_only': keyframes_only
+        }, [video_path], no_cache)
+        
+        if cached_result:
+            logger.info(f"Job {job_id}: Result served from cache")
+            if webhook_url:
+                notify_job_completed(job_id, webhook_url, cached_result)
+            return cached_result
+        
+        video_info = get_media_info(video_path)
+        video_duration = float(video_info.get('duration', 0))
+        
+        if video_duration <= 0:
+            raise ProcessingError("Could not get video duration")
+        
+        thumbnail_times = build_thumbnail_times(video_duration, times, interval)
+        
+        if not thumbnail_times:
+            raise ValidationError("No valid timestamps within the video duration")
+        
+        if keyframes_only:
+            # Report the real keyframe times and skip timestamps that share a keyframe
+            thumbnail_times = get_keyframe_index(video_path).snap_times(thumbnail_times)
+        
+        output_paths = [
+            generate_temp_filename(prefix=f"{job_id}_thumbnail_{index:04d}_", suffix=".jpg")
+            for index in range(len(thumbnail_times))
+        ]
+        
+        # Limit the number of inputs opened by a single FFmpeg process
+        batch_size = settings.THUMBNAIL_BATCH_SIZE
+        for start in range(0, len(thumbnail_times), batch_size):
+            command = build_batch_thumbnail_command(
+                video_path,
+                thumbnail_times[start:start + batch_size],
+                output_paths[start:start + batch_size],
+                width, height, quality, keyframes_only
+            )
+            run_ffmpeg_command(command)
+        
+        result = []
+        for time, output_path in zip(thumbnail_times, output_paths):
+            if not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
+                raise ProcessingError(f"Could not generate thumbnail at {time}s")
+            result.append({"time": time, "url": store_file(output_path)})
+        
+        save_cached_result(fingerprint, 'generate_thumbnails', result)
+        logger.info(f"Job {job_id}: {len(result)} thumbnails generated and stored")
+        
+        if webhook_url:
+            notify_job_completed(job_id, webhook_url, result)
+        
+        return result
+        
+    except Exception as e:
+        logger.exception(f"Job {job_id}: Error generating thumbnails: {str(e)}")
+        
+        if webhook_url:
+            notify_job_failed(job_id, webhook_url, str(e))
+        
+        raise
+        
+    finally:
+        for file_path in [video_path] + output_paths:
+            if file_path and os.path.exists(file_path):
+                try:
+                    os.remove(file_path)
+                    logger.debug(f"Job {job_id}: Temporary file removed: {file_path}")
+                except Exception as e:
+                    logger.warning(f"Error removing temporary file {file_path}: {str(e)}")
+
+def build_storyboard_layout(duration, interval, columns, rows):
+    """
+    Compute the storyboard layout for a video.
+    
+    The interval is widened when the video would produce more than
+    STORYBOARD_MAX_FRAMES tiles, so long videos keep a bounded output size.
+    
+    Returns:
+        Dict with the effective interval, frame count and sheet count
+    """
+    frame_count = max(1, math.ceil(duration / interval))
+    
+    if frame_count > settings.STORYBOARD_MAX_FRAMES:
+        interval = duration / settings.STORYBOARD_MAX_FRAMES
+        frame_count = settings.STORYBOARD_MAX_FRAMES
+        logger.warning(f"Storyboard interval widened to {interval:.3f}s to stay under {frame_count} frames")
+    
+    tiles_per_sheet = columns * rows
+    
+    return {
+        "interval": interval,
+        "frame_count": frame_count,
+        "sheet_count": math.ceil(frame_count / tiles_per_sheet)
+    }
+
+def build_storyboard_command(video_path, output_pattern, interval, tile_width, tile_height,
+                             columns, rows, image_format='jpg', quality=75, keyframes_only=False):
+    """
+    Build the FFmpeg command producing every sprite sheet in one decode pass.
+    
+    Frames are sampled with fps, shrunk to the tile size and packed by the
+    tile filter, which only holds one sheet in memory at a time.
+    """
+    video_filter = (
+        f"fps=1/{interval},"
+        f"scale={tile_width}:{tile_height}:force_original_aspect_ratio=decrease,"
+        f"pad={tile_width}:{tile_height}:(ow-iw)/2:(oh-ih)/2,"
+        f"tile={columns}x{rows}"
+    )
+    
+    command = ['ffmpeg', '-y']
+    
+    if keyframes_only:
+        command.extend(['-skip_frame', 'nokey'])
+    
+    command.extend([
+        '-i', video_path,
+        '-an', '-sn',
+        '-vf', video_filter,
+        '-fps_mode', 'vfr'
+    ])
+    
+    if image_format == 'webp':
+        command.extend(['-c:v', 'libwebp', '-quality', str(quality)])
+    else:
+        command.extend(['-q:v', quality_to_qscale(quality)])
+    
+    command.append(output_pattern)
+    
+    return command
+
+def build_storyboard_vtt(duration, interval, frame_count, tile_width, tile_height, columns, rows, sheet_names):
+    """
+    Build the WebVTT thumbnail track pointing at sprite sheet regions.
+    
+    Each cue covers one sampling interval and references its tile with a
+    media fragment (sheet.jpg#xywh=x,y,w,h).
+    """
+    tiles_per_sheet = columns * rows
+    lines = ["WEBVTT", ""]
+    
+    for index in range(frame_count):
+        start = index * interval
+        end = min(duration, start + interval)
+        
+        sheet_index, tile_index = divmod(index, tiles_per_sheet)
+        row, column = divmod(tile_index, columns)
+        
+        lines.append(f"{format_timestamp(start, 'vtt')} --> {format_timestamp(end, 'vtt')}")
+        lines.append(f"{sheet_names[sheet_index]}#xywh={column * tile_width},{row * tile_height},{tile_width},{tile_height}")
+        lines.append("")
+    
+    return "\n".join(lines)
+
+def generate_storyboard(video_url, interval=10, tile_width=160, columns=10, rows=10,
+                        image_format='jpg', quality=75, keyframes_only=False,
+                        job_id=None, webhook_url=None, no_cache=False):
+    """
+    Generate storyboard sprite sheets and a WebVTT thumbnail track.
+    
+    Args:
+        video_url: URL of the video file
+        interval: Seconds between sampled frames
+        tile_width: Width of each tile (height follows the video aspect ratio)
+        columns: Tiles per row in each sheet
+        rows: Rows per sheet
+        image_format: Sprite sheet format ('jpg' or 'webp')
+        quality: Image quality (1-100)
+        keyframes_only: Only decode keyframes (faster, less precise)
+        job_id: Optional job ID
+        webhook_url: Optional webhook URL for notification
+        no_cache: Skip the result cache lookup
+        
+    Returns:
+        Dict with the VTT URL, sprite sheet URLs and layout
+    """
+    if not job_id:
+        job_id = str(uuid.uuid4())
+    
+    logger.info(f"Job {job_id}: Generating storyboard for {video_url} every {interval}s")
+    
+    video_path = None
+    sheets_dir = None
+    
+    try:
+        video_path = download_file(video_url, settings.TEMP_DIR)
+        logger.info(f"Job {job_id}: Video downloaded: {video_path}")
+        
+        fingerprint, cached_result = lookup_cached_result('generate_storyboard', {
+            'interval': interval,
+            'tile_width': tile_width,
+            'columns': columns,
+            'rows': rows,
+            'image_format': image_format,
+            'quality': quality,
+            'keyframes_only': keyframes_only
+        }, [video_path], no_cache)
+        
+        if cached_result:
+            logger.info(f"Job {job_id}: Result served from cache")
+            if webhook_url:
+                notify_job_completed(job_id, webhook_url, cached_result)
+            return cached_result
+        
+        video_info = get_media_info(video_path)
+        video_duration = float(video_info.get('duration', 0))
+        video_width = int(video_info.get('width', 0))
+        video_height = int(video_info.get('height', 0))
+        
+        if video_duration <= 0 or video_width <= 0 or video_height <= 0:
+            raise ProcessingError("Could not get video information")
+        
+        # Keep the video aspect ratio with even dimensions
+        tile_height = max(2, int(round(tile_width * video_height / video_width / 2)) * 2)
+        
+        layout = build_storyboard_layout(video_duration, interval, columns, rows)
+        
+        # The directory name is generated here: job_id comes from the client and
+        # must not choose (or overwrite) a path under TEMP_DIR or STORAGE_PATH
+        storyboard_id = uuid.uuid4().hex
+        sheets_dir = os.path.join(settings.TEMP_DIR, f"{storyboard_id}_storyboard")
+        os.makedirs(sheets_dir, exist_ok=True)
+        
+        command = build_storyboard_command(
+            video_path,
+            os.path.join(sheets_dir, f"sprite_%04d.{image_format}"),
+            layout['interval'], tile_width, tile_height, columns, rows,
+            image_format, quality, keyframes_only
+        )
+        
+        run_ffmpeg_command(command)
+        
+        sheet_files = sorted(os.listdir(sheets_dir))
+        
+        if not sheet_files:
+            raise ProcessingError("Could not generate storyboard sprite sheets")
+        
+        if len(sheet_files) < layout['sheet_count']:
+            # The last sampled frames can fall past the decodable end of the video
+            layout['sheet_count'] = len(sheet_files)
+            layout['frame_count'] = min(layout['frame_count'], len(sheet_files) * columns * rows)
+        
+        # Sheets and the VTT file share a directory so the track can reference them relatively
+        target_dir = os.path.join(settings.STORAGE_PATH, 'storyboards', storyboard_id)
+        sheet_urls = [
+            store_file(os.path.join(sheets_dir, sheet_file), target_dir=target_dir, custom_filename=sheet_file)
+            for sheet_file in sheet_files
+        ]
+        
+        vtt_content = build_storyboard_vtt(
+            video_duration, layout['interval'], layout['frame_count'],
+            tile_width, tile_height, columns, rows, sheet_files
+        )
+        
+        vtt_path = os.path.join(sheets_dir, 'storyboard.vtt')
+        with open(vtt_path, 'w', encoding='utf-8') as f:
+            f.write(vtt_content)
+        
+        result = {
+            "vtt_url": store_file(vtt_path, target_dir=target_dir, custom_filename='storyboard.vtt'),
+            "sprites": sheet_urls,
+            "interval": layout['interval'],
+            "tile_width": tile_width,
+            "tile_height": tile_height,
+            "columns": columns,
+            "rows": rows,
+            "frame_count": layout['frame_count']
+        }
+        
+        save_cached_result(fingerprint, 'generate_storyboard', result)
+        logger.info(f"Job {job_id}: Storyboard generated with {len(sheet_urls)} sheets: {result['vtt_url']}")
+        
+        if webhook_url:
+            notify_job_completed(job_id, webhook_url, result)
+        
+        return result
+        
+    except Exception as e:
+        logger.exception(f"Job {job_id}: Error generating storyboard: {str(e)}")
+        
+        if webhook_url:
+            notify_job_failed(job_id, webhook_url, str(e))
+        
+        raise
+        
+    finally:
+        if video_path and os.path.exists(video_path):
+            try:
+                os.remove(video_path)
+                logger.debug(f"Job {job_id}: Temporary file removed: {video_path}")
+            except Exception as e:
+                logger.warning(f"Error removing temporary file {video_path}: {str(e)}")
+        
+        if sheets_dir and os.path.exists(sheets_dir):
+            shutil.rmtree(sheets_dir, ignore_errors=True)
+
+def _acquire_render_lock(key):
+    with _render_locks_guard:
+        entry = _render_locks.setdefault(key, [threading.Lock(), 0])
+        entry[1] += 1
+    entry[0].acquire()
+    return entry
+
+def _release_render_lock(key, entry):
+    entry[0].release()
+    with _render_locks_guard:
+        entry[1] -= 1
+        if entry[1] == 0:
+            _render_locks.pop(key, None)
+
+# Values the on-demand thumbnail parameters are snapped to, so the number
+# of distinct renders (and cache entries) per stored file stays small
+THUMB_TIME_STEP = 1.0
+THUMB_WIDTHS = (80, 160, 320, 480, 640, 960, 1280, 1920)
+THUMB_HEIGHTS = (45, 90, 180, 270, 360, 540, 720, 1080)
+THUMB_QUALITIES = (50, 65, 80, 90)
+
+def _snap(value, choices):
+    return min(choices, key=lambda choice: (abs(choice - value), choice))
+
+def normalize_thumbnail_params(time, width, height=None, quality=80):
+    """
+    Snap on-demand thumbnail parameters to the supported steps.
+    
+    Returns:
+        Tuple (time, width, height, quality)
+    """
+    return (
+        round(time / THUMB_TIME_STEP) * THUMB_TIME_STEP,
+        _snap(width, THUMB_WIDTHS),
+        None if height is None else _snap(height, THUMB_HEIGHTS),
+        _snap(quality, THUMB_QUALITIES)
+    )
+
+def sign_thumbnail_path(relative_path, expires):
+    """
+    Signature for a public /thumb URL: HMAC-SHA256 of "<path>:<expires>"
+    keyed with API_KEY, where expires is a Unix timestamp.
+    """
+    message = f"{relative_path}:{int(expires)}".encode('utf-8')
+    return hmac.new(settings.API_KEY.encode('utf-8'), message, hashlib.sha256).hexdigest()
+
+def verify_thumbnail_signature(relative_path, expires, signature):
+    """Check a /thumb URL signature and that it has not expired."""
+    try:
+        expires = int(expires)
+    except (TypeError, ValueError):
+        return False
+    
+    if expires < time.time():
+        return False
+    
+    return hmac.compare_digest(sign_thumbnail_path(relative_path, expires), str(signature))
+
+def resolve_stored_path(relative_path):
+    """
+    Resolve a path relative to STORAGE_PATH, rejecting paths that escape it.
+    """
+    storage_root = os.path.realpath(settings.STORAGE_PATH)
+    source_path = os.path.realpath(os.path.join(storage_root, relative_path))
+    
+    if os.path.commonpath([storage_root, source_path]) != storage_root:
+        raise ValidationError("Invalid storage path")
+    
+    if not os.path.isfile(source_path):
+        raise NotFoundError(f"File not found: {relative_path}")
+    
+    return source_path
+
+def build_thumbnail_cache_key(source_path, time, width, height, quality, image_format):
+    """
+    Build the on-demand thumbnail cache key.
+    
+    The source size and modification time are part of the key, so a
+    replaced source never serves a stale thumbnail.
+    """
+    stat = os.stat(source_path)
+    payload = '|'.join(str(value) for value in [
+        os.path.relpath(source_path, os.path.realpath(settings.STORAGE_PATH)),
+        stat.st_size, stat.st_mtime_ns,
+        time, width, height, quality, image_format,
+        settings.PIPELINE_VERSION
+    ])
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def render_cached_thumbnail(relative_path, time=0, width=320, height=None, quality=80, image_format='jpg'):
+    """
+    Render a thumbnail of a stored file on demand, caching it on disk.
+    
+    Concurrent requests for the same thumbnail wait for a single render
+    instead of starting their own. The parameters are snapped with
+    normalize_thumbnail_params before rendering.
+    
+    Args:
+        relative_path: Path of the source file relative to STORAGE_PATH
+        time: Timestamp in seconds
+        width: Thumbnail width
+        height: Thumbnail height (keeps the aspect ratio if None)
+        quality: Image quality (1-100)
+        image_format: 'jpg' or 'webp'
+        
+    Returns:
+        Tuple (path of the cached thumbnail, cache key)
+    """
+    time, width, height, quality = normalize_thumbnail_params(time, width, height, quality)
+    source_path = resolve_stored_path(relative_path)
+    key = build_thumbnail_cache_key(source_path, time, width, height, quality, image_format)
+    cache_path = get_cache_path('thumbs', key, f".{image_format}")
+    
+    if os.path.exists(cache_path):
+        # Mark it as recently used for the cache eviction
+        os.utime(cache_path)
+        return cache_path, key
+    
+    entry = _acquire_render_lock(key)
+    temp_path = None
+    
+    try:
+        # Another request may have rendered it while we waited
+        if os.path.exists(cache_path):
+            return cache_path, key
+        
+        # Rendered next to the cache entry: TEMP_DIR may be another volume and
+        # os.replace cannot rename across filesystems (EXDEV). The extension
+        # stays last so FFmpeg picks the image muxer
+        temp_path = f"{cache_path}.{uuid.uuid4().hex}.tmp.{image_format}"
+        
+        command = [
+            'ffmpeg', '-y',
+            '-ss', str(time),
+            '-i', source_path,
+            '-frames:v', '1',
+            '-vf', f"scale={width}:{height or -2}"
+        ]
+        
+        if image_format == 'webp':
+            command.extend(['-c:v', 'libwebp', '-quality', str(quality)])
+        else:
+            command.extend(['-q:v', quality_to_qscale(quality)])
+        
+        command.append(temp_path)
+        run_ffmpeg_command(command)
+        
+        if not os.path.exists(temp_path) or os.path.getsize(temp_path) == 0:
+            raise ValidationError(f"No frame available at {time}s")
+        
+        os.replace(temp_path, cache_path)
+        logger.info(f"On-demand thumbnail rendered for {relative_path} at {time}s ({width}px)")
+        
+        return cache_path, key
+        
+    finally:
+        _release_render_lock(key, entry)
+        
+        if temp_path and os.path.exists(temp_path):
+            try:
+                os.remove(temp_path)
+            except Exception as e:
+                logger.warning(f"Error removing temporary file {temp_path}: {str(e)}")
+
 def process_meme_overlay(video_url, meme_url, position='bottom_right', scale=0.3, 
-                        job_id=None, webhook_url=None):
+                        job_id=None, webhook_url=None, no_cache=False, encoding_profile=None):
     """
     Add a meme overlay to a video.
     
@@ -241,6 +1165,8 @@ def process_meme_overlay(video_url, meme_url, position='bottom_right', scale=0.3
         scale: Scale factor for the overlay (0.1 to 1.0)
         job_id: Optional job ID
         webhook_url: Optional webhook URL for notification
+        no_cache: Skip the result cache lookup
+        encoding_profile: Name of the encoding profile (default profile if None)
         
     Returns:
         URL of the processed video
@@ -248,7 +1174,8 @@ def process_meme_overlay(video_url, meme_url, position='bottom_right', scale=0.3
     if not job_id:
         job_id = str(uuid.uuid4())
     
-    logger.info(f"Job {job_id}: Starting meme overlay processing for video {video_url}")
+    profile = get_encoding_profile(encoding_profile)
+    logger.info(f"Job {job_id}: Starting meme overlay processing for video {video_url} (profile {profile['name']})")
     
     video_path = None
     meme_path = None
@@ -261,6 +1188,18 @@ def process_meme_overlay(video_url, meme_url, position='bottom_right', scale=0.3
         meme_path = download_file(meme_url, settings.TEMP_DIR)
         logger.info(f"Job {job_id}: Meme downloaded: {meme_path}")
         
+        fingerprint, cached_url = lookup_cached_result('process_meme_overlay', {
+            'position': position,
+            'scale': scale,
+            'encoding_profile': profile
+        }, [video_path, meme_path], no_cache)
+        
+        if cached_url:
+            logger.info(f"Job {job_id}: Result served from cache: {cached_url}")
+            if webhook_url:
+                notify_job_completed(job_id, webhook_url, cached_url)
+            return cached_url
+        
         video_info = get_media_info(video_path)
         video_width = int(video_info.get('width', 0))
         video_height = int(video_info.get('height', 0))
@@ -273,15 +1212,18 @@ def process_meme_overlay(video_url, meme_url, position='bottom_right', scale=0.3
         # Calculate position using the helper function
         overlay_x, overlay_y = calculate_overlay_position(position, scale, video_width, video_height)
         
-        filter_complex = f"[0:v][1:v] overlay={overlay_x}:{overlay_y}:enable='between(t,0,999999)'[out]"
+        # Static memes are normalized to a cached RGBA frame; animated ones play as-is
+        prepared_path = prepare_overlay_image(meme_path)
+        filter_complex = build_overlay_filter(overlay_x, overlay_y)
         
         command = [
             'ffmpeg',
             '-i', video_path,
-            '-i', meme_path,
+            '-i', prepared_path or meme_path,
             '-filter_complex', filter_complex,
             '-map', '[out]',
             '-map', '0:a?',
+            *build_video_encoding_args(profile['name']),
             '-c:a', 'copy',
             output_path
         ]
@@ -292,6 +1234,7 @@ def process_meme_overlay(video_url, meme_url, position='bottom_right', scale=0.3
             raise ProcessingError("The meme overlay output file is not valid")
         
         result_url = store_file(output_path)
+        save_cached_result(fingerprint, 'process_meme_overlay', result_url)
         logger.info(f"Job {job_id}: Video with meme processed and stored: {result_url}")
         
         if webhook_url:
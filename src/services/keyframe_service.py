@@ -0,0 +1,274 @@
+import io
+import os
+import logging
+import threading
+import subprocess
+import numpy as np
+from collections import OrderedDict
+from ..utils.file_utils import compute_file_hash
+from ..utils.cache_utils import get_cache_path, atomic_write
+from ..config import settings
+from ..api.middlewares.error_handler import ProcessingError
+
+logger = logging.getLogger(__name__)
+
+# Versión del formato del índice en disco
+INDEX_FORMAT_VERSION = 2
+
+# Tolerancia para comparar timestamps (en segundos)
+TIME_EPSILON = 1e-6
+
+_index_cache = OrderedDict()
+_index_cache_lock = threading.Lock()
+
+class KeyframeIndex:
+    """
+    Índice de paquetes de la pista de video ordenado por tiempo de
+    presentación, con las posiciones de los keyframes.
+
+    Los datos se guardan en arrays NumPy: las búsquedas son binarias
+    (searchsorted) y el índice ocupa unos pocos bytes por paquete.
+
+    Los tiempos son relativos al start_time del contenedor, igual que los
+    valores de -ss en la entrada de FFmpeg y los rangos que pide el usuario
+    (en MPEG-TS o MP4 con edit lists el pts absoluto no empieza en 0).
+    """
+    def __init__(self, pts, pos, size, keyframe, start_time=0.0):
+        self.pts = pts
+        self.start_time = float(start_time)
+        self.pos = pos
+        self.size = size
+        self.keyframe = keyframe
+        self.keyframe_times = pts[keyframe]
+        self.keyframe_positions = pos[keyframe]
+
+    def __len__(self):
+        return len(self.pts)
+
+    @property
+    def keyframe_count(self):
+        return len(self.keyframe_times)
+
+    def _index_before(self, time):
+        index = np.searchsorted(self.keyframe_times, time + TIME_EPSILON, side='right') - 1
+        return np.maximum(index, 0)
+
+    def keyframe_before(self, time):
+        """Keyframe en o antes de `time` (el primero si no hay ninguno antes)."""
+        if not self.keyframe_count:
+            return None
+        return float(self.keyframe_times[self._index_before(time)])
+
+    def keyframe_after(self, time):
+        """Keyframe en o después de `time`, o None si no hay ninguno."""
+        index = np.searchsorted(self.keyframe_times, time - TIME_EPSILON, side='left')
+        if index >= self.keyframe_count:
+            return None
+        return float(self.keyframe_times[index])
+
+    def nearest_keyframe(self, time):
+        before = self.keyframe_before(time)
+        after = self.keyframe_after(time)
+        if before is None or after is None:
+            return before if after is None else after
+        return before if time - before <= after - time else after
+
+    def keyframes_between(self, start, end):
+        """Keyframes con start <= t < end."""
+        first = np.searchsorted(self.keyframe_times, start - TIME_EPSILON, side='left')
+        last = np.searchsorted(self.keyframe_times, end - TIME_EPSILON, side='left')
+        return [float(value) for value in self.keyframe_times[first:last]]
+
+    def frames_between(self, start, end):
+        """Número de paquetes (frames) con start <= t < end."""
+        first = np.searchsorted(self.pts, start - TIME_EPSILON, side='left')
+        last = np.searchsorted(self.pts, end - TIME_EPSILON, side='left')
+        return int(last - first)
+
+    def byte_offset(self, time):
+        """Posición en bytes del keyframe en o antes de `time` (-1 si se desconoce)."""
+        if not self.keyframe_count:
+            return -1
+        return int(self.keyframe_positions[self._index_before(time)])
+
+    def snap_times(self, times):
+        """
+        Ajusta cada timestamp al keyframe en o antes de él, eliminando
+        duplicados y conservando el orden.
+        """
+        if not self.keyframe_count:
+            return list(times)
+
+        snapped = self.keyframe_times[self._index_before(np.asarray(times, dtype=np.float64))]
+        result = []
+        for value in snapped:
+            value = round(float(value), 6)
+            if value not in result:
+                result.append(value)
+        return result
+
+    def summary(self):
+        return {
+            'packet_count': len(self),
+            'keyframe_count': self.keyframe_count,
+            'keyframe_times': [round(float(value), 6) for value in self.keyframe_times]
+        }
+
+    def to_bytes(self):
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, pts=self.pts, pos=self.pos, size=self.size, keyframe=self.keyframe,
+                            start_time=np.float64(self.start_time))
+        return buffer.getvalue()
+
+    @classmethod
+    def from_file(cls, path):
+        with np.load(path) as data:
+            return cls(data['pts'], data['pos'], data['size'], data['keyframe'], float(data['start_time']))
+
+def build_packet_probe_command(video_path):
+    """
+    Comando FFprobe que lista los paquetes de la primera pista de video sin
+    decodificarlos, y el start_time del contenedor.
+    """
+    return [
+        'ffprobe',
+        '-v', 'error',
+        '-select_streams', 'v:0',
+        '-show_entries', 'packet=pts_time,dts_time,size,pos,flags:format=start_time',
+        '-of', 'compact=p=0',
+        video_path
+    ]
+
+def _parse_number(value, cast, default):
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        return default
+
+def parse_packet_output(output):
+    """
+    Convierte la salida `compact` de FFprobe en un KeyframeIndex.
+
+    Args:
+        output: Texto con una línea `clave=valor|...` por paquete y una
+            línea `start_time=...` del contenedor
+
+    Returns:
+        KeyframeIndex ordenado por tiempo de presentación, con los tiempos
+        relativos al start_time
+    """
+    start_time = 0.0
+    pts = []
+    pos = []
+    size = []
+    keyframe = []
+
+    for line in output.splitlines():
+        if '=' not in line:
+            continue
+
+        fields = dict(item.split('=', 1) for item in line.strip().split('|') if '=' in item)
+
+        if 'start_time' in fields and 'pts_time' not in fields:
+            start_time = _parse_number(fields['start_time'], float, 0.0)
+            continue
+
+        # Sin pts (algunos contenedores) se usa el dts
+        time = _parse_number(fields.get('pts_time'), float, None)
+        if time is None:
+            time = _parse_number(fields.get('dts_time'), float, None)
+        if time is None:
+            continue
+
+        pts.append(time)
+        pos.append(_parse_number(fields.get('pos'), int, -1))
+        size.append(_parse_number(fields.get('size'), int, 0))
+        keyframe.append('K' in fields.get('flags', ''))
+
+    # Los paquetes llegan en orden de decodificación; se ordenan por presentación
+    order = np.argsort(np.asarray(pts, dtype=np.float64), kind='stable')
+
+    return KeyframeIndex(
+        np.asarray(pts, dtype=np.float64)[order] - start_time,
+        np.asarray(pos, dtype=np.int64)[order],
+        np.asarray(size, dtype=np.int32)[order],
+        np.asarray(keyframe, dtype=bool)[order],
+        start_time
+    )
+
+def build_keyframe_index(video_path):
+    """
+    Lee los paquetes de la pista de video con FFprobe y construye el índice.
+
+    Raises:
+        ProcessingError: Si FFprobe falla
+    """
+    command = build_packet_probe_command(video_path)
+    logger.debug(f"Ejecutando comando FFprobe: {' '.join(command)}")
+
+    try:
+        process = subprocess.run(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            check=False
+        )
+    except OSError as e:
+        raise ProcessingError(f"Error ejecutando FFprobe: {str(e)}")
+
+    if process.returncode != 0:
+        logger.error(f"Error FFprobe (código {process.returncode}): {process.stderr}")
+        raise ProcessingError(f"Error FFprobe: {process.stderr.strip().splitlines()[-1] if process.stderr.strip() else 'Desconocido'}")
+
+    return parse_packet_output(process.stdout)
+
+def get_keyframe_index(video_path, file_hash=None):
+    """
+    Devuelve el índice de keyframes de un archivo.
+
+    El índice se guarda en disco (CACHE_DIR/keyframes) indexado por el hash
+    del contenido, de modo que lo reutilizan los trabajos siguientes del
+    mismo contenedor, y se mantienen en memoria los KEYFRAME_INDEX_CACHE_SIZE
+    más recientes. El servicio de limpieza poda la caché en disco
+    (KEYFRAME_CACHE_MAX_AGE / KEYFRAME_CACHE_MAX_SIZE).
+
+    Args:
+        video_path: Ruta del archivo de video
+        file_hash: Hash del contenido si ya se calculó (evita releer el archivo)
+
+    Returns:
+        KeyframeIndex
+    """
+    key = f"{file_hash or compute_file_hash(video_path)}-v{INDEX_FORMAT_VERSION}"
+
+    with _index_cache_lock:
+        index = _index_cache.get(key)
+        if index is not None:
+            _index_cache.move_to_end(key)
+            return index
+
+    cache_path = get_cache_path('keyframes', key, '.npz')
+
+    if os.path.exists(cache_path):
+        try:
+            index = KeyframeIndex.from_file(cache_path)
+            # Marca la entrada como usada para la poda por antigüedad
+            os.utime(cache_path)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Índice de keyframes inválido {cache_path}: {str(e)}")
+
+    if index is None:
+        index = build_keyframe_index(video_path)
+        try:
+            atomic_write(cache_path, index.to_bytes())
+        except OSError as e:
+            logger.warning(f"No se pudo guardar el índice de keyframes: {str(e)}")
+        logger.info(f"Índice de keyframes construido: {len(index)} paquetes, {index.keyframe_count} keyframes")
+
+    with _index_cache_lock:
+        _index_cache[key] = index
+        while len(_index_cache) > settings.KEYFRAME_INDEX_CACHE_SIZE:
+            _index_cache.popitem(last=False)
+
+    return index
@@ -0,0 +1,497 @@
+import os
+import re
+import json
+import math
+import hashlib
+import logging
+import uuid
+from collections import Counter
+from ..utils.file_utils import download_file, generate_temp_filename, verify_file_integrity, compute_file_hash
+from ..utils.cache_utils import get_cache_path, read_json_cache, write_json_cache
+from .ffmpeg_service import (run_ffmpeg_command, get_media_info, get_encoding_profile,
+                             build_video_encoding_args, build_audio_encoding_args)
+from .storage_service import store_file
+from .webhook_service import notify_job_completed, notify_job_failed
+from .cache_service import lookup_cached_result, save_cached_result
+from ..config import settings
+from ..api.middlewares.error_handler import ProcessingError, ValidationError
+
+logger = logging.getLogger(__name__)
+
+# Versión del formato de las mediciones guardadas en CACHE_DIR/measurements
+MEASUREMENT_FORMAT_VERSION = 1
+
+# Objetivos EBU R128 por defecto y límites que acepta el filtro loudnorm
+DEFAULT_LOUDNORM_PARAMS = {
+    'integrated': -23.0,
+    'true_peak': -1.0,
+    'lra': 7.0
+}
+
+LOUDNORM_LIMITS = {
+    'integrated': (-70.0, -5.0),
+    'true_peak': (-9.0, 0.0),
+    'lra': (1.0, 20.0)
+}
+
+# Campos de la salida JSON de la primera pasada de loudnorm
+LOUDNORM_MEASUREMENT_FIELDS = {
+    'input_i': 'measured_I',
+    'input_tp': 'measured_TP',
+    'input_lra': 'measured_LRA',
+    'input_thresh': 'measured_thresh',
+    'target_offset': 'offset'
+}
+
+# Umbral de negro de cropdetect (0-255) y múltiplo al que se redondea el recorte
+DEFAULT_CROPDETECT_PARAMS = {
+    'limit': 24,
+    'round': 2
+}
+
+CROP_PATTERN = re.compile(r'crop=(\d+):(\d+):(\d+):(\d+)')
+
+def build_measurement_key(file_hash, filter_name, params):
+    """Clave de una medición: hash del archivo, filtro y parámetros normalizados."""
+    payload = json.dumps({
+        'file': file_hash,
+        'filter': filter_name,
+        'params': params,
+        'version': MEASUREMENT_FORMAT_VERSION
+    }, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def get_measurement(media_path, filter_name, params, measure, refresh=False, file_hash=None):
+    """
+    Devuelve la medición de la primera pasada de un filtro de dos pasadas.
+    
+    Las mediciones se guardan en disco (CACHE_DIR/measurements) indexadas por
+    el hash del contenido, el filtro y sus parámetros, de modo que otros
+    trabajos sobre el mismo archivo pasan directamente al render.
+    
+    Args:
+        media_path: Ruta del archivo
+        filter_name: Nombre del filtro (loudnorm, cropdetect...)
+        params: Parámetros que afectan a la medición
+        measure: Función (media_path, params) -> dict que hace la primera pasada
+        refresh: Ignorar la medición guardada y volver a medir
+        file_hash: Hash del archivo si el llamador ya lo calculó
+    
+    Returns:
+        Tupla (medición, True si venía de la caché)
+    """
+    key = build_measurement_key(file_hash or compute_file_hash(media_path), filter_name, params)
+    
+    if not refresh:
+        entry = read_json_cache('measurements', key)
+        if entry and entry.get('filter') == filter_name and 'measurement' in entry:
+            logger.debug(f"Medición {filter_name} servida desde caché: {key}")
+            # Marca la entrada como usada para la poda (MEASUREMENT_CACHE_MAX_AGE)
+            os.utime(get_cache_path('measurements', key))
+            return entry['measurement'], True
+    
+    measurement = measure(media_path, params)
+    
+    try:
+        write_json_cache('measurements', key, {
+            'filter': filter_name,
+            'params': params,
+            'measurement': measurement
+        })
+    except OSError as e:
+        logger.warning(f"No se pudo guardar la medición {filter_name}: {str(e)}")
+    
+    return measurement, False
+
+def normalize_loudnorm_params(integrated=None, true_peak=None, lra=None):
+    """
+    Completa los objetivos de loudnorm con los valores por defecto.
+    
+    Raises:
+        ValidationError: Si algún objetivo está fuera de los límites del filtro
+    """
+    values = {'integrated': integrated, 'true_peak': true_peak, 'lra': lra}
+    params = {}
+    
+    for name, value in values.items():
+        value = DEFAULT_LOUDNORM_PARAMS[name] if value is None else float(value)
+        low, high = LOUDNORM_LIMITS[name]
+        
+        if not low <= value <= high:
+            raise ValidationError(f"{name} debe estar entre {low} y {high}")
+        
+        params[name] = value
+    
+    return params
+
+def build_loudnorm_filter(params, measurement=None):
+    """
+    Filtro loudnorm de la primera pasada (sin `measurement`, imprime las
+    mediciones en JSON) o de la segunda, lineal con los valores medidos.
+    """
+    options = [f"I={params['integrated']}", f"TP={params['true_peak']}", f"LRA={params['lra']}"]
+    
+    if measurement is None:
+        options.append('print_format=json')
+    else:
+        options.extend(f"{option}={measurement[field]}" for field, option in LOUDNORM_MEASUREMENT_FIELDS.items())
+        options.extend(['linear=true', 'print_format=summary'])
+    
+    return 'loudnorm=' + ':'.join(options)
+
+def build_loudnorm_measure_command(media_path, params):
+    """Comando FFmpeg de la primera pasada: solo decodifica el audio y lo mide."""
+    return [
+        'ffmpeg',
+        '-hide_banner',
+        '-nostats',
+        '-i', media_path,
+        '-map', '0:a:0',
+        '-vn', '-sn', '-dn',
+        '-af', build_loudnorm_filter(params),
+        '-f', 'null',
+        '-'
+    ]
+
+def parse_loudnorm_output(stderr):
+    """
+    Extrae las mediciones del bloque JSON que loudnorm escribe en stderr.
+    
+    Raises:
+        ProcessingError: Si no hay mediciones o el audio es silencio
+    """
+    blocks = re.findall(r'\{[^{}]*\}', stderr or '')
+    
+    if not blocks:
+        raise ProcessingError("loudnorm no devolvió mediciones")
+    
+    try:
+        data = json.loads(blocks[-1])
+        measurement = {field: float(data[field]) for field in LOUDNORM_MEASUREMENT_FIELDS}
+    except (ValueError, KeyError) as e:
+        raise ProcessingError(f"Mediciones de loudnorm inválidas: {str(e)}")
+    
+    if not all(math.isfinite(value) for value in measurement.values()):
+        raise ProcessingError("El audio es silencio, no se puede normalizar")
+    
+    return measurement
+
+def measure_loudness(media_path, params):
+    """Primera pasada de loudnorm; devuelve input_i, input_tp, input_lra, input_thresh y target_offset."""
+    result = run_ffmpeg_command(build_loudnorm_measure_command(media_path, params))
+    return parse_loudnorm_output(result.get('stderr'))
+
+def build_loudnorm_render_command(media_path, output_path, params, measurement, sample_rate=None,
+                                  has_video=True, profile_name=None):
+    """
+    Comando FFmpeg de la segunda pasada: aplica loudnorm lineal con las
+    mediciones y copia el video sin recodificar.
+    """
+    command = [
+        'ffmpeg',
+        '-y',
+        '-i', media_path
+    ]
+    
+    if has_video:
+        command.extend(['-map', '0:v:0', '-c:v', 'copy'])
+    
+    command.extend([
+        '-map', '0:a:0',
+        '-af', build_loudnorm_filter(params, measurement),
+        *build_audio_encoding_args(profile_name)
+    ])
+    
+    # loudnorm remuestrea internamente a 192 kHz; se vuelve a la frecuencia original
+    if sample_rate:
+        command.extend(['-ar', str(sample_rate)])
+    
+    command.extend(['-movflags', '+faststart', output_path])
+    return command
+
+def normalize_loudness(media_url, integrated=None, true_peak=None, lra=None, job_id=None,
+                       webhook_url=None, no_cache=False, encoding_profile=None):
+    """
+    Normaliza la sonoridad de un audio o video según EBU R128 (loudnorm en
+    dos pasadas).
+    
+    La medición de la primera pasada se guarda por archivo y objetivos, así
+    que los trabajos siguientes sobre la misma fuente solo hacen el render.
+    
+    Args:
+        media_url: URL del audio o video
+        integrated: Sonoridad integrada objetivo en LUFS (por defecto -23)
+        true_peak: Pico real máximo en dBTP (por defecto -1)
+        lra: Rango de sonoridad objetivo en LU (por defecto 7)
+        job_id: ID del trabajo (opcional)
+        webhook_url: URL para notificar cuando se complete (opcional)
+        no_cache: Omitir la caché de resultados y volver a medir
+        encoding_profile: Nombre del perfil de codificación (por defecto si es None)
+    
+    Returns:
+        Dict con la URL del resultado, los objetivos, la medición y si la
+        medición venía de la caché
+    """
+    if not job_id:
+        job_id = str(uuid.uuid4())
+    
+    params = normalize_loudnorm_params(integrated, true_peak, lra)
+    profile = get_encoding_profile(encoding_profile)
+    logger.info(f"Job {job_id}: Iniciando normalización de sonoridad de {media_url}")
+    
+    media_path = None
+    output_path = None
+    
+    try:
+        media_path = download_file(media_url, settings.TEMP_DIR)
+        logger.info(f"Job {job_id}: Archivo descargado: {media_path}")
+        
+        # El hash se calcula una vez para la caché de resultados y la de mediciones
+        file_hash = compute_file_hash(media_path)
+        
+        fingerprint, cached_result = lookup_cached_result('normalize_loudness', {
+            **params,
+            'encoding_profile': profile
+        }, [media_path], no_cache, input_hashes=[file_hash])
+        
+        if cached_result:
+            logger.info(f"Job {job_id}: Resultado servido desde caché")
+            if webhook_url:
+                notify_job_completed(job_id, webhook_url, cached_result)
+            return cached_result
+        
+        media_info = get_media_info(media_path)
+        
+        if 'audio_codec' not in media_info:
+            raise ValidationError("El archivo no contiene una pista de audio")
+        
+        has_video = 'video_codec' in media_info
+        
+        measurement, measurement_cached = get_measurement(
+            media_path, 'loudnorm', params, measure_loudness, refresh=no_cache, file_hash=file_hash
+        )
+        logger.info(f"Job {job_id}: Sonoridad medida {measurement['input_i']} LUFS"
+                    f"{' (desde caché)' if measurement_cached else ''}")
+        
+        output_path = generate_temp_filename(prefix=f"{job_id}_loudnorm_", suffix=".mp4" if has_video else ".m4a")
+        run_ffmpeg_command(build_loudnorm_render_command(
+            media_path, output_path, params, measurement,
+            sample_rate=media_info.get('sample_rate'), has_video=has_video, profile_name=profile['name']
+        ))
+        
+        if not verify_file_integrity(output_path):
+            raise ProcessingError("El archivo normalizado no es válido")
+        
+        result = {
+            "url": store_file(output_path),
+            "target": params,
+            "measurement": measurement,
+            "measurement_cached": measurement_cached
+        }
+        
+        save_cached_result(fingerprint, 'normalize_loudness', result)
+        logger.info(f"Job {job_id}: Sonoridad normalizada a {params['integrated']} LUFS")
+        
+        if webhook_url:
+            notify_job_completed(job_id, webhook_url, result)
+        
+        return result
+    
+    except Exception as e:
+        logger.exception(f"Job {job_id}: Error normalizando sonoridad: {str(e)}")
+        
+        if webhook_url:
+            notify_job_failed(job_id, webhook_url, str(e))
+        
+        raise
+    
+    finally:
+        for file_path in [media_path, output_path]:
+            if file_path and os.path.exists(file_path):
+                try:
+                    os.remove(file_path)
+                    logger.debug(f"Job {job_id}: Archivo temporal eliminado: {file_path}")
+                except Exception as e:
+                    logger.warning(f"Error eliminando archivo temporal {file_path}: {str(e)}")
+
+def build_cropdetect_command(video_path, params):
+    """
+    Comando FFmpeg de la primera pasada de cropdetect. Solo se decodifican
+    los keyframes, suficientes para detectar bandas negras fijas.
+    """
+    return [
+        'ffmpeg',
+        '-hide_banner',
+        '-nostats',
+        '-skip_frame', 'nokey',
+        '-i', video_path,
+        '-map', '0:v:0',
+        '-an', '-sn', '-dn',
+        '-vf', f"cropdetect=limit={params['limit']}:round={params['round']}:reset=1:skip=0",
+        '-f', 'null',
+        '-'
+    ]
+
+def parse_cropdetect_output(stderr):
+    """
+    Devuelve el recorte (w, h, x, y) detectado en más frames; con empate, el
+    de mayor área para no recortar contenido.
+    
+    Raises:
+        ProcessingError: Si cropdetect no devolvió ningún recorte
+    """
+    counts = Counter(tuple(int(value) for value in match) for match in CROP_PATTERN.findall(stderr or ''))
+    
+    if not counts:
+        raise ProcessingError("cropdetect no devolvió ningún recorte")
+    
+    return max(counts, key=lambda crop: (counts[crop], crop[0] * crop[1]))
+
+def measure_crop(video_path, params):
+    """Primera pasada de cropdetect; devuelve el recorte y el número de frames analizados."""
+    result = run_ffmpeg_command(build_cropdetect_command(video_path, params))
+    stderr = result.get('stderr')
+    width, height, x, y = parse_cropdetect_output(stderr)
+    
+    return {
+        'width': width,
+        'height': height,
+        'x': x,
+        'y': y,
+        'frames': len(CROP_PATTERN.findall(stderr))
+    }
+
+def build_crop_render_command(video_path, output_path, crop=None, profile_name=None):
+    """
+    Comando FFmpeg de la segunda pasada: recorta y recodifica el video
+    copiando el audio. Sin `crop` (no hay bandas) solo se remultiplexa.
+    """
+    command = [
+        'ffmpeg',
+        '-y',
+        '-i', video_path,
+        '-map', '0:v:0',
+        '-map', '0:a?'
+    ]
+    
+    if crop:
+        command.extend([
+            '-vf', f"crop={crop['width']}:{crop['height']}:{crop['x']}:{crop['y']}",
+            *build_video_encoding_args(profile_name),
+            '-c:a', 'copy'
+        ])
+    else:
+        command.extend(['-c', 'copy'])
+    
+    command.extend(['-movflags', '+faststart', output_path])
+    return command
+
+def auto_crop_video(video_url, limit=None, job_id=None, webhook_url=None, no_cache=False, encoding_profile=None):
+    """
+    Elimina las bandas negras de un video (cropdetect en dos pasadas).
+    
+    La medición de la primera pasada se guarda por archivo y umbral, así que
+    los trabajos siguientes sobre la misma fuente solo hacen el render.
+    
+    Args:
+        video_url: URL del video
+        limit: Umbral de negro de cropdetect, 0-255 (por defecto 24)
+        job_id: ID del trabajo (opcional)
+        webhook_url: URL para notificar cuando se complete (opcional)
+        no_cache: Omitir la caché de resultados y volver a medir
+        encoding_profile: Nombre del perfil de codificación (por defecto si es None)
+    
+    Returns:
+        Dict con la URL del resultado, el recorte aplicado, si se recortó y
+        si la medición venía de la caché
+    """
+    if not job_id:
+        job_id = str(uuid.uuid4())
+    
+    params = {
+        **DEFAULT_CROPDETECT_PARAMS,
+        'limit': DEFAULT_CROPDETECT_PARAMS['limit'] if limit is None else int(limit)
+    }
+    
+    if not 0 <= params['limit'] <= 255:
+        raise ValidationError("limit debe estar entre 0 y 255")
+    
+    profile = get_encoding_profile(encoding_profile)
+    logger.info(f"Job {job_id}: Iniciando recorte automático de {video_url}")
+    
+    video_path = None
+    output_path = None
+    
+    try:
+        video_path = download_file(video_url, settings.TEMP_DIR)
+        logger.info(f"Job {job_id}: Video descargado: {video_path}")
+        
+        file_hash = compute_file_hash(video_path)
+        
+        fingerprint, cached_result = lookup_cached_result('auto_crop_video', {
+            **params,
+            'encoding_profile': profile
+        }, [video_path], no_cache, input_hashes=[file_hash])
+        
+        if cached_result:
+            logger.info(f"Job {job_id}: Resultado servido desde caché")
+            if webhook_url:
+                notify_job_completed(job_id, webhook_url, cached_result)
+            return cached_result
+        
+        media_info = get_media_info(video_path)
+        
+        if 'video_codec' not in media_info:
+            raise ValidationError("El archivo no contiene una pista de video")
+        
+        crop, measurement_cached = get_measurement(
+            video_path, 'cropdetect', params, measure_crop, refresh=no_cache, file_hash=file_hash
+        )
+        # cropdetect ve los frames ya autorrotados: se compara con las
+        # dimensiones de visualización, no con las codificadas
+        frame_size = (media_info.get('width'), media_info.get('height'))
+        if media_info.get('rotation', 0) % 180 == 90:
+            frame_size = frame_size[::-1]
+        cropped = (crop['width'], crop['height']) != frame_size
+        logger.info(f"Job {job_id}: Recorte detectado {crop['width']}x{crop['height']}+{crop['x']}+{crop['y']}"
+                    f"{' (desde caché)' if measurement_cached else ''}")
+        
+        output_path = generate_temp_filename(prefix=f"{job_id}_autocrop_", suffix=".mp4")
+        run_ffmpeg_command(build_crop_render_command(
+            video_path, output_path, crop if cropped else None, profile_name=profile['name']
+        ))
+        
+        if not verify_file_integrity(output_path):
+            raise ProcessingError("El video recortado no es válido")
+        
+        result = {
+            "url": store_file(output_path),
+            "crop": {key: crop[key] for key in ('width', 'height', 'x', 'y')},
+            "cropped": cropped,
+            "measurement_cached": measurement_cached
+        }
+        
+        save_cached_result(fingerprint, 'auto_crop_video', result)
+        logger.info(f"Job {job_id}: Recorte automático completado")
+        
+        if webhook_url:
+            notify_job_completed(job_id, webhook_url, result)
+        
+        return result
+    
+    except Exception as e:
+        logger.exception(f"Job {job_id}: Error en el recorte automático: {str(e)}")
+        
+        if webhook_url:
+            notify_job_failed(job_id, webhook_url, str(e))
+        
+        raise
+    
+    finally:
+        for file_path in [video_path, output_path]:
+            if file_path and os.path.exists(file_path):
+                try:
+                    os.remove(file_path)
+                    logger.debug(f"Job {job_id}: Archivo temporal eliminado: {file_path}")
+                except Exception as e:
+                    logger.warning(f"Error eliminando archivo temporal {file_path}: {str(e)}")
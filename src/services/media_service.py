@@ -6,12 +6,78 @@ from ..utils.file_utils import download_file, generate_temp_filename, verify_fil
 from ..services.ffmpeg_service import run_ffmpeg_command, get_media_info
 from ..services.storage_service import store_file
 from ..services.webhook_service import notify_job_completed, notify_job_failed
+from ..services.cache_service import lookup_cached_result, save_cached_result
+from ..services.capability_service import select_encoder
 from ..config import settings
 from ..api.middlewares.error_handler import ProcessingError
 
 logger = logging.getLogger(__name__)
 
-def extract_audio(media_url: str, bitrate: str = '192k', format: str = 'mp3', job_id: str = None, webhook_url: str = None) -> str:
+# Codecs de origen que pueden copiarse directamente a cada formato de salida
+STREAM_COPY_CODECS = {
+    'mp3': {'mp3'},
+    'aac': {'aac'},
+    'flac': {'flac'},
+    'wav': {'pcm_s16le'}
+}
+
+LOSSLESS_FORMATS = {'wav', 'flac'}
+
+def parse_bitrate(bitrate: str) -> int:
+    """Convierte un bitrate como '192k' a bits por segundo."""
+    value = str(bitrate).strip().lower()
+    if value.endswith('k'):
+        return int(float(value[:-1]) * 1000)
+    if value.endswith('m'):
+        return int(float(value[:-1]) * 1000000)
+    return int(value)
+
+def can_stream_copy_audio(media_info: dict, format: str, bitrate: str) -> bool:
+    """
+    Indica si el audio de origen puede copiarse sin recodificar.
+    
+    El codec debe coincidir con el formato pedido y, para formatos con
+    pérdida, el bitrate de origen no debe superar el solicitado (recodificar
+    a un bitrate mayor no mejora la calidad).
+    """
+    codec = media_info.get('audio_codec')
+    
+    if codec not in STREAM_COPY_CODECS.get(format, set()):
+        return False
+    
+    if format in LOSSLESS_FORMATS:
+        return True
+    
+    source_bitrate = media_info.get('audio_bit_rate', 0)
+    
+    # Margen del 5% para bitrates medios de fuentes VBR
+    return 0 < source_bitrate <= parse_bitrate(bitrate) * 1.05
+
+def get_audio_codec_args(format: str, bitrate: str = None) -> list:
+    """
+    Argumentos de codec de audio para un formato de salida.
+    
+    Con bitrate se codifica a tasa constante (-b:a); el mp3 sin bitrate usa
+    VBR (-q:a 2). Nunca se pasan ambos: -q:a anularía el bitrate pedido.
+    """
+    if format == 'mp3':
+        args = ['-codec:a', select_encoder('mp3')]
+        if not bitrate:
+            return args + ['-q:a', '2']
+    elif format == 'wav':
+        args = ['-codec:a', 'pcm_s16le']
+    elif format == 'aac':
+        args = ['-codec:a', select_encoder('aac')]
+    elif format == 'flac':
+        args = ['-codec:a', select_encoder('flac')]
+    else:
+        args = []
+    
+    if bitrate:
+        args.extend(['-b:a', bitrate])
+    return args
+
+def extract_audio(media_url: str, bitrate: str = '192k', format: str = 'mp3', job_id: str = None, webhook_url: str = None, no_cache: bool = False) -> str:
     if not job_id:
         job_id = str(uuid.uuid4())
     
@@ -24,36 +90,58 @@ def extract_audio(media_url: str, bitrate: str = '192k', format: str = 'mp3', jo
         media_path = download_file(media_url, settings.TEMP_DIR)
         logger.info(f"Job {job_id}: Archivo multimedia descargado: {media_path}")
         
+        fingerprint, cached_url = lookup_cached_result('extract_audio', {
+            'bitrate': bitrate,
+            'format': format
+        }, [media_path], no_cache)
+        
+        if cached_url:
+            logger.info(f"Job {job_id}: Resultado obtenido de caché: {cached_url}")
+            if webhook_url:
+                notify_job_completed(job_id, webhook_url, cached_url)
+            return cached_url
+        
         media_info = get_media_info(media_path)
         logger.debug(f"Job {job_id}: Información multimedia: {media_info}")
         
         output_path = generate_temp_filename(prefix=f"{job_id}_audio_", suffix=f".{format}")
         
-        command = [
-            'ffmpeg',
-            '-i', media_path,
-            '-vn',
-            '-b:a', bitrate
-        ]
-        
-        if format == 'mp3':
-            command.extend(['-codec:a', 'libmp3lame', '-q:a', '2'])
-        elif format == 'wav':
-            command.extend(['-codec:a', 'pcm_s16le'])
-        elif format == 'aac':
-            command.extend(['-codec:a', 'aac']) 
-        elif format == 'flac':
-            command.extend(['-codec:a', 'flac'])
+        copied = False
         
-        command.append(output_path)
+        if can_stream_copy_audio(media_info, format, bitrate):
+            logger.info(f"Job {job_id}: Audio {media_info.get('audio_codec')} compatible con {format}, copiando sin recodificar")
+            try:
+                run_ffmpeg_command([
+                    'ffmpeg',
+                    '-i', media_path,
+                    '-map', '0:a:0',
+                    '-vn',
+                    '-c:a', 'copy',
+                    output_path
+                ])
+                copied = verify_file_integrity(output_path)
+            except ProcessingError as e:
+                logger.warning(f"Job {job_id}: Copia directa de audio fallida, recodificando: {str(e)}")
         
-        run_ffmpeg_command(command)
+        if not copied:
+            command = [
+                'ffmpeg',
+                '-y',
+                '-i', media_path,
+                '-vn'
+            ]
+            
+            command.extend(get_audio_codec_args(format, bitrate))
+            command.append(output_path)
+            
+            run_ffmpeg_command(command)
         
         if not verify_file_integrity(output_path):
             logger.error(f"Job {job_id}: El archivo de audio extraído no es válido o no se creó: {output_path}")
             raise ProcessingError("El archivo de audio extraído no es válido")
         
         result_url = store_file(output_path)
+        save_cached_result(fingerprint, 'extract_audio', result_url)
         logger.info(f"Job {job_id}: Audio extraído y almacenado: {result_url}")
         
         if webhook_url:
@@ -78,54 +166,103 @@ def extract_audio(media_url: str, bitrate: str = '192k', format: str = 'mp3', jo
                 except Exception as e:
                     logger.warning(f"Job {job_id}: Error eliminando archivo temporal {file_path}: {str(e)}")
 
-def transcribe_media(media_url: str, language: str = 'auto', output_format: str = 'txt', job_id: str = None, webhook_url: str = None) -> dict:
+def _output_keys(outputs: list) -> list:
+    """Clave de cada salida: el formato, o formato_bitrate si el formato se repite."""
+    formats = [output['format'] for output in outputs]
+    return [
+        output['format'] if formats.count(output['format']) == 1 else f"{output['format']}_{output['bitrate']}"
+        for output in outputs
+    ]
+
+def extract_audio_formats(media_url: str, outputs: list, job_id: str = None, webhook_url: str = None, no_cache: bool = False) -> dict:
+    """
+    Extrae el audio en varios formatos con una sola invocación de FFmpeg.
+    
+    El archivo se descarga y se decodifica una sola vez; cada formato es una
+    salida distinta del mismo comando (copiando el stream cuando es posible).
+    
+    Args:
+        media_url: URL del archivo multimedia
+        outputs: Lista de dicts con 'format' y 'bitrate' opcional (los
+            duplicados se extraen una sola vez)
+        job_id: ID del trabajo (opcional)
+        webhook_url: URL para notificación por webhook (opcional)
+        no_cache: Omitir la caché de resultados
+        
+    Returns:
+        Dict con la URL de cada salida
+    """
     if not job_id:
         job_id = str(uuid.uuid4())
     
-    logger.info(f"Job {job_id}: Iniciando transcripción desde {media_url}")
+    outputs = [
+        {'format': output.get('format', 'mp3'), 'bitrate': output.get('bitrate', '192k')}
+        for output in outputs
+    ]
+    # Salidas iguales tras aplicar los valores por defecto se extraen una vez
+    # (si no, compartirían clave y una sobrescribiría a la otra)
+    outputs = [output for i, output in enumerate(outputs) if output not in outputs[:i]]
+    keys = _output_keys(outputs)
+    
+    logger.info(f"Job {job_id}: Iniciando extracción de audio en {len(outputs)} formatos desde {media_url}")
     
     media_path = None
-    audio_path = None
+    output_paths = []
     
     try:
         media_path = download_file(media_url, settings.TEMP_DIR)
         logger.info(f"Job {job_id}: Archivo multimedia descargado: {media_path}")
         
-        audio_path = generate_temp_filename(prefix=f"{job_id}_audio_transcribe_", suffix=".wav")
+        fingerprint, cached_result = lookup_cached_result('extract_audio_formats', {
+            'outputs': outputs
+        }, [media_path], no_cache)
+        
+        if cached_result:
+            logger.info(f"Job {job_id}: Resultado obtenido de caché")
+            if webhook_url:
+                notify_job_completed(job_id, webhook_url, cached_result)
+            return cached_result
+        
+        media_info = get_media_info(media_path)
         
-        command = [
-            'ffmpeg',
-            '-i', media_path,
-            '-vn',
-            '-ar', '16000',
-            '-ac', '1',
-            '-c:a', 'pcm_s16le',
-            audio_path
+        output_paths = [
+            generate_temp_filename(prefix=f"{job_id}_audio_{key}_", suffix=f".{output['format']}")
+            for key, output in zip(keys, outputs)
         ]
         
-        run_ffmpeg_command(command)
-
-        if not verify_file_integrity(audio_path):
-            logger.error(f"Job {job_id}: El archivo de audio para transcripción no es válido o no se creó: {audio_path}")
-            raise ProcessingError("El archivo de audio para transcripción no es válido")
+        def build_command(allow_copy):
+            command = ['ffmpeg', '-y', '-i', media_path]
+            for output, output_path in zip(outputs, output_paths):
+                command.extend(['-map', '0:a:0', '-vn'])
+                if allow_copy and can_stream_copy_audio(media_info, output['format'], output['bitrate']):
+                    command.extend(['-c:a', 'copy'])
+                else:
+                    command.extend(get_audio_codec_args(output['format'], output['bitrate']))
+                command.append(output_path)
+            return command
+        
+        try:
+            run_ffmpeg_command(build_command(allow_copy=True))
+        except ProcessingError as e:
+            logger.warning(f"Job {job_id}: Extracción con copia directa fallida, recodificando todo: {str(e)}")
+            run_ffmpeg_command(build_command(allow_copy=False))
         
-        result = {
-            "message": "La transcripción requiere integración con Whisper u otro servicio de ASR",
-            "audio_prepared_path": audio_path,
-            "requested_format": output_format,
-            "language": language,
-            "job_id": job_id
-        }
+        result = {}
+        for key, output_path in zip(keys, output_paths):
+            if not verify_file_integrity(output_path):
+                raise ProcessingError(f"El archivo de audio extraído ({key}) no es válido")
+            result[key] = store_file(output_path)
         
-        logger.info(f"Job {job_id}: Transcripción completada (simulada)")
+        save_cached_result(fingerprint, 'extract_audio_formats', result)
+        logger.info(f"Job {job_id}: Audio extraído en {len(result)} formatos")
         
         if webhook_url:
-            notify_job_completed(job_id, webhook_url, str(result))
+            notify_job_completed(job_id, webhook_url, result)
         
         return result
         
     except Exception as e:
-        logger.exception(f"Job {job_id}: Error transcribiendo media: {str(e)}")
+        logger.exception(f"Job {job_id}: Error extrayendo audio en varios formatos: {str(e)}")
         
         if webhook_url:
             notify_job_failed(job_id, webhook_url, str(e))
@@ -133,10 +270,56 @@ def transcribe_media(media_url: str, language: str = 'auto', output_format: str
         raise
         
     finally:
-        for file_path in [media_path, audio_path]:
+        for file_path in [media_path] + output_paths:
             if file_path and os.path.exists(file_path):
                 try:
                     os.remove(file_path)
                     logger.debug(f"Job {job_id}: Archivo temporal eliminado: {file_path}")
                 except Exception as e:
                     logger.warning(f"Job {job_id}: Error eliminando archivo temporal {file_path}: {str(e)}")
+
+def transcribe_media(media_url: str, language: str = 'auto', output_format: str = 'txt', job_id: str = None, webhook_url: str = None, no_cache: bool = False) -> dict:
+    """
+    Transcribe el audio de un archivo multimedia con el backend ASR
+    configurado (ver transcription_service.transcribe_file).
+    
+    Returns:
+        Dict con la URL de la transcripción, el formato, el idioma, la
+        duración, el número de fragmentos y de palabras
+    """
+    from .transcription_service import transcribe_file
+    
+    if not job_id:
+        job_id = str(uuid.uuid4())
+    
+    logger.info(f"Job {job_id}: Iniciando transcripción desde {media_url}")
+    
+    media_path = None
+    
+    try:
+        media_path = download_file(media_url, settings.TEMP_DIR)
+        logger.info(f"Job {job_id}: Archivo multimedia descargado: {media_path}")
+        
+        result = transcribe_file(media_path, language, output_format, job_id, no_cache)
+        logger.info(f"Job {job_id}: Transcripción completada: {result['url']}")
+        
+        if webhook_url:
+            notify_job_completed(job_id, webhook_url, result)
+        
+        return result
+        
+    except Exception as e:
+        logger.exception(f"Job {job_id}: Error transcribiendo media: {str(e)}")
+        
+        if webhook_url:
+            notify_job_failed(job_id, webhook_url, str(e))
+        
+        raise
+        
+    finally:
+        if media_path and os.path.exists(media_path):
+            try:
+                os.remove(media_path)
+                logger.debug(f"Job {job_id}: Archivo temporal eliminado: {media_path}")
+            except Exception as e:
+                logger.warning(f"Job {job_id}: Error eliminando archivo temporal {media_path}: {str(e)}")
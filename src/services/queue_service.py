@@ -52,7 +52,7 @@ def _get_task_registry():
     """
     # Importar servicios bajo demanda
     from src.services.video_service import add_captions_to_video, process_meme_overlay, concatenate_videos_service, add_audio_to_video
-    from src.services.media_service import extract_audio, transcribe_media
+    from src.services.media_service import extract_audio, extract_audio_formats, transcribe_media
     from src.services.animation_service import animated_text_service
     
     # Construir el registro de tareas
@@ -61,6 +61,7 @@ def _get_task_registry():
         'process_meme_overlay': process_meme_overlay,
         'concatenate_videos': concatenate_videos_service,
         'extract_audio': extract_audio,
+        'extract_audio_formats': extract_audio_formats,
         'transcribe_media': transcribe_media,
         'animated_text': animated_text_service,
         'add_audio_to_video': add_audio_to_video
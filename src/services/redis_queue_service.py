@@ -89,6 +89,7 @@ def enqueue_task(task_func_name: str, job_id: str = None, **kwargs) -> Dict[str,
             "created_at": time.time(),
             "task_func": task_func_name,
             "kwargs": kwargs,
+            "encoding_profile": kwargs.get("encoding_profile"),
             "updated_at": time.time()
         }
         
@@ -201,6 +202,36 @@ def update_task_status(job_id: str, status: str, result=None, error=None) -> boo
             # Reintento de la operación
             return update_task_status(job_id, status, result, error)
 
+def update_task_progress(job_id: str, progress: Dict[str, Any]) -> bool:
+    """
+    Guarda el progreso parcial de una tarea sin cambiar su estado.
+    
+    Args:
+        job_id: ID del trabajo
+        progress: Dict con el progreso (por ejemplo, resultados parciales)
+        
+    Returns:
+        Bool indicando si la actualización fue exitosa (False si la tarea no existe)
+    """
+    try:
+        client = _ensure_redis_connection()
+        
+        task_key = f"{TASK_INFO_PREFIX}{job_id}"
+        task_data_str = client.get(task_key)
+        
+        if not task_data_str:
+            return False
+        
+        task_data = json.loads(task_data_str)
+        task_data["progress"] = progress
+        task_data["updated_at"] = time.time()
+        
+        client.set(task_key, json.dumps(task_data))
+        return True
+    except RedisError as e:
+        logger.error(f"Error de Redis durante actualización de progreso: {str(e)}")
+        return False
+
 def fetch_pending_task() -> Optional[Dict[str, Any]]:
     """
     Obtiene y elimina una tarea pendiente de la cola.
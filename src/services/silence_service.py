@@ -0,0 +1,290 @@
+import os
+import time
+import logging
+import uuid
+import numpy as np
+from ..utils.file_utils import download_file, generate_temp_filename, verify_file_integrity
+from .ffmpeg_service import (run_ffmpeg_command, get_media_info, get_encoding_profile,
+                             build_video_encoding_args, build_audio_encoding_args)
+from .storage_service import store_file
+from .webhook_service import notify_job_completed, notify_job_failed
+from .cache_service import lookup_cached_result, save_cached_result
+from ..config import settings
+from ..api.middlewares.error_handler import ProcessingError, ValidationError
+
+logger = logging.getLogger(__name__)
+
+# Audio de análisis: 16 kHz mono PCM de 16 bits (igual que transcribe_media)
+ANALYSIS_SAMPLE_RATE = 16000
+
+# Ventanas de análisis en milisegundos
+ANALYSIS_WINDOW_MS = 30
+
+# Ventanas procesadas por bloque (acota la memoria con archivos largos)
+ANALYSIS_BLOCK_WINDOWS = 65536
+
+DEFAULT_SILENCE_PARAMS = {
+    'threshold_db': -40.0,
+    'min_silence': 0.5,
+    'padding': 0.1
+}
+
+def build_pcm_command(media_path, pcm_path, sample_rate=ANALYSIS_SAMPLE_RATE):
+    """
+    Comando FFmpeg que decodifica la primera pista de audio a PCM s16le mono
+    sin cabecera, listo para leerse con np.memmap.
+    """
+    return [
+        'ffmpeg',
+        '-y',
+        '-i', media_path,
+        '-map', '0:a:0',
+        '-vn', '-sn', '-dn',
+        '-ac', '1',
+        '-ar', str(sample_rate),
+        '-c:a', 'pcm_s16le',
+        '-f', 's16le',
+        pcm_path
+    ]
+
+def load_pcm(pcm_path):
+    """Abre un archivo PCM s16le como array de solo lectura mapeado en memoria."""
+    if os.path.getsize(pcm_path) < 2:
+        return np.zeros(0, dtype='<i2')
+    return np.memmap(pcm_path, dtype='<i2', mode='r')
+
+def compute_window_energy(samples, sample_rate=ANALYSIS_SAMPLE_RATE, window_ms=ANALYSIS_WINDOW_MS):
+    """
+    Calcula el nivel RMS en dBFS de cada ventana del audio.
+    
+    Las ventanas se procesan por bloques en float32, de modo que la memoria
+    no depende de la duración del archivo.
+    
+    Args:
+        samples: Array int16 (puede ser un np.memmap)
+        sample_rate: Frecuencia de muestreo
+        window_ms: Duración de cada ventana en milisegundos
+    
+    Returns:
+        Array float32 con el nivel de cada ventana
+    """
+    window = max(int(sample_rate * window_ms / 1000), 1)
+    count = len(samples) // window
+    levels = np.empty(count, dtype=np.float32)
+    
+    for first in range(0, count, ANALYSIS_BLOCK_WINDOWS):
+        last = min(first + ANALYSIS_BLOCK_WINDOWS, count)
+        block = np.asarray(samples[first * window:last * window], dtype=np.float32).reshape(-1, window)
+        block *= 1.0 / 32768.0
+        mean_square = np.einsum('ij,ij->i', block, block) / window
+        levels[first:last] = 10.0 * np.log10(mean_square + 1e-10)
+    
+    return levels
+
+def find_runs(mask):
+    """Devuelve los índices (inicio, fin exclusivo) de cada tramo True."""
+    padded = np.concatenate(([False], mask, [False]))
+    changes = np.flatnonzero(padded[1:] != padded[:-1])
+    return changes[0::2], changes[1::2]
+
+def detect_keep_ranges(levels, window_seconds, duration, threshold_db=-40.0, min_silence=0.5, padding=0.1):
+    """
+    Calcula los rangos con voz que se conservan.
+    
+    Los silencios más cortos que `min_silence` se mantienen (pausas
+    naturales) y cada rango se amplía `padding` segundos por ambos lados
+    para no cortar el inicio ni el final de las palabras.
+    
+    Args:
+        levels: Nivel en dBFS de cada ventana
+        window_seconds: Duración de una ventana en segundos
+        duration: Duración total en segundos
+        threshold_db: Nivel por debajo del cual una ventana es silencio
+        min_silence: Duración mínima del silencio que se elimina
+        padding: Margen alrededor de cada rango conservado
+    
+    Returns:
+        Lista de tuplas (inicio, fin) en segundos, ordenadas y sin solapes
+    """
+    starts, ends = find_runs(levels > threshold_db)
+    
+    if not len(starts):
+        return []
+    
+    starts = starts * window_seconds
+    ends = ends * window_seconds
+    
+    # Une los tramos separados por silencios cortos
+    long_gaps = np.flatnonzero(starts[1:] - ends[:-1] >= min_silence)
+    starts = np.concatenate(([starts[0]], starts[1:][long_gaps]))
+    ends = np.concatenate((ends[:-1][long_gaps], [ends[-1]]))
+    
+    starts = np.maximum(starts - padding, 0.0)
+    ends = np.minimum(ends + padding, duration) if duration > 0 else ends + padding
+    
+    ranges = []
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        if ranges and start <= ranges[-1][1]:
+            ranges[-1] = (ranges[-1][0], max(ranges[-1][1], end))
+        else:
+            ranges.append((start, end))
+    
+    return [(round(start, 3), round(end, 3)) for start, end in ranges if end > start]
+
+def build_select_expression(ranges):
+    return '+'.join(f"between(t,{start:.3f},{end:.3f})" for start, end in ranges)
+
+def build_jump_cut_command(media_path, ranges, output_path, has_video=True, profile_name=None):
+    """
+    Comando FFmpeg que conserva solo `ranges` en una pasada, con select y
+    aselect, y regenera los timestamps para que los cortes queden unidos.
+    """
+    expression = build_select_expression(ranges)
+    graphs = []
+    maps = []
+    
+    if has_video:
+        graphs.append(f"[0:v:0]select='{expression}',setpts=N/FRAME_RATE/TB[v]")
+        maps.extend(['-map', '[v]', *build_video_encoding_args(profile_name)])
+    
+    graphs.append(f"[0:a:0]aselect='{expression}',asetpts=N/SR/TB[a]")
+    maps.extend(['-map', '[a]', *build_audio_encoding_args(profile_name)])
+    
+    command = [
+        'ffmpeg',
+        '-y',
+        '-i', media_path,
+        '-filter_complex', ';'.join(graphs),
+        *maps
+    ]
+    
+    if has_video:
+        command.extend(['-movflags', '+faststart'])
+    
+    command.append(output_path)
+    return command
+
+def remove_silence(media_url, threshold_db=None, min_silence=None, padding=None, job_id=None,
+                   webhook_url=None, no_cache=False, encoding_profile=None):
+    """
+    Elimina las pausas de un video o audio (jump cuts).
+    
+    El audio se decodifica una vez a PCM 16 kHz mono, el nivel RMS de cada
+    ventana se calcula con NumPy sobre el archivo mapeado en memoria y los
+    rangos con voz se renderizan en una sola pasada de FFmpeg.
+    
+    Args:
+        media_url: URL del video o audio
+        threshold_db: Nivel en dBFS por debajo del cual hay silencio
+        min_silence: Duración mínima (segundos) de los silencios que se eliminan
+        padding: Margen (segundos) que se conserva alrededor de la voz
+        job_id: ID del trabajo (opcional)
+        webhook_url: URL para notificar cuando se complete (opcional)
+        no_cache: Omitir la consulta a la caché de resultados
+        encoding_profile: Nombre del perfil de codificación (por defecto si es None)
+    
+    Returns:
+        Dict con la URL del resultado, las duraciones original y final, los
+        rangos conservados y la velocidad del análisis respecto a tiempo real
+    """
+    if not job_id:
+        job_id = str(uuid.uuid4())
+    
+    params = {
+        'threshold_db': DEFAULT_SILENCE_PARAMS['threshold_db'] if threshold_db is None else float(threshold_db),
+        'min_silence': DEFAULT_SILENCE_PARAMS['min_silence'] if min_silence is None else float(min_silence),
+        'padding': DEFAULT_SILENCE_PARAMS['padding'] if padding is None else float(padding)
+    }
+    
+    if params['min_silence'] <= 0 or params['padding'] < 0:
+        raise ValidationError("min_silence debe ser positivo y padding no puede ser negativo")
+    
+    profile = get_encoding_profile(encoding_profile)
+    logger.info(f"Job {job_id}: Iniciando eliminación de silencios de {media_url}")
+    
+    media_path = None
+    pcm_path = None
+    output_path = None
+    
+    try:
+        media_path = download_file(media_url, settings.TEMP_DIR)
+        logger.info(f"Job {job_id}: Archivo descargado: {media_path}")
+        
+        fingerprint, cached_result = lookup_cached_result('remove_silence', {
+            **params,
+            'encoding_profile': profile
+        }, [media_path], no_cache)
+        
+        if cached_result:
+            logger.info(f"Job {job_id}: Resultado servido desde caché")
+            if webhook_url:
+                notify_job_completed(job_id, webhook_url, cached_result)
+            return cached_result
+        
+        media_info = get_media_info(media_path)
+        
+        if 'audio_codec' not in media_info:
+            raise ValidationError("El archivo no contiene una pista de audio")
+        
+        has_video = 'video_codec' in media_info
+        
+        pcm_path = generate_temp_filename(prefix=f"{job_id}_silence_", suffix=".pcm")
+        run_ffmpeg_command(build_pcm_command(media_path, pcm_path))
+        
+        started = time.monotonic()
+        samples = load_pcm(pcm_path)
+        audio_duration = len(samples) / ANALYSIS_SAMPLE_RATE
+        duration = media_info.get('duration') or audio_duration
+        
+        levels = compute_window_energy(samples)
+        ranges = detect_keep_ranges(levels, ANALYSIS_WINDOW_MS / 1000, duration, **params)
+        analysis_time = time.monotonic() - started
+        del samples
+        
+        if not ranges:
+            raise ProcessingError("No se detectó voz por encima del umbral")
+        
+        output_path = generate_temp_filename(prefix=f"{job_id}_jumpcut_", suffix=".mp4" if has_video else ".m4a")
+        run_ffmpeg_command(build_jump_cut_command(
+            media_path, ranges, output_path, has_video=has_video, profile_name=profile['name']
+        ))
+        
+        if not verify_file_integrity(output_path):
+            raise ProcessingError("El archivo sin silencios no es válido")
+        
+        kept = sum(end - start for start, end in ranges)
+        
+        result = {
+            "url": store_file(output_path),
+            "original_duration": round(duration, 3),
+            "duration": round(kept, 3),
+            "removed_duration": round(max(duration - kept, 0.0), 3),
+            "ranges": [[start, end] for start, end in ranges],
+            "realtime_factor": round(audio_duration / analysis_time, 1) if analysis_time > 0 else None
+        }
+        
+        save_cached_result(fingerprint, 'remove_silence', result)
+        logger.info(f"Job {job_id}: {len(ranges)} rangos conservados, {result['removed_duration']}s eliminados "
+                    f"(análisis {result['realtime_factor']}x tiempo real)")
+        
+        if webhook_url:
+            notify_job_completed(job_id, webhook_url, result)
+        
+        return result
+    
+    except Exception as e:
+        logger.exception(f"Job {job_id}: Error eliminando silencios: {str(e)}")
+        
+        if webhook_url:
+            notify_job_failed(job_id, webhook_url, str(e))
+        
+        raise
+    
+    finally:
+        for file_path in [media_path, pcm_path, output_path]:
+            if file_path and os.path.exists(file_path):
+                try:
+                    os.remove(file_path)
+                    logger.debug(f"Job {job_id}: Archivo temporal eliminado: {file_path}")
+                except Exception as e:
+                    logger.warning(f"Error eliminando archivo temporal {file_path}: {str(e)}")
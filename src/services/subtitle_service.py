@@ -0,0 +1,531 @@
+import re
+import copy
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from ..utils.cache_utils import read_json_cache, write_json_cache
+from ..config import settings
+from ..api.middlewares.error_handler import ValidationError
+
+logger = logging.getLogger(__name__)
+
+# Versión del formato de los subtítulos analizados guardados en caché
+PARSER_VERSION = 1
+
+SUBTITLE_FORMATS = ('srt', 'vtt', 'ass')
+
+# Resolución de referencia de libass cuando el script no define PlayRes
+DEFAULT_PLAY_RES = (384, 288)
+
+# Campos de estilo ASS (V4+) en el orden de la línea Format
+ASS_STYLE_FIELDS = [
+    'Name', 'Fontname', 'Fontsize', 'PrimaryColour', 'SecondaryColour', 'OutlineColour',
+    'BackColour', 'Bold', 'Italic', 'Underline', 'StrikeOut', 'ScaleX', 'ScaleY',
+    'Spacing', 'Angle', 'BorderStyle', 'Outline', 'Shadow', 'Alignment',
+    'MarginL', 'MarginR', 'MarginV', 'Encoding'
+]
+
+DEFAULT_ASS_STYLE = {
+    'Name': 'Default',
+    'Fontname': 'Arial',
+    'Fontsize': '16',
+    'PrimaryColour': '&H00FFFFFF',
+    'SecondaryColour': '&H000000FF',
+    'OutlineColour': '&H00000000',
+    'BackColour': '&H80000000',
+    'Bold': '0',
+    'Italic': '0',
+    'Underline': '0',
+    'StrikeOut': '0',
+    'ScaleX': '100',
+    'ScaleY': '100',
+    'Spacing': '0',
+    'Angle': '0',
+    'BorderStyle': '1',
+    'Outline': '1',
+    'Shadow': '0',
+    'Alignment': '2',
+    'MarginL': '10',
+    'MarginR': '10',
+    'MarginV': '10',
+    'Encoding': '1'
+}
+
+ASS_EVENT_FIELDS = ['Layer', 'Start', 'End', 'Style', 'Name', 'MarginL', 'MarginR', 'MarginV', 'Effect', 'Text']
+
+# Alineación ASS (teclado numérico) por posición
+ASS_ALIGNMENTS = {
+    'bottom': 2,
+    'center': 5,
+    'top': 8
+}
+
+# Tabla de colores de FFmpeg (libavutil/parseutils.c); los nombres no distinguen
+# mayúsculas. 'grey' se mantiene como alias de 'gray'.
+NAMED_COLORS = {
+    'aliceblue': 'F0F8FF', 'antiquewhite': 'FAEBD7', 'aqua': '00FFFF', 'aquamarine': '7FFFD4',
+    'azure': 'F0FFFF', 'beige': 'F5F5DC', 'bisque': 'FFE4C4', 'black': '000000', 'blanchedalmond': 'FFEBCD',
+    'blue': '0000FF', 'blueviolet': '8A2BE2', 'brown': 'A52A2A', 'burlywood': 'DEB887', 'cadetblue': '5F9EA0',
+    'chartreuse': '7FFF00', 'chocolate': 'D2691E', 'coral': 'FF7F50', 'cornflowerblue': '6495ED',
+    'cornsilk': 'FFF8DC', 'crimson': 'DC143C', 'cyan': '00FFFF', 'darkblue': '00008B', 'darkcyan': '008B8B',
+    'darkgoldenrod': 'B8860B', 'darkgray': 'A9A9A9', 'darkgreen': '006400', 'darkkhaki': 'BDB76B',
+    'darkmagenta': '8B008B', 'darkolivegreen': '556B2F', 'darkorange': 'FF8C00', 'darkorchid': '9932CC',
+    'darkred': '8B0000', 'darksalmon': 'E9967A', 'darkseagreen': '8FBC8F', 'darkslateblue': '483D8B',
+    'darkslategray': '2F4F4F', 'darkturquoise': '00CED1', 'darkviolet': '9400D3', 'deeppink': 'FF1493',
+    'deepskyblue': '00BFFF', 'dimgray': '696969', 'dodgerblue': '1E90FF', 'firebrick': 'B22222',
+    'floralwhite': 'FFFAF0', 'forestgreen': '228B22', 'fuchsia': 'FF00FF', 'gainsboro': 'DCDCDC',
+    'ghostwhite': 'F8F8FF', 'gold': 'FFD700', 'goldenrod': 'DAA520', 'gray': '808080', 'green': '008000',
+    'greenyellow': 'ADFF2F', 'honeydew': 'F0FFF0', 'hotpink': 'FF69B4', 'indianred': 'CD5C5C',
+    'indigo': '4B0082', 'ivory': 'FFFFF0', 'khaki': 'F0E68C', 'lavender': 'E6E6FA', 'lavenderblush': 'FFF0F5',
+    'lawngreen': '7CFC00', 'lemonchiffon': 'FFFACD', 'lightblue': 'ADD8E6', 'lightcoral': 'F08080',
+    'lightcyan': 'E0FFFF', 'lightgoldenrodyellow': 'FAFAD2', 'lightgreen': '90EE90', 'lightgrey': 'D3D3D3',
+    'lightpink': 'FFB6C1', 'lightsalmon': 'FFA07A', 'lightseagreen': '20B2AA', 'lightskyblue': '87CEFA',
+    'lightslategray': '778899', 'lightsteelblue': 'B0C4DE', 'lightyellow': 'FFFFE0', 'lime': '00FF00',
+    'limegreen': '32CD32', 'linen': 'FAF0E6', 'magenta': 'FF00FF', 'maroon': '800000',
+    'mediumaquamarine': '66CDAA', 'mediumblue': '0000CD', 'mediumorchid': 'BA55D3', 'mediumpurple': '9370D8',
+    'mediumseagreen': '3CB371', 'mediumslateblue': '7B68EE', 'mediumspringgreen': '00FA9A',
+    'mediumturquoise': '48D1CC', 'mediumvioletred': 'C71585', 'midnightblue': '191970', 'mintcream': 'F5FFFA',
+    'mistyrose': 'FFE4E1', 'moccasin': 'FFE4B5', 'navajowhite': 'FFDEAD', 'navy': '000080',
+    'oldlace': 'FDF5E6', 'olive': '808000', 'olivedrab': '6B8E23', 'orange': 'FFA500', 'orangered': 'FF4500',
+    'orchid': 'DA70D6', 'palegoldenrod': 'EEE8AA', 'palegreen': '98FB98', 'paleturquoise': 'AFEEEE',
+    'palevioletred': 'D87093', 'papayawhip': 'FFEFD5', 'peachpuff': 'FFDAB9', 'peru': 'CD853F',
+    'pink': 'FFC0CB', 'plum': 'DDA0DD', 'powderblue': 'B0E0E6', 'purple': '800080', 'red': 'FF0000',
+    'rosybrown': 'BC8F8F', 'royalblue': '4169E1', 'saddlebrown': '8B4513', 'salmon': 'FA8072',
+    'sandybrown': 'F4A460', 'seagreen': '2E8B57', 'seashell': 'FFF5EE', 'sienna': 'A0522D',
+    'silver': 'C0C0C0', 'skyblue': '87CEEB', 'slateblue': '6A5ACD', 'slategray': '708090', 'snow': 'FFFAFA',
+    'springgreen': '00FF7F', 'steelblue': '4682B4', 'tan': 'D2B48C', 'teal': '008080', 'thistle': 'D8BFD8',
+    'tomato': 'FF6347', 'turquoise': '40E0D0', 'violet': 'EE82EE', 'wheat': 'F5DEB3', 'white': 'FFFFFF',
+    'whitesmoke': 'F5F5F5', 'yellow': 'FFFF00', 'yellowgreen': '9ACD32', 'grey': '808080'
+}
+
+TIMESTAMP_PATTERN = re.compile(r'(?:(\d+):)?(\d{1,2}):(\d{1,2})(?:[.,](\d{1,3}))?')
+CUE_TIMING_PATTERN = re.compile(r'^\s*(\S+)\s*-->\s*(\S+)')
+ASS_TAG_PATTERN = re.compile(r'\{[^}]*\}')
+HTML_TAG_PATTERN = re.compile(r'</?([a-zA-Z]+)[^>]*>')
+
+_parsed_cache = OrderedDict()
+_parsed_cache_lock = threading.Lock()
+
+def parse_timestamp(value):
+    """
+    Convierte un timestamp SRT (00:00:01,500), VTT (00:01.500) o ASS
+    (0:00:01.50) a segundos.
+    """
+    match = TIMESTAMP_PATTERN.fullmatch(value.strip())
+    if not match:
+        raise ValidationError(f"Timestamp de subtítulo inválido: {value}")
+    
+    hours, minutes, seconds, fraction = match.groups()
+    fraction = fraction or '0'
+    
+    return (
+        int(hours or 0) * 3600 +
+        int(minutes) * 60 +
+        int(seconds) +
+        int(fraction) / (10 ** len(fraction))
+    )
+
+def format_timestamp(seconds, subtitle_format='srt'):
+    """
+    Formatea segundos como timestamp SRT (HH:MM:SS,mmm), VTT
+    (HH:MM:SS.mmm) o ASS (H:MM:SS.cc).
+    """
+    if subtitle_format == 'ass':
+        centiseconds = int(round(max(0, seconds) * 100))
+        hours, centiseconds = divmod(centiseconds, 360000)
+        minutes, centiseconds = divmod(centiseconds, 6000)
+        secs, centiseconds = divmod(centiseconds, 100)
+        return f"{hours}:{minutes:02d}:{secs:02d}.{centiseconds:02d}"
+    
+    milliseconds = int(round(max(0, seconds) * 1000))
+    hours, milliseconds = divmod(milliseconds, 3600000)
+    minutes, milliseconds = divmod(milliseconds, 60000)
+    secs, milliseconds = divmod(milliseconds, 1000)
+    separator = ',' if subtitle_format == 'srt' else '.'
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}{separator}{milliseconds:03d}"
+
+def parse_color_alpha(value):
+    """
+    Convierte el sufijo @alpha de FFmpeg (0.0-1.0 o 0xXX, opacidad) en el
+    byte de transparencia de ASS (0 opaco, 255 transparente).
+    """
+    try:
+        opacity = int(value, 16) / 255 if value.lower().startswith('0x') else float(value)
+    except ValueError:
+        raise ValidationError(f"Transparencia de color inválida: {value}")
+    
+    if not 0 <= opacity <= 1:
+        raise ValidationError(f"La transparencia debe estar entre 0 y 1: {value}")
+    
+    return 255 - int(round(opacity * 255))
+
+def to_ass_color(color, alpha=0):
+    """
+    Convierte un color al formato ASS &HAABBGGRR.
+    
+    Acepta la sintaxis de colores de FFmpeg (nombre de la tabla de FFmpeg,
+    '#RRGGBB', '0xRRGGBB' o 'RRGGBB', opcionalmente con AA de opacidad y
+    un sufijo '@alpha') y colores ASS '&HAABBGGRR'.
+    
+    Args:
+        color: Color de entrada
+        alpha: Transparencia (0 opaco, 255 transparente) si el color no la indica
+    """
+    value = str(color).strip()
+    
+    if value.upper().startswith('&H'):
+        return value.upper()
+    
+    value, _, alpha_suffix = value.partition('@')
+    
+    if alpha_suffix:
+        alpha = parse_color_alpha(alpha_suffix)
+    
+    if value.lower().startswith('0x'):
+        value = value[2:]
+    
+    value = NAMED_COLORS.get(value.lower(), value.lstrip('#'))
+    
+    if not re.fullmatch(r'[0-9a-fA-F]{6}([0-9a-fA-F]{2})?', value):
+        raise ValidationError(f"Color inválido: {color}")
+    
+    if len(value) == 8 and not alpha_suffix:
+        alpha = 255 - int(value[6:8], 16)
+    
+    red, green, blue = value[0:2], value[2:4], value[4:6]
+    return f"&H{alpha:02X}{blue}{green}{red}".upper()
+
+def new_document(cues=None, styles=None, script_info=None):
+    return {
+        'cues': cues or [],
+        'styles': styles or [],
+        'script_info': script_info or {}
+    }
+
+def detect_subtitle_format(content):
+    """Detecta el formato de un texto de subtítulos por su contenido."""
+    head = content.lstrip('\ufeff').lstrip()[:200]
+    
+    if head.startswith('WEBVTT'):
+        return 'vtt'
+    if '[Script Info]' in head or head.startswith('[V4'):
+        return 'ass'
+    return 'srt'
+
+def _split_blocks(content):
+    normalized = content.lstrip('\ufeff').replace('\r\n', '\n').replace('\r', '\n')
+    return [block for block in re.split(r'\n\s*\n', normalized) if block.strip()]
+
+def _parse_cue_blocks(blocks):
+    cues = []
+    
+    for block in blocks:
+        lines = block.strip('\n').split('\n')
+        
+        timing_index = next((i for i, line in enumerate(lines) if '-->' in line), None)
+        if timing_index is None:
+            continue
+        
+        match = CUE_TIMING_PATTERN.match(lines[timing_index])
+        if not match:
+            continue
+        
+        cues.append({
+            'start': parse_timestamp(match.group(1)),
+            'end': parse_timestamp(match.group(2)),
+            'text': '\n'.join(lines[timing_index + 1:]).strip()
+        })
+    
+    return cues
+
+def parse_srt(content):
+    return new_document(_parse_cue_blocks(_split_blocks(content)))
+
+def parse_vtt(content):
+    blocks = _split_blocks(content)
+    
+    # Se omiten la cabecera y los bloques NOTE, STYLE y REGION
+    cue_blocks = [
+        block for block in blocks[1:]
+        if not block.lstrip().startswith(('NOTE', 'STYLE', 'REGION'))
+    ]
+    
+    return new_document(_parse_cue_blocks(cue_blocks))
+
+def parse_ass(content):
+    script_info = {}
+    styles = []
+    cues = []
+    section = None
+    style_format = ASS_STYLE_FIELDS
+    event_format = ASS_EVENT_FIELDS
+    
+    for raw_line in content.lstrip('\ufeff').splitlines():
+        line = raw_line.strip()
+        
+        if not line or line.startswith(';'):
+            continue
+        
+        if line.startswith('[') and line.endswith(']'):
+            section = line[1:-1].lower()
+            continue
+        
+        key, _, value = line.partition(':')
+        key = key.strip()
+        value = value.strip()
+        
+        if section == 'script info':
+            script_info[key] = value
+        elif section in ('v4+ styles', 'v4 styles'):
+            if key == 'Format':
+                style_format = [field.strip() for field in value.split(',')]
+            elif key == 'Style':
+                values = [field.strip() for field in value.split(',', len(style_format) - 1)]
+                styles.append(dict(zip(style_format, values)))
+        elif section == 'events':
+            if key == 'Format':
+                event_format = [field.strip() for field in value.split(',')]
+            elif key == 'Dialogue':
+                event = dict(zip(event_format, value.split(',', len(event_format) - 1)))
+                cues.append({
+                    'start': parse_timestamp(event.get('Start', '0:00:00.00')),
+                    'end': parse_timestamp(event.get('End', '0:00:00.00')),
+                    'text': event.get('Text', '').replace('\\N', '\n').replace('\\n', '\n'),
+                    'style': event.get('Style', 'Default').strip()
+                })
+    
+    return new_document(cues, styles, script_info)
+
+PARSERS = {
+    'srt': parse_srt,
+    'vtt': parse_vtt,
+    'ass': parse_ass
+}
+
+def _content_key(content):
+    return hashlib.sha256(f"{PARSER_VERSION}|{content}".encode('utf-8')).hexdigest()
+
+def parse_subtitles(content, subtitle_format=None):
+    """
+    Analiza un texto de subtítulos SRT, VTT o ASS.
+    
+    Los resultados se guardan en memoria y en disco indexados por el hash
+    del contenido, de modo que cada archivo solo se analiza una vez.
+    
+    Args:
+        content: Texto de los subtítulos
+        subtitle_format: 'srt', 'vtt' o 'ass' (se detecta si es None)
+    
+    Returns:
+        Documento con 'cues' (start, end, text[, style]), 'styles' y
+        'script_info'. Es una copia que el llamador puede modificar.
+    """
+    subtitle_format = subtitle_format or detect_subtitle_format(content)
+    
+    if subtitle_format not in PARSERS:
+        raise ValidationError(f"Formato de subtítulos no soportado: {subtitle_format}")
+    
+    key = f"{subtitle_format}_{_content_key(content)}"
+    
+    with _parsed_cache_lock:
+        document = _parsed_cache.get(key)
+        if document is not None:
+            _parsed_cache.move_to_end(key)
+    
+    if document is None:
+        document = read_json_cache('subtitles', key)
+    
+    if document is None:
+        document = PARSERS[subtitle_format](content)
+        try:
+            write_json_cache('subtitles', key, document)
+        except OSError as e:
+            logger.warning(f"No se pudieron guardar los subtítulos analizados: {str(e)}")
+    
+    with _parsed_cache_lock:
+        _parsed_cache[key] = document
+        while len(_parsed_cache) > settings.SUBTITLE_CACHE_SIZE:
+            _parsed_cache.popitem(last=False)
+    
+    return copy.deepcopy(document)
+
+def load_subtitles(file_path, subtitle_format=None):
+    """
+    Lee y analiza un archivo de subtítulos.
+    
+    El formato se deduce de la extensión o, si no es conocida, del contenido.
+    """
+    with open(file_path, 'r', encoding='utf-8-sig', errors='replace') as f:
+        content = f.read()
+    
+    if not subtitle_format:
+        extension = file_path.rsplit('.', 1)[-1].lower() if '.' in file_path else ''
+        subtitle_format = extension if extension in PARSERS else None
+    
+    return parse_subtitles(content, subtitle_format)
+
+def _strip_ass_tags(text):
+    return ASS_TAG_PATTERN.sub('', text)
+
+def _html_to_ass(text):
+    def replace(match):
+        tag = match.group(1).lower()
+        if tag not in ('b', 'i', 'u', 's'):
+            return ''
+        return f"{{\\{tag}{0 if match.group(0).startswith('</') else 1}}}"
+    
+    return HTML_TAG_PATTERN.sub(replace, text)
+
+def write_srt(document):
+    blocks = []
+    
+    for index, cue in enumerate(document['cues'], start=1):
+        blocks.append(
+            f"{index}\n"
+            f"{format_timestamp(cue['start'], 'srt')} --> {format_timestamp(cue['end'], 'srt')}\n"
+            f"{_strip_ass_tags(cue['text'])}\n"
+        )
+    
+    return '\n'.join(blocks)
+
+def write_vtt(document):
+    blocks = ["WEBVTT\n"]
+    
+    for cue in document['cues']:
+        blocks.append(
+            f"{format_timestamp(cue['start'], 'vtt')} --> {format_timestamp(cue['end'], 'vtt')}\n"
+            f"{_strip_ass_tags(cue['text'])}\n"
+        )
+    
+    return '\n'.join(blocks)
+
+def write_ass(document):
+    script_info = {
+        'ScriptType': 'v4.00+',
+        'PlayResX': str(DEFAULT_PLAY_RES[0]),
+        'PlayResY': str(DEFAULT_PLAY_RES[1]),
+        'WrapStyle': '0',
+        **document.get('script_info', {})
+    }
+    
+    styles = document.get('styles') or [dict(DEFAULT_ASS_STYLE)]
+    
+    lines = ['[Script Info]']
+    lines.extend(f"{key}: {value}" for key, value in script_info.items())
+    lines.extend(['', '[V4+ Styles]', f"Format: {', '.join(ASS_STYLE_FIELDS)}"])
+    
+    for style in styles:
+        merged = {**DEFAULT_ASS_STYLE, **style}
+        lines.append(f"Style: {','.join(str(merged[field]) for field in ASS_STYLE_FIELDS)}")
+    
+    lines.extend(['', '[Events]', f"Format: {', '.join(ASS_EVENT_FIELDS)}"])
+    
+    for cue in document['cues']:
+        text = _html_to_ass(cue['text']).replace('\n', '\\N')
+        lines.append(
+            f"Dialogue: 0,{format_timestamp(cue['start'], 'ass')},{format_timestamp(cue['end'], 'ass')},"
+            f"{cue.get('style', styles[0]['Name'])},,0,0,0,,{text}"
+        )
+    
+    return '\n'.join(lines) + '\n'
+
+WRITERS = {
+    'srt': write_srt,
+    'vtt': write_vtt,
+    'ass': write_ass
+}
+
+def write_subtitles(document, subtitle_format):
+    """
+    Serializa un documento de subtítulos en el formato indicado.
+    """
+    if subtitle_format not in WRITERS:
+        raise ValidationError(f"Formato de subtítulos no soportado: {subtitle_format}")
+    return WRITERS[subtitle_format](document)
+
+def save_subtitles(document, file_path, subtitle_format=None):
+    """
+    Escribe un documento de subtítulos en disco. El formato se deduce de la
+    extensión si no se indica.
+    """
+    subtitle_format = subtitle_format or file_path.rsplit('.', 1)[-1].lower()
+    
+    with open(file_path, 'w', encoding='utf-8') as f:
+        f.write(write_subtitles(document, subtitle_format))
+    
+    return file_path
+
+def convert_subtitles(content, target_format, source_format=None):
+    """
+    Convierte un texto de subtítulos entre SRT, VTT y ASS.
+    """
+    return write_subtitles(parse_subtitles(content, source_format), target_format)
+
+def shift_subtitles(document, offset):
+    """
+    Desplaza todos los cues en el tiempo. Los cues que quedan por completo
+    antes de 0 se eliminan y los que lo cruzan se recortan.
+    """
+    cues = []
+    
+    for cue in document['cues']:
+        start = cue['start'] + offset
+        end = cue['end'] + offset
+        if end <= 0:
+            continue
+        cues.append({**cue, 'start': max(0.0, start), 'end': end})
+    
+    return {**document, 'cues': cues}
+
+def merge_subtitles(documents):
+    """
+    Combina varios documentos en uno, con los cues ordenados por inicio.
+    Los estilos se unen conservando el primero de cada nombre.
+    """
+    cues = []
+    styles = []
+    style_names = set()
+    script_info = {}
+    
+    for document in documents:
+        cues.extend(document['cues'])
+        for style in document.get('styles', []):
+            if style.get('Name') not in style_names:
+                style_names.add(style.get('Name'))
+                styles.append(style)
+        script_info = {**document.get('script_info', {}), **script_info}
+    
+    cues.sort(key=lambda cue: (cue['start'], cue['end']))
+    return new_document(cues, styles, script_info)
+
+def apply_style(document, style):
+    """
+    Aplica un estilo ASS a todos los cues del documento, reemplazando los
+    estilos existentes.
+    
+    Args:
+        document: Documento de subtítulos
+        style: Dict con campos ASS (Fontname, Fontsize, PrimaryColour...)
+    """
+    merged = {**DEFAULT_ASS_STYLE, **style}
+    cues = [{**cue, 'style': merged['Name']} for cue in document['cues']]
+    return {**document, 'cues': cues, 'styles': [merged]}
+
+def build_caption_style(font='Arial', font_size=24, font_color='white', background=True, position='bottom'):
+    """
+    Construye el estilo ASS equivalente a las opciones del endpoint de
+    subtítulos.
+    """
+    style = {
+        'Fontname': font,
+        'Fontsize': str(font_size),
+        'PrimaryColour': to_ass_color(font_color),
+        'Alignment': str(ASS_ALIGNMENTS.get(position, ASS_ALIGNMENTS['bottom']))
+    }
+    
+    if background:
+        # BorderStyle 4: caja de fondo semitransparente detrás de cada línea
+        style.update({'BorderStyle': '4', 'BackColour': '&H80000000', 'Outline': '0'})
+    
+    return style
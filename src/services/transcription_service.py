@@ -1,16 +1,415 @@
 import os
+import time
 import logging
 import uuid
 import json
-from ..utils.file_utils import download_file, generate_temp_filename, verify_file_integrity
+import zlib
+import multiprocessing
+import numpy as np
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+# Primero error_handler: los workers del pool (spawn) importan este módulo
+# desde cero y ffmpeg_service tiene un import circular con src.api
+from ..api.middlewares.error_handler import ProcessingError, ValidationError
+from ..utils.file_utils import download_file, generate_temp_filename
 from .ffmpeg_service import run_ffmpeg_command
 from .storage_service import store_file
 from .webhook_service import notify_job_completed, notify_job_failed
+from .subtitle_service import new_document, save_subtitles, SUBTITLE_FORMATS
+from .silence_service import (build_pcm_command, load_pcm, compute_window_energy, detect_keep_ranges,
+                              ANALYSIS_SAMPLE_RATE, ANALYSIS_WINDOW_MS)
+from .cache_service import lookup_cached_result, save_cached_result
 from ..config import settings
-from ..api.middlewares.error_handler import ProcessingError
 
 logger = logging.getLogger(__name__)
 
+TRANSCRIPT_FORMATS = ('txt', 'json') + SUBTITLE_FORMATS
+
+# Segmentación por voz: pausas que separan fragmentos y margen alrededor de la voz
+VAD_THRESHOLD_DB = -40.0
+VAD_MIN_SILENCE = 0.3
+VAD_PADDING = 0.2
+
+ASR_BACKENDS = {}
+
+def register_asr_backend(name):
+    """Registra una clase ASRBackend con un nombre."""
+    def decorator(cls):
+        cls.name = name
+        ASR_BACKENDS[name] = cls
+        return cls
+    return decorator
+
+class ASRBackend:
+    """
+    Backend de reconocimiento de voz.
+    
+    load() se llama una vez por proceso (el modelo se reutiliza entre
+    fragmentos y trabajos); transcribe() recibe el audio de un fragmento
+    como float32 mono y devuelve segmentos con tiempos relativos al
+    fragmento.
+    """
+    name = None
+    
+    def load(self):
+        pass
+    
+    def transcribe(self, audio, sample_rate, language=None):
+        """
+        Returns:
+            Tupla (segmentos, idioma). Cada segmento es un dict con 'start',
+            'end', 'text' y 'words' (lista de {'start', 'end', 'word'})
+        """
+        raise NotImplementedError
+
+@register_asr_backend('stub')
+class StubBackend(ASRBackend):
+    """
+    Backend local determinista para pruebas: una palabra por segundo de
+    audio, derivada del contenido.
+    """
+    word_seconds = 1.0
+    
+    def transcribe(self, audio, sample_rate, language=None):
+        step = int(sample_rate * self.word_seconds)
+        words = []
+        
+        for first in range(0, len(audio), step):
+            piece = audio[first:first + step]
+            words.append({
+                'start': round(first / sample_rate, 3),
+                'end': round((first + len(piece)) / sample_rate, 3),
+                'word': f"w{zlib.crc32(piece.tobytes()) % 10000:04d}"
+            })
+        
+        if not words:
+            return [], language or 'und'
+        
+        segment = {
+            'start': words[0]['start'],
+            'end': words[-1]['end'],
+            'text': ' '.join(word['word'] for word in words),
+            'words': words
+        }
+        return [segment], language or 'und'
+
+@register_asr_backend('whisper')
+class WhisperBackend(ASRBackend):
+    """Modelo Whisper en CPU con faster-whisper (CTranslate2, int8)."""
+    def load(self):
+        try:
+            from faster_whisper import WhisperModel
+        except ImportError:
+            raise ProcessingError("El backend ASR 'whisper' requiere el paquete faster-whisper")
+        
+        self.model = WhisperModel(
+            settings.ASR_MODEL,
+            device='cpu',
+            compute_type=settings.ASR_COMPUTE_TYPE,
+            cpu_threads=settings.ASR_THREADS,
+            download_root=os.path.join(settings.CACHE_DIR, 'asr')
+        )
+    
+    def transcribe(self, audio, sample_rate, language=None):
+        segments, info = self.model.transcribe(audio, language=language, word_timestamps=True, vad_filter=False)
+        
+        result = [{
+            'start': round(segment.start, 3),
+            'end': round(segment.end, 3),
+            'text': segment.text.strip(),
+            'words': [
+                {'start': round(word.start, 3), 'end': round(word.end, 3), 'word': word.word.strip()}
+                for word in (segment.words or [])
+            ]
+        } for segment in segments]
+        
+        return result, info.language
+
+# Backend cargado en cada proceso, y pool de procesos reutilizado entre trabajos
+_process_backends = {}
+_asr_pool = None
+_asr_pool_key = None
+
+def get_asr_backend(name):
+    """Devuelve el backend `name` de este proceso, cargándolo la primera vez."""
+    if name not in ASR_BACKENDS:
+        raise ValidationError(f"Backend ASR desconocido: {name}")
+    
+    backend = _process_backends.get(name)
+    if backend is None:
+        backend = ASR_BACKENDS[name]()
+        backend.load()
+        _process_backends[name] = backend
+    
+    return backend
+
+def transcribe_chunk(pcm_path, index, start, end, backend_name, language=None):
+    """
+    Transcribe un fragmento del PCM (se ejecuta en el pool de procesos).
+    
+    Cada proceso abre el PCM con np.memmap, de modo que entre procesos solo
+    viajan la ruta y los tiempos.
+    """
+    samples = load_pcm(pcm_path)
+    first = int(start * ANALYSIS_SAMPLE_RATE)
+    last = int(end * ANALYSIS_SAMPLE_RATE)
+    audio = np.asarray(samples[first:last], dtype=np.float32) / 32768.0
+    
+    segments, detected = get_asr_backend(backend_name).transcribe(audio, ANALYSIS_SAMPLE_RATE, language)
+    return index, segments, detected
+
+def _get_asr_pool(workers):
+    global _asr_pool, _asr_pool_key
+    
+    if _asr_pool is None or _asr_pool_key != workers:
+        if _asr_pool is not None:
+            _asr_pool.shutdown(wait=False, cancel_futures=True)
+        # spawn: un fork de un worker con hilos (RQ, Redis, BLAS) puede heredar locks tomados
+        _asr_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        _asr_pool_key = workers
+    
+    return _asr_pool
+
+def _reset_asr_pool():
+    global _asr_pool, _asr_pool_key
+    
+    if _asr_pool is not None:
+        _asr_pool.shutdown(wait=False, cancel_futures=True)
+    _asr_pool = None
+    _asr_pool_key = None
+
+def plan_transcription_chunks(levels, window_seconds, duration, max_chunk=None):
+    """
+    Agrupa los tramos con voz en fragmentos de hasta `max_chunk` segundos.
+    
+    Los fragmentos se cortan en las pausas (nunca a mitad de palabra salvo
+    que un tramo de voz continua supere `max_chunk`) y el silencio entre
+    ellos no se transcribe.
+    
+    Returns:
+        Lista de tuplas (inicio, fin) en segundos
+    """
+    max_chunk = max_chunk or settings.ASR_CHUNK_SECONDS
+    speech = detect_keep_ranges(levels, window_seconds, duration, threshold_db=VAD_THRESHOLD_DB,
+                                min_silence=VAD_MIN_SILENCE, padding=VAD_PADDING)
+    
+    chunks = []
+    for start, end in speech:
+        if chunks and end - chunks[-1][0] <= max_chunk:
+            chunks[-1] = (chunks[-1][0], end)
+            continue
+        
+        while end - start > max_chunk:
+            chunks.append((start, round(start + max_chunk, 3)))
+            start = round(start + max_chunk, 3)
+        chunks.append((start, end))
+    
+    return chunks
+
+def stitch_transcript(chunks, chunk_results):
+    """
+    Une los resultados de los fragmentos en orden, con tiempos absolutos.
+    
+    Args:
+        chunks: Lista de (inicio, fin) de cada fragmento
+        chunk_results: Dict {índice: segmentos} con tiempos relativos
+    
+    Returns:
+        Lista de segmentos con tiempos absolutos
+    """
+    segments = []
+    
+    for index, (offset, _) in enumerate(chunks):
+        for segment in chunk_results.get(index, []):
+            if not segment.get('text'):
+                continue
+            segments.append({
+                'start': round(segment['start'] + offset, 3),
+                'end': round(segment['end'] + offset, 3),
+                'text': segment['text'],
+                'words': [
+                    {**word, 'start': round(word['start'] + offset, 3), 'end': round(word['end'] + offset, 3)}
+                    for word in segment.get('words', [])
+                ]
+            })
+    
+    return segments
+
+def write_transcript(segments, output_path, output_format, language):
+    """Escribe la transcripción en txt, json o un formato de subtítulos."""
+    transcript = "\n".join(segment['text'] for segment in segments)
+    
+    if output_format == 'txt':
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write(transcript)
+    
+    elif output_format in SUBTITLE_FORMATS:
+        cues = [{'start': s['start'], 'end': s['end'], 'text': s['text']} for s in segments]
+        save_subtitles(new_document(cues), output_path, output_format)
+    
+    elif output_format == 'json':
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                "language": language,
+                "transcript": transcript,
+                "segments": segments
+            }, f, ensure_ascii=False, indent=2)
+    
+    else:
+        raise ValidationError(f"Formato de transcripción no soportado: {output_format}")
+    
+    return output_path
+
+def _publish_progress(job_id, progress):
+    """Guarda el progreso parcial en el registro del trabajo (si existe)."""
+    from .redis_queue_service import update_task_progress
+    
+    try:
+        return update_task_progress(job_id, progress)
+    except Exception as e:
+        logger.debug(f"Job {job_id}: No se pudo publicar el progreso: {str(e)}")
+        return False
+
+def run_transcription(pcm_path, chunks, backend_name, language=None, job_id=None, workers=None):
+    """
+    Transcribe los fragmentos en paralelo y publica el texto parcial.
+    
+    Con más de un worker los fragmentos se reparten en un pool de procesos
+    que se reutiliza entre trabajos (el modelo se carga una vez por
+    proceso). El texto de los fragmentos ya completados en orden se guarda
+    en el registro del trabajo a medida que avanzan.
+    
+    Returns:
+        Tupla (segmentos unidos, idioma detectado)
+    """
+    workers = settings.ASR_WORKERS if workers is None else workers
+    results = {}
+    languages = Counter()
+    published = 0
+    publish = bool(job_id)
+    
+    def collect(index, segments, detected):
+        nonlocal published, publish
+        results[index] = segments
+        languages[detected] += 1
+        
+        ready = published
+        while ready in results:
+            ready += 1
+        
+        if publish and ready > published:
+            published = ready
+            partial = stitch_transcript(chunks[:ready], results)
+            publish = _publish_progress(job_id, {
+                'completed_chunks': len(results),
+                'total_chunks': len(chunks),
+                'partial_text': "\n".join(segment['text'] for segment in partial)
+            })
+    
+    if workers <= 1 or len(chunks) <= 1:
+        for index, (start, end) in enumerate(chunks):
+            collect(*transcribe_chunk(pcm_path, index, start, end, backend_name, language))
+    else:
+        pool = _get_asr_pool(workers)
+        try:
+            futures = [
+                pool.submit(transcribe_chunk, pcm_path, index, start, end, backend_name, language)
+                for index, (start, end) in enumerate(chunks)
+            ]
+            for future in as_completed(futures):
+                collect(*future.result())
+        except BrokenProcessPool as e:
+            _reset_asr_pool()
+            raise ProcessingError(f"El pool de transcripción terminó inesperadamente: {str(e)}")
+    
+    detected = languages.most_common(1)[0][0] if languages else (language or 'und')
+    return stitch_transcript(chunks, results), detected
+
+def transcribe_file(media_path, language='auto', output_format='txt', job_id=None, no_cache=False, backend=None):
+    """
+    Transcribe un archivo local.
+    
+    El audio se decodifica a PCM 16 kHz mono, se divide en fragmentos por
+    voz y se transcribe con el backend ASR. El resultado se guarda en la
+    caché por el hash del audio decodificado, de modo que el mismo audio en
+    otro contenedor tampoco se vuelve a transcribir.
+    
+    Args:
+        media_path: Ruta del archivo de audio o video
+        language: Código de idioma ('auto' para detección automática)
+        output_format: Formato de salida ('txt', 'json', 'srt', 'vtt', 'ass')
+        job_id: ID del trabajo (recibe el progreso parcial)
+        no_cache: Omitir la consulta a la caché de resultados
+        backend: Nombre del backend ASR (por defecto ASR_BACKEND)
+    
+    Returns:
+        Dict con la URL de la transcripción, el formato, el idioma, la
+        duración, el número de fragmentos y de palabras
+    """
+    if output_format not in TRANSCRIPT_FORMATS:
+        raise ValidationError(f"Formato de transcripción no soportado: {output_format}")
+    
+    backend_name = backend or settings.ASR_BACKEND
+    if backend_name not in ASR_BACKENDS:
+        raise ValidationError(f"Backend ASR desconocido: {backend_name}")
+    
+    asr_language = None if not language or language == 'auto' else language
+    prefix = f"{job_id}_" if job_id else ""
+    pcm_path = None
+    output_path = None
+    
+    try:
+        pcm_path = generate_temp_filename(prefix=f"{prefix}transcribe_", suffix=".pcm")
+        run_ffmpeg_command(build_pcm_command(media_path, pcm_path))
+        
+        fingerprint, cached_result = lookup_cached_result('transcribe', {
+            'language': language,
+            'output_format': output_format,
+            'backend': backend_name,
+            'model': settings.ASR_MODEL if backend_name == 'whisper' else None
+        }, [pcm_path], no_cache)
+        
+        if cached_result:
+            logger.info(f"Job {job_id}: Transcripción servida desde caché")
+            return cached_result
+        
+        samples = load_pcm(pcm_path)
+        duration = len(samples) / ANALYSIS_SAMPLE_RATE
+        chunks = plan_transcription_chunks(compute_window_energy(samples), ANALYSIS_WINDOW_MS / 1000, duration)
+        del samples
+        
+        started = time.monotonic()
+        segments, detected = run_transcription(pcm_path, chunks, backend_name, asr_language, job_id)
+        elapsed = time.monotonic() - started
+        
+        output_path = generate_temp_filename(prefix=f"{prefix}transcript_", suffix=f".{output_format}")
+        write_transcript(segments, output_path, output_format, detected)
+        
+        result = {
+            "url": store_file(output_path),
+            "format": output_format,
+            "language": detected,
+            "duration": round(duration, 3),
+            "chunk_count": len(chunks),
+            "word_count": sum(len(segment['words']) for segment in segments)
+        }
+        
+        save_cached_result(fingerprint, 'transcribe', result)
+        logger.info(f"Job {job_id}: {len(chunks)} fragmentos transcritos en {elapsed:.2f}s "
+                    f"({duration / elapsed if elapsed > 0 else 0:.1f}x tiempo real)")
+        
+        return result
+    
+    finally:
+        for file_path in [pcm_path, output_path]:
+            if file_path and os.path.exists(file_path):
+                try:
+                    os.remove(file_path)
+                    logger.debug(f"Job {job_id}: Archivo temporal eliminado: {file_path}")
+                except Exception as e:
+                    logger.warning(f"Error eliminando archivo temporal {file_path}: {str(e)}")
+
 def transcribe_audio(audio_url, language='auto', output_format='txt', job_id=None, webhook_url=None):
     """
     Transcribe audio a texto.
@@ -18,10 +417,10 @@ def transcribe_audio(audio_url, language='auto', output_format='txt', job_id=Non
     Args:
         audio_url: URL del archivo de audio
         language: Código de idioma ('auto' para detección automática)
-        output_format: Formato de salida ('txt', 'srt', 'vtt', 'json')
+        output_format: Formato de salida ('txt', 'srt', 'vtt', 'ass', 'json')
         job_id: ID del trabajo (opcional)
         webhook_url: URL para notificación por webhook (opcional)
-        
+    
     Returns:
         URL del archivo de transcripción
     """
@@ -31,86 +430,19 @@ def transcribe_audio(audio_url, language='auto', output_format='txt', job_id=Non
     logger.info(f"Job {job_id}: Iniciando transcripción de audio desde {audio_url}")
     
     audio_path = None
-    wav_path = None
-    output_path = None
     
     try:
-        # Descargar el archivo de audio
         audio_path = download_file(audio_url, settings.TEMP_DIR)
         logger.info(f"Job {job_id}: Audio descargado: {audio_path}")
         
-        # Convertir a WAV para mejor compatibilidad con servicios de ASR
-        wav_path = generate_temp_filename(prefix=f"{job_id}_audio_", suffix=".wav")
-        
-        command = [
-            'ffmpeg',
-            '-i', audio_path,
-            '-ar', '16000',  # Frecuencia de muestreo estándar para ASR
-            '-ac', '1',      # Mono
-            '-c:a', 'pcm_s16le',  # Formato PCM sin comprimir, 16 bits
-            wav_path
-        ]
-        
-        run_ffmpeg_command(command)
-        
-        if not verify_file_integrity(wav_path):
-            raise ProcessingError("Error al preparar el archivo de audio para transcripción")
-        
-        # Aquí se integraría con un servicio real de ASR como Whisper, Azure Speech, etc.
-        # Por ahora, vamos a simular una transcripción
-        
-        output_path = generate_temp_filename(prefix=f"{job_id}_transcript_", suffix=f".{output_format}")
-        
-        # Simulación de transcripción
-        sample_transcript = "Esta es una transcripción de ejemplo.\nEn un sistema de producción, este texto sería generado por un servicio de reconocimiento de voz."
-        
-        if output_format == 'txt':
-            with open(output_path, 'w', encoding='utf-8') as f:
-                f.write(sample_transcript)
-        
-        elif output_format == 'srt':
-            with open(output_path, 'w', encoding='utf-8') as f:
-                f.write("1\n00:00:00,000 --> 00:00:05,000\nEsta es una transcripción de ejemplo.\n\n")
-                f.write("2\n00:00:05,100 --> 00:00:10,000\nEn un sistema de producción, este texto sería generado por un servicio de reconocimiento de voz.\n")
-        
-        elif output_format == 'vtt':
-            with open(output_path, 'w', encoding='utf-8') as f:
-                f.write("WEBVTT\n\n")
-                f.write("00:00:00.000 --> 00:00:05.000\nEsta es una transcripción de ejemplo.\n\n")
-                f.write("00:00:05.100 --> 00:00:10.000\nEn un sistema de producción, este texto sería generado por un servicio de reconocimiento de voz.\n")
-        
-        elif output_format == 'json':
-            transcript_data = {
-                "jobId": job_id,
-                "language": language,
-                "transcript": sample_transcript,
-                "segments": [
-                    {
-                        "start": 0,
-                        "end": 5,
-                        "text": "Esta es una transcripción de ejemplo."
-                    },
-                    {
-                        "start": 5.1,
-                        "end": 10,
-                        "text": "En un sistema de producción, este texto sería generado por un servicio de reconocimiento de voz."
-                    }
-                ]
-            }
-            
-            with open(output_path, 'w', encoding='utf-8') as f:
-                json.dump(transcript_data, f, ensure_ascii=False, indent=2)
-        
-        # Almacenar el archivo de transcripción y obtener URL
-        result_url = store_file(output_path)
+        result_url = transcribe_file(audio_path, language, output_format, job_id)['url']
         logger.info(f"Job {job_id}: Transcripción completada y almacenada: {result_url}")
         
-        # Notificar por webhook si es necesario
         if webhook_url:
             notify_job_completed(job_id, webhook_url, result_url)
         
         return result_url
-        
+    
     except Exception as e:
         logger.exception(f"Job {job_id}: Error en transcripción: {str(e)}")
         
@@ -118,13 +450,11 @@ def transcribe_audio(audio_url, language='auto', output_format='txt', job_id=Non
             notify_job_failed(job_id, webhook_url, str(e))
         
         raise
-        
+    
     finally:
-        # Limpieza de archivos temporales
-        for file_path in [audio_path, wav_path, output_path]:
-            if file_path and os.path.exists(file_path):
-                try:
-                    os.remove(file_path)
-                    logger.debug(f"Job {job_id}: Archivo temporal eliminado: {file_path}")
-                except Exception as e:
-                    logger.warning(f"Error eliminando archivo temporal {file_path}: {str(e)}")
+        if audio_path and os.path.exists(audio_path):
+            try:
+                os.remove(audio_path)
+                logger.debug(f"Job {job_id}: Archivo temporal eliminado: {audio_path}")
+            except Exception as e:
+                logger.warning(f"Error eliminando archivo temporal {audio_path}: {str(e)}")
@@ -0,0 +1,321 @@
+import os
+import logging
+import uuid
+from ..utils.file_utils import download_file, generate_temp_filename, verify_file_integrity, compute_file_hash
+from .ffmpeg_service import (run_ffmpeg_command, get_media_info, get_encoding_profile,
+                             build_video_encoding_args, build_audio_encoding_args)
+from .keyframe_service import get_keyframe_index, TIME_EPSILON
+from .storage_service import store_file
+from .webhook_service import notify_job_completed, notify_job_failed
+from .cache_service import lookup_cached_result, save_cached_result
+from ..config import settings
+from ..api.middlewares.error_handler import ProcessingError, ValidationError
+
+logger = logging.getLogger(__name__)
+
+# Encoders software para los bordes: deben producir el mismo codec que el
+# original para poder concatenar con los GOPs copiados
+SMART_RENDER_ENCODERS = {
+    'h264': 'libx264',
+    'hevc': 'libx265'
+}
+
+def normalize_trim_ranges(ranges, duration):
+    """
+    Valida los rangos solicitados y los ajusta a la duración del video.
+    
+    Args:
+        ranges: Lista de dicts {'start', 'end'} en segundos
+        duration: Duración del video en segundos
+    
+    Returns:
+        Lista de tuplas (inicio, fin)
+    
+    Raises:
+        ValidationError: Si algún rango está vacío o fuera del video
+    """
+    result = []
+    
+    for item in ranges:
+        start = float(item['start'])
+        end = float(item['end']) if item.get('end') is not None else duration
+        
+        if duration > 0:
+            end = min(end, duration)
+        
+        if start < 0 or end - start <= TIME_EPSILON:
+            raise ValidationError(f"Rango de recorte inválido: {start}-{end}")
+        
+        result.append((round(start, 6), round(end, 6)))
+    
+    return result
+
+def plan_trim_segments(index, start, end, duration=0):
+    """
+    Divide un rango en segmentos que se copian y segmentos que se recodifican.
+    
+    La parte entre el primer keyframe en o después de `start` y el último
+    keyframe en o antes de `end` se copia sin recodificar; solo los GOPs
+    parciales de cada borde se recodifican para mantener la precisión al
+    frame.
+    
+    Args:
+        index: KeyframeIndex del video (None para recodificar todo el rango)
+        start: Inicio del rango en segundos
+        end: Fin del rango en segundos
+        duration: Duración del video (un rango hasta el final se copia entero)
+    
+    Returns:
+        Lista de dicts {'start', 'end', 'mode'} con mode 'copy' o 'encode'
+    """
+    whole = [{'start': start, 'end': end, 'mode': 'encode'}]
+    
+    if index is None or not index.keyframe_count:
+        return whole
+    
+    copy_start = index.keyframe_after(start)
+    copy_end = end if duration and end >= duration - TIME_EPSILON else index.keyframe_before(end)
+    
+    if copy_start is None or copy_end is None or copy_end - copy_start <= TIME_EPSILON:
+        return whole
+    
+    segments = []
+    
+    if copy_start - start > TIME_EPSILON:
+        segments.append({'start': start, 'end': copy_start, 'mode': 'encode'})
+    
+    segments.append({'start': copy_start, 'end': copy_end, 'mode': 'copy'})
+    
+    if end - copy_end > TIME_EPSILON:
+        segments.append({'start': copy_end, 'end': end, 'mode': 'encode'})
+    
+    return segments
+
+def build_segment_command(video_path, segment, output_path, encoding_args, frames=None):
+    """
+    Comando FFmpeg que extrae un segmento de video (sin audio) a MPEG-TS.
+    
+    La búsqueda es de entrada (-ss antes de -i): en modo copia empieza
+    exactamente en el keyframe y en modo recodificación es precisa al frame.
+    MPEG-TS repite los parámetros del codec en banda, de modo que los
+    segmentos copiados y recodificados se concatenan sin problemas.
+    
+    Con `frames` (contado en el índice de keyframes) el segmento se limita
+    por número de frames en lugar de -t: la duración de salida depende del
+    start_time del contenedor y del redondeo en los bordes, y con entradas
+    MPEG-TS puede dejar segmentos vacíos o perder el último frame.
+    """
+    command = [
+        'ffmpeg',
+        '-y',
+        '-ss', f"{segment['start']:.6f}",
+        '-i', video_path
+    ]
+    
+    if frames:
+        command.extend(['-frames:v', str(frames)])
+    else:
+        command.extend(['-t', f"{segment['end'] - segment['start']:.6f}"])
+    
+    command.extend([
+        '-map', '0:v:0',
+        '-an', '-sn', '-dn'
+    ])
+    
+    if segment['mode'] == 'copy':
+        command.extend(['-c:v', 'copy'])
+    else:
+        command.extend(encoding_args)
+    
+    command.extend(['-f', 'mpegts', output_path])
+    return command
+
+def build_edge_encoding_args(video_info, profile_name=None):
+    """
+    Argumentos de codificación de los segmentos de borde.
+    
+    Returns:
+        Tupla (argumentos, smart_render). smart_render es False si el codec
+        del original no admite recodificación parcial y hay que recodificar
+        los rangos completos con el perfil.
+    """
+    encoder = SMART_RENDER_ENCODERS.get(video_info.get('video_codec'))
+    
+    if not encoder:
+        return build_video_encoding_args(profile_name), False
+    
+    # Mismo codec y formato de píxel que los GOPs copiados (siempre encoder
+    # software: las opciones de NVENC/QSV no se aplican aquí)
+    profile = get_encoding_profile(profile_name)
+    args = ['-c:v', encoder]
+    
+    if profile.get('preset'):
+        args.extend(['-preset', str(profile['preset'])])
+    if profile.get('crf') is not None:
+        args.extend(['-crf', str(profile['crf'])])
+    if profile.get('tune'):
+        args.extend(['-tune', str(profile['tune'])])
+    
+    pix_fmt = video_info.get('pix_fmt')
+    if pix_fmt and pix_fmt != 'unknown':
+        args.extend(['-pix_fmt', pix_fmt])
+    
+    return args, True
+
+def build_trim_mux_command(concat_file, video_path, ranges, output_path, has_audio=True, profile_name=None):
+    """
+    Une los segmentos de video con el audio de cada rango.
+    
+    El video se copia desde la lista de concatenación; el audio de cada rango
+    se lee con búsqueda de entrada y se recodifica (es barato y evita los
+    cortes a mitad de frame de audio).
+    """
+    command = [
+        'ffmpeg',
+        '-y',
+        '-f', 'concat',
+        '-safe', '0',
+        '-i', concat_file
+    ]
+    
+    if has_audio:
+        for start, end in ranges:
+            command.extend(['-ss', f"{start:.6f}", '-t', f"{end - start:.6f}", '-i', video_path])
+        
+        if len(ranges) == 1:
+            audio_map = '1:a:0'
+        else:
+            inputs = ''.join(f"[{i}:a:0]" for i in range(1, len(ranges) + 1))
+            command.extend(['-filter_complex', f"{inputs}concat=n={len(ranges)}:v=0:a=1[aout]"])
+            audio_map = '[aout]'
+        
+        command.extend(['-map', '0:v:0', '-map', audio_map, *build_audio_encoding_args(profile_name)])
+    else:
+        command.extend(['-map', '0:v:0'])
+    
+    command.extend(['-c:v', 'copy', '-movflags', '+faststart', output_path])
+    return command
+
+def trim_video(video_url, ranges, job_id=None, webhook_url=None, no_cache=False, encoding_profile=None):
+    """
+    Recorta uno o varios rangos de un video y los une en orden.
+    
+    Los GOPs completos se copian sin recodificar usando el índice de
+    keyframes en caché; solo se recodifican los GOPs parciales de los bordes.
+    
+    Args:
+        video_url: URL del video
+        ranges: Lista de dicts {'start', 'end'} en segundos (end opcional)
+        job_id: ID del trabajo (opcional)
+        webhook_url: URL para notificar cuando se complete (opcional)
+        no_cache: Omitir la consulta a la caché de resultados
+        encoding_profile: Nombre del perfil de codificación (por defecto si es None)
+    
+    Returns:
+        Dict con la URL del video, su duración y los segundos copiados y
+        recodificados
+    """
+    if not job_id:
+        job_id = str(uuid.uuid4())
+    
+    if not ranges:
+        raise ValidationError("Se requiere al menos un rango")
+    
+    profile = get_encoding_profile(encoding_profile)
+    logger.info(f"Job {job_id}: Iniciando recorte de {len(ranges)} rango(s) de {video_url}")
+    
+    video_path = None
+    concat_file = None
+    output_path = None
+    segment_paths = []
+    
+    try:
+        video_path = download_file(video_url, settings.TEMP_DIR)
+        logger.info(f"Job {job_id}: Video descargado: {video_path}")
+        
+        # El hash se calcula una vez para la caché de resultados y el índice
+        file_hash = compute_file_hash(video_path)
+        
+        fingerprint, cached_result = lookup_cached_result('trim_video', {
+            'ranges': ranges,
+            'encoding_profile': profile
+        }, [video_path], no_cache, input_hashes=[file_hash])
+        
+        if cached_result:
+            logger.info(f"Job {job_id}: Resultado servido desde caché")
+            if webhook_url:
+                notify_job_completed(job_id, webhook_url, cached_result)
+            return cached_result
+        
+        video_info = get_media_info(video_path)
+        
+        if 'video_codec' not in video_info:
+            raise ProcessingError("El archivo no contiene una pista de video")
+        
+        duration = video_info.get('duration', 0)
+        trim_ranges = normalize_trim_ranges(ranges, duration)
+        encoding_args, smart_render = build_edge_encoding_args(video_info, profile['name'])
+        
+        index = get_keyframe_index(video_path, file_hash) if smart_render else None
+        if not smart_render:
+            logger.info(f"Job {job_id}: Codec {video_info.get('video_codec')} sin copia parcial, se recodifica")
+        
+        segments = []
+        for start, end in trim_ranges:
+            segments.extend(plan_trim_segments(index, start, end, duration))
+        
+        for i, segment in enumerate(segments):
+            segment_path = generate_temp_filename(prefix=f"{job_id}_trim_{i}_", suffix=".ts")
+            segment_paths.append(segment_path)
+            frames = index.frames_between(segment['start'], segment['end']) if index is not None else None
+            run_ffmpeg_command(build_segment_command(video_path, segment, segment_path, encoding_args, frames))
+        
+        concat_file = os.path.join(settings.TEMP_DIR, f"{job_id}_trim_list.txt")
+        with open(concat_file, 'w') as f:
+            for segment_path in segment_paths:
+                f.write(f"file '{segment_path}'\n")
+        
+        output_path = generate_temp_filename(prefix=f"{job_id}_trimmed_", suffix=".mp4")
+        run_ffmpeg_command(build_trim_mux_command(
+            concat_file, video_path, trim_ranges, output_path,
+            has_audio='audio_codec' in video_info, profile_name=profile['name']
+        ))
+        
+        if not verify_file_integrity(output_path):
+            raise ProcessingError("El video recortado no es válido")
+        
+        copied = sum(s['end'] - s['start'] for s in segments if s['mode'] == 'copy')
+        encoded = sum(s['end'] - s['start'] for s in segments if s['mode'] == 'encode')
+        
+        result = {
+            "url": store_file(output_path),
+            "duration": round(copied + encoded, 3),
+            "copied_duration": round(copied, 3),
+            "encoded_duration": round(encoded, 3)
+        }
+        
+        save_cached_result(fingerprint, 'trim_video', result)
+        logger.info(f"Job {job_id}: Video recortado ({result['copied_duration']}s copiados, "
+                    f"{result['encoded_duration']}s recodificados): {result['url']}")
+        
+        if webhook_url:
+            notify_job_completed(job_id, webhook_url, result)
+        
+        return result
+    
+    except Exception as e:
+        logger.exception(f"Job {job_id}: Error recortando video: {str(e)}")
+        
+        if webhook_url:
+            notify_job_failed(job_id, webhook_url, str(e))
+        
+        raise
+    
+    finally:
+        for file_path in [video_path, concat_file, output_path, *segment_paths]:
+            if file_path and os.path.exists(file_path):
+                try:
+                    os.remove(file_path)
+                    logger.debug(f"Job {job_id}: Archivo temporal eliminado: {file_path}")
+                except Exception as e:
+                    logger.warning(f"Error eliminando archivo temporal {file_path}: {str(e)}")
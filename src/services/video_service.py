@@ -2,48 +2,200 @@ import os
 import logging
 import uuid
 from ..utils.file_utils import download_file, generate_temp_filename, verify_file_integrity
-from .ffmpeg_service import run_ffmpeg_command, get_media_info
+from .ffmpeg_service import run_ffmpeg_command, get_media_info, get_encoding_profile, build_video_encoding_args, build_audio_encoding_args
 from .storage_service import store_file
 from .webhook_service import notify_job_completed, notify_job_failed
+from .cache_service import lookup_cached_result, save_cached_result
+from .subtitle_service import load_subtitles, save_subtitles, apply_style, build_caption_style
+from .font_service import resolve_font
+from .image_service import prepare_overlay_image, build_overlay_filter
 from ..config import settings
-from ..api.middlewares.error_handler import ProcessingError
+from ..api.middlewares.error_handler import ProcessingError, ValidationError
 
 logger = logging.getLogger(__name__)
 
-def add_captions_to_video(video_url, subtitles_url, font='Arial', font_size=24, 
+# Codec de subtítulos usado en modo mux según el contenedor de salida
+SUBTITLE_MUX_CODECS = {
+    'mp4': 'mov_text',
+    'mkv': 'webvtt'
+}
+
+# Formato al que se normalizan las pistas antes del mux
+SUBTITLE_MUX_FORMATS = {
+    'mp4': 'srt',
+    'mkv': 'vtt'
+}
+
+def build_subtitle_mux_command(video_path, subtitle_tracks, output_path, container='mp4'):
+    """
+    Construye el comando FFmpeg que añade pistas de subtítulos sin
+    recodificar el video ni el audio.
+    
+    Args:
+        video_path: Ruta del video
+        subtitle_tracks: Lista de dicts con 'path' y opcionalmente
+                         'language', 'title' y 'default'
+        output_path: Ruta del archivo de salida
+        container: Contenedor de salida ('mp4' o 'mkv')
+        
+    Returns:
+        Lista con el comando
+    """
+    if container not in SUBTITLE_MUX_CODECS:
+        raise ValidationError(f"Contenedor no soportado para subtítulos: {container}")
+    
+    command = ['ffmpeg', '-y', '-i', video_path]
+    
+    for track in subtitle_tracks:
+        command.extend(['-i', track['path']])
+    
+    command.extend(['-map', '0:v', '-map', '0:a?'])
+    
+    for index in range(len(subtitle_tracks)):
+        command.extend(['-map', f'{index + 1}:0'])
+    
+    command.extend([
+        '-c:v', 'copy',
+        '-c:a', 'copy',
+        '-c:s', SUBTITLE_MUX_CODECS[container]
+    ])
+    
+    # Si ninguna pista se marca como predeterminada, se usa la primera
+    default_index = next(
+        (index for index, track in enumerate(subtitle_tracks) if track.get('default')), 0
+    )
+    
+    for index, track in enumerate(subtitle_tracks):
+        if track.get('language'):
+            command.extend([f'-metadata:s:s:{index}', f"language={track['language']}"])
+        if track.get('title'):
+            command.extend([f'-metadata:s:s:{index}', f"title={track['title']}"])
+        command.extend([f'-disposition:s:{index}', 'default' if index == default_index else '0'])
+    
+    if container == 'mp4':
+        command.extend(['-movflags', '+faststart'])
+    
+    command.append(output_path)
+    return command
+
+def add_captions_to_video(video_url, subtitles_url=None, font='Arial', font_size=24, 
                           font_color='white', background=True, position='bottom',
-                          job_id=None, webhook_url=None):
+                          job_id=None, webhook_url=None, no_cache=False, encoding_profile=None,
+                          mode='burn', tracks=None, container='mp4'):
+    """
+    Añade subtítulos a un video.
+    
+    En modo 'burn' los subtítulos se queman en la imagen (recodifica el
+    video). En modo 'mux' se añaden como pistas de subtítulos junto al
+    video y audio copiados sin recodificar, admitiendo varias pistas.
+    
+    Args:
+        video_url: URL del video
+        subtitles_url: URL del archivo de subtítulos (SRT, VTT o ASS)
+        mode: 'burn' o 'mux'
+        tracks: Lista de pistas para modo mux: dicts con 'url' y
+                opcionalmente 'language', 'title' y 'default'
+        container: Contenedor de salida en modo mux ('mp4' o 'mkv')
+        
+    Returns:
+        URL del video procesado
+    """
     if not job_id:
         job_id = str(uuid.uuid4())
     
-    logger.info(f"Job {job_id}: Iniciando procesamiento de video con subtítulos")
+    if mode not in ('burn', 'mux'):
+        raise ValidationError(f"Modo de subtítulos no soportado: {mode}")
+    
+    if mode == 'mux':
+        tracks = tracks or ([{"url": subtitles_url}] if subtitles_url else [])
+        if not tracks:
+            raise ValidationError("Se requiere subtitles_url o tracks")
+        if container not in SUBTITLE_MUX_CODECS:
+            raise ValidationError(f"Contenedor no soportado para subtítulos: {container}")
+    elif not subtitles_url:
+        raise ValidationError("El modo burn requiere subtitles_url")
+    
+    profile = get_encoding_profile(encoding_profile)
+    logger.info(f"Job {job_id}: Iniciando procesamiento de video con subtítulos (modo {mode}, perfil {profile['name']})")
     
     video_path = None
     subtitles_path = None
+    ass_path = None
+    subtitle_tracks = []
     output_path = None
     
     try:
         video_path = download_file(video_url, settings.TEMP_DIR)
         logger.info(f"Job {job_id}: Video descargado: {video_path}")
         
-        subtitles_path = download_file(subtitles_url, settings.TEMP_DIR)
-        logger.info(f"Job {job_id}: Subtítulos descargados: {subtitles_path}")
-        
-        output_path = generate_temp_filename(prefix=f"{job_id}_captioned_", suffix=".mp4")
-        
-        background_filter = ''
-        if background:
-            background_filter = ':force_style=\'BackColor=&H80000000,BorderStyle=4\''
-        
-        subtitle_filter = f"subtitles={subtitles_path}:fontsdir=.:force_style='FontName={font},FontSize={font_size},PrimaryColour=&H{font_color}{background_filter}'"
-        
-        command = [
-            'ffmpeg',
-            '-i', video_path,
-            '-vf', subtitle_filter,
-            '-c:a', 'copy',
-            output_path
-        ]
+        if mode == 'mux':
+            for track in tracks:
+                subtitle_tracks.append({**track, 'path': download_file(track['url'], settings.TEMP_DIR)})
+            logger.info(f"Job {job_id}: {len(subtitle_tracks)} pistas de subtítulos descargadas")
+            
+            fingerprint, cached_url = lookup_cached_result('add_captions_to_video', {
+                'mode': mode,
+                'container': container,
+                'tracks': [
+                    {key: track.get(key) for key in ('language', 'title', 'default')}
+                    for track in tracks
+                ]
+            }, [video_path] + [track['path'] for track in subtitle_tracks], no_cache)
+        else:
+            subtitles_path = download_file(subtitles_url, settings.TEMP_DIR)
+            logger.info(f"Job {job_id}: Subtítulos descargados: {subtitles_path}")
+            
+            fingerprint, cached_url = lookup_cached_result('add_captions_to_video', {
+                'font': font,
+                'font_size': font_size,
+                'font_color': font_color,
+                'background': background,
+                'position': position,
+                'encoding_profile': profile
+            }, [video_path, subtitles_path], no_cache)
+        
+        if cached_url:
+            logger.info(f"Job {job_id}: Resultado obtenido de caché: {cached_url}")
+            if webhook_url:
+                notify_job_completed(job_id, webhook_url, cached_url)
+            return cached_url
+        
+        if mode == 'mux':
+            # Las pistas se normalizan en proceso para que FFmpeg solo copie texto ya limpio
+            subtitle_format = SUBTITLE_MUX_FORMATS[container]
+            for track in subtitle_tracks:
+                track['source_path'] = track['path']
+                track['path'] = save_subtitles(
+                    load_subtitles(track['source_path']),
+                    generate_temp_filename(prefix=f"{job_id}_track_", suffix=f".{subtitle_format}")
+                )
+            
+            output_path = generate_temp_filename(prefix=f"{job_id}_captioned_", suffix=f".{container}")
+            command = build_subtitle_mux_command(video_path, subtitle_tracks, output_path, container)
+        else:
+            output_path = generate_temp_filename(prefix=f"{job_id}_captioned_", suffix=".mp4")
+            
+            # El estilo se inyecta en un ASS generado en proceso en lugar de usar force_style
+            styled_subtitles = apply_style(
+                load_subtitles(subtitles_path),
+                build_caption_style(resolve_font(font)['family'], font_size, font_color, background, position)
+            )
+            ass_path = save_subtitles(
+                styled_subtitles,
+                generate_temp_filename(prefix=f"{job_id}_styled_", suffix=".ass")
+            )
+            
+            # Sin fontsdir: las fuentes llegan por fontconfig con la caché precalculada
+            subtitle_filter = f"subtitles={ass_path}"
+            
+            command = [
+                'ffmpeg',
+                '-i', video_path,
+                '-vf', subtitle_filter,
+                *build_video_encoding_args(profile['name']),
+                '-c:a', 'copy',
+                output_path
+            ]
         
         run_ffmpeg_command(command)
         
@@ -51,6 +203,7 @@ def add_captions_to_video(video_url, subtitles_url, font='Arial', font_size=24,
             raise ProcessingError("El archivo de video con subtítulos no es válido")
         
         result_url = store_file(output_path)
+        save_cached_result(fingerprint, 'add_captions_to_video', result_url)
         logger.info(f"Job {job_id}: Video con subtítulos procesado y almacenado: {result_url}")
         
         if webhook_url:
@@ -67,7 +220,11 @@ def add_captions_to_video(video_url, subtitles_url, font='Arial', font_size=24,
         raise
         
     finally:
-        for file_path in [video_path, subtitles_path, output_path]:
+        temp_files = [video_path, subtitles_path, ass_path, output_path]
+        for track in subtitle_tracks:
+            temp_files.extend([track.get('source_path'), track['path']])
+        
+        for file_path in temp_files:
             if file_path and os.path.exists(file_path):
                 try:
                     os.remove(file_path)
@@ -76,11 +233,12 @@ def add_captions_to_video(video_url, subtitles_url, font='Arial', font_size=24,
                     logger.warning(f"Error eliminando archivo temporal {file_path}: {str(e)}")
 
 def process_meme_overlay(video_url, meme_url, position='bottom_right', scale=0.3, 
-                        job_id=None, webhook_url=None):
+                        job_id=None, webhook_url=None, no_cache=False, encoding_profile=None):
     if not job_id:
         job_id = str(uuid.uuid4())
     
-    logger.info(f"Job {job_id}: Iniciando procesamiento de meme overlay en video {video_url}")
+    profile = get_encoding_profile(encoding_profile)
+    logger.info(f"Job {job_id}: Iniciando procesamiento de meme overlay en video {video_url} (perfil {profile['name']})")
     
     video_path = None
     meme_path = None
@@ -93,6 +251,18 @@ def process_meme_overlay(video_url, meme_url, position='bottom_right', scale=0.3
         meme_path = download_file(meme_url, settings.TEMP_DIR)
         logger.info(f"Job {job_id}: Meme descargado: {meme_path}")
         
+        fingerprint, cached_url = lookup_cached_result('process_meme_overlay', {
+            'position': position,
+            'scale': scale,
+            'encoding_profile': profile
+        }, [video_path, meme_path], no_cache)
+        
+        if cached_url:
+            logger.info(f"Job {job_id}: Resultado obtenido de caché: {cached_url}")
+            if webhook_url:
+                notify_job_completed(job_id, webhook_url, cached_url)
+            return cached_url
+        
         video_info = get_media_info(video_path)
         video_width = int(video_info.get('width', 0))
         video_height = int(video_info.get('height', 0))
@@ -115,15 +285,18 @@ def process_meme_overlay(video_url, meme_url, position='bottom_right', scale=0.3
             overlay_x = f"W-w*{scale}-10"
             overlay_y = "10"
         
-        filter_complex = f"[0:v][1:v] overlay={overlay_x}:{overlay_y}:enable='between(t,0,999999)'[out]"
+        # Los memes estáticos se normalizan a un frame RGBA en caché; los animados se usan tal cual
+        prepared_path = prepare_overlay_image(meme_path)
+        filter_complex = build_overlay_filter(overlay_x, overlay_y)
         
         command = [
             'ffmpeg',
             '-i', video_path,
-            '-i', meme_path,
+            '-i', prepared_path or meme_path,
             '-filter_complex', filter_complex,
             '-map', '[out]',
             '-map', '0:a?',
+            *build_video_encoding_args(profile['name']),
             '-c:a', 'copy',
             output_path
         ]
@@ -134,6 +307,7 @@ def process_meme_overlay(video_url, meme_url, position='bottom_right', scale=0.3
             raise ProcessingError("El archivo de video con meme no es válido")
         
         result_url = store_file(output_path)
+        save_cached_result(fingerprint, 'process_meme_overlay', result_url)
         logger.info(f"Job {job_id}: Video con meme procesado y almacenado: {result_url}")
         
         if webhook_url:
@@ -158,7 +332,7 @@ def process_meme_overlay(video_url, meme_url, position='bottom_right', scale=0.3
                 except Exception as e:
                     logger.warning(f"Error eliminando archivo temporal {file_path}: {str(e)}")
 
-def concatenate_videos_service(video_urls, job_id=None, webhook_url=None):
+def concatenate_videos_service(video_urls, job_id=None, webhook_url=None, no_cache=False):
     if not job_id:
         job_id = str(uuid.uuid4())
     
@@ -174,6 +348,14 @@ def concatenate_videos_service(video_urls, job_id=None, webhook_url=None):
             video_paths.append(video_path)
             logger.info(f"Job {job_id}: Video {i+1} descargado: {video_path}")
         
+        fingerprint, cached_url = lookup_cached_result('concatenate_videos_service', {}, video_paths, no_cache)
+        
+        if cached_url:
+            logger.info(f"Job {job_id}: Resultado obtenido de caché: {cached_url}")
+            if webhook_url:
+                notify_job_completed(job_id, webhook_url, cached_url)
+            return cached_url
+        
         concat_file = os.path.join(settings.TEMP_DIR, f"{job_id}_concat_list.txt")
         with open(concat_file, 'w') as f:
             for video_path in video_paths:
@@ -196,6 +378,7 @@ def concatenate_videos_service(video_urls, job_id=None, webhook_url=None):
             raise ProcessingError("El archivo de video concatenado no es válido")
         
         result_url = store_file(output_path)
+        save_cached_result(fingerprint, 'concatenate_videos_service', result_url)
         logger.info(f"Job {job_id}: Videos concatenados y almacenados: {result_url}")
         
         if webhook_url:
@@ -232,11 +415,12 @@ def concatenate_videos_service(video_urls, job_id=None, webhook_url=None):
                 logger.warning(f"Error eliminando archivo temporal {output_path}: {str(e)}")
 
 def add_audio_to_video(video_url, audio_url, replace_audio=True, audio_volume=1.0, 
-                     job_id=None, webhook_url=None):
+                     job_id=None, webhook_url=None, no_cache=False, encoding_profile=None):
     if not job_id:
         job_id = str(uuid.uuid4())
     
-    logger.info(f"Job {job_id}: Iniciando adición de audio a video {video_url}")
+    profile = get_encoding_profile(encoding_profile)
+    logger.info(f"Job {job_id}: Iniciando adición de audio a video {video_url} (perfil {profile['name']})")
     
     video_path = None
     audio_path = None
@@ -249,6 +433,18 @@ def add_audio_to_video(video_url, audio_url, replace_audio=True, audio_volume=1.
         audio_path = download_file(audio_url, settings.TEMP_DIR)
         logger.info(f"Job {job_id}: Audio descargado: {audio_path}")
         
+        fingerprint, cached_url = lookup_cached_result('add_audio_to_video', {
+            'replace_audio': replace_audio,
+            'audio_volume': audio_volume,
+            'encoding_profile': profile
+        }, [video_path, audio_path], no_cache)
+        
+        if cached_url:
+            logger.info(f"Job {job_id}: Resultado obtenido de caché: {cached_url}")
+            if webhook_url:
+                notify_job_completed(job_id, webhook_url, cached_url)
+            return cached_url
+        
         output_path = generate_temp_filename(prefix=f"{job_id}_audio_video_", suffix=".mp4")
         
         if replace_audio:
@@ -260,6 +456,7 @@ def add_audio_to_video(video_url, audio_url, replace_audio=True, audio_volume=1.
                 '-c:v', 'copy',
                 '-map', '0:v:0',
                 '-map', '1:a:0',
+                *build_audio_encoding_args(profile['name']),
                 '-shortest',
                 output_path
             ]
@@ -273,6 +470,7 @@ def add_audio_to_video(video_url, audio_url, replace_audio=True, audio_volume=1.
                 '-map', '0:v',
                 '-map', '[aout]',
                 '-c:v', 'copy',
+                *build_audio_encoding_args(profile['name']),
                 output_path
             ]
         
@@ -282,6 +480,7 @@ def add_audio_to_video(video_url, audio_url, replace_audio=True, audio_volume=1.
             raise ProcessingError("El archivo de salida no es válido")
         
         result_url = store_file(output_path)
+        save_cached_result(fingerprint, 'add_audio_to_video', result_url)
         logger.info(f"Job {job_id}: Video con audio procesado y almacenado: {result_url}")
         
         if webhook_url:
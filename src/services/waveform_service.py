@@ -0,0 +1,303 @@
+import os
+import json
+import struct
+import logging
+import tempfile
+import subprocess
+import uuid
+import numpy as np
+from ..utils.file_utils import download_file, generate_temp_filename
+from .ffmpeg_service import get_media_info
+from .storage_service import store_file
+from .webhook_service import notify_job_completed, notify_job_failed
+from .cache_service import lookup_cached_result, save_cached_result
+from ..config import settings
+from ..api.middlewares.error_handler import ProcessingError, ValidationError
+
+logger = logging.getLogger(__name__)
+
+# Frecuencia del PCM que se analiza (la de audiowaveform por defecto)
+WAVEFORM_SAMPLE_RATE = 44100
+
+# Muestras leídas del pipe en cada bloque (2 MB de PCM s16le)
+WAVEFORM_CHUNK_SAMPLES = 1 << 20
+
+# Formato .dat de audiowaveform, versión 1: cabecera de 20 bytes y pares
+# (mínimo, máximo) int16 little-endian por píxel
+DAT_VERSION = 1
+DAT_HEADER = struct.Struct('<iIiiI')
+
+class PeakAccumulator:
+    """
+    Calcula los picos mínimo y máximo de cada bloque de `samples_per_pixel`
+    muestras a medida que llega el audio. Solo se guardan los picos y el
+    resto de muestras que aún no completa un bloque.
+    """
+    def __init__(self, samples_per_pixel):
+        self.samples_per_pixel = samples_per_pixel
+        self._mins = []
+        self._maxs = []
+        self._remainder = np.empty(0, dtype=np.int16)
+    
+    def add(self, samples):
+        if len(self._remainder):
+            samples = np.concatenate((self._remainder, samples))
+        
+        whole = len(samples) // self.samples_per_pixel * self.samples_per_pixel
+        
+        if whole:
+            blocks = samples[:whole].reshape(-1, self.samples_per_pixel)
+            self._mins.append(blocks.min(axis=1))
+            self._maxs.append(blocks.max(axis=1))
+        
+        # Copia: el buffer de lectura se reutiliza en el siguiente bloque
+        self._remainder = samples[whole:].copy()
+    
+    def finish(self):
+        """Devuelve los arrays (mínimos, máximos) incluyendo el último bloque parcial."""
+        if len(self._remainder):
+            self._mins.append(np.array([self._remainder.min()], dtype=np.int16))
+            self._maxs.append(np.array([self._remainder.max()], dtype=np.int16))
+            self._remainder = np.empty(0, dtype=np.int16)
+        
+        if not self._mins:
+            return np.empty(0, dtype=np.int16), np.empty(0, dtype=np.int16)
+        
+        return np.concatenate(self._mins), np.concatenate(self._maxs)
+
+def parse_zoom_levels(zoom_levels=None):
+    """
+    Normaliza los niveles de zoom (muestras por píxel).
+    
+    Raises:
+        ValidationError: Si algún nivel no es un entero positivo
+    """
+    levels = zoom_levels or settings.WAVEFORM_ZOOM_LEVELS
+    
+    try:
+        levels = sorted({int(level) for level in levels})
+    except (TypeError, ValueError):
+        raise ValidationError("Los niveles de zoom deben ser enteros")
+    
+    if not levels or levels[0] < 1:
+        raise ValidationError("Los niveles de zoom deben ser enteros positivos")
+    
+    return levels
+
+def build_pcm_stream_command(media_path, sample_rate=WAVEFORM_SAMPLE_RATE):
+    """Comando FFmpeg que escribe la primera pista de audio como PCM s16le mono en stdout."""
+    return [
+        'ffmpeg',
+        '-v', 'error',
+        '-i', media_path,
+        '-map', '0:a:0',
+        '-vn', '-sn', '-dn',
+        '-ac', '1',
+        '-ar', str(sample_rate),
+        '-f', 's16le',
+        'pipe:1'
+    ]
+
+def _read_into(stream, view):
+    filled = 0
+    while filled < len(view):
+        count = stream.readinto(view[filled:])
+        if not count:
+            break
+        filled += count
+    return filled
+
+def compute_waveform_peaks(media_path, zoom_levels, sample_rate=WAVEFORM_SAMPLE_RATE):
+    """
+    Decodifica el audio en streaming y calcula los picos de cada nivel.
+    
+    El PCM se lee por bloques de WAVEFORM_CHUNK_SAMPLES muestras en un único
+    buffer, de modo que la memoria no depende de la duración del audio.
+    
+    Args:
+        media_path: Ruta del archivo
+        zoom_levels: Lista de muestras por píxel
+        sample_rate: Frecuencia de muestreo del análisis
+    
+    Returns:
+        Tupla (dict {muestras_por_píxel: (mínimos, máximos)}, muestras leídas)
+    
+    Raises:
+        ProcessingError: Si FFmpeg falla
+    """
+    accumulators = [PeakAccumulator(level) for level in zoom_levels]
+    buffer = bytearray(WAVEFORM_CHUNK_SAMPLES * 2)
+    view = memoryview(buffer)
+    sample_count = 0
+    
+    command = build_pcm_stream_command(media_path, sample_rate)
+    logger.debug(f"Ejecutando comando FFmpeg: {' '.join(command)}")
+    
+    # stderr va a un archivo para que el pipe no se bloquee
+    with tempfile.TemporaryFile(dir=settings.TEMP_DIR) as log_file:
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=log_file, bufsize=0)
+        
+        try:
+            while True:
+                filled = _read_into(process.stdout, view)
+                samples = np.frombuffer(buffer, dtype='<i2', count=filled // 2)
+                
+                if len(samples):
+                    for accumulator in accumulators:
+                        accumulator.add(samples)
+                    sample_count += len(samples)
+                
+                if filled < len(buffer):
+                    break
+            
+            returncode = process.wait()
+            
+            if returncode != 0:
+                log_file.seek(0)
+                stderr = log_file.read().decode('utf-8', errors='replace').strip()
+                logger.error(f"Error FFmpeg (código {returncode}): {stderr}")
+                raise ProcessingError(f"Error FFmpeg: {stderr.splitlines()[-1] if stderr else 'Desconocido'}")
+        
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            process.stdout.close()
+    
+    peaks = {accumulator.samples_per_pixel: accumulator.finish() for accumulator in accumulators}
+    return peaks, sample_count
+
+def encode_waveform_dat(mins, maxs, sample_rate, samples_per_pixel):
+    """Serializa los picos en el formato binario .dat de audiowaveform (16 bits)."""
+    data = np.empty(len(mins) * 2, dtype='<i2')
+    data[0::2] = mins
+    data[1::2] = maxs
+    return DAT_HEADER.pack(DAT_VERSION, 0, sample_rate, samples_per_pixel, len(mins)) + data.tobytes()
+
+def decode_waveform_dat(data):
+    """Lee un .dat de audiowaveform; devuelve (frecuencia, muestras por píxel, mínimos, máximos)."""
+    version, flags, sample_rate, samples_per_pixel, length = DAT_HEADER.unpack_from(data)
+    
+    if version != DAT_VERSION:
+        raise ValidationError(f"Versión de waveform no soportada: {version}")
+    
+    dtype = '<i1' if flags & 1 else '<i2'
+    values = np.frombuffer(data, dtype=dtype, count=length * 2, offset=DAT_HEADER.size)
+    return sample_rate, samples_per_pixel, values[0::2], values[1::2]
+
+def build_waveform_json(mins, maxs, sample_rate, samples_per_pixel):
+    """
+    Picos en el formato JSON de audiowaveform, reducidos a 8 bits para que
+    el editor los cargue rápido (el .dat conserva los 16 bits).
+    """
+    data = np.empty(len(mins) * 2, dtype=np.int16)
+    data[0::2] = mins >> 8
+    data[1::2] = maxs >> 8
+    
+    return {
+        'version': 2,
+        'channels': 1,
+        'sample_rate': sample_rate,
+        'samples_per_pixel': samples_per_pixel,
+        'bits': 8,
+        'length': len(mins),
+        'data': data.tolist()
+    }
+
+def generate_waveform(media_url, zoom_levels=None, job_id=None, webhook_url=None, no_cache=False):
+    """
+    Genera los datos de forma de onda de un audio o video.
+    
+    Args:
+        media_url: URL del archivo
+        zoom_levels: Muestras por píxel de cada nivel (por defecto WAVEFORM_ZOOM_LEVELS)
+        job_id: ID del trabajo (opcional)
+        webhook_url: URL para notificar cuando se complete (opcional)
+        no_cache: Omitir la consulta a la caché de resultados
+    
+    Returns:
+        Dict con la frecuencia de muestreo, la duración y, por nivel, el
+        número de píxeles y las URLs del .dat y del JSON
+    """
+    if not job_id:
+        job_id = str(uuid.uuid4())
+    
+    levels = parse_zoom_levels(zoom_levels)
+    logger.info(f"Job {job_id}: Iniciando forma de onda de {media_url} (niveles {levels})")
+    
+    media_path = None
+    output_paths = []
+    
+    try:
+        media_path = download_file(media_url, settings.TEMP_DIR)
+        logger.info(f"Job {job_id}: Archivo descargado: {media_path}")
+        
+        fingerprint, cached_result = lookup_cached_result('generate_waveform', {
+            'zoom_levels': levels,
+            'sample_rate': WAVEFORM_SAMPLE_RATE
+        }, [media_path], no_cache)
+        
+        if cached_result:
+            logger.info(f"Job {job_id}: Resultado servido desde caché")
+            if webhook_url:
+                notify_job_completed(job_id, webhook_url, cached_result)
+            return cached_result
+        
+        if 'audio_codec' not in get_media_info(media_path):
+            raise ValidationError("El archivo no contiene una pista de audio")
+        
+        peaks, sample_count = compute_waveform_peaks(media_path, levels)
+        
+        if not sample_count:
+            raise ProcessingError("No se decodificó audio del archivo")
+        
+        result = {
+            "sample_rate": WAVEFORM_SAMPLE_RATE,
+            "duration": round(sample_count / WAVEFORM_SAMPLE_RATE, 3),
+            "levels": []
+        }
+        
+        for level in levels:
+            mins, maxs = peaks[level]
+            
+            dat_path = generate_temp_filename(prefix=f"{job_id}_waveform_{level}_", suffix=".dat")
+            output_paths.append(dat_path)
+            with open(dat_path, 'wb') as f:
+                f.write(encode_waveform_dat(mins, maxs, WAVEFORM_SAMPLE_RATE, level))
+            
+            json_path = generate_temp_filename(prefix=f"{job_id}_waveform_{level}_", suffix=".json")
+            output_paths.append(json_path)
+            with open(json_path, 'w') as f:
+                json.dump(build_waveform_json(mins, maxs, WAVEFORM_SAMPLE_RATE, level), f, separators=(',', ':'))
+            
+            result["levels"].append({
+                "samples_per_pixel": level,
+                "length": len(mins),
+                "dat_url": store_file(dat_path),
+                "json_url": store_file(json_path)
+            })
+        
+        save_cached_result(fingerprint, 'generate_waveform', result)
+        logger.info(f"Job {job_id}: Forma de onda generada ({sample_count} muestras, {len(levels)} niveles)")
+        
+        if webhook_url:
+            notify_job_completed(job_id, webhook_url, result)
+        
+        return result
+    
+    except Exception as e:
+        logger.exception(f"Job {job_id}: Error generando forma de onda: {str(e)}")
+        
+        if webhook_url:
+            notify_job_failed(job_id, webhook_url, str(e))
+        
+        raise
+    
+    finally:
+        for file_path in [media_path, *output_paths]:
+            if file_path and os.path.exists(file_path):
+                try:
+                    os.remove(file_path)
+                    logger.debug(f"Job {job_id}: Archivo temporal eliminado: {file_path}")
+                except Exception as e:
+                    logger.warning(f"Error eliminando archivo temporal {file_path}: {str(e)}")
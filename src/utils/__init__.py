@@ -24,7 +24,21 @@ __all__ = [
     'is_valid_filename',
     'safe_delete_file',
     'get_file_extension',
-    'verify_file_integrity'
+    'verify_file_integrity',
+    'compute_file_hash',
+    
+    # cache_utils
+    'get_cache_path',
+    'atomic_write',
+    'read_json_cache',
+    'write_json_cache',
+    
+    # frame_utils
+    'frames_from_buffer',
+    'compute_frame_metrics',
+    'score_frames',
+    'select_best_frame',
+    'iter_images'
 ]
 
 # Use lazy loading to avoid circular imports
@@ -40,8 +54,14 @@ def __getattr__(name):
         if name == 'TaskStatus':
             return TaskStatus
         return locals()[name]
-    elif name in ['download_file', 'generate_temp_filename', 'is_valid_filename', 'safe_delete_file', 'get_file_extension', 'verify_file_integrity']:
-        from .file_utils import download_file, generate_temp_filename, is_valid_filename, safe_delete_file, get_file_extension, verify_file_integrity
+    elif name in ['download_file', 'generate_temp_filename', 'is_valid_filename', 'safe_delete_file', 'get_file_extension', 'verify_file_integrity', 'compute_file_hash']:
+        from .file_utils import download_file, generate_temp_filename, is_valid_filename, safe_delete_file, get_file_extension, verify_file_integrity, compute_file_hash
+        return locals()[name]
+    elif name in ['get_cache_path', 'atomic_write', 'read_json_cache', 'write_json_cache']:
+        from .cache_utils import get_cache_path, atomic_write, read_json_cache, write_json_cache
+        return locals()[name]
+    elif name in ['frames_from_buffer', 'compute_frame_metrics', 'score_frames', 'select_best_frame', 'iter_images']:
+        from .frame_utils import frames_from_buffer, compute_frame_metrics, score_frames, select_best_frame, iter_images
         return locals()[name]
     
     raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
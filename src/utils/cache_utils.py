@@ -0,0 +1,63 @@
+import os
+import json
+import uuid
+import logging
+from typing import Any, Optional
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+def get_cache_path(namespace: str, key: str, suffix: str = '.json') -> str:
+    """
+    Devuelve la ruta de una entrada de la caché en disco, creando el
+    directorio del espacio de nombres si no existe.
+    """
+    directory = os.path.join(settings.CACHE_DIR, namespace)
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f"{key}{suffix}")
+
+def atomic_write(path: str, data: bytes) -> str:
+    """
+    Escribe un archivo de forma atómica (archivo temporal + rename), de modo
+    que otros procesos nunca vean una entrada a medio escribir.
+    """
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    return path
+
+def read_json_cache(namespace: str, key: str) -> Optional[Any]:
+    """
+    Lee una entrada JSON de la caché en disco.
+
+    Returns:
+        Datos almacenados o None si no existe o está corrupta
+    """
+    path = get_cache_path(namespace, key)
+
+    if not os.path.exists(path):
+        return None
+
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Entrada de caché inválida {path}: {str(e)}")
+        return None
+
+def write_json_cache(namespace: str, key: str, data: Any) -> str:
+    """
+    Guarda una entrada JSON en la caché en disco.
+
+    Returns:
+        Ruta de la entrada almacenada
+    """
+    path = get_cache_path(namespace, key)
+    return atomic_write(path, json.dumps(data, ensure_ascii=False).encode('utf-8'))
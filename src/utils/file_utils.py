@@ -1,4 +1,5 @@
 import os
+import hashlib
 import requests
 import uuid
 import logging
@@ -21,6 +22,11 @@ def download_file(url: str, target_dir: Optional[str] = None, prefix: Optional[s
     if not url or not isinstance(url, str):
         raise ValidationError("La URL no puede estar vacía o no ser una cadena de texto")
     
+    # Assets registrados: se sirven desde la caché local sin descarga
+    if url.startswith('asset://'):
+        from ..services.asset_service import materialize_asset
+        return materialize_asset(url, target_dir, prefix)
+    
     try:
         parsed_url = urlparse(url)
         if not parsed_url.scheme or not parsed_url.netloc:
@@ -128,3 +134,15 @@ def verify_file_integrity(file_path):
     except Exception as e:
         logger.error(f"Error verificando integridad de archivo {file_path}: {str(e)}")
         return False
+
+def compute_file_hash(file_path: str, algorithm: str = 'sha256', chunk_size: int = 1024 * 1024) -> str:
+    """
+    Calcula el hash del contenido de un archivo leyéndolo por bloques.
+    """
+    hasher = hashlib.new(algorithm)
+    
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            hasher.update(chunk)
+    
+    return hasher.hexdigest()
@@ -0,0 +1,237 @@
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Coeficientes de luminancia BT.601
+LUMA_WEIGHTS = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+# Pesos de cada métrica en la puntuación final
+SCORE_WEIGHTS = {
+    'brightness': 1.0,
+    'contrast': 1.0,
+    'sharpness': 1.5,
+    'colorfulness': 0.5
+}
+
+# Frames por debajo/encima de este brillo medio se consideran negros/blancos
+MIN_BRIGHTNESS = 20.0
+MAX_BRIGHTNESS = 235.0
+
+# Frames con menor desviación de luminancia se consideran planos
+MIN_CONTRAST = 8.0
+
+def frames_from_buffer(buffer, width, height, channels=3):
+    """
+    Interpreta la salida rawvideo de FFmpeg como un array de frames sin
+    copiar los datos.
+    
+    Args:
+        buffer: Bytes con frames consecutivos en formato rgb24
+        width: Ancho de cada frame
+        height: Alto de cada frame
+        channels: Canales por píxel
+        
+    Returns:
+        Array de solo lectura con forma (n, height, width, channels)
+    """
+    frame_size = width * height * channels
+    frame_count = len(buffer) // frame_size
+    
+    if frame_count == 0:
+        return np.empty((0, height, width, channels), dtype=np.uint8)
+    
+    # Se ignora un posible frame incompleto al final
+    return np.frombuffer(buffer, dtype=np.uint8, count=frame_count * frame_size).reshape(
+        frame_count, height, width, channels
+    )
+
+def compute_frame_metrics(frames):
+    """
+    Calcula métricas de calidad para un lote de frames RGB.
+    
+    Todas las operaciones se realizan sobre el lote completo, sin bucles
+    por frame.
+    
+    Args:
+        frames: Array uint8 con forma (n, height, width, 3)
+        
+    Returns:
+        Dict de arrays (n,) con brillo, contraste, nitidez (varianza del
+        laplaciano) y colorido (Hasler-Süsstrunk)
+    """
+    rgb = frames.astype(np.float32)
+    luma = rgb @ LUMA_WEIGHTS
+    
+    laplacian = (
+        luma[:, :-2, 1:-1] + luma[:, 2:, 1:-1] +
+        luma[:, 1:-1, :-2] + luma[:, 1:-1, 2:] -
+        4.0 * luma[:, 1:-1, 1:-1]
+    )
+    
+    red, green, blue = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    rg = red - green
+    yb = 0.5 * (red + green) - blue
+    
+    colorfulness = (
+        np.sqrt(rg.std(axis=(1, 2)) ** 2 + yb.std(axis=(1, 2)) ** 2) +
+        0.3 * np.sqrt(rg.mean(axis=(1, 2)) ** 2 + yb.mean(axis=(1, 2)) ** 2)
+    )
+    
+    return {
+        'brightness': luma.mean(axis=(1, 2)),
+        'contrast': luma.std(axis=(1, 2)),
+        'sharpness': laplacian.var(axis=(1, 2)),
+        'colorfulness': colorfulness
+    }
+
+def _normalize(values):
+    peak = values.max() if values.size else 0
+    return values / peak if peak > 0 else np.zeros_like(values)
+
+def score_frames(frames):
+    """
+    Puntúa un lote de frames para elegir una miniatura representativa.
+    
+    Los frames negros, blancos o planos (fundidos, cortinillas) reciben la
+    peor puntuación posible.
+    
+    Args:
+        frames: Array uint8 con forma (n, height, width, 3)
+        
+    Returns:
+        Array (n,) de puntuaciones, mayor es mejor
+    """
+    metrics = compute_frame_metrics(frames)
+    brightness = metrics['brightness']
+    
+    # Preferir exposición media: 1 en gris medio, 0 en negro/blanco puro
+    exposure = 1.0 - np.abs(brightness - 128.0) / 128.0
+    
+    scores = (
+        SCORE_WEIGHTS['brightness'] * exposure +
+        SCORE_WEIGHTS['contrast'] * _normalize(metrics['contrast']) +
+        SCORE_WEIGHTS['sharpness'] * _normalize(metrics['sharpness']) +
+        SCORE_WEIGHTS['colorfulness'] * _normalize(metrics['colorfulness'])
+    )
+    
+    unusable = (
+        (brightness < MIN_BRIGHTNESS) |
+        (brightness > MAX_BRIGHTNESS) |
+        (metrics['contrast'] < MIN_CONTRAST)
+    )
+    
+    return np.where(unusable, -1.0, scores)
+
+def select_best_frame(frames):
+    """
+    Devuelve el índice del frame con mejor puntuación, o None si el lote
+    está vacío.
+    """
+    if len(frames) == 0:
+        return None
+    
+    return int(np.argmax(score_frames(frames)))
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+def _find_jpeg_end(buffer):
+    """
+    Devuelve la posición final del primer JPEG completo del buffer, o -1 si
+    aún no está completo. Recorre los segmentos por su longitud para no
+    confundir bytes de datos con el marcador EOI.
+    """
+    if len(buffer) < 2:
+        return -1
+    if buffer[0] != 0xFF or buffer[1] != 0xD8:
+        raise ValueError("Flujo JPEG inválido: falta el marcador SOI")
+    
+    pos = 2
+    while True:
+        if pos + 2 > len(buffer):
+            return -1
+        if buffer[pos] != 0xFF:
+            raise ValueError("Flujo JPEG inválido: marcador esperado")
+        
+        marker = buffer[pos + 1]
+        
+        if marker == 0xD9:
+            return pos + 2
+        if marker == 0xFF:
+            pos += 1
+            continue
+        if 0xD0 <= marker <= 0xD7 or marker == 0x01:
+            pos += 2
+            continue
+        
+        if pos + 4 > len(buffer):
+            return -1
+        pos += 2 + int.from_bytes(buffer[pos + 2:pos + 4], 'big')
+        
+        if marker == 0xDA:
+            # Datos entrópicos: termina en el primer 0xFF que no sea relleno ni RST
+            while True:
+                index = buffer.find(b'\xff', pos)
+                if index == -1 or index + 1 >= len(buffer):
+                    return -1
+                following = buffer[index + 1]
+                if following == 0x00 or 0xD0 <= following <= 0xD7:
+                    pos = index + 2
+                    continue
+                pos = index
+                break
+
+def _find_png_end(buffer):
+    """
+    Devuelve la posición final del primer PNG completo del buffer (tras el
+    chunk IEND), o -1 si aún no está completo.
+    """
+    if len(buffer) < len(PNG_SIGNATURE):
+        return -1
+    if buffer[:len(PNG_SIGNATURE)] != PNG_SIGNATURE:
+        raise ValueError("Flujo PNG inválido: firma incorrecta")
+    
+    pos = len(PNG_SIGNATURE)
+    while True:
+        if pos + 8 > len(buffer):
+            return -1
+        length = int.from_bytes(buffer[pos:pos + 4], 'big')
+        chunk_type = bytes(buffer[pos + 4:pos + 8])
+        pos += 12 + length
+        if pos > len(buffer):
+            return -1
+        if chunk_type == b'IEND':
+            return pos
+
+def iter_images(chunks, image_format='jpg'):
+    """
+    Separa un flujo image2pipe de FFmpeg en imágenes individuales.
+    
+    Solo se mantiene en memoria la imagen en curso, de modo que el consumo
+    no depende de la duración del vídeo.
+    
+    Args:
+        chunks: Iterable de bloques de bytes leídos de FFmpeg
+        image_format: 'jpg' o 'png'
+        
+    Yields:
+        Bytes de cada imagen completa
+        
+    Raises:
+        ValueError: Si el flujo no tiene el formato esperado
+    """
+    find_end = _find_png_end if image_format == 'png' else _find_jpeg_end
+    buffer = bytearray()
+    
+    for chunk in chunks:
+        buffer.extend(chunk)
+        
+        while True:
+            end = find_end(buffer)
+            if end < 0:
+                break
+            yield bytes(buffer[:end])
+            del buffer[:end]
+    
+    if buffer:
+        logger.warning(f"Flujo de imágenes truncado: {len(buffer)} bytes descartados")
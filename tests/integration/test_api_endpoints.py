@@ -50,3 +50,10 @@ def test_validation_error(client, valid_api_key):
     data = json.loads(response.data)
     assert data['status'] == 'error'
     assert 'validation_error' in data['error']
+
+def test_thumb_requires_key_or_signature(client):
+    response = client.get('/thumb/video.mp4?t=1')
+    assert response.status_code == 401
+    
+    response = client.get('/thumb/video.mp4?t=1&exp=9999999999&sig=invalid')
+    assert response.status_code == 401
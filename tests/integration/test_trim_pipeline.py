@@ -0,0 +1,95 @@
+# tests/integration/test_trim_pipeline.py
+import json
+import shutil
+import subprocess
+import pytest
+from unittest.mock import patch
+from src.config import settings
+# error_handler has to load before the services to avoid the api <-> services import cycle
+import src.api.middlewares.error_handler  # noqa: F401
+from src.services.trim_service import trim_video
+from src.services import keyframe_service
+
+pytestmark = pytest.mark.skipif(
+    not (shutil.which('ffmpeg') and shutil.which('ffprobe')),
+    reason="requires ffmpeg and ffprobe"
+)
+
+FRAME_RATE = 25
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    for name in ['TEMP_DIR', 'CACHE_DIR']:
+        directory = tmp_path / name.lower()
+        directory.mkdir()
+        monkeypatch.setattr(settings, name, str(directory))
+    keyframe_service._index_cache.clear()
+    yield tmp_path
+    keyframe_service._index_cache.clear()
+
+def _generate_source(path, container_args=()):
+    # 10 s de H.264 con un keyframe cada 2 s y audio AAC
+    subprocess.run([
+        'ffmpeg', '-v', 'error', '-y',
+        '-f', 'lavfi', '-i', f"testsrc=size=320x240:rate={FRAME_RATE}",
+        '-f', 'lavfi', '-i', 'sine=frequency=440:sample_rate=48000',
+        '-t', '10',
+        '-c:v', 'libx264', '-preset', 'ultrafast', '-g', str(FRAME_RATE * 2), '-keyint_min', str(FRAME_RATE * 2),
+        '-sc_threshold', '0', '-pix_fmt', 'yuv420p',
+        '-c:a', 'aac',
+        *container_args,
+        str(path)
+    ], check=True)
+
+def _probe_streams(path):
+    output = subprocess.run([
+        'ffprobe', '-v', 'error', '-count_frames',
+        '-show_entries', 'stream=codec_type,nb_read_frames,duration',
+        '-of', 'json', str(path)
+    ], check=True, stdout=subprocess.PIPE, text=True).stdout
+    return {stream['codec_type']: stream for stream in json.loads(output)['streams']}
+
+def _run_trim(workdir, source, ranges):
+    stored = {}
+
+    def fake_download(url, directory):
+        path = workdir / 'temp_dir' / f"input{source.suffix}"
+        shutil.copy(source, path)
+        return str(path)
+
+    def fake_store(path):
+        stored['path'] = workdir / 'trimmed.mp4'
+        shutil.copy(path, stored['path'])
+        return 'http://localhost:8080/storage/trimmed.mp4'
+
+    with patch('src.services.trim_service.download_file', side_effect=fake_download), \
+         patch('src.services.trim_service.store_file', side_effect=fake_store), \
+         patch('src.services.trim_service.lookup_cached_result', return_value=(None, None)), \
+         patch('src.services.trim_service.save_cached_result'):
+        result = trim_video('https://example.com/video', ranges, encoding_profile='draft')
+
+    return result, _probe_streams(stored['path'])
+
+@pytest.mark.parametrize('container', ['mp4', 'ts'])
+def test_trim_real_h264_keeps_frames_and_sync(workdir, container):
+    source = workdir / f"source.{container}"
+    # MPEG-TS empieza en un start_time distinto de 0
+    _generate_source(source)
+
+    result, streams = _run_trim(workdir, source, [{'start': 1.5, 'end': 7.3}])
+
+    assert result['copied_duration'] == 4.0
+    assert result['encoded_duration'] == 1.8
+    assert int(streams['video']['nb_read_frames']) == round(5.8 * FRAME_RATE)
+    assert abs(float(streams['audio']['duration']) - 5.8) < 0.05
+    assert abs(float(streams['video']['duration']) - float(streams['audio']['duration'])) < 0.05
+
+def test_trim_real_h264_multiple_ranges(workdir):
+    source = workdir / 'source.mp4'
+    _generate_source(source)
+
+    result, streams = _run_trim(workdir, source, [{'start': 0.5, 'end': 2.5}, {'start': 6.0}])
+
+    assert result['duration'] == 6.0
+    assert int(streams['video']['nb_read_frames']) == 6 * FRAME_RATE
+    assert abs(float(streams['audio']['duration']) - 6.0) < 0.05
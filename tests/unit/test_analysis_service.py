@@ -0,0 +1,87 @@
+# tests/unit/test_analysis_service.py
+import io
+import pytest
+from unittest.mock import patch
+from src.api.middlewares.error_handler import ProcessingError, ValidationError
+from src.services.analysis_service import (
+    AnalysisParser, build_analysis_command, run_analysis_command, analyze_media, DEFAULT_ANALYSIS_PARAMS
+)
+
+FFMPEG_LOG = """Input #0, mov,mp4,m4a,3gp,3g2,mj2, from '/tmp/in.mp4':
+[silencedetect @ 0x1] silence_start: -0.01
+[blackdetect @ 0x2] black_start:0 black_end:1.2 black_duration:1.2
+[silencedetect @ 0x1] silence_end: 1.5 | silence_duration: 1.51
+[scdet @ 0x3] lavfi.scd.score: 42.517, lavfi.scd.time: 1.24
+[freezedetect @ 0x4] lavfi.freezedetect.freeze_start: 5
+[freezedetect @ 0x4] lavfi.freezedetect.freeze_duration: 3
+[freezedetect @ 0x4] lavfi.freezedetect.freeze_end: 8
+[silencedetect @ 0x1] silence_start: 9.2
+"""
+
+class FakeProcess:
+    def __init__(self, stderr, returncode=0):
+        self.stderr = io.StringIO(stderr)
+        self.returncode = returncode
+
+    def wait(self):
+        return self.returncode
+
+def test_analysis_parser_builds_timeline():
+    parser = AnalysisParser()
+    for line in FFMPEG_LOG.splitlines(keepends=True):
+        parser.feed(line)
+
+    result = parser.result(10.0)
+
+    assert [(e['type'], e['start'], e['end']) for e in result['events']] == [
+        ('black', 0.0, 1.2),
+        ('silence', 0.0, 1.5),
+        ('scene', 1.24, 1.24),
+        ('freeze', 5.0, 8.0),
+        ('silence', 9.2, 10.0)
+    ]
+    assert result['events'][2]['score'] == 42.517
+    assert result['summary'] == {'scene': 1, 'black': 1, 'freeze': 1, 'silence': 2}
+
+def test_build_analysis_command_single_graph():
+    command = build_analysis_command('/tmp/in.mp4', ['scene', 'black', 'freeze', 'silence'], DEFAULT_ANALYSIS_PARAMS)
+    graph = command[command.index('-filter_complex') + 1]
+
+    assert command.count('-i') == 1
+    assert graph.startswith('[0:v:0]scale=')
+    assert 'scdet=' in graph and 'blackdetect=' in graph and 'freezedetect=' in graph
+    assert ';[0:a:0]silencedetect=noise=-50dB' in graph
+    assert command[-3:] == ['-f', 'null', '-']
+
+def test_build_analysis_command_skips_missing_streams():
+    command = build_analysis_command('/tmp/in.mp3', ['scene', 'silence'], DEFAULT_ANALYSIS_PARAMS, has_video=False)
+    assert command[command.index('-filter_complex') + 1].startswith('[0:a:0]silencedetect')
+
+    with pytest.raises(ValidationError):
+        build_analysis_command('/tmp/in.mp3', ['scene'], DEFAULT_ANALYSIS_PARAMS, has_video=False)
+
+def test_run_analysis_command_error():
+    with patch('src.services.analysis_service.subprocess.Popen',
+               return_value=FakeProcess("/tmp/in.mp4: Invalid data found when processing input\n", 1)):
+        with pytest.raises(ProcessingError):
+            run_analysis_command(['ffmpeg'], AnalysisParser())
+
+@patch('src.services.analysis_service.save_cached_result')
+@patch('src.services.analysis_service.lookup_cached_result', return_value=('fingerprint', None))
+@patch('src.services.analysis_service.get_media_info')
+@patch('src.services.analysis_service.download_file', return_value='/tmp/analysis_input.mp4')
+def test_analyze_media(mock_download, mock_info, mock_lookup, mock_save):
+    mock_info.return_value = {'duration': 10.0, 'video_codec': 'h264', 'audio_codec': 'aac'}
+
+    with patch('src.services.analysis_service.subprocess.Popen', return_value=FakeProcess(FFMPEG_LOG)) as mock_popen:
+        result = analyze_media('https://example.com/video.mp4', params={'scene_threshold': 20})
+
+    assert mock_popen.call_count == 1
+    assert 'scdet=threshold=20.0' in mock_popen.call_args[0][0][mock_popen.call_args[0][0].index('-filter_complex') + 1]
+    assert result['duration'] == 10.0
+    assert len(result['events']) == 5
+    mock_save.assert_called_once_with('fingerprint', 'analyze_media', result)
+
+def test_analyze_media_rejects_unknown_detector():
+    with pytest.raises(ValidationError):
+        analyze_media('https://example.com/video.mp4', detectors=['faces'])
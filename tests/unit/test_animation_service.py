@@ -1,30 +1,39 @@
-# tests/unit/test_video_service.py
+# tests/unit/test_animation_service.py
 import pytest
 import os
 from unittest.mock import patch, MagicMock
 # Import directly from the module, not through __init__
-from src.services.video_service import add_captions_to_video, process_meme_overlay
+from src.services.animation_service import animated_text_service, build_animation_subtitles
+from src.services.subtitle_service import write_subtitles
 from src.api.middlewares.error_handler import ProcessingError
 
 @pytest.fixture
 def mock_paths():
     return {
-        'video_path': '/tmp/test_video.mp4',
+        'video_path': '/tmp/test_animation_video.mp4',
+        'ass_path': '/tmp/test_animation.ass',
         'output_path': '/tmp/output.mp4'
     }
 
+def _write_output(command):
+    with open(command[-1], 'w') as f:
+        f.write('video')
+
+@patch('src.services.animation_service.lookup_cached_result', return_value=(None, None))
+@patch('src.services.animation_service.save_cached_result')
 @patch('src.services.animation_service.download_file')
 @patch('src.services.animation_service.generate_temp_filename')
 @patch('src.services.animation_service.get_media_info')
 @patch('src.services.animation_service.run_ffmpeg_command')
 @patch('src.services.animation_service.store_file')
 def test_animated_text_service_success(
-    mock_store_file, mock_run_ffmpeg, mock_get_media_info, mock_gen_temp, mock_download, mock_paths
+    mock_store_file, mock_run_ffmpeg, mock_get_media_info, mock_gen_temp, mock_download,
+    mock_save_cache, mock_lookup_cache, mock_paths
 ):
     mock_download.return_value = mock_paths['video_path']
-    mock_gen_temp.return_value = mock_paths['output_path']
+    mock_gen_temp.side_effect = [mock_paths['output_path'], mock_paths['ass_path']]
     mock_get_media_info.return_value = {'duration': 10.0, 'width': 1280, 'height': 720}
-    mock_run_ffmpeg.return_value = {'success': True}
+    mock_run_ffmpeg.side_effect = _write_output
     mock_store_file.return_value = 'https://example.com/storage/output.mp4'
     
     with open(mock_paths['video_path'], 'w') as f:
@@ -40,24 +49,48 @@ def test_animated_text_service_success(
     assert mock_download.call_count == 1
     assert mock_get_media_info.call_count == 1
     assert mock_run_ffmpeg.call_count == 1
+    assert f"ass={mock_paths['ass_path']}" in mock_run_ffmpeg.call_args[0][0]
     assert mock_store_file.call_count == 1
+    assert not os.path.exists(mock_paths['ass_path'])
     
     if os.path.exists(mock_paths['video_path']):
         os.remove(mock_paths['video_path'])
 
-def test_build_animation_filter():
-    filter_fade = build_animation_filter(
-        text='Test', animation='fade', position='bottom', 
-        font='Arial', font_size=36, color='white', 
-        duration=3.0, video_width=1280, video_height=720
+def _build(animation, text='Test', duration=3.0):
+    return build_animation_subtitles(
+        text=text, animation=animation, position='bottom',
+        font='Arial', font_size=36, color='white',
+        duration=duration, video_width=1280, video_height=720
     )
-    assert 'drawtext=text' in filter_fade
-    assert 'alpha=' in filter_fade
+
+def test_build_animation_subtitles():
+    fade = _build('fade')
+    assert fade['cues'][0]['text'] == '{\\pos(640,648)\\fad(1000,1000)}Test'
+    assert fade['script_info']['PlayResY'] == '720'
+    assert fade['styles'][0]['Fontsize'] == '36'
     
-    filter_slide = build_animation_filter(
-        text='Test', animation='slide', position='bottom', 
-        font='Arial', font_size=36, color='white', 
-        duration=3.0, video_width=1280, video_height=720
-    )
-    assert 'drawtext=text' in filter_slide
-    assert 'x=' in filter_slide
+    slide = _build('slide')
+    assert '\\move(1920,648,640,648,0,1500)' in slide['cues'][0]['text']
+    
+    zoom = _build('zoom')
+    assert '\\t(0,1000,\\fscx100\\fscy100)' in zoom['cues'][0]['text']
+
+def test_build_animation_subtitles_typewriter_uses_karaoke():
+    typewriter = _build('typewriter', text='Hi!', duration=3.0)
+    
+    assert typewriter['cues'][0]['text'] == '{\\pos(640,648)}{\\k80}H{\\k80}i{\\k80}!'
+    assert typewriter['styles'][0]['SecondaryColour'] == '&HFF000000'
+
+def test_build_animation_subtitles_bounce_settles():
+    bounce = _build('bounce', duration=4.0)
+    cues = bounce['cues']
+    
+    assert all('\\move(' in cue['text'] for cue in cues[:-1])
+    assert cues[-1]['end'] == 4.0
+    assert all(a['end'] == b['start'] for a, b in zip(cues, cues[1:]))
+
+def test_build_animation_subtitles_escapes_override_blocks():
+    document = _build('fade', text='{\\b1}bold')
+    ass = write_subtitles(document, 'ass')
+    
+    assert '(\\\u200bb1)bold' in ass
@@ -0,0 +1,108 @@
+# tests/unit/test_asset_service.py
+import os
+import fnmatch
+import pytest
+from unittest.mock import patch
+from src.config import settings
+from src.api.middlewares.error_handler import ValidationError, NotFoundError
+from src.utils.file_utils import download_file
+from src.services.asset_service import (
+    register_asset, get_asset, get_pinned_path, materialize_asset, delete_asset, warm_asset_cache
+)
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    def delete(self, key):
+        return 1 if self.data.pop(key, None) is not None else 0
+
+    def scan_iter(self, match='*'):
+        return [key for key in list(self.data) if fnmatch.fnmatch(key, match)]
+
+@pytest.fixture
+def assets(tmp_path, monkeypatch):
+    for name in ['STORAGE_PATH', 'TEMP_DIR', 'ASSET_CACHE_DIR']:
+        directory = tmp_path / name.lower()
+        directory.mkdir()
+        monkeypatch.setattr(settings, name, str(directory))
+    monkeypatch.setattr(settings, 'MEDIA_URL', 'http://localhost:8080/storage')
+
+    client = FakeRedis()
+    with patch('src.services.asset_service._get_redis_client', return_value=client):
+        yield tmp_path
+
+def _upload(tmp_path, name='logo.png', content=b'\x89PNG logo'):
+    path = tmp_path / 'temp_dir' / f"upload_{name}"
+    path.write_bytes(content)
+    return str(path)
+
+def test_register_asset_stores_and_pins(assets):
+    upload_path = _upload(assets)
+
+    asset = register_asset('image', file_path=upload_path, filename='logo.png', name='Logo')
+
+    assert asset['ref'] == f"asset://{asset['id']}"
+    assert asset['url'].startswith('http://localhost:8080/storage/assets/')
+    assert os.path.exists(get_pinned_path(asset))
+    assert not os.path.exists(upload_path)
+    assert get_asset(asset['id']) == asset
+
+def test_register_asset_rejects_wrong_extension(assets):
+    with pytest.raises(ValidationError):
+        register_asset('font', file_path=_upload(assets), filename='logo.png')
+
+@patch('src.utils.file_utils.requests.get')
+def test_download_file_serves_assets_without_network(mock_get, assets):
+    asset = register_asset('image', file_path=_upload(assets), filename='logo.png')
+
+    first = download_file(asset['ref'], settings.TEMP_DIR)
+    second = download_file(asset['ref'], settings.TEMP_DIR, prefix='job_')
+
+    assert first != second
+    assert os.path.basename(second).startswith('job_')
+    with open(first, 'rb') as f:
+        assert f.read() == b'\x89PNG logo'
+
+    # Los trabajos borran su copia sin afectar a la caché fijada
+    os.remove(first)
+    assert os.path.exists(get_pinned_path(asset))
+    mock_get.assert_not_called()
+
+def test_materialize_asset_unknown(assets):
+    with pytest.raises(NotFoundError):
+        materialize_asset('asset://missing')
+
+def test_warm_asset_cache_repins_and_prunes(assets):
+    asset = register_asset('subtitle', file_path=_upload(assets, 'style.ass', b'[Script Info]'), filename='style.ass')
+    pinned_path = get_pinned_path(asset)
+    os.remove(pinned_path)
+
+    stale_path = os.path.join(os.path.dirname(pinned_path), 'stale.ass')
+    with open(stale_path, 'wb') as f:
+        f.write(b'old')
+
+    stats = warm_asset_cache()
+
+    assert stats == {'cached': 1, 'failed': 0, 'removed': 1}
+    assert os.path.exists(pinned_path)
+    assert not os.path.exists(stale_path)
+
+def test_delete_asset_keeps_shared_content(assets):
+    first = register_asset('image', file_path=_upload(assets), filename='logo.png')
+    second = register_asset('image', file_path=_upload(assets), filename='logo.png')
+
+    delete_asset(first['id'])
+    assert os.path.exists(get_pinned_path(second))
+
+    delete_asset(second['id'])
+    assert not os.path.exists(get_pinned_path(second))
+
+    with pytest.raises(NotFoundError):
+        get_asset(second['id'])
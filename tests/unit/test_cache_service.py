@@ -0,0 +1,96 @@
+# tests/unit/test_cache_service.py
+import pytest
+import json
+from unittest.mock import patch, MagicMock
+from redis.exceptions import ConnectionError as RedisConnectionError
+from src.services import cache_service
+from src.services.cache_service import (
+    build_job_fingerprint, lookup_cached_result, get_cached_result, store_cached_result, normalize_params
+)
+
+@pytest.fixture(autouse=True)
+def reset_cache_client():
+    cache_service._cache_client = None
+    cache_service._cache_unavailable_until = 0.0
+    yield
+    cache_service._cache_client = None
+    cache_service._cache_unavailable_until = 0.0
+
+@pytest.fixture
+def input_file(tmp_path):
+    path = tmp_path / "input.mp4"
+    path.write_bytes(b"video content")
+    return str(path)
+
+def test_normalize_params_ignores_job_fields():
+    params = normalize_params({'scale': 1.0, 'job_id': 'abc', 'webhook_url': 'http://x', 'font': None})
+    assert params == {'scale': 1}
+
+def test_build_job_fingerprint_is_deterministic(input_file):
+    first = build_job_fingerprint('generate_thumbnail', {'time': 5, 'width': 640}, [input_file])
+    second = build_job_fingerprint('generate_thumbnail', {'width': 640, 'time': 5.0, 'job_id': 'x'}, [input_file])
+    other = build_job_fingerprint('generate_thumbnail', {'time': 6, 'width': 640}, [input_file])
+
+    assert first == second
+    assert first != other
+
+def test_build_job_fingerprint_depends_on_content(input_file, tmp_path):
+    other_file = tmp_path / "other.mp4"
+    other_file.write_bytes(b"different content")
+
+    assert build_job_fingerprint('extract_audio', {}, [input_file]) != \
+        build_job_fingerprint('extract_audio', {}, [str(other_file)])
+
+@patch('src.services.cache_service._get_cache_client')
+def test_lookup_cached_result_hit(mock_client, input_file):
+    client = MagicMock()
+    client.get.return_value = json.dumps({'result': 'https://cdn.example.com/out.mp4'})
+    mock_client.return_value = client
+
+    fingerprint, cached = lookup_cached_result('extract_audio', {'format': 'mp3'}, [input_file])
+
+    assert fingerprint
+    assert cached == 'https://cdn.example.com/out.mp4'
+
+@patch('src.services.cache_service._get_cache_client')
+def test_lookup_cached_result_no_cache(mock_client, input_file):
+    fingerprint, cached = lookup_cached_result('extract_audio', {'format': 'mp3'}, [input_file], no_cache=True)
+
+    assert fingerprint
+    assert cached is None
+    assert mock_client.return_value.get.call_count == 0
+
+@patch('src.services.cache_service._get_cache_client', return_value=None)
+def test_get_cached_result_redis_unavailable(mock_client):
+    assert get_cached_result('abc') is None
+    assert store_cached_result('abc', 'extract_audio', 'https://cdn.example.com/out.mp4') is False
+
+@patch('src.services.cache_service.compute_file_hash')
+@patch('src.services.cache_service.redis.from_url')
+def test_cache_skips_redis_without_retrying(mock_from_url, mock_hash, input_file):
+    mock_from_url.return_value.ping.side_effect = RedisConnectionError("Connection refused")
+
+    first = lookup_cached_result('extract_audio', {'format': 'mp3'}, [input_file])
+    second = lookup_cached_result('extract_audio', {'format': 'mp3'}, [input_file])
+
+    # Sin Redis el trabajo sigue sin caché, sin calcular la huella ni reintentar
+    assert first == (None, None)
+    assert second == (None, None)
+    assert mock_from_url.call_count == 1
+    assert mock_hash.call_count == 0
+    assert mock_from_url.call_args.kwargs['socket_connect_timeout'] == cache_service.settings.CACHE_REDIS_TIMEOUT
+
+def test_cache_retries_redis_after_interval(input_file):
+    client = MagicMock()
+    client.get.side_effect = RedisConnectionError("Connection reset")
+    cache_service._cache_client = client
+
+    assert get_cached_result('abc') is None
+    assert cache_service._cache_client is None
+
+    with patch('src.services.cache_service.redis.from_url') as mock_from_url, \
+         patch('src.services.cache_service.time.time', return_value=cache_service._cache_unavailable_until + 1):
+        mock_from_url.return_value.get.return_value = None
+        assert get_cached_result('abc') is None
+
+    assert mock_from_url.call_count == 1
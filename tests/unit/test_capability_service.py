@@ -0,0 +1,74 @@
+# tests/unit/test_capability_service.py
+import pytest
+from unittest.mock import patch
+from src.services import capability_service
+from src.services.capability_service import (
+    _parse_codec_list, _parse_filter_list, _parse_protocols, detect_ffmpeg_capabilities, select_encoder
+)
+
+ENCODERS_OUTPUT = """Encoders:
+ V..... = Video
+ A..... = Audio
+ ------
+ V....D libx264              libx264 H.264 / AVC / MPEG-4 AVC (codec h264)
+ V....D h264_nvenc           NVIDIA NVENC H.264 encoder (codec h264)
+ A....D aac                  AAC (Advanced Audio Coding)
+ A....D libmp3lame           libmp3lame MP3 (MPEG audio layer 3) (codec mp3)
+"""
+
+FILTERS_OUTPUT = """Filters:
+  T.. = Timeline support
+  ... = Other
+ T.C drawtext          V->V       Draw text on top of video frames using libfreetype library.
+ ... subtitles         V->V       Render text subtitles onto input video using the libass library.
+"""
+
+PROTOCOLS_OUTPUT = """Supported file protocols:
+Input:
+  file
+  https
+Output:
+  file
+"""
+
+@pytest.fixture(autouse=True)
+def reset_registry():
+    capability_service._capabilities = None
+    yield
+    capability_service._capabilities = None
+
+def test_parse_outputs():
+    assert _parse_codec_list(ENCODERS_OUTPUT) == ['aac', 'h264_nvenc', 'libmp3lame', 'libx264']
+    assert _parse_filter_list(FILTERS_OUTPUT) == ['drawtext', 'subtitles']
+    assert _parse_protocols(PROTOCOLS_OUTPUT) == {'input': ['file', 'https'], 'output': ['file']}
+
+@patch('src.services.capability_service.write_json_cache')
+@patch('src.services.capability_service.read_json_cache', return_value=None)
+@patch('src.services.capability_service._run')
+def test_detect_ffmpeg_capabilities(mock_run, mock_read_cache, mock_write_cache):
+    outputs = {
+        '-version': 'ffmpeg version 6.1.1 Copyright (c) 2000-2023',
+        '-encoders': ENCODERS_OUTPUT,
+        '-decoders': ENCODERS_OUTPUT,
+        '-filters': FILTERS_OUTPUT,
+        '-protocols': PROTOCOLS_OUTPUT
+    }
+    mock_run.side_effect = lambda command, timeout=30: outputs[command[-1]]
+
+    capabilities = detect_ffmpeg_capabilities()
+
+    assert capabilities['available'] is True
+    assert capabilities['ffmpeg_version'] == '6.1.1'
+    assert 'subtitles' in capabilities['filters']
+    # Los encoders de hardware están desactivados por defecto
+    assert capabilities['preferred_encoders']['h264'] == 'libx264'
+    assert capabilities['preferred_encoders']['mp3'] == 'libmp3lame'
+    assert mock_write_cache.call_count == 1
+
+@patch('src.services.capability_service._run', return_value=None)
+def test_select_encoder_without_ffmpeg(mock_run):
+    assert select_encoder('h264') == 'libx264'
+    assert select_encoder('mp3', default='libmp3lame') == 'libmp3lame'
+    # El registro se detecta una sola vez por proceso
+    select_encoder('aac')
+    assert mock_run.call_count == 2
@@ -0,0 +1,91 @@
+# tests/unit/test_cleanup_service.py
+import os
+import time
+import pytest
+from src.config import settings
+from src.services.cleanup_service import cleanup_thumbnail_cache, cleanup_disk_caches
+
+@pytest.fixture
+def thumbs_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'CACHE_DIR', str(tmp_path))
+    directory = tmp_path / 'thumbs'
+    directory.mkdir()
+    return directory
+
+def _write_thumb(directory, name, size, age):
+    path = directory / name
+    path.write_bytes(b'x' * size)
+    mtime = time.time() - age
+    os.utime(path, (mtime, mtime))
+    return path
+
+def test_cleanup_thumbnail_cache_evicts_old_entries(thumbs_dir, monkeypatch):
+    monkeypatch.setattr(settings, 'THUMB_CACHE_MAX_AGE', 3600)
+    monkeypatch.setattr(settings, 'THUMB_CACHE_MAX_SIZE', 1000)
+    old = _write_thumb(thumbs_dir, 'old.jpg', 10, 7200)
+    recent = _write_thumb(thumbs_dir, 'recent.jpg', 10, 60)
+    
+    result = cleanup_thumbnail_cache()
+    
+    assert result['deleted_count'] == 1
+    assert not old.exists()
+    assert recent.exists()
+
+def test_cleanup_thumbnail_cache_enforces_size(thumbs_dir, monkeypatch):
+    monkeypatch.setattr(settings, 'THUMB_CACHE_MAX_AGE', 3600)
+    monkeypatch.setattr(settings, 'THUMB_CACHE_MAX_SIZE', 250)
+    oldest = _write_thumb(thumbs_dir, 'a.jpg', 100, 300)
+    middle = _write_thumb(thumbs_dir, 'b.jpg', 100, 200)
+    newest = _write_thumb(thumbs_dir, 'c.jpg', 100, 100)
+    
+    result = cleanup_thumbnail_cache()
+    
+    assert result['cache_size_bytes'] == 200
+    assert not oldest.exists()
+    assert middle.exists() and newest.exists()
+
+def test_cleanup_disk_caches_uses_each_namespace_limits(thumbs_dir, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'THUMB_CACHE_MAX_AGE', 3600)
+    monkeypatch.setattr(settings, 'THUMB_CACHE_MAX_SIZE', 1000)
+    monkeypatch.setattr(settings, 'KEYFRAME_CACHE_MAX_AGE', 86400)
+    monkeypatch.setattr(settings, 'KEYFRAME_CACHE_MAX_SIZE', 1000)
+    keyframes_dir = tmp_path / 'keyframes'
+    keyframes_dir.mkdir()
+    thumb = _write_thumb(thumbs_dir, 'old.jpg', 10, 7200)
+    index = _write_thumb(keyframes_dir, 'abc-v2.npz', 10, 7200)
+    stale_index = _write_thumb(keyframes_dir, 'def-v2.npz', 10, 2 * 86400)
+    
+    results = cleanup_disk_caches()
+    
+    assert results['thumbs']['deleted_count'] == 1
+    assert results['keyframes']['deleted_count'] == 1
+    assert not thumb.exists() and not stale_index.exists()
+    assert index.exists()
+
+def test_cleanup_disk_caches_evicts_measurements(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(settings, 'MEASUREMENT_CACHE_MAX_AGE', 3600)
+    monkeypatch.setattr(settings, 'MEASUREMENT_CACHE_MAX_SIZE', 1000)
+    measurements_dir = tmp_path / 'measurements'
+    measurements_dir.mkdir()
+    old = _write_thumb(measurements_dir, 'old.json', 10, 7200)
+    recent = _write_thumb(measurements_dir, 'recent.json', 10, 60)
+    
+    results = cleanup_disk_caches()
+    
+    assert results['measurements']['deleted_count'] == 1
+    assert not old.exists() and recent.exists()
+
+def test_cleanup_disk_caches_evicts_overlays(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(settings, 'OVERLAY_CACHE_MAX_AGE', 3600)
+    monkeypatch.setattr(settings, 'OVERLAY_CACHE_MAX_SIZE', 150)
+    overlays_dir = tmp_path / 'overlays'
+    overlays_dir.mkdir()
+    oldest = _write_thumb(overlays_dir, 'a.png', 100, 120)
+    newest = _write_thumb(overlays_dir, 'b.png', 100, 60)
+    
+    results = cleanup_disk_caches()
+    
+    assert results['overlays']['cache_size_bytes'] == 100
+    assert not oldest.exists() and newest.exists()
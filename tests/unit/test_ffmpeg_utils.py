@@ -5,8 +5,10 @@ import json
 from unittest.mock import patch, MagicMock
 
 # Import directly from the module to avoid circular imports
-from src.services.ffmpeg_service import run_ffmpeg_command, get_media_info
-from src.api.middlewares.error_handler import ProcessingError
+from src.services.ffmpeg_service import (
+    run_ffmpeg_command, get_media_info, get_stream_rotation, build_video_encoding_args, build_audio_encoding_args
+)
+from src.api.middlewares.error_handler import ProcessingError, ValidationError
 
 @pytest.fixture
 def test_video_path():
@@ -78,9 +80,10 @@ def test_run_ffmpeg_command_non_zero_exit(mock_subprocess_run, test_video_path):
     assert "Error: File not found" in str(excinfo.value)
     assert mock_subprocess_run.call_count == 1
 
+@patch('src.services.ffmpeg_service.os.path.exists', return_value=True)
 @patch('subprocess.run')
 @patch('json.loads')
-def test_get_media_info(mock_json_loads, mock_subprocess_run, test_video_path, media_info_sample):
+def test_get_media_info(mock_json_loads, mock_subprocess_run, mock_exists, test_video_path, media_info_sample):
     """Test that media info is correctly extracted from ffprobe output"""
     # Setup the mocks
     mock_process = MagicMock()
@@ -139,3 +142,30 @@ def test_get_media_info_file_not_found(mock_exists, test_video_path):
     
     # Assert that the error message mentions file not found
     assert "not found" in str(excinfo.value).lower()
+
+def test_build_video_encoding_args_draft_profile():
+    """Test that the draft profile maps to a fast x264 preset"""
+    args = build_video_encoding_args('draft')
+    
+    assert args[:2] == ['-c:v', 'libx264']
+    assert args[args.index('-preset') + 1] == 'ultrafast'
+    assert '-crf' in args
+
+def test_build_audio_encoding_args_default_profile():
+    """Test that the default profile provides audio codec and bitrate"""
+    args = build_audio_encoding_args()
+    
+    assert '-c:a' in args
+    assert '-b:a' in args
+
+def test_build_video_encoding_args_unknown_profile():
+    """Test that ValidationError is raised for unknown profiles"""
+    with pytest.raises(ValidationError):
+        build_video_encoding_args('does-not-exist')
+
+def test_get_stream_rotation():
+    """Test rotation from the display matrix side data and the legacy rotate tag"""
+    assert get_stream_rotation({'side_data_list': [{'side_data_type': 'Display Matrix', 'rotation': -90}]}) == 270
+    assert get_stream_rotation({'tags': {'rotate': '90'}}) == 90
+    assert get_stream_rotation({'tags': {'rotate': 'bogus'}}) == 0
+    assert get_stream_rotation({}) == 0
@@ -0,0 +1,99 @@
+# tests/unit/test_font_service.py
+import struct
+import pytest
+from unittest.mock import patch
+from src.services import font_service
+from src.services.font_service import (
+    read_font_names, build_font_registry, build_fontconfig_config, resolve_font, validate_font_registry
+)
+
+def build_font(family, style='Regular', typographic_family=None):
+    """Genera una fuente SFNT mínima con solo la tabla 'name'."""
+    records = [(3, 1, 0x409, 1, family), (3, 1, 0x409, 2, style), (1, 0, 0, 1, 'Mac Name')]
+    if typographic_family:
+        records.append((3, 1, 0x409, 16, typographic_family))
+
+    strings = b''
+    entries = b''
+    for platform_id, encoding_id, language_id, name_id, value in records:
+        encoded = value.encode('mac_roman' if platform_id == 1 else 'utf-16-be')
+        entries += struct.pack('>HHHHHH', platform_id, encoding_id, language_id, name_id, len(encoded), len(strings))
+        strings += encoded
+
+    name_table = struct.pack('>HHH', 0, len(records), 6 + len(entries)) + entries + strings
+    header = struct.pack('>IHHHH', 0x00010000, 1, 16, 0, 0)
+    table_record = struct.pack('>4sIII', b'name', 0, 12 + 16, len(name_table))
+    return header + table_record + name_table
+
+@pytest.fixture(autouse=True)
+def reset_registry(tmp_path):
+    font_service._registry = None
+    with patch.object(font_service.settings, 'CACHE_DIR', str(tmp_path / 'cache')), \
+         patch.object(font_service.settings, 'ASSET_CACHE_DIR', str(tmp_path / 'assets')):
+        yield
+    font_service._registry = None
+
+@pytest.fixture
+def fonts_dir(tmp_path):
+    directory = tmp_path / 'fonts'
+    directory.mkdir()
+    (directory / 'brand.ttf').write_bytes(build_font('Brand Sans', 'Bold'))
+    (directory / 'dejavu.ttf').write_bytes(build_font('DejaVu Sans'))
+    (directory / 'liberation.ttf').write_bytes(build_font('Liberation Sans'))
+    (directory / 'notes.txt').write_text('not a font')
+    with patch.object(font_service.settings, 'FONTS_DIR', str(directory)), \
+         patch.object(font_service.settings, 'FONT_SEARCH_PATHS', []):
+        yield directory
+
+def test_read_font_names(tmp_path):
+    path = tmp_path / 'font.ttf'
+    path.write_bytes(build_font('Inter Display', 'Bold', typographic_family='Inter'))
+
+    assert read_font_names(str(path)) == [{'family': 'Inter', 'style': 'Bold'}]
+
+def test_build_font_registry_uses_disk_cache(fonts_dir):
+    registry = build_font_registry()
+
+    assert set(registry['families']) == {'brand sans', 'dejavu sans', 'liberation sans'}
+    assert registry['families']['brand sans']['styles']['bold'] == str(fonts_dir / 'brand.ttf')
+
+    with patch('src.services.font_service.read_font_names') as mock_read:
+        assert build_font_registry() == registry
+        mock_read.assert_not_called()
+
+    # Un archivo nuevo cambia la huella y obliga a reanalizar
+    (fonts_dir / 'extra.ttf').write_bytes(build_font('Extra'))
+    assert 'extra' in build_font_registry()['families']
+
+def test_resolve_font(fonts_dir):
+    assert resolve_font('brand sans') == {'family': 'Brand Sans', 'path': str(fonts_dir / 'brand.ttf')}
+    assert resolve_font('Arial')['family'] == 'Liberation Sans'
+    assert resolve_font('Comic Sans MS')['family'] == 'DejaVu Sans'
+    assert resolve_font(None)['family'] == 'DejaVu Sans'
+
+def test_resolve_font_without_fonts(tmp_path):
+    with patch.object(font_service.settings, 'FONTS_DIR', str(tmp_path / 'missing')), \
+         patch.object(font_service.settings, 'FONT_SEARCH_PATHS', []):
+        assert resolve_font('Arial') == {'family': 'Arial', 'path': None}
+        assert 'times new roman' in validate_font_registry(font_service.get_font_registry())
+
+def test_build_fontconfig_config():
+    config = build_fontconfig_config(['/app/fonts', '/usr/share/fonts'], '/app/cache/fontconfig')
+
+    assert '<dir>/app/fonts</dir>' in config
+    assert '<dir>/usr/share/fonts</dir>' in config
+    assert '<cachedir>/app/cache/fontconfig</cachedir>' in config
+
+@patch('src.services.font_service.subprocess.run')
+def test_prepare_fontconfig_runs_fc_cache_once(mock_run, fonts_dir, monkeypatch):
+    monkeypatch.delenv('FONTCONFIG_FILE', raising=False)
+    mock_run.return_value.returncode = 0
+
+    registry = font_service.get_font_registry()
+    config_path = font_service.prepare_fontconfig(registry)
+    font_service.prepare_fontconfig(registry)
+
+    assert mock_run.call_count == 1
+    assert font_service.os.environ['FONTCONFIG_FILE'].endswith('fonts.conf')
+    with open(config_path) as f:
+        assert str(fonts_dir) in f.read()
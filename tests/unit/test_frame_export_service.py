@@ -0,0 +1,58 @@
+# tests/unit/test_frame_export_service.py
+import io
+import tarfile
+import zipfile
+import pytest
+from unittest.mock import patch
+from PIL import Image
+from src.utils.frame_utils import iter_images
+from src.services.frame_export_service import FrameArchiveWriter, iter_video_frames, _ChunkBuffer
+
+def _encode(color, image_format):
+    output = io.BytesIO()
+    Image.new('RGB', (64, 48), color).save(output, 'PNG' if image_format == 'png' else 'JPEG')
+    return output.getvalue()
+
+def _chunked(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+@pytest.mark.parametrize('image_format', ['jpg', 'png'])
+def test_iter_images_splits_stream_across_chunks(image_format):
+    images = [_encode(color, image_format) for color in ['red', 'green', 'blue']]
+    
+    result = list(iter_images(_chunked(b''.join(images), 7), image_format))
+    
+    assert result == images
+
+def test_iter_images_rejects_invalid_stream():
+    with pytest.raises(ValueError):
+        list(iter_images([b'not an image'], 'jpg'))
+
+@pytest.mark.parametrize('archive_format', ['zip', 'tar'])
+def test_frame_archive_writer_streams_to_unseekable_target(archive_format):
+    buffer = _ChunkBuffer()
+    output = bytearray()
+    
+    writer = FrameArchiveWriter(buffer, archive_format)
+    for index in range(3):
+        writer.add(f"frame_{index:06d}.jpg", b'frame %d' % index)
+        output.extend(buffer.drain())
+    writer.close()
+    output.extend(buffer.drain())
+    
+    if archive_format == 'zip':
+        with zipfile.ZipFile(io.BytesIO(bytes(output))) as archive:
+            assert archive.read('frame_000002.jpg') == b'frame 2'
+    else:
+        with tarfile.open(fileobj=io.BytesIO(bytes(output))) as archive:
+            assert archive.extractfile('frame_000002.jpg').read() == b'frame 2'
+
+def test_iter_video_frames_reads_pipe(tmp_path):
+    images = [_encode(color, 'jpg') for color in ['red', 'green']]
+    stream_path = tmp_path / 'stream.mjpeg'
+    stream_path.write_bytes(b''.join(images))
+    
+    with patch('src.services.frame_export_service.build_frame_export_command',
+               return_value=['cat', str(stream_path)]), \
+         patch('src.services.frame_export_service.settings.TEMP_DIR', str(tmp_path)):
+        assert list(iter_video_frames('/tmp/video.mp4')) == images
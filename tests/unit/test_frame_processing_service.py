@@ -0,0 +1,163 @@
+# tests/unit/test_frame_processing_service.py
+import io
+import numpy as np
+import pytest
+from PIL import Image
+from unittest.mock import patch
+from src.api.middlewares.error_handler import ProcessingError, ValidationError
+from src.services.frame_processing_service import (
+    FRAME_PROCESSORS, parse_cube_lut, build_frame_encode_command, run_frame_pipeline, cap_batch_size,
+    process_video_frames
+)
+
+class FakeProcess:
+    def __init__(self, stdout=b'', returncode=0):
+        self.stdout = io.BytesIO(stdout)
+        self.stdin = io.BytesIO()
+        self.stdin.close = lambda: None
+        self.returncode = returncode
+
+    def wait(self):
+        return self.returncode
+
+    def poll(self):
+        return self.returncode
+
+    def kill(self):
+        pass
+
+def make_frames(count, height=4, width=6):
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 256, (count, height, width, 3), dtype=np.uint8)
+
+def run_processor(name, frames, params=None, batch_size=4):
+    processor = FRAME_PROCESSORS[name](params)
+    processor.setup(frames.shape[2], frames.shape[1], batch_size)
+    batch = frames.copy()
+    processor.process(batch)
+    return processor, batch
+
+def test_parse_cube_lut_1d_resamples_to_256():
+    size, curves, is_3d = parse_cube_lut("TITLE \"invert\"\nLUT_1D_SIZE 2\n1 1 1\n0 0 0\n")
+
+    assert (size, is_3d) == (2, False)
+    assert curves.shape == (3, 256)
+    assert curves[0, 0] == 255 and curves[0, 255] == 0
+
+def test_parse_cube_lut_rejects_incomplete():
+    with pytest.raises(ValidationError):
+        parse_cube_lut("LUT_3D_SIZE 2\n0 0 0\n")
+
+def test_lut_processor_curves():
+    frames = make_frames(3)
+    _, batch = run_processor('lut', frames, {'contrast': 1.0, 'brightness': 0, 'gamma': 1.0})
+    assert np.array_equal(batch, frames)
+
+    _, batch = run_processor('lut', frames, {'brightness': 255})
+    assert (batch == 255).all()
+
+@patch('src.services.frame_processing_service.download_file')
+def test_lut_processor_3d_cube(mock_download, tmp_path):
+    # LUT 3D de 2x2x2 que intercambia los canales R y B
+    rows = [f"{b} {g} {r}" for b in (0, 1) for g in (0, 1) for r in (0, 1)]
+    cube_path = tmp_path / 'swap.cube'
+    cube_path.write_text("LUT_3D_SIZE 2\n" + "\n".join(rows) + "\n")
+    mock_download.return_value = str(cube_path)
+
+    frames = np.array([[[[255, 0, 0], [0, 255, 0], [10, 200, 130]]]], dtype=np.uint8)
+    _, batch = run_processor('lut', frames, {'lut_url': 'https://example.com/swap.cube'})
+
+    assert batch[0, 0].tolist() == [[0, 0, 255], [0, 255, 0], [255, 255, 0]]
+
+@patch('src.services.frame_processing_service.download_file')
+def test_mask_processor(mock_download, tmp_path):
+    mask = Image.new('L', (6, 4), 0)
+    mask.paste(255, (0, 0, 3, 4))
+    mask_path = tmp_path / 'mask.png'
+    mask.save(mask_path)
+    mock_download.return_value = str(mask_path)
+
+    frames = make_frames(2)
+    _, batch = run_processor('mask', frames, {'mask_url': 'https://example.com/mask.png', 'color': [0, 255, 0]})
+
+    assert np.array_equal(batch[:, :, :2], frames[:, :, :2])
+    assert (batch[:, :, 4:] == [0, 255, 0]).all()
+
+def test_analytics_processor():
+    frames = np.zeros((2, 4, 6, 3), dtype=np.uint8)
+    frames[1] = 255
+    processor, batch = run_processor('analytics', frames)
+
+    result = processor.result()
+    assert processor.modifies_frames is False
+    assert result['brightness'] == [0.0, 255.0]
+    assert result['mean_rgb'] == [127.5, 127.5, 127.5]
+
+def test_build_frame_encode_command():
+    command = build_frame_encode_command('/tmp/in.mp4', '/tmp/out.mp4', 1280, 720, '30000/1001', 'draft')
+
+    assert command[command.index('-s') + 1] == '1280x720'
+    assert command[command.index('-framerate') + 1] == '30000/1001'
+    assert command[command.index('-i') + 1] == 'pipe:0'
+    assert command[-1] == '/tmp/out.mp4'
+
+def test_run_frame_pipeline_batches_frames():
+    frames = make_frames(10)
+    decoder = FakeProcess(frames.tobytes())
+    encoder = FakeProcess()
+
+    with patch('src.services.frame_processing_service.subprocess.Popen', side_effect=[decoder, encoder]):
+        stats = run_frame_pipeline('/tmp/in.mp4', FRAME_PROCESSORS['lut']({'brightness': 255}),
+                                   6, 4, '25', output_path='/tmp/out.mp4', batch_size=4)
+
+    assert stats['frame_count'] == 10
+    assert stats['throughput_fps'] >= 0
+    assert encoder.stdin.getvalue() == b'\xff' * frames.nbytes
+
+def test_run_frame_pipeline_without_output_skips_encoder():
+    decoder = FakeProcess(make_frames(3).tobytes())
+
+    with patch('src.services.frame_processing_service.subprocess.Popen', side_effect=[decoder]) as mock_popen:
+        stats = run_frame_pipeline('/tmp/in.mp4', FRAME_PROCESSORS['analytics'](), 6, 4, '25', batch_size=2)
+
+    assert stats['frame_count'] == 3
+    assert mock_popen.call_count == 1
+
+def test_run_frame_pipeline_decoder_error():
+    decoder = FakeProcess(b'', returncode=1)
+
+    with patch('src.services.frame_processing_service.subprocess.Popen', side_effect=[decoder]):
+        with pytest.raises(ProcessingError):
+            run_frame_pipeline('/tmp/in.mp4', FRAME_PROCESSORS['analytics'](), 6, 4, '25')
+
+def test_cap_batch_size_by_bytes():
+    lut = FRAME_PROCESSORS['lut']()
+    analytics = FRAME_PROCESSORS['analytics']()
+
+    with patch('src.services.frame_processing_service.settings.FRAME_PROCESSING_MAX_BATCH_BYTES', 512 * 1024 * 1024):
+        # 4K con LUT 3D: cada frame reserva ~158 MB
+        assert cap_batch_size(256, 3840, 2160, lut) == 3
+        assert cap_batch_size(256, 3840, 2160, analytics) == 21
+        assert cap_batch_size(8, 640, 360, lut) == 8
+        # Nunca menos de un frame
+        assert cap_batch_size(8, 100000, 100000, lut) == 1
+
+@patch('src.services.frame_processing_service.save_cached_result')
+@patch('src.services.frame_processing_service.lookup_cached_result', return_value=(None, None))
+@patch('src.services.frame_processing_service.run_frame_pipeline')
+@patch('src.services.frame_processing_service.get_media_info')
+@patch('src.services.frame_processing_service.download_file', return_value='/tmp/in.mp4')
+def test_process_video_frames_rotated_video(mock_download, mock_info, mock_pipeline, mock_lookup, mock_save):
+    mock_info.return_value = {'width': 1920, 'height': 1080, 'frame_rate': '30/1', 'rotation': 90}
+
+    def fake_pipeline(video_path, processor, width, height, frame_rate, **kwargs):
+        processor.setup(width, height, 1)
+        return {'frame_count': 5, 'throughput_fps': 10.0}
+
+    mock_pipeline.side_effect = fake_pipeline
+
+    process_video_frames('https://example.com/video.mp4', 'analytics')
+
+    # Los frames autorrotados llegan en vertical
+    width, height = mock_pipeline.call_args.args[2:4]
+    assert (width, height) == (1080, 1920)
@@ -0,0 +1,39 @@
+# tests/unit/test_frame_utils.py
+import numpy as np
+from src.utils.frame_utils import frames_from_buffer, score_frames, select_best_frame
+
+def _make_frames(count, width=160, height=90, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 256, size=(count, height, width, 3), dtype=np.uint8)
+
+def test_frames_from_buffer_is_zero_copy():
+    frames = _make_frames(3, 16, 8)
+    buffer = frames.tobytes() + b'\x00' * 10  # trailing partial frame
+    
+    decoded = frames_from_buffer(buffer, 16, 8)
+    
+    assert decoded.shape == (3, 8, 16, 3)
+    assert not decoded.flags.owndata
+    assert np.array_equal(decoded, frames)
+
+def test_select_best_frame_skips_black_and_flat_frames():
+    frames = np.zeros((3, 90, 160, 3), dtype=np.uint8)
+    frames[1] = 128  # flat grey
+    frames[2] = _make_frames(1)[0]
+    
+    scores = score_frames(frames)
+    
+    assert scores[0] < 0
+    assert scores[1] < 0
+    assert select_best_frame(frames) == 2
+
+def test_select_best_frame_empty():
+    assert select_best_frame(np.empty((0, 90, 160, 3), dtype=np.uint8)) is None
+
+def test_score_frames_200_candidates():
+    frames = _make_frames(200)
+    
+    scores = score_frames(frames)
+    
+    assert scores.shape == (200,)
+    assert select_best_frame(frames) == int(np.argmax(scores))
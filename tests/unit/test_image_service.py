@@ -0,0 +1,233 @@
+# tests/unit/test_image_service.py
+import os
+import time
+import threading
+import pytest
+from PIL import Image
+from unittest.mock import patch
+from src.config import settings
+from src.api.middlewares.error_handler import ValidationError
+from src.services.image_service import (
+    build_thumbnail_times, build_batch_thumbnail_command,
+    build_storyboard_layout, build_storyboard_command, build_storyboard_vtt, generate_storyboard,
+    render_cached_thumbnail, normalize_thumbnail_params, sign_thumbnail_path, verify_thumbnail_signature,
+    build_derivative_sizes, generate_thumbnail_derivatives,
+    prepare_overlay_image, build_overlay_filter
+)
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    for name in ['STORAGE_PATH', 'CACHE_DIR', 'TEMP_DIR']:
+        directory = tmp_path / name.lower()
+        directory.mkdir()
+        monkeypatch.setattr(settings, name, str(directory))
+    
+    (tmp_path / 'storage_path' / 'video.mp4').write_bytes(b'video content')
+    return tmp_path
+
+def _fake_render(command):
+    time.sleep(0.05)
+    with open(command[-1], 'wb') as f:
+        f.write(b'thumbnail')
+
+def test_build_thumbnail_times_interval():
+    assert build_thumbnail_times(10.0, interval=4) == [0, 4, 8]
+
+def test_build_thumbnail_times_tiny_interval_is_capped():
+    assert len(build_thumbnail_times(86400.0, interval=1e-9)) == settings.THUMBNAIL_MAX_FRAMES
+
+def test_build_thumbnail_times_drops_out_of_range():
+    assert build_thumbnail_times(10.0, times=[1.5, 9.9, 12]) == [1.5, 9.9]
+
+def test_build_batch_thumbnail_command_single_process():
+    command = build_batch_thumbnail_command(
+        '/tmp/video.mp4', [1, 2, 3], ['/tmp/a.jpg', '/tmp/b.jpg', '/tmp/c.jpg'], 320, 180, 90
+    )
+    
+    assert command.count('-i') == 3
+    assert command.count('-ss') == 3
+    assert '-skip_frame' not in command
+    # Input seeking: -ss appears before its -i
+    assert command.index('-ss') < command.index('-i')
+    assert command[-1] == '/tmp/c.jpg'
+
+def test_build_batch_thumbnail_command_keyframes_only():
+    command = build_batch_thumbnail_command(
+        '/tmp/video.mp4', [1, 2], ['/tmp/a.jpg', '/tmp/b.jpg'], 320, 180, 90, keyframes_only=True
+    )
+    
+    assert command.count('-skip_frame') == 2
+    assert command[command.index('-skip_frame') + 1] == 'nokey'
+
+def test_build_storyboard_layout_widens_interval():
+    with patch('src.services.image_service.settings') as mock_settings:
+        mock_settings.STORYBOARD_MAX_FRAMES = 100
+        layout = build_storyboard_layout(7200, 10, 10, 10)
+    
+    assert layout['frame_count'] == 100
+    assert layout['interval'] == 72
+    assert layout['sheet_count'] == 1
+
+def test_build_storyboard_command_single_pass():
+    command = build_storyboard_command('/tmp/video.mp4', '/tmp/sprite_%04d.jpg', 10, 160, 90, 5, 4)
+    
+    assert command.count('-i') == 1
+    assert command[command.index('-vf') + 1] == (
+        "fps=1/10,scale=160:90:force_original_aspect_ratio=decrease,pad=160:90:(ow-iw)/2:(oh-ih)/2,tile=5x4"
+    )
+
+def test_build_storyboard_vtt_cues():
+    vtt = build_storyboard_vtt(25, 10, 3, 160, 90, 2, 1, ['sprite_0001.jpg', 'sprite_0002.jpg'])
+    lines = vtt.split('\n')
+    
+    assert lines[0] == 'WEBVTT'
+    assert '00:00:00.000 --> 00:00:10.000' in lines
+    assert 'sprite_0001.jpg#xywh=160,0,160,90' in lines
+    assert '00:00:20.000 --> 00:00:25.000' in lines
+    assert 'sprite_0002.jpg#xywh=0,0,160,90' in lines
+
+@patch('src.services.image_service.run_ffmpeg_command', side_effect=_fake_render)
+def test_render_cached_thumbnail_coalesces_concurrent_requests(mock_run, storage):
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(render_cached_thumbnail('video.mp4', 12.5, 320)))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert mock_run.call_count == 1
+    assert len({key for _, key in results}) == 1
+    
+    # Served from the disk cache afterwards
+    render_cached_thumbnail('video.mp4', 12.5, 320)
+    assert mock_run.call_count == 1
+    
+    render_cached_thumbnail('video.mp4', 12.5, 640)
+    assert mock_run.call_count == 2
+
+@patch('src.services.image_service.run_ffmpeg_command', side_effect=_fake_render)
+def test_render_cached_thumbnail_snaps_parameters(mock_run, storage):
+    first = render_cached_thumbnail('video.mp4', 12.4, 317, quality=79)
+    second = render_cached_thumbnail('video.mp4', 11.6, 330, quality=82)
+    
+    assert first == second
+    assert mock_run.call_count == 1
+    assert normalize_thumbnail_params(12.4, 317, 200, 79) == (12.0, 320, 180, 80)
+
+@patch('src.services.image_service.run_ffmpeg_command', side_effect=_fake_render)
+def test_render_cached_thumbnail_renders_inside_cache_dir(mock_run, storage):
+    # TEMP_DIR y CACHE_DIR pueden estar en volúmenes distintos (docker-compose)
+    assert settings.TEMP_DIR != settings.CACHE_DIR
+    
+    with patch('src.services.image_service.os.replace', wraps=os.replace) as mock_replace:
+        cache_path, _ = render_cached_thumbnail('video.mp4', 12.5, 320)
+    
+    temp_path = mock_run.call_args.args[0][-1]
+    assert os.path.dirname(temp_path) == os.path.dirname(cache_path)
+    mock_replace.assert_called_once_with(temp_path, cache_path)
+    assert os.listdir(os.path.dirname(cache_path)) == [os.path.basename(cache_path)]
+    assert os.listdir(settings.TEMP_DIR) == []
+
+def test_thumbnail_signature():
+    expires = int(time.time()) + 60
+    signature = sign_thumbnail_path('video.mp4', expires)
+    
+    assert verify_thumbnail_signature('video.mp4', expires, signature)
+    assert not verify_thumbnail_signature('other.mp4', expires, signature)
+    assert not verify_thumbnail_signature('video.mp4', expires + 1, signature)
+    assert not verify_thumbnail_signature('video.mp4', time.time() - 1, sign_thumbnail_path('video.mp4', time.time() - 1))
+    assert not verify_thumbnail_signature('video.mp4', 'never', signature)
+
+def _fake_storyboard(command):
+    with open(command[-1].replace('%04d', '0001'), 'wb') as f:
+        f.write(b'sprite')
+
+@patch('src.services.image_service.save_cached_result')
+@patch('src.services.image_service.lookup_cached_result', return_value=(None, None))
+@patch('src.services.image_service.store_file', return_value='https://example.com/sprite')
+@patch('src.services.image_service.run_ffmpeg_command', side_effect=_fake_storyboard)
+@patch('src.services.image_service.get_media_info', return_value={'duration': 20, 'width': 1280, 'height': 720})
+@patch('src.services.image_service.download_file', return_value='/tmp/storyboard_input.mp4')
+def test_generate_storyboard_ignores_client_id_in_paths(mock_download, mock_info, mock_run, mock_store,
+                                                        mock_lookup, mock_save, storage):
+    generate_storyboard('https://example.com/video.mp4', job_id='../../x')
+    
+    storyboards = str(storage / 'storage_path' / 'storyboards')
+    target_dirs = {call.kwargs['target_dir'] for call in mock_store.call_args_list}
+    
+    assert len(target_dirs) == 1
+    target_dir = target_dirs.pop()
+    assert os.path.dirname(target_dir) == storyboards
+    assert '..' not in target_dir
+    assert '../../x' not in mock_run.call_args.args[0][-1]
+
+def test_render_cached_thumbnail_rejects_path_traversal(storage):
+    with pytest.raises(ValidationError):
+        render_cached_thumbnail('../cache_dir/secret.jpg')
+
+def test_build_derivative_sizes_never_upscales():
+    assert build_derivative_sizes([160, 1280, 640, 1920], 1280, 720) == [(1280, 720), (640, 360), (160, 90)]
+
+@patch('src.services.image_service.save_cached_result')
+@patch('src.services.image_service.lookup_cached_result', return_value=(None, None))
+@patch('src.services.image_service.store_file', side_effect=lambda path: f"https://example.com/{path}")
+@patch('src.services.image_service.run_ffmpeg_pipe')
+@patch('src.services.image_service.get_media_info')
+@patch('src.services.image_service.download_file')
+def test_generate_thumbnail_derivatives_decodes_once(mock_download, mock_info, mock_pipe, mock_store,
+                                                     mock_lookup, mock_save, storage):
+    video_path = storage / 'temp_dir' / 'video.mp4'
+    video_path.write_bytes(b'video content')
+    mock_download.return_value = str(video_path)
+    mock_info.return_value = {'duration': 10.0, 'width': 1920, 'height': 1080}
+    mock_pipe.return_value = bytes(640 * 360 * 3)
+    
+    result = generate_thumbnail_derivatives('https://example.com/video.mp4', time=5,
+                                            sizes=[640, 320, 160], formats=['jpg', 'webp'])
+    
+    assert mock_pipe.call_count == 1
+    assert 'scale=640:360' in mock_pipe.call_args[0][0]
+    assert [(t['width'], t['format']) for t in result['thumbnails']] == [
+        (640, 'jpg'), (640, 'webp'), (320, 'jpg'), (320, 'webp'), (160, 'jpg'), (160, 'webp')
+    ]
+
+def test_prepare_overlay_image_bakes_scale_and_opacity(storage):
+    image_path = storage / 'logo.png'
+    Image.new('RGBA', (200, 100), (255, 0, 0, 200)).save(image_path)
+    
+    prepared_path = prepare_overlay_image(str(image_path), scale=0.5, opacity=0.5)
+    
+    with Image.open(prepared_path) as prepared:
+        assert prepared.mode == 'RGBA'
+        assert prepared.size == (100, 50)
+        assert prepared.getpixel((50, 25)) == (255, 0, 0, 100)
+
+def test_prepare_overlay_image_is_cached_by_content(storage):
+    image_path = storage / 'logo.png'
+    Image.new('RGB', (64, 64), (0, 0, 255)).save(image_path)
+    
+    first_path = prepare_overlay_image(str(image_path), scale=0.5, opacity=0.8)
+    os.utime(first_path, (0, 0))
+    
+    with patch('src.services.image_service.atomic_write') as mock_write:
+        assert prepare_overlay_image(str(image_path), scale=0.5, opacity=0.8) == first_path
+        mock_write.assert_not_called()
+    
+    # Cache hits refresh the mtime used by the eviction
+    assert os.path.getmtime(first_path) > 0
+    
+    assert prepare_overlay_image(str(image_path), scale=0.5, opacity=0.6) != first_path
+
+def test_prepare_overlay_image_skips_animated(storage):
+    image_path = storage / 'meme.gif'
+    frames = [Image.new('RGB', (16, 16), color) for color in ((255, 0, 0), (0, 255, 0))]
+    frames[0].save(image_path, save_all=True, append_images=frames[1:])
+    
+    assert prepare_overlay_image(str(image_path)) is None
+
+def test_build_overlay_filter():
+    assert build_overlay_filter('10', '10') == '[0:v][1:v]overlay=10:10:eof_action=repeat[out]'
+    assert 'colorchannelmixer=aa=0.5' in build_overlay_filter('10', '10', 0.3, 0.5)
@@ -0,0 +1,97 @@
+# tests/unit/test_keyframe_service.py
+import os
+import pytest
+from unittest.mock import patch
+from src.api.middlewares.error_handler import ProcessingError
+from src.services import keyframe_service
+from src.services.keyframe_service import parse_packet_output, get_keyframe_index
+
+# Paquetes en orden de decodificación (B-frames con pts desordenado)
+PACKET_OUTPUT = "\n".join([
+    "pts_time=0.000000|dts_time=-0.080000|size=5000|pos=48|flags=K__",
+    "pts_time=0.080000|dts_time=-0.040000|size=800|pos=5048|flags=___",
+    "pts_time=0.040000|dts_time=0.000000|size=300|pos=5848|flags=___",
+    "pts_time=2.000000|dts_time=1.960000|size=4800|pos=9000|flags=K__",
+    "pts_time=N/A|dts_time=2.040000|size=700|pos=N/A|flags=___",
+    "pts_time=4.000000|dts_time=3.960000|size=4700|pos=20000|flags=K__",
+    ""
+])
+
+@pytest.fixture(autouse=True)
+def keyframe_cache(tmp_path):
+    keyframe_service._index_cache.clear()
+    with patch.object(keyframe_service.settings, 'CACHE_DIR', str(tmp_path / 'cache')):
+        yield
+    keyframe_service._index_cache.clear()
+
+def test_parse_packet_output_sorts_by_pts():
+    index = parse_packet_output(PACKET_OUTPUT)
+
+    assert len(index) == 6
+    assert index.pts.tolist() == [0.0, 0.04, 0.08, 2.0, 2.04, 4.0]
+    assert index.pos.tolist()[4] == -1
+    assert index.keyframe_times.tolist() == [0.0, 2.0, 4.0]
+
+def test_parse_packet_output_relative_to_start_time():
+    # MPEG-TS: el primer pts es 10 s y FFprobe añade el start_time del formato
+    index = parse_packet_output("\n".join([
+        "pts_time=10.000000|dts_time=10.000000|size=5000|pos=188|flags=K__",
+        "pts_time=11.000000|dts_time=11.000000|size=800|pos=5264|flags=___",
+        "pts_time=12.000000|dts_time=12.000000|size=4800|pos=9024|flags=K__",
+        "pts_time=14.000000|dts_time=14.000000|size=4700|pos=20116|flags=K__",
+        "start_time=10.000000"
+    ]))
+
+    assert index.start_time == 10.0
+    assert index.keyframe_times.tolist() == [0.0, 2.0, 4.0]
+    assert index.snap_times([2.5]) == [2.0]
+
+def test_keyframe_lookups():
+    index = parse_packet_output(PACKET_OUTPUT)
+
+    assert index.keyframe_before(1.9) == 0.0
+    assert index.keyframe_before(2.0) == 2.0
+    assert index.keyframe_after(2.1) == 4.0
+    assert index.keyframe_after(4.5) is None
+    assert index.nearest_keyframe(2.9) == 2.0
+    assert index.nearest_keyframe(3.1) == 4.0
+    assert index.keyframes_between(0.5, 4.0) == [2.0]
+    assert index.frames_between(0.0, 2.0) == 3
+    assert index.byte_offset(3.0) == 9000
+
+def test_snap_times_deduplicates():
+    index = parse_packet_output(PACKET_OUTPUT)
+
+    assert index.snap_times([0.5, 1.0, 2.5, 5.0]) == [0.0, 2.0, 4.0]
+
+@patch('src.services.keyframe_service.subprocess.run')
+def test_get_keyframe_index_uses_disk_cache(mock_run, tmp_path):
+    video_path = tmp_path / 'video.mp4'
+    video_path.write_bytes(b'video')
+    mock_run.return_value.returncode = 0
+    mock_run.return_value.stdout = PACKET_OUTPUT
+
+    index = get_keyframe_index(str(video_path))
+    assert get_keyframe_index(str(video_path)) is index
+
+    # Otro proceso (memoria vacía) lee el índice de disco sin llamar a FFprobe
+    keyframe_service._index_cache.clear()
+    cache_path = next((tmp_path / 'cache' / 'keyframes').iterdir())
+    os.utime(cache_path, (0, 0))
+    cached = get_keyframe_index(str(video_path))
+
+    assert mock_run.call_count == 1
+    # El acierto renueva la fecha usada por la poda de la caché
+    assert cache_path.stat().st_mtime > 0
+    assert cached.keyframe_times.tolist() == index.keyframe_times.tolist()
+    assert cached.pos.tolist() == index.pos.tolist()
+
+@patch('src.services.keyframe_service.subprocess.run')
+def test_get_keyframe_index_ffprobe_error(mock_run, tmp_path):
+    video_path = tmp_path / 'broken.mp4'
+    video_path.write_bytes(b'broken')
+    mock_run.return_value.returncode = 1
+    mock_run.return_value.stderr = 'Invalid data found when processing input'
+
+    with pytest.raises(ProcessingError):
+        get_keyframe_index(str(video_path))
@@ -0,0 +1,202 @@
+# tests/unit/test_measurement_service.py
+import os
+import pytest
+from unittest.mock import patch, MagicMock
+from src.api.middlewares.error_handler import ProcessingError, ValidationError
+from src.services import measurement_service
+from src.services.measurement_service import (
+    build_measurement_key, get_measurement, normalize_loudnorm_params, build_loudnorm_filter,
+    parse_loudnorm_output, parse_cropdetect_output, build_crop_render_command, normalize_loudness,
+    auto_crop_video
+)
+
+LOUDNORM_STDERR = """
+[Parsed_loudnorm_0 @ 0x55d1c8c0e6c0]
+{
+	"input_i" : "-27.61",
+	"input_tp" : "-4.47",
+	"input_lra" : "18.06",
+	"input_thresh" : "-39.20",
+	"output_i" : "-22.98",
+	"output_tp" : "-1.00",
+	"output_lra" : "9.50",
+	"output_thresh" : "-33.68",
+	"normalization_type" : "dynamic",
+	"target_offset" : "-0.02"
+}
+"""
+
+CROP_STDERR = "\n".join([
+    "[Parsed_cropdetect_0 @ 0x1] x1:0 x2:1919 y1:140 y2:939 w:1920 h:800 x:0 y:140 pts:0 t:0.000 crop=1920:800:0:140",
+    "[Parsed_cropdetect_0 @ 0x1] x1:0 x2:1919 y1:300 y2:779 w:1920 h:480 x:0 y:300 pts:1 t:2.000 crop=1920:480:0:300",
+    "[Parsed_cropdetect_0 @ 0x1] x1:0 x2:1919 y1:140 y2:939 w:1920 h:800 x:0 y:140 pts:2 t:4.000 crop=1920:800:0:140"
+])
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(measurement_service.settings, 'CACHE_DIR', str(tmp_path / 'cache'))
+    return tmp_path
+
+def write_input(directory, data):
+    """Simula la descarga: cada trabajo recibe su propia copia del archivo."""
+    media_path = directory / 'input.mp4'
+    media_path.write_bytes(data)
+    return str(media_path)
+
+def test_build_measurement_key_depends_on_filter_and_params():
+    key = build_measurement_key('abc', 'loudnorm', {'integrated': -23.0, 'lra': 7.0})
+
+    assert key == build_measurement_key('abc', 'loudnorm', {'lra': 7.0, 'integrated': -23.0})
+    assert key != build_measurement_key('abc', 'loudnorm', {'integrated': -16.0, 'lra': 7.0})
+    assert key != build_measurement_key('abc', 'cropdetect', {'integrated': -23.0, 'lra': 7.0})
+    assert key != build_measurement_key('def', 'loudnorm', {'integrated': -23.0, 'lra': 7.0})
+
+def test_get_measurement_reuses_first_pass(cache_dir):
+    media_path = cache_dir / 'input.mp4'
+    media_path.write_bytes(b'media')
+    measure = MagicMock(return_value={'value': 1.5})
+
+    first = get_measurement(str(media_path), 'loudnorm', {'integrated': -23.0}, measure)
+    entry_path = next((cache_dir / 'cache' / 'measurements').iterdir())
+    os.utime(entry_path, (0, 0))
+    second = get_measurement(str(media_path), 'loudnorm', {'integrated': -23.0}, measure)
+    # El acierto renueva la fecha usada por la poda de la caché
+    assert entry_path.stat().st_mtime > 0
+    other = get_measurement(str(media_path), 'loudnorm', {'integrated': -16.0}, measure)
+    refreshed = get_measurement(str(media_path), 'loudnorm', {'integrated': -23.0}, measure, refresh=True)
+
+    assert first == ({'value': 1.5}, False)
+    assert second == ({'value': 1.5}, True)
+    assert other[1] is False
+    assert refreshed[1] is False
+    assert measure.call_count == 3
+
+def test_normalize_loudnorm_params():
+    assert normalize_loudnorm_params(integrated=-16) == {'integrated': -16.0, 'true_peak': -1.0, 'lra': 7.0}
+
+    with pytest.raises(ValidationError):
+        normalize_loudnorm_params(true_peak=1)
+
+def test_parse_loudnorm_output_and_second_pass_filter():
+    measurement = parse_loudnorm_output(LOUDNORM_STDERR)
+    assert measurement == {
+        'input_i': -27.61, 'input_tp': -4.47, 'input_lra': 18.06, 'input_thresh': -39.2, 'target_offset': -0.02
+    }
+
+    loudnorm = build_loudnorm_filter(normalize_loudnorm_params(), measurement)
+    assert loudnorm.startswith('loudnorm=I=-23.0:TP=-1.0:LRA=7.0:measured_I=-27.61:measured_TP=-4.47:')
+    assert 'offset=-0.02:linear=true' in loudnorm
+
+def test_parse_loudnorm_output_silent_audio():
+    with pytest.raises(ProcessingError):
+        parse_loudnorm_output(LOUDNORM_STDERR.replace('"-27.61"', '"-inf"'))
+
+    with pytest.raises(ProcessingError):
+        parse_loudnorm_output('')
+
+def test_parse_cropdetect_output_picks_most_frequent():
+    assert parse_cropdetect_output(CROP_STDERR) == (1920, 800, 0, 140)
+
+    with pytest.raises(ProcessingError):
+        parse_cropdetect_output('no crop lines')
+
+def test_build_crop_render_command():
+    command = build_crop_render_command('/tmp/in.mp4', '/tmp/out.mp4', {'width': 1920, 'height': 800, 'x': 0, 'y': 140})
+    assert command[command.index('-vf') + 1] == 'crop=1920:800:0:140'
+
+    remux = build_crop_render_command('/tmp/in.mp4', '/tmp/out.mp4')
+    assert '-vf' not in remux
+    assert remux[remux.index('-c') + 1] == 'copy'
+
+@patch('src.services.measurement_service.save_cached_result')
+@patch('src.services.measurement_service.lookup_cached_result', return_value=(None, None))
+@patch('src.services.measurement_service.store_file', return_value='http://localhost:8080/storage/loudnorm.mp4')
+@patch('src.services.measurement_service.verify_file_integrity', return_value=True)
+@patch('src.services.measurement_service.get_media_info')
+@patch('src.services.measurement_service.download_file')
+def test_normalize_loudness_skips_measurement_pass_when_cached(mock_download, mock_info, mock_verify, mock_store,
+                                                               mock_lookup, mock_save, cache_dir):
+    mock_download.side_effect = lambda url, directory: write_input(cache_dir, b'media')
+    mock_info.return_value = {'duration': 10.0, 'video_codec': 'h264', 'audio_codec': 'aac', 'sample_rate': 48000}
+
+    with patch('src.services.measurement_service.run_ffmpeg_command',
+               return_value={'success': True, 'stderr': LOUDNORM_STDERR}) as mock_run:
+        first = normalize_loudness('https://example.com/video.mp4')
+        second = normalize_loudness('https://example.com/video.mp4')
+
+    # Primer trabajo: medición + render; segundo: solo render
+    assert mock_run.call_count == 3
+    assert first['measurement_cached'] is False
+    assert second['measurement_cached'] is True
+    assert second['measurement']['input_i'] == -27.61
+
+    render = mock_run.call_args_list[-1].args[0]
+    assert render[render.index('-c:v') + 1] == 'copy'
+    assert render[render.index('-ar') + 1] == '48000'
+
+@patch('src.services.measurement_service.save_cached_result')
+@patch('src.services.measurement_service.lookup_cached_result', return_value=(None, None))
+@patch('src.services.measurement_service.store_file', return_value='http://localhost:8080/storage/autocrop.mp4')
+@patch('src.services.measurement_service.verify_file_integrity', return_value=True)
+@patch('src.services.measurement_service.get_media_info')
+@patch('src.services.measurement_service.download_file')
+def test_auto_crop_video_hashes_input_once(mock_download, mock_info, mock_verify, mock_store, mock_lookup,
+                                           mock_save, cache_dir):
+    mock_download.side_effect = lambda url, directory: write_input(cache_dir, b'video')
+    mock_info.return_value = {'duration': 10.0, 'video_codec': 'h264', 'width': 1920, 'height': 1080}
+
+    with patch('src.services.measurement_service.compute_file_hash', return_value='abc123') as mock_hash, \
+         patch('src.services.measurement_service.run_ffmpeg_command',
+               return_value={'success': True, 'stderr': CROP_STDERR}):
+        auto_crop_video('https://example.com/video.mp4')
+
+    # Un solo hash para la caché de resultados y la de mediciones
+    assert mock_hash.call_count == 1
+    assert mock_lookup.call_args.kwargs['input_hashes'] == ['abc123']
+
+@patch('src.services.measurement_service.save_cached_result')
+@patch('src.services.measurement_service.lookup_cached_result', return_value=(None, None))
+@patch('src.services.measurement_service.store_file', return_value='http://localhost:8080/storage/autocrop.mp4')
+@patch('src.services.measurement_service.verify_file_integrity', return_value=True)
+@patch('src.services.measurement_service.get_media_info')
+@patch('src.services.measurement_service.download_file')
+def test_auto_crop_video(mock_download, mock_info, mock_verify, mock_store, mock_lookup, mock_save, cache_dir):
+    mock_download.side_effect = lambda url, directory: write_input(cache_dir, b'video')
+    mock_info.return_value = {'duration': 10.0, 'video_codec': 'h264', 'width': 1920, 'height': 1080}
+
+    with patch('src.services.measurement_service.run_ffmpeg_command',
+               return_value={'success': True, 'stderr': CROP_STDERR}) as mock_run:
+        result = auto_crop_video('https://example.com/video.mp4')
+
+    assert mock_run.call_count == 2
+    assert '-skip_frame' in mock_run.call_args_list[0].args[0]
+    assert result['crop'] == {'width': 1920, 'height': 800, 'x': 0, 'y': 140}
+    assert result['cropped'] is True
+    assert result['measurement_cached'] is False
+
+@patch('src.services.measurement_service.save_cached_result')
+@patch('src.services.measurement_service.lookup_cached_result', return_value=(None, None))
+@patch('src.services.measurement_service.store_file', return_value='http://localhost:8080/storage/autocrop.mp4')
+@patch('src.services.measurement_service.verify_file_integrity', return_value=True)
+@patch('src.services.measurement_service.get_media_info')
+@patch('src.services.measurement_service.download_file')
+def test_auto_crop_video_rotated_without_bars(mock_download, mock_info, mock_verify, mock_store, mock_lookup,
+                                              mock_save, cache_dir):
+    mock_download.side_effect = lambda url, directory: write_input(cache_dir, b'portrait')
+    # Video vertical de móvil: codificado 1920x1080 con rotación de 90°
+    mock_info.return_value = {'duration': 10.0, 'video_codec': 'h264', 'width': 1920, 'height': 1080, 'rotation': 90}
+    portrait = "[Parsed_cropdetect_0 @ 0x1] x1:0 x2:1079 y1:0 y2:1919 w:1080 h:1920 x:0 y:0 pts:0 t:0.000 crop=1080:1920:0:0"
+
+    with patch('src.services.measurement_service.run_ffmpeg_command',
+               return_value={'success': True, 'stderr': portrait}) as mock_run:
+        result = auto_crop_video('https://example.com/video.mp4')
+
+    assert result['cropped'] is False
+    # Sin bandas solo se remultiplexa
+    render = mock_run.call_args_list[-1].args[0]
+    assert '-vf' not in render
+    assert render[render.index('-c') + 1] == 'copy'
+
+def test_auto_crop_video_rejects_invalid_limit():
+    with pytest.raises(ValidationError):
+        auto_crop_video('https://example.com/video.mp4', limit=300)
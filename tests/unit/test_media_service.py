@@ -0,0 +1,113 @@
+# tests/unit/test_media_service.py
+import pytest
+from unittest.mock import patch
+from src.services.media_service import extract_audio, extract_audio_formats, can_stream_copy_audio, get_audio_codec_args
+
+@pytest.fixture
+def media_path(tmp_path):
+    path = tmp_path / "input.mp4"
+    path.write_bytes(b"media")
+    return str(path)
+
+def test_can_stream_copy_audio():
+    aac_info = {'audio_codec': 'aac', 'audio_bit_rate': 128000}
+    
+    assert can_stream_copy_audio(aac_info, 'aac', '192k') is True
+    assert can_stream_copy_audio(aac_info, 'aac', '96k') is False
+    assert can_stream_copy_audio(aac_info, 'mp3', '192k') is False
+    assert can_stream_copy_audio({'audio_codec': 'aac'}, 'aac', '192k') is False
+    assert can_stream_copy_audio({'audio_codec': 'flac'}, 'flac', '192k') is True
+
+def test_get_audio_codec_args_bitrate_or_vbr():
+    assert '-q:a' not in get_audio_codec_args('mp3', '128k')
+    assert get_audio_codec_args('mp3', '128k')[-2:] == ['-b:a', '128k']
+    assert get_audio_codec_args('mp3')[-2:] == ['-q:a', '2']
+
+@patch('src.services.media_service.lookup_cached_result', return_value=(None, None))
+@patch('src.services.media_service.download_file')
+@patch('src.services.media_service.get_media_info')
+@patch('src.services.media_service.generate_temp_filename')
+@patch('src.services.media_service.run_ffmpeg_command')
+@patch('src.services.media_service.verify_file_integrity', return_value=True)
+@patch('src.services.media_service.store_file', return_value='https://example.com/storage/audio.aac')
+def test_extract_audio_stream_copy(mock_store, mock_verify, mock_run, mock_temp, mock_info, mock_download,
+                                   mock_cache, media_path, tmp_path):
+    mock_download.return_value = media_path
+    mock_temp.return_value = str(tmp_path / "output.aac")
+    mock_info.return_value = {'audio_codec': 'aac', 'audio_bit_rate': 128000}
+    
+    result = extract_audio('https://example.com/video.mp4', bitrate='192k', format='aac')
+    
+    assert result == 'https://example.com/storage/audio.aac'
+    assert mock_run.call_count == 1
+    command = mock_run.call_args[0][0]
+    assert command[command.index('-c:a') + 1] == 'copy'
+
+@patch('src.services.media_service.lookup_cached_result', return_value=(None, None))
+@patch('src.services.media_service.download_file')
+@patch('src.services.media_service.get_media_info')
+@patch('src.services.media_service.generate_temp_filename')
+@patch('src.services.media_service.run_ffmpeg_command')
+@patch('src.services.media_service.verify_file_integrity', return_value=True)
+@patch('src.services.media_service.store_file', return_value='https://example.com/storage/audio.mp3')
+def test_extract_audio_transcodes_other_codecs(mock_store, mock_verify, mock_run, mock_temp, mock_info,
+                                               mock_download, mock_cache, media_path, tmp_path):
+    mock_download.return_value = media_path
+    mock_temp.return_value = str(tmp_path / "output.mp3")
+    mock_info.return_value = {'audio_codec': 'aac', 'audio_bit_rate': 128000}
+    
+    extract_audio('https://example.com/video.mp4', bitrate='192k', format='mp3')
+    
+    assert mock_run.call_count == 1
+    command = mock_run.call_args[0][0]
+    assert 'copy' not in command
+    assert command[command.index('-b:a') + 1] == '192k'
+    # El bitrate pedido no se anula con VBR
+    assert '-q:a' not in command
+
+@patch('src.services.media_service.lookup_cached_result', return_value=(None, None))
+@patch('src.services.media_service.download_file')
+@patch('src.services.media_service.get_media_info')
+@patch('src.services.media_service.run_ffmpeg_command')
+@patch('src.services.media_service.verify_file_integrity', return_value=True)
+@patch('src.services.media_service.store_file')
+def test_extract_audio_formats_single_invocation(mock_store, mock_verify, mock_run, mock_info, mock_download,
+                                                 mock_cache, media_path):
+    mock_download.return_value = media_path
+    mock_info.return_value = {'audio_codec': 'aac', 'audio_bit_rate': 128000}
+    mock_store.side_effect = lambda path: f"https://example.com/storage/{path.rsplit('.', 1)[-1]}"
+    
+    result = extract_audio_formats('https://example.com/video.mp4', [
+        {'format': 'mp3', 'bitrate': '128k'},
+        {'format': 'mp3', 'bitrate': '320k'},
+        {'format': 'wav'},
+        {'format': 'flac'}
+    ])
+    
+    assert set(result) == {'mp3_128k', 'mp3_320k', 'wav', 'flac'}
+    assert mock_run.call_count == 1
+    command = mock_run.call_args[0][0]
+    assert command.count('-i') == 1
+    assert command.count('-map') == 4
+
+@patch('src.services.media_service.lookup_cached_result', return_value=(None, None))
+@patch('src.services.media_service.download_file')
+@patch('src.services.media_service.get_media_info')
+@patch('src.services.media_service.run_ffmpeg_command')
+@patch('src.services.media_service.verify_file_integrity', return_value=True)
+@patch('src.services.media_service.store_file')
+def test_extract_audio_formats_deduplicates_outputs(mock_store, mock_verify, mock_run, mock_info, mock_download,
+                                                    mock_cache, media_path):
+    mock_download.return_value = media_path
+    mock_info.return_value = {'audio_codec': 'aac', 'audio_bit_rate': 128000}
+    mock_store.side_effect = lambda path: f"https://example.com/storage/{path.rsplit('.', 1)[-1]}"
+    
+    # Iguales una vez aplicado el bitrate por defecto
+    result = extract_audio_formats('https://example.com/video.mp4', [
+        {'format': 'mp3'},
+        {'format': 'mp3', 'bitrate': '192k'},
+        {'format': 'wav'}
+    ])
+    
+    assert set(result) == {'mp3', 'wav'}
+    assert mock_run.call_args[0][0].count('-map') == 2
@@ -0,0 +1,75 @@
+# tests/unit/test_silence_service.py
+import numpy as np
+import pytest
+from unittest.mock import patch
+from src.api.middlewares.error_handler import ValidationError
+from src.services.silence_service import (
+    load_pcm, compute_window_energy, detect_keep_ranges, build_jump_cut_command, remove_silence,
+    ANALYSIS_SAMPLE_RATE
+)
+
+def make_speech(pattern):
+    """Genera audio con tono (True) o silencio (False) para cada segundo de `pattern`."""
+    t = np.arange(ANALYSIS_SAMPLE_RATE) / ANALYSIS_SAMPLE_RATE
+    tone = (np.sin(2 * np.pi * 220 * t) * 8000).astype('<i2')
+    silence = np.zeros(ANALYSIS_SAMPLE_RATE, dtype='<i2')
+    return np.concatenate([tone if voiced else silence for voiced in pattern])
+
+def test_compute_window_energy_from_memmap(tmp_path):
+    pcm_path = tmp_path / 'audio.pcm'
+    make_speech([True, False]).tofile(pcm_path)
+
+    levels = compute_window_energy(load_pcm(str(pcm_path)))
+
+    assert len(levels) == 66
+    assert levels[:33].min() > -16
+    assert levels[34:].max() < -90
+
+def test_detect_keep_ranges_merges_short_pauses():
+    levels = compute_window_energy(make_speech([True, False, True, False, False, False, True]))
+
+    ranges = detect_keep_ranges(levels, 0.03, 7.0, threshold_db=-40, min_silence=1.5, padding=0.1)
+
+    # La pausa de 1 s se conserva; la de 3 s se elimina
+    assert ranges == [(0.0, 3.1), (5.9, 7.0)]
+
+def test_detect_keep_ranges_all_silent():
+    levels = compute_window_energy(make_speech([False, False]))
+    assert detect_keep_ranges(levels, 0.03, 2.0) == []
+
+def test_build_jump_cut_command():
+    command = build_jump_cut_command('/tmp/in.mp4', [(0.0, 3.09), (5.91, 7.0)], '/tmp/out.mp4', profile_name='draft')
+    graph = command[command.index('-filter_complex') + 1]
+
+    assert "select='between(t,0.000,3.090)+between(t,5.910,7.000)',setpts=N/FRAME_RATE/TB[v]" in graph
+    assert "aselect='between(t,0.000,3.090)+between(t,5.910,7.000)',asetpts=N/SR/TB[a]" in graph
+
+    audio_only = build_jump_cut_command('/tmp/in.m4a', [(0.0, 1.0)], '/tmp/out.m4a', has_video=False)
+    assert '[v]' not in audio_only[audio_only.index('-filter_complex') + 1]
+
+@patch('src.services.silence_service.save_cached_result')
+@patch('src.services.silence_service.lookup_cached_result', return_value=(None, None))
+@patch('src.services.silence_service.store_file', return_value='http://localhost:8080/storage/jumpcut.mp4')
+@patch('src.services.silence_service.verify_file_integrity', return_value=True)
+@patch('src.services.silence_service.get_media_info')
+@patch('src.services.silence_service.download_file', return_value='/tmp/silence_input.mp4')
+def test_remove_silence(mock_download, mock_info, mock_verify, mock_store, mock_lookup, mock_save):
+    mock_info.return_value = {'duration': 4.0, 'video_codec': 'h264', 'audio_codec': 'aac'}
+
+    def fake_ffmpeg(command):
+        # La primera llamada decodifica a PCM; la segunda renderiza
+        if command[-2:-1] == ['s16le']:
+            make_speech([True, False, False, True]).tofile(command[-1])
+        return {'success': True}
+
+    with patch('src.services.silence_service.run_ffmpeg_command', side_effect=fake_ffmpeg) as mock_run:
+        result = remove_silence('https://example.com/video.mp4')
+
+    assert mock_run.call_count == 2
+    assert result['ranges'] == [[0.0, 1.12], [2.9, 4.0]]
+    assert result['removed_duration'] == 1.78
+    assert result['realtime_factor'] > 1
+
+def test_remove_silence_rejects_invalid_params():
+    with pytest.raises(ValidationError):
+        remove_silence('https://example.com/video.mp4', min_silence=0)
@@ -0,0 +1,115 @@
+# tests/unit/test_subtitle_service.py
+import pytest
+from unittest.mock import patch, MagicMock
+from src.config import settings
+from src.api.middlewares.error_handler import ValidationError
+from src.services.subtitle_service import (
+    parse_subtitles, write_subtitles, convert_subtitles, shift_subtitles, merge_subtitles,
+    apply_style, build_caption_style, to_ass_color, parse_timestamp, format_timestamp, PARSERS
+)
+
+SRT = """1
+00:00:01,000 --> 00:00:02,500
+Hello <i>world</i>
+
+2
+00:00:03,000 --> 00:00:04,000
+Second line
+two
+"""
+
+VTT = """WEBVTT
+
+NOTE comment
+
+intro
+00:01.000 --> 00:02.500 align:start
+Hello world
+"""
+
+ASS = """[Script Info]
+ScriptType: v4.00+
+
+[V4+ Styles]
+Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding
+Style: Default,Arial,20,&H00FFFFFF,&H000000FF,&H00000000,&H80000000,0,0,0,0,100,100,0,0,1,1,0,2,10,10,10,1
+
+[Events]
+Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
+Dialogue: 0,0:00:01.00,0:00:02.50,Default,,0,0,0,,{\\b1}Hello, world\\Nagain
+"""
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'CACHE_DIR', str(tmp_path))
+
+def test_parse_timestamps():
+    assert parse_timestamp('00:00:01,500') == 1.5
+    assert parse_timestamp('01:02.250') == 62.25
+    assert parse_timestamp('1:00:00.50') == 3600.5
+    assert format_timestamp(3661.5, 'srt') == '01:01:01,500'
+    assert format_timestamp(3661.5, 'ass') == '1:01:01.50'
+
+def test_parse_formats():
+    srt = parse_subtitles(SRT)
+    vtt = parse_subtitles(VTT)
+    ass = parse_subtitles(ASS)
+    
+    assert [(c['start'], c['end']) for c in srt['cues']] == [(1.0, 2.5), (3.0, 4.0)]
+    assert srt['cues'][1]['text'] == 'Second line\ntwo'
+    assert vtt['cues'] == [{'start': 1.0, 'end': 2.5, 'text': 'Hello world'}]
+    assert ass['cues'][0]['text'] == '{\\b1}Hello, world\nagain'
+    assert ass['styles'][0]['Fontsize'] == '20'
+
+def test_convert_round_trip():
+    vtt = convert_subtitles(SRT, 'vtt')
+    assert vtt.startswith('WEBVTT')
+    assert '00:00:03.000 --> 00:00:04.000' in vtt
+    
+    srt = convert_subtitles(ASS, 'srt')
+    assert 'Hello, world\nagain' in srt
+    
+    ass = convert_subtitles(SRT, 'ass')
+    assert 'Dialogue: 0,0:00:01.00,0:00:02.50,Default,,0,0,0,,Hello {\\i1}world{\\i0}' in ass
+    assert parse_subtitles(ass)['cues'][1]['text'] == 'Second line\ntwo'
+
+def test_parse_subtitles_is_cached():
+    mock_parse = MagicMock(side_effect=PARSERS['srt'])
+    
+    with patch.dict(PARSERS, {'srt': mock_parse}):
+        content = SRT + '\n'
+        first = parse_subtitles(content)
+        first['cues'].clear()
+        second = parse_subtitles(content)
+    
+    assert mock_parse.call_count == 1
+    assert len(second['cues']) == 2
+
+def test_shift_and_merge():
+    shifted = shift_subtitles(parse_subtitles(SRT), -2)
+    assert [(c['start'], c['end']) for c in shifted['cues']] == [(0.0, 0.5), (1.0, 2.0)]
+    
+    merged = merge_subtitles([parse_subtitles(SRT), parse_subtitles(VTT)])
+    assert [c['start'] for c in merged['cues']] == [1.0, 1.0, 3.0]
+
+def test_to_ass_color_accepts_ffmpeg_syntax():
+    assert to_ass_color('pink') == '&H00CBC0FF'
+    assert to_ass_color('Navy') == '&H00800000'
+    assert to_ass_color('0xFF0000') == '&H000000FF'
+    assert to_ass_color('white@0.5') == '&H7FFFFFFF'
+    assert to_ass_color('red@0x40') == '&HBF0000FF'
+    assert to_ass_color('#00FF0080') == '&H7F00FF00'
+    
+    for color in ['notacolor', 'white@2', '#12345']:
+        with pytest.raises(ValidationError):
+            to_ass_color(color)
+
+def test_apply_caption_style():
+    assert to_ass_color('white') == '&H00FFFFFF'
+    assert to_ass_color('#FF8000', alpha=128) == '&H800080FF'
+    
+    document = apply_style(parse_subtitles(SRT), build_caption_style('Roboto', 30, 'yellow', True, 'top'))
+    ass = write_subtitles(document, 'ass')
+    
+    assert 'Style: Default,Roboto,30,&H0000FFFF' in ass
+    assert ',4,0,0,8,' in ass
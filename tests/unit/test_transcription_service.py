@@ -0,0 +1,101 @@
+# tests/unit/test_transcription_service.py
+import numpy as np
+import pytest
+from unittest.mock import patch
+from src.api.middlewares.error_handler import ValidationError
+from src.services import transcription_service
+from src.services.silence_service import compute_window_energy, ANALYSIS_SAMPLE_RATE
+from src.services.transcription_service import (
+    plan_transcription_chunks, stitch_transcript, run_transcription, transcribe_file
+)
+
+def make_speech(pattern):
+    """Genera audio con tono (True) o silencio (False) para cada segundo de `pattern`."""
+    t = np.arange(ANALYSIS_SAMPLE_RATE) / ANALYSIS_SAMPLE_RATE
+    tone = (np.sin(2 * np.pi * 220 * t) * 8000).astype('<i2')
+    silence = np.zeros(ANALYSIS_SAMPLE_RATE, dtype='<i2')
+    return np.concatenate([tone if voiced else silence for voiced in pattern])
+
+@pytest.fixture
+def pcm_path(tmp_path):
+    path = tmp_path / 'audio.pcm'
+    make_speech([True, True, False, False, True, False, False, True, True, True]).tofile(path)
+    return str(path)
+
+@pytest.fixture(autouse=True)
+def reset_pool():
+    yield
+    transcription_service._reset_asr_pool()
+
+def test_plan_transcription_chunks_cuts_at_pauses():
+    levels = compute_window_energy(make_speech([True, True, False, False, True, False, False, True, True, True]))
+
+    assert plan_transcription_chunks(levels, 0.03, 10.0, max_chunk=30) == [(0.0, 10.0)]
+    assert plan_transcription_chunks(levels, 0.03, 10.0, max_chunk=4) == [(0.0, 2.21), (3.79, 5.21), (6.79, 10.0)]
+
+def test_plan_transcription_chunks_splits_long_speech():
+    levels = compute_window_energy(make_speech([True] * 5))
+    assert plan_transcription_chunks(levels, 0.03, 5.0, max_chunk=2) == [(0.0, 2.0), (2.0, 4.0), (4.0, 5.0)]
+
+def test_stitch_transcript_offsets_words():
+    chunk_results = {
+        1: [{'start': 0.0, 'end': 1.0, 'text': 'world', 'words': [{'start': 0.0, 'end': 1.0, 'word': 'world'}]}],
+        0: [{'start': 0.5, 'end': 1.0, 'text': 'hello', 'words': [{'start': 0.5, 'end': 1.0, 'word': 'hello'}]}]
+    }
+
+    segments = stitch_transcript([(0.0, 2.0), (10.0, 12.0)], chunk_results)
+
+    assert [segment['text'] for segment in segments] == ['hello', 'world']
+    assert segments[1]['words'][0] == {'start': 10.0, 'end': 11.0, 'word': 'world'}
+
+def test_run_transcription_publishes_partial_text(pcm_path):
+    chunks = [(0.0, 2.22), (3.8, 5.22), (6.8, 10.0)]
+
+    with patch('src.services.transcription_service._publish_progress', return_value=True) as mock_publish:
+        segments, language = run_transcription(pcm_path, chunks, 'stub', 'es', job_id='job-1', workers=1)
+
+    assert language == 'es'
+    assert len(segments) == 3
+    assert segments[2]['words'][0]['start'] == 6.8
+    progress = [call.args[1] for call in mock_publish.call_args_list]
+    assert [p['completed_chunks'] for p in progress] == [1, 2, 3]
+    assert progress[-1]['partial_text'] == "\n".join(segment['text'] for segment in segments)
+
+def test_run_transcription_process_pool_matches_inline(pcm_path):
+    chunks = [(0.0, 2.22), (3.8, 5.22), (6.8, 10.0)]
+
+    inline, _ = run_transcription(pcm_path, chunks, 'stub', workers=1)
+    pooled, _ = run_transcription(pcm_path, chunks, 'stub', workers=2)
+
+    assert pooled == inline
+    # Workers arrancados con spawn, no con fork del proceso con hilos
+    assert transcription_service._get_asr_pool(2)._mp_context.get_start_method() == 'spawn'
+
+@patch('src.services.transcription_service.save_cached_result')
+@patch('src.services.transcription_service.lookup_cached_result', return_value=('fingerprint', None))
+@patch('src.services.transcription_service.store_file')
+def test_transcribe_file_writes_subtitles(mock_store, mock_lookup, mock_save, tmp_path, monkeypatch):
+    monkeypatch.setattr(transcription_service.settings, 'TEMP_DIR', str(tmp_path))
+    monkeypatch.setattr(transcription_service.settings, 'ASR_WORKERS', 1)
+    written = {}
+
+    def fake_store(path):
+        with open(path, encoding='utf-8') as f:
+            written['content'] = f.read()
+        return 'http://localhost:8080/storage/transcript.srt'
+
+    mock_store.side_effect = fake_store
+
+    with patch('src.services.transcription_service.run_ffmpeg_command',
+               side_effect=lambda command: make_speech([True, True, False, False, True]).tofile(command[-1])):
+        result = transcribe_file('/tmp/speech.mp4', output_format='srt', backend='stub')
+
+    assert result['url'] == 'http://localhost:8080/storage/transcript.srt'
+    assert result['chunk_count'] == 1
+    assert result['duration'] == 5.0
+    assert written['content'].startswith('1\n00:00:00,000 --> ')
+    mock_save.assert_called_once_with('fingerprint', 'transcribe', result)
+
+def test_transcribe_file_rejects_unknown_backend():
+    with pytest.raises(ValidationError):
+        transcribe_file('/tmp/speech.mp4', backend='cloud')
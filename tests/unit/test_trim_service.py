@@ -0,0 +1,127 @@
+# tests/unit/test_trim_service.py
+import pytest
+from unittest.mock import patch
+from src.api.middlewares.error_handler import ValidationError
+from src.services.keyframe_service import parse_packet_output
+from src.services.trim_service import (
+    normalize_trim_ranges, plan_trim_segments, build_segment_command, build_edge_encoding_args,
+    build_trim_mux_command, trim_video
+)
+
+# Keyframes cada 2 segundos en un video de 10 segundos
+PACKET_OUTPUT = "\n".join(
+    f"pts_time={t / 10:.6f}|dts_time={t / 10:.6f}|size=100|pos={t * 100}|flags={'K__' if t % 20 == 0 else '___'}"
+    for t in range(100)
+)
+
+@pytest.fixture
+def index():
+    return parse_packet_output(PACKET_OUTPUT)
+
+def test_normalize_trim_ranges():
+    assert normalize_trim_ranges([{'start': 1, 'end': 20}, {'start': 8}], 10.0) == [(1.0, 10.0), (8.0, 10.0)]
+
+    with pytest.raises(ValidationError):
+        normalize_trim_ranges([{'start': 5, 'end': 5}], 10.0)
+
+    with pytest.raises(ValidationError):
+        normalize_trim_ranges([{'start': 12}], 10.0)
+
+def test_plan_trim_segments_copies_full_gops(index):
+    segments = plan_trim_segments(index, 1.5, 7.3, 10.0)
+
+    assert segments == [
+        {'start': 1.5, 'end': 2.0, 'mode': 'encode'},
+        {'start': 2.0, 'end': 6.0, 'mode': 'copy'},
+        {'start': 6.0, 'end': 7.3, 'mode': 'encode'}
+    ]
+
+def test_plan_trim_segments_aligned_and_to_end(index):
+    assert plan_trim_segments(index, 2.0, 6.0, 10.0) == [{'start': 2.0, 'end': 6.0, 'mode': 'copy'}]
+    assert plan_trim_segments(index, 4.0, 10.0, 10.0) == [{'start': 4.0, 'end': 10.0, 'mode': 'copy'}]
+
+def test_plan_trim_segments_inside_one_gop(index):
+    assert plan_trim_segments(index, 2.5, 3.5, 10.0) == [{'start': 2.5, 'end': 3.5, 'mode': 'encode'}]
+    assert plan_trim_segments(None, 2.0, 6.0) == [{'start': 2.0, 'end': 6.0, 'mode': 'encode'}]
+
+def test_plan_trim_segments_with_start_offset():
+    # MPEG-TS típico: el primer pts es 1.4 s; los rangos y -ss son relativos
+    offset_output = "\n".join(
+        f"pts_time={1.4 + t / 10:.6f}|dts_time={1.4 + t / 10:.6f}|size=100|pos={t * 100}|flags={'K__' if t % 20 == 0 else '___'}"
+        for t in range(100)
+    ) + "\nstart_time=1.400000"
+
+    segments = plan_trim_segments(parse_packet_output(offset_output), 1.5, 7.3, 10.0)
+
+    assert [(round(s['start'], 6), round(s['end'], 6), s['mode']) for s in segments] == [
+        (1.5, 2.0, 'encode'), (2.0, 6.0, 'copy'), (6.0, 7.3, 'encode')
+    ]
+
+def test_build_segment_command():
+    copy = build_segment_command('/tmp/in.mp4', {'start': 2.0, 'end': 6.0, 'mode': 'copy'}, '/tmp/a.ts', ['-c:v', 'libx264'])
+    encode = build_segment_command('/tmp/in.mp4', {'start': 1.5, 'end': 2.0, 'mode': 'encode'}, '/tmp/b.ts', ['-c:v', 'libx264'])
+
+    # Búsqueda de entrada en ambos casos
+    assert copy.index('-ss') < copy.index('-i')
+    assert copy[copy.index('-c:v') + 1] == 'copy'
+    assert encode[encode.index('-c:v') + 1] == 'libx264'
+    assert encode[encode.index('-t') + 1] == '0.500000'
+    assert copy[-3:] == ['-f', 'mpegts', '/tmp/a.ts']
+
+    # Con el número de frames del índice no se usa -t
+    counted = build_segment_command('/tmp/in.ts', {'start': 1.5, 'end': 2.0, 'mode': 'encode'}, '/tmp/c.ts',
+                                    ['-c:v', 'libx264'], frames=5)
+    assert counted[counted.index('-frames:v') + 1] == '5'
+    assert '-t' not in counted
+
+def test_build_edge_encoding_args_matches_source():
+    args, smart_render = build_edge_encoding_args({'video_codec': 'hevc', 'pix_fmt': 'yuv420p10le'}, 'draft')
+
+    assert smart_render is True
+    assert args[args.index('-c:v') + 1] == 'libx265'
+    assert args[args.index('-pix_fmt') + 1] == 'yuv420p10le'
+
+    _, smart_render = build_edge_encoding_args({'video_codec': 'vp9'}, 'draft')
+    assert smart_render is False
+
+def test_build_trim_mux_command_concatenates_audio():
+    command = build_trim_mux_command('/tmp/list.txt', '/tmp/in.mp4', [(1.0, 3.0), (5.0, 6.0)], '/tmp/out.mp4')
+
+    assert command.count('-i') == 3
+    assert '[1:a:0][2:a:0]concat=n=2:v=0:a=1[aout]' in command
+    assert command[command.index('-c:v') + 1] == 'copy'
+
+    silent = build_trim_mux_command('/tmp/list.txt', '/tmp/in.mp4', [(1.0, 3.0)], '/tmp/out.mp4', has_audio=False)
+    assert silent.count('-i') == 1
+    assert '-filter_complex' not in silent
+
+@patch('src.services.trim_service.save_cached_result')
+@patch('src.services.trim_service.lookup_cached_result', return_value=(None, None))
+@patch('src.services.trim_service.store_file', return_value='http://localhost:8080/storage/trimmed.mp4')
+@patch('src.services.trim_service.verify_file_integrity', return_value=True)
+@patch('src.services.trim_service.run_ffmpeg_command')
+@patch('src.services.trim_service.get_keyframe_index')
+@patch('src.services.trim_service.get_media_info')
+@patch('src.services.trim_service.compute_file_hash', return_value='abc123')
+@patch('src.services.trim_service.download_file', return_value='/tmp/trim_input.mp4')
+def test_trim_video(mock_download, mock_hash, mock_info, mock_index, mock_run, mock_verify, mock_store,
+                    mock_lookup, mock_save, index):
+    mock_info.return_value = {'duration': 10.0, 'video_codec': 'h264', 'pix_fmt': 'yuv420p', 'audio_codec': 'aac'}
+    mock_index.return_value = index
+
+    result = trim_video('https://example.com/video.mp4', [{'start': 1.5, 'end': 7.3}])
+
+    assert result == {
+        'url': 'http://localhost:8080/storage/trimmed.mp4',
+        'duration': 5.8,
+        'copied_duration': 4.0,
+        'encoded_duration': 1.8
+    }
+    # Tres segmentos y la mezcla final
+    assert mock_run.call_count == 4
+    mock_save.assert_called_once()
+
+    # El archivo se lee una sola vez para la caché y el índice
+    mock_hash.assert_called_once_with('/tmp/trim_input.mp4')
+    assert mock_lookup.call_args.kwargs['input_hashes'] == ['abc123']
+    mock_index.assert_called_once_with('/tmp/trim_input.mp4', 'abc123')
@@ -1,9 +1,8 @@
 # tests/unit/test_video_service.py
 import pytest
-import os
 from unittest.mock import patch, MagicMock
 # Import directly from the module, not through __init__
-from src.services.video_service import add_captions_to_video, process_meme_overlay
+from src.services.video_service import add_captions_to_video, process_meme_overlay, build_subtitle_mux_command
 from src.api.middlewares.error_handler import ProcessingError
 
 @pytest.fixture
@@ -18,19 +17,26 @@ def mock_paths():
 @patch('src.services.video_service.download_file')
 @patch('src.services.video_service.generate_temp_filename')
 @patch('src.services.video_service.run_ffmpeg_command')
+@patch('src.services.video_service.verify_file_integrity', return_value=True)
+@patch('src.services.video_service.lookup_cached_result', return_value=(None, None))
+@patch('src.services.video_service.save_cached_result')
 @patch('src.services.video_service.store_file')
 def test_add_captions_to_video_success(
-    mock_store_file, mock_run_ffmpeg, mock_gen_temp, mock_download, mock_paths
+    mock_store_file, mock_save_cache, mock_lookup_cache, mock_verify, mock_run_ffmpeg, mock_gen_temp,
+    mock_download, mock_paths, tmp_path
 ):
-    mock_download.side_effect = [mock_paths['video_path'], mock_paths['subtitles_path']]
-    mock_gen_temp.return_value = mock_paths['output_path']
+    video_path = tmp_path / 'video.mp4'
+    subtitles_path = tmp_path / 'subtitles.srt'
+    ass_path = str(tmp_path / 'styled.ass')
+    video_path.write_text('test')
+    subtitles_path.write_text("1\n00:00:01,000 --> 00:00:02,500\nHola mundo\n")
+    
+    mock_download.side_effect = [str(video_path), str(subtitles_path)]
+    # Primero la salida .mp4 y después el ASS con el estilo aplicado
+    mock_gen_temp.side_effect = [mock_paths['output_path'], ass_path]
     mock_run_ffmpeg.return_value = {'success': True}
     mock_store_file.return_value = 'https://example.com/storage/output.mp4'
     
-    for path in [mock_paths['video_path'], mock_paths['subtitles_path']]:
-        with open(path, 'w') as f:
-            f.write('test')
-    
     result = add_captions_to_video(
         video_url='https://example.com/video.mp4',
         subtitles_url='https://example.com/subtitles.srt'
@@ -41,9 +47,15 @@ def test_add_captions_to_video_success(
     assert mock_run_ffmpeg.call_count == 1
     assert mock_store_file.call_count == 1
     
-    for path in [mock_paths['video_path'], mock_paths['subtitles_path']]:
-        if os.path.exists(path):
-            os.remove(path)
+    # Se quema el ASS generado, no el SRT descargado
+    command = mock_run_ffmpeg.call_args[0][0]
+    assert command[command.index('-i') + 1] == str(video_path)
+    assert command[command.index('-vf') + 1] == f"subtitles={ass_path}"
+    assert command[command.index('-c:a') + 1] == 'copy'
+    assert command[-1] == mock_paths['output_path']
+    
+    # Los temporales se eliminan al terminar
+    assert not video_path.exists() and not subtitles_path.exists()
 
 @patch('src.services.video_service.download_file')
 def test_add_captions_to_video_download_error(mock_download):
@@ -56,3 +68,23 @@ def test_add_captions_to_video_download_error(mock_download):
         )
     
     assert "Error de descarga" in str(excinfo.value)
+
+def test_build_subtitle_mux_command_multiple_tracks():
+    command = build_subtitle_mux_command('/tmp/video.mp4', [
+        {'path': '/tmp/en.srt', 'language': 'eng'},
+        {'path': '/tmp/es.vtt', 'language': 'spa', 'title': 'Español', 'default': True}
+    ], '/tmp/output.mp4')
+    
+    assert command.count('-i') == 3
+    assert command[command.index('-c:v') + 1] == 'copy'
+    assert command[command.index('-c:s') + 1] == 'mov_text'
+    assert '-vf' not in command
+    assert command[command.index('-metadata:s:s:1') + 1] == 'language=spa'
+    assert command[command.index('-disposition:s:0') + 1] == '0'
+    assert command[command.index('-disposition:s:1') + 1] == 'default'
+
+def test_build_subtitle_mux_command_mkv_uses_webvtt():
+    command = build_subtitle_mux_command('/tmp/video.mp4', [{'path': '/tmp/en.ass'}], '/tmp/output.mkv', 'mkv')
+    
+    assert command[command.index('-c:s') + 1] == 'webvtt'
+    assert '-movflags' not in command
@@ -0,0 +1,106 @@
+# tests/unit/test_waveform_service.py
+import io
+import json
+import numpy as np
+import pytest
+from unittest.mock import patch
+from src.api.middlewares.error_handler import ProcessingError, ValidationError
+from src.services import waveform_service
+from src.services.waveform_service import (
+    PeakAccumulator, parse_zoom_levels, compute_waveform_peaks, encode_waveform_dat, decode_waveform_dat,
+    build_waveform_json, generate_waveform
+)
+
+class FakeProcess:
+    def __init__(self, stdout=b'', returncode=0):
+        self.stdout = io.BytesIO(stdout)
+        self.returncode = returncode
+
+    def wait(self):
+        return self.returncode
+
+    def poll(self):
+        return self.returncode
+
+def make_audio(count=10000):
+    return (np.sin(np.arange(count) / 10) * 20000).astype('<i2')
+
+def test_peak_accumulator_matches_full_computation():
+    samples = make_audio()
+    accumulator = PeakAccumulator(256)
+
+    # Bloques que no coinciden con los píxeles
+    for first in range(0, len(samples), 1000):
+        accumulator.add(samples[first:first + 1000])
+    mins, maxs = accumulator.finish()
+
+    assert len(mins) == 40
+    for i in range(40):
+        bucket = samples[i * 256:(i + 1) * 256]
+        assert mins[i] == bucket.min() and maxs[i] == bucket.max()
+
+def test_parse_zoom_levels():
+    assert parse_zoom_levels([1024, 256, 256]) == [256, 1024]
+
+    with pytest.raises(ValidationError):
+        parse_zoom_levels([0])
+
+def test_compute_waveform_peaks_streams_in_chunks(monkeypatch):
+    monkeypatch.setattr(waveform_service, 'WAVEFORM_CHUNK_SAMPLES', 3000)
+    samples = make_audio()
+
+    with patch('src.services.waveform_service.subprocess.Popen', return_value=FakeProcess(samples.tobytes())):
+        peaks, sample_count = compute_waveform_peaks('/tmp/in.mp4', [256, 1024])
+
+    assert sample_count == 10000
+    assert len(peaks[256][0]) == 40
+    assert len(peaks[1024][0]) == 10
+    assert peaks[1024][1].max() == samples.max()
+
+def test_compute_waveform_peaks_error():
+    with patch('src.services.waveform_service.subprocess.Popen', return_value=FakeProcess(b'', returncode=1)):
+        with pytest.raises(ProcessingError):
+            compute_waveform_peaks('/tmp/in.mp4', [256])
+
+def test_waveform_dat_roundtrip():
+    mins = np.array([-100, -32768], dtype=np.int16)
+    maxs = np.array([200, 32767], dtype=np.int16)
+
+    data = encode_waveform_dat(mins, maxs, 44100, 256)
+    sample_rate, samples_per_pixel, decoded_mins, decoded_maxs = decode_waveform_dat(data)
+
+    assert len(data) == 20 + 8
+    assert (sample_rate, samples_per_pixel) == (44100, 256)
+    assert decoded_mins.tolist() == [-100, -32768]
+    assert decoded_maxs.tolist() == [200, 32767]
+
+def test_build_waveform_json_8_bits():
+    waveform = build_waveform_json(np.array([-32768], dtype=np.int16), np.array([32767], dtype=np.int16), 44100, 256)
+
+    assert waveform['bits'] == 8
+    assert waveform['data'] == [-128, 127]
+
+@patch('src.services.waveform_service.save_cached_result')
+@patch('src.services.waveform_service.lookup_cached_result', return_value=(None, None))
+@patch('src.services.waveform_service.store_file')
+@patch('src.services.waveform_service.get_media_info', return_value={'audio_codec': 'aac'})
+@patch('src.services.waveform_service.download_file', return_value='/tmp/waveform_input.mp4')
+def test_generate_waveform(mock_download, mock_info, mock_store, mock_lookup, mock_save, tmp_path, monkeypatch):
+    monkeypatch.setattr(waveform_service.settings, 'TEMP_DIR', str(tmp_path))
+    stored = {}
+
+    def fake_store(path):
+        with open(path, 'rb') as f:
+            stored[path.rsplit('.', 1)[-1]] = f.read()
+        return f"http://localhost:8080/storage/{path.rsplit('/', 1)[-1]}"
+
+    mock_store.side_effect = fake_store
+
+    with patch('src.services.waveform_service.subprocess.Popen', return_value=FakeProcess(make_audio(44100).tobytes())):
+        result = generate_waveform('https://example.com/audio.mp3', zoom_levels=[4096])
+
+    assert result['duration'] == 1.0
+    assert result['levels'][0]['length'] == 11
+    assert result['levels'][0]['dat_url'].endswith('.dat')
+    assert json.loads(stored['json'])['length'] == 11
+    assert decode_waveform_dat(stored['dat'])[1] == 4096